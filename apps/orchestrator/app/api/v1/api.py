@@ -1,5 +1,5 @@
 from fastapi import APIRouter
-from .endpoints import sessions, campaigns, narration, combat
+from .endpoints import sessions, campaigns, narration, combat, loot
 
 api_router = APIRouter()
 
@@ -7,3 +7,4 @@ api_router.include_router(sessions.router, prefix="/sessions", tags=["sessions"]
 api_router.include_router(campaigns.router, prefix="/campaigns", tags=["campaigns"])
 api_router.include_router(narration.router, prefix="/narration", tags=["narration"])
 api_router.include_router(combat.router, prefix="/combat", tags=["combat"])
+api_router.include_router(loot.router, prefix="/loot", tags=["loot"])
@@ -1,7 +1,10 @@
 from fastapi import APIRouter, Depends, HTTPException
 from sqlalchemy.orm import Session
-from typing import List
+from typing import List, Tuple
 from app.core.database import get_db
+from app.models.session import Session as SessionModel
+from app.schemas.combat import InitiativeDelay, InitiativeParticipant, TurnOrderResponse
+from app.services.initiative_tracker import InitiativeTracker
 
 router = APIRouter()
 
@@ -17,8 +20,82 @@ def resolve_action(session_id: str, db: Session = Depends(get_db)):
     # Implementation for action resolution
     pass
 
-@router.get("/{session_id}/turn-order")
+def _load_tracker(session_id: str, db: Session, for_update: bool = True) -> Tuple[SessionModel, InitiativeTracker]:
+    # Mutations lock the session row until _save_tracker commits, so concurrent
+    # turn-order changes apply one after another instead of overwriting each other
+    query = db.query(SessionModel).filter(SessionModel.id == session_id)
+    if for_update:
+        query = query.with_for_update()
+    session = query.first()
+    if not session:
+        raise HTTPException(status_code=404, detail="Session not found")
+    return session, InitiativeTracker.from_dict((session.settings or {}).get("initiative", {}))
+
+def _save_tracker(session: SessionModel, tracker: InitiativeTracker, db: Session) -> TurnOrderResponse:
+    # Reassign so SQLAlchemy notices the JSON column changed
+    session.settings = {**(session.settings or {}), "initiative": tracker.to_dict()}
+    db.commit()
+    return _turn_order_response(tracker)
+
+def _turn_order_response(tracker: InitiativeTracker) -> TurnOrderResponse:
+    order = [
+        {"participant_id": e.participant_id, "name": e.name, "initiative": e.initiative, "modifier": e.modifier}
+        for e in tracker.order()
+    ]
+    current = order[0] if tracker.current is not None and not tracker.current.removed and order else None
+    return TurnOrderResponse(round=tracker.round, current=current, order=order)
+
+@router.get("/{session_id}/turn-order", response_model=TurnOrderResponse)
 def get_turn_order(session_id: str, db: Session = Depends(get_db)):
     """Get current turn order"""
-    # Implementation for turn order
-    pass
+    _, tracker = _load_tracker(session_id, db, for_update=False)
+    return _turn_order_response(tracker)
+
+@router.post("/{session_id}/turn-order/next", response_model=TurnOrderResponse)
+def next_turn(session_id: str, db: Session = Depends(get_db)):
+    """Advance to the next participant's turn"""
+    session, tracker = _load_tracker(session_id, db)
+    if not len(tracker):
+        raise HTTPException(status_code=400, detail="Turn order is empty")
+    tracker.next_turn()
+    return _save_tracker(session, tracker, db)
+
+@router.post("/{session_id}/turn-order/participants", response_model=TurnOrderResponse)
+def add_participants(
+    session_id: str,
+    participants: List[InitiativeParticipant],
+    db: Session = Depends(get_db)
+):
+    """Insert participants (e.g. summoned creatures) into the turn order"""
+    session, tracker = _load_tracker(session_id, db)
+    try:
+        for participant in participants:
+            tracker.insert(participant.participant_id, participant.name, participant.initiative, participant.modifier)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    return _save_tracker(session, tracker, db)
+
+@router.delete("/{session_id}/turn-order/participants/{participant_id}", response_model=TurnOrderResponse)
+def remove_participant(session_id: str, participant_id: str, db: Session = Depends(get_db)):
+    """Remove a participant from the turn order"""
+    session, tracker = _load_tracker(session_id, db)
+    try:
+        tracker.remove(participant_id)
+    except KeyError:
+        raise HTTPException(status_code=404, detail="Participant not in turn order")
+    return _save_tracker(session, tracker, db)
+
+@router.post("/{session_id}/turn-order/participants/{participant_id}/delay", response_model=TurnOrderResponse)
+def delay_participant(
+    session_id: str,
+    participant_id: str,
+    delay: InitiativeDelay,
+    db: Session = Depends(get_db)
+):
+    """Delay (or ready) a participant to act on a different initiative count"""
+    session, tracker = _load_tracker(session_id, db)
+    try:
+        tracker.delay(participant_id, delay.initiative)
+    except KeyError:
+        raise HTTPException(status_code=404, detail="Participant not in turn order")
+    return _save_tracker(session, tracker, db)
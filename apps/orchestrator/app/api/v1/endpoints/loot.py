@@ -0,0 +1,19 @@
+from fastapi import APIRouter, HTTPException, Query
+from app.schemas.loot import LootStatisticsResponse
+from app.services.loot_statistics import LootStatisticsUnavailable, loot_statistics
+
+router = APIRouter()
+
+@router.get("/statistics", response_model=LootStatisticsResponse)
+def get_loot_statistics(
+    challenge_rating: float = Query(..., ge=0, description="Encounter CR"),
+    hoard_type: str = Query("standard", description="Hoard type ('individual', 'standard', 'lair')"),
+    individual: bool = Query(False, description="Individual treasure for one creature instead of a hoard"),
+):
+    """Exact expected value, variance and rarity distribution of the loot for a CR"""
+    try:
+        return loot_statistics.lookup(challenge_rating, hoard_type, individual)
+    except KeyError:
+        raise HTTPException(status_code=400, detail=f"Unknown hoard type: {hoard_type}")
+    except LootStatisticsUnavailable as e:
+        raise HTTPException(status_code=503, detail=f"Loot statistics unavailable: {e}")
@@ -29,6 +29,11 @@ class Settings(BaseSettings):
     GATEWAY_URL: str = "http://localhost:3001"
     WORKERS_URL: str = "http://localhost:8001"
     
+    # Loot statistics (computed by the workers, cached here)
+    LOOT_STATS_CACHE_SECONDS: int = 3600
+    LOOT_STATS_TIMEOUT: float = 10.0
+    LOOT_STATS_RETRY_SECONDS: int = 60
+    
     # Logging
     LOG_LEVEL: str = "INFO"
     
@@ -0,0 +1,18 @@
+from celery import Celery
+from app.core.config import settings
+
+# Client for the Celery workers (apps/workers); tasks are sent by name, so
+# the orchestrator does not import worker code
+workers = Celery(
+    "ai_dungeon_master_orchestrator",
+    broker=settings.REDIS_URL,
+    backend=settings.REDIS_URL,
+)
+
+workers.conf.update(
+    task_serializer="json",
+    accept_content=["json"],
+    result_serializer="json",
+    timezone="UTC",
+    enable_utc=True,
+)
@@ -0,0 +1,22 @@
+from pydantic import BaseModel, Field
+from typing import List, Optional
+
+class InitiativeParticipant(BaseModel):
+    participant_id: str = Field(..., description="Participant ID")
+    name: str = Field(..., description="Display name")
+    initiative: int = Field(..., description="Initiative total")
+    modifier: int = Field(default=0, description="Initiative modifier (first tiebreak)")
+
+class InitiativeDelay(BaseModel):
+    initiative: int = Field(..., description="New initiative count to act on")
+
+class TurnOrderEntry(BaseModel):
+    participant_id: str
+    name: str
+    initiative: int
+    modifier: int
+
+class TurnOrderResponse(BaseModel):
+    round: int
+    current: Optional[TurnOrderEntry] = None
+    order: List[TurnOrderEntry] = Field(default=[], description="Turn order starting from the current participant")
@@ -0,0 +1,26 @@
+from pydantic import BaseModel, Field
+from typing import Dict, List, Optional
+
+class CountDistribution(BaseModel):
+    expected: float
+    distribution: List[float] = Field(default=[], description="P(count == k) for k = 0, 1, ...")
+
+class CoinStatistics(BaseModel):
+    expected: float
+    variance: float
+
+class TierRange(BaseModel):
+    min_cr: float
+    max_cr: Optional[float] = Field(default=None, description="Exclusive upper bound; none for the last tier")
+
+class LootStatisticsResponse(BaseModel):
+    tables_version: str
+    tier: TierRange
+    hoard_type: str
+    expected_value: float = Field(..., description="Expected total value in gp")
+    variance: float
+    std_dev: float
+    coins: Dict[str, CoinStatistics] = Field(default={}, description="Coin amounts per coin type")
+    expected_value_by_category: Dict[str, float] = {}
+    item_count: CountDistribution
+    rarity: Dict[str, CountDistribution] = Field(default={}, description="Item count distribution per rarity")
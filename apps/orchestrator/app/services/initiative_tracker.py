@@ -0,0 +1,170 @@
+import heapq
+import itertools
+import random
+from dataclasses import dataclass, field
+from typing import Any, Dict, List, Optional, Tuple
+
+@dataclass
+class InitiativeEntry:
+    participant_id: str
+    name: str
+    initiative: int
+    modifier: int = 0
+    tiebreak: float = 0.0
+    seq: int = 0
+    removed: bool = field(default=False, compare=False)
+
+    @property
+    def key(self) -> Tuple[int, int, float, int]:
+        """Heap key: highest initiative, then modifier, then the stored tiebreak, acts first"""
+        return (-self.initiative, -self.modifier, -self.tiebreak, self.seq)
+
+class InitiativeTracker:
+    """
+    Initiative order as two heaps: participants still to act this round and
+    participants who have already acted. Tiebreaks are rolled once on insert,
+    so nothing is ever re-sorted; insert, remove (lazy), delay and next_turn
+    are all O(log n).
+
+    The turn marker is the sort position of the current turn. New entries
+    that sort after it still act this round. It stays put when the current
+    participant delays, so the round carries on from the same place.
+    """
+
+    def __init__(self, round: int = 1):
+        self.round = round
+        self.current: Optional[InitiativeEntry] = None
+        self._turn_key: Optional[Tuple[int, int, float]] = None
+        self._pending: List[Tuple[Tuple, InitiativeEntry]] = []
+        self._acted: List[Tuple[Tuple, InitiativeEntry]] = []
+        self._entries: Dict[str, InitiativeEntry] = {}
+        self._seq = itertools.count()
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def __contains__(self, participant_id: str) -> bool:
+        return participant_id in self._entries
+
+    def insert(
+        self,
+        participant_id: str,
+        name: str,
+        initiative: int,
+        modifier: int = 0,
+        tiebreak: Optional[float] = None
+    ) -> InitiativeEntry:
+        """Add a participant (e.g. a summoned creature) without re-sorting"""
+        if participant_id in self._entries:
+            raise ValueError(f"Participant already in initiative: {participant_id}")
+        entry = InitiativeEntry(
+            participant_id=participant_id,
+            name=name,
+            initiative=initiative,
+            modifier=modifier,
+            tiebreak=random.random() if tiebreak is None else tiebreak,
+            seq=next(self._seq)
+        )
+        self._entries[participant_id] = entry
+        self._push(entry)
+        return entry
+
+    def remove(self, participant_id: str) -> InitiativeEntry:
+        """Remove a participant (e.g. a dead creature); heap entries are dropped lazily"""
+        entry = self._entries.pop(participant_id, None)
+        if entry is None:
+            raise KeyError(participant_id)
+        entry.removed = True
+        return entry
+
+    def delay(self, participant_id: str, initiative: int) -> InitiativeEntry:
+        """Move a participant to a new initiative count, keeping its modifier and tiebreak"""
+        old = self.remove(participant_id)
+        entry = self.insert(participant_id, old.name, initiative, old.modifier, old.tiebreak)
+        if self.current is old:
+            # Still this participant's turn; the marker keeps the round's place
+            self.current = entry
+        return entry
+
+    def next_turn(self) -> Optional[InitiativeEntry]:
+        """Advance to the next participant, starting a new round when everyone has acted"""
+        entry = self._pop_valid(self._pending)
+        if entry is None:
+            self._pending, self._acted = self._acted, []
+            self.round += 1
+            entry = self._pop_valid(self._pending)
+        if entry is not None:
+            heapq.heappush(self._acted, (entry.key, entry))
+            self._turn_key = _position(entry)
+        self.current = entry
+        return entry
+
+    def order(self) -> List[InitiativeEntry]:
+        """Full turn order starting from the current participant"""
+        current = self.current if self.current is not None and not self.current.removed else None
+        upcoming = sorted((e for _, e in self._pending if not e.removed and e is not current), key=lambda e: e.key)
+        acted = sorted((e for _, e in self._acted if not e.removed and e is not current), key=lambda e: e.key)
+        return ([current] if current else []) + upcoming + acted
+
+    def _push(self, entry: InitiativeEntry) -> None:
+        # Participants that sort after the turn marker still act this round
+        if self._turn_key is None or _position(entry) >= self._turn_key:
+            heapq.heappush(self._pending, (entry.key, entry))
+        else:
+            heapq.heappush(self._acted, (entry.key, entry))
+
+    @staticmethod
+    def _pop_valid(heap: List[Tuple[Tuple, InitiativeEntry]]) -> Optional[InitiativeEntry]:
+        while heap:
+            _, entry = heapq.heappop(heap)
+            if not entry.removed:
+                return entry
+        return None
+
+    def to_dict(self) -> Dict[str, Any]:
+        """Serializable form for storing with the session"""
+        pending_ids = {e.participant_id for _, e in self._pending if not e.removed}
+        return {
+            "round": self.round,
+            "current": self.current.participant_id if self.current and not self.current.removed else None,
+            "turn": list(self._turn_key) if self._turn_key is not None else None,
+            "entries": [
+                {
+                    "participant_id": e.participant_id,
+                    "name": e.name,
+                    "initiative": e.initiative,
+                    "modifier": e.modifier,
+                    "tiebreak": e.tiebreak,
+                    "pending": e.participant_id in pending_ids
+                }
+                for e in self._entries.values()
+            ]
+        }
+
+    @classmethod
+    def from_dict(cls, data: Dict[str, Any]) -> "InitiativeTracker":
+        tracker = cls(round=data.get("round", 1))
+        for raw in data.get("entries", []):
+            entry = InitiativeEntry(
+                participant_id=raw["participant_id"],
+                name=raw["name"],
+                initiative=raw["initiative"],
+                modifier=raw.get("modifier", 0),
+                tiebreak=raw.get("tiebreak", 0.0),
+                seq=next(tracker._seq)
+            )
+            tracker._entries[entry.participant_id] = entry
+            heap = tracker._pending if raw.get("pending", True) else tracker._acted
+            heap.append((entry.key, entry))
+            if entry.participant_id == data.get("current"):
+                tracker.current = entry
+        heapq.heapify(tracker._pending)
+        heapq.heapify(tracker._acted)
+        if data.get("turn") is not None:
+            tracker._turn_key = tuple(data["turn"])
+        return tracker
+
+
+def _position(entry: InitiativeEntry) -> Tuple[int, int, float]:
+    """Turn-order position of an entry, independent of its insertion sequence"""
+    return entry.key[:3]
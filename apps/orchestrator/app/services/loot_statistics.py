@@ -0,0 +1,122 @@
+import threading
+import time
+from bisect import bisect_right
+from typing import Any, Callable, Dict, Optional
+import structlog
+from app.core.config import settings
+from app.core.workers import workers
+
+logger = structlog.get_logger()
+
+LOOT_STATISTICS_TASK = "app.tasks.loot_gen.loot_statistics"
+
+class LootStatisticsUnavailable(RuntimeError):
+    """The workers could not provide the statistics table"""
+
+def fetch_from_workers() -> Dict[str, Any]:
+    """Statistics table from the workers' loot_statistics task"""
+    result = workers.send_task(LOOT_STATISTICS_TASK).get(timeout=settings.LOOT_STATS_TIMEOUT)
+    if 'error' in result:
+        raise LootStatisticsUnavailable(result['error'])
+    return result
+
+class LootStatisticsCache:
+    """
+    The workers' loot statistics table (every CR tier and hoard type),
+    fetched once and kept for ``ttl`` seconds. The table is small and only
+    changes with the loot table file, so lookups are answered locally.
+
+    Only the first fetch runs on a request thread. Once a table is cached, a
+    stale one is served while a background thread refreshes it. A failed
+    fetch is not retried for ``retry`` seconds.
+    """
+
+    def __init__(
+        self,
+        fetch: Callable[[], Dict[str, Any]] = fetch_from_workers,
+        ttl: float = settings.LOOT_STATS_CACHE_SECONDS,
+        retry: float = settings.LOOT_STATS_RETRY_SECONDS
+    ):
+        self.fetch = fetch
+        self.ttl = ttl
+        self.retry = retry
+        self._table: Optional[Dict[str, Any]] = None
+        self._fetched_at = 0.0
+        self._retry_at = 0.0
+        self._error = ""
+        self._lock = threading.Lock()
+
+    def table(self) -> Dict[str, Any]:
+        table = self._table
+        if table is not None:
+            if time.monotonic() - self._fetched_at >= self.ttl:
+                self._refresh_in_background()
+            return table
+        with self._lock:
+            # Another request may have fetched it while we waited
+            if self._table is not None:
+                return self._table
+            if time.monotonic() < self._retry_at:
+                raise LootStatisticsUnavailable(self._error)
+            self._refresh()
+            return self._table
+
+    def _refresh(self) -> None:
+        """Fetch the table; the caller holds the lock"""
+        try:
+            table = self.fetch()
+        except Exception as e:
+            self._retry_at = time.monotonic() + self.retry
+            if self._table is not None:
+                # Keep serving the previous table until the retry is due
+                self._fetched_at = self._retry_at - self.ttl
+                logger.warning("Loot statistics refresh failed", error=str(e), retry_in=self.retry)
+                return
+            self._error = str(e)
+            raise LootStatisticsUnavailable(self._error) from e
+        self._table, self._fetched_at = table, time.monotonic()
+        logger.info("Loot statistics cached", tables_version=table.get('tables_version'))
+
+    def _refresh_in_background(self) -> None:
+        if not self._lock.acquire(blocking=False):
+            # A refresh is already running
+            return
+
+        def run():
+            try:
+                if time.monotonic() - self._fetched_at >= self.ttl:
+                    self._refresh()
+            finally:
+                self._lock.release()
+
+        try:
+            threading.Thread(target=run, name="loot-statistics-refresh", daemon=True).start()
+        except Exception:
+            self._lock.release()
+            raise
+
+    def lookup(self, challenge_rating: float, hoard_type: str = "standard", individual: bool = False) -> Dict[str, Any]:
+        """
+        Statistics for the tier containing ``challenge_rating``: a treasure
+        hoard of ``hoard_type``, or individual treasure
+
+        Raises:
+            KeyError: Unknown hoard type
+            LootStatisticsUnavailable: No table cached and the workers failed
+        """
+        table = self.table()
+        bounds = [tier['min_cr'] for tier in table['tiers']]
+        tier = max(bisect_right(bounds, challenge_rating) - 1, 0)
+        by_tier = table['individual_treasure'] if individual else table['hoards'][hoard_type]
+        return {'tables_version': table['tables_version'], **by_tier[tier]}
+
+    def warm(self) -> None:
+        """Fetch the table in the background so the first request does not wait"""
+        def run():
+            try:
+                self.table()
+            except LootStatisticsUnavailable as e:
+                logger.warning("Loot statistics warm-up failed", error=str(e))
+        threading.Thread(target=run, name="loot-statistics-warm", daemon=True).start()
+
+loot_statistics = LootStatisticsCache()
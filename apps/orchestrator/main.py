@@ -6,6 +6,7 @@ from app.core.config import settings
 from app.api.v1.api import api_router
 from app.core.database import engine
 from app.models import Base
+from app.services.loot_statistics import loot_statistics
 
 # Configure structured logging
 structlog.configure(
@@ -37,6 +38,9 @@ async def lifespan(app: FastAPI):
     Base.metadata.create_all(bind=engine)
     logger.info("Database tables created")
     
+    # Fetch loot statistics in the background so lookups are served from cache
+    loot_statistics.warm()
+    
     yield
     
     # Shutdown
@@ -0,0 +1,123 @@
+"""
+Area-of-effect templates on the map grid.
+
+Templates (sphere/cylinder, cone, line, cube) are rasterized to the cells
+whose centers fall inside the shape, in feet at 5 feet per cell:
+- Square grids measure from the grid intersection nearest the origin
+  point.
+- Hex grids measure from the center of the hex containing the origin.
+- A cone's width at any distance equals that distance.
+- A line is 5 feet wide unless a width is given.
+- A cube extends ``size`` feet from the origin in ``direction``.
+
+Masks are relative to the origin, so they are cached by (shape, size,
+width, direction, grid type) and shifted into place per use. Affected
+tokens are then found through the token index's cell hash.
+"""
+from functools import lru_cache
+from typing import Any, Dict, Iterable, List, Set, Tuple
+import math
+import numpy as np
+from app.services import hex_grid
+from app.services.token_index import FEET_PER_CELL, TokenIndex
+
+SHAPES = ('sphere', 'cylinder', 'cone', 'line', 'cube')
+TEMPLATE_CACHE_SIZE = 512
+
+Cell = Tuple[int, int]
+
+
+@lru_cache(maxsize=TEMPLATE_CACHE_SIZE)
+def template_offsets(
+    shape: str,
+    size: int,
+    direction: int = 0,
+    grid_type: str = 'square',
+    width: int = FEET_PER_CELL
+) -> np.ndarray:
+    """
+    Cells covered by a template, relative to its origin (read-only)
+
+    Args:
+        shape: 'sphere'/'cylinder' (size = radius), 'cone' or 'line' (size =
+            length), 'cube' (size = side)
+        size: Template size in feet
+        direction: Facing in whole degrees (0 = +x, 90 = +y)
+        grid_type: 'square' (offsets in cells from the origin intersection's
+            lower-right cell) or 'hex' (axial offsets from the origin hex)
+        width: Line width in feet
+
+    Returns:
+        (N, 2) int array of offsets
+    """
+    if shape not in SHAPES:
+        raise ValueError(f"Unsupported template shape: {shape}")
+    reach = int(math.ceil(max(size, width) * (math.sqrt(2) if shape == 'cube' else 1) / FEET_PER_CELL)) + 1
+
+    if grid_type == 'hex':
+        candidates = hex_grid.range_offsets(reach)
+        # Hex centers one step apart are 5 feet apart
+        px, py = hex_grid.axial_to_pixel(candidates[:, 0], candidates[:, 1], FEET_PER_CELL / math.sqrt(3))
+    else:
+        span = np.arange(-reach, reach)
+        dy, dx = np.meshgrid(span, span, indexing='ij')
+        candidates = np.stack([dx.ravel(), dy.ravel()], axis=1)
+        px = (candidates[:, 0] + 0.5) * FEET_PER_CELL
+        py = (candidates[:, 1] + 0.5) * FEET_PER_CELL
+
+    angle = math.radians(direction)
+    along = px * math.cos(angle) + py * math.sin(angle)
+    across = -px * math.sin(angle) + py * math.cos(angle)
+    eps = 1e-9
+    if shape in ('sphere', 'cylinder'):
+        inside = np.hypot(px, py) <= size + eps
+    elif shape == 'cone':
+        inside = (along > 0) & (along <= size + eps) & (np.abs(across) <= along / 2 + eps)
+    elif shape == 'line':
+        inside = (along > 0) & (along <= size + eps) & (np.abs(across) <= width / 2 + eps)
+    else:
+        inside = (along >= -eps) & (along <= size + eps) & (np.abs(across) <= size / 2 + eps)
+    if grid_type == 'hex' and shape in ('sphere', 'cylinder'):
+        inside[0] = True
+
+    offsets = np.ascontiguousarray(candidates[inside], dtype=np.int64)
+    offsets.setflags(write=False)
+    return offsets
+
+
+def template_cells(
+    template: Dict[str, Any],
+    origin: Tuple[float, float],
+    grid_size: int = 50,
+    grid_type: str = 'square'
+) -> np.ndarray:
+    """
+    Map cells (col, row) covered by a template placed at a pixel origin
+
+    Args:
+        template: {'shape', 'size', 'direction' (degrees), 'width'}
+        origin: Origin point in pixels
+        grid_size: Cell size in pixels
+        grid_type: 'square' or 'hex'
+    """
+    offsets = template_offsets(
+        template['shape'],
+        int(template['size']),
+        int(round(template.get('direction', 0))) % 360,
+        grid_type,
+        int(template.get('width', FEET_PER_CELL)),
+    )
+    x, y = origin
+    if grid_type == 'hex':
+        q, r = hex_grid.pixel_to_axial(x, y, grid_size)
+        cols, rows = hex_grid.axial_to_offset(offsets[:, 0] + q, offsets[:, 1] + r)
+        return np.stack([cols, rows], axis=1)
+    corner = np.array([round(x / grid_size), round(y / grid_size)], dtype=np.int64)
+    return offsets + corner
+
+
+def tokens_in_cells(index: TokenIndex, cells: np.ndarray, exclude: Iterable[str] = ()) -> List[str]:
+    """Ids of tokens occupying any of ``cells``, sorted"""
+    found: Set[str] = index.at_cells(map(tuple, cells.tolist()))
+    found.difference_update(exclude)
+    return sorted(found)
@@ -0,0 +1,255 @@
+"""
+Array-backed combat state.
+
+Participants are stored struct-of-arrays (one NumPy column per attribute)
+rather than as a list of dicts. Per-side conscious counts are maintained
+incrementally as HP crosses zero, so "should combat end?" is O(1) instead
+of a scan over every participant. Conditions are a bitmask per participant.
+
+The state serializes to a compact columnar dict that fits the Celery JSON
+serializer and round-trips between workers.
+"""
+from typing import Any, Dict, Iterable, List, Optional
+import numpy as np
+
+STATE_VERSION = 1
+
+CONDITIONS = (
+    'blinded', 'charmed', 'deafened', 'frightened', 'grappled', 'incapacitated',
+    'invisible', 'paralyzed', 'petrified', 'poisoned', 'prone', 'restrained',
+    'stunned', 'unconscious', 'exhaustion', 'concentrating',
+)
+_CONDITION_BITS = {name: 1 << i for i, name in enumerate(CONDITIONS)}
+
+
+class CombatState:
+    """HP, AC, side, initiative and conditions for every participant in an encounter"""
+    __slots__ = (
+        'ids', 'names', 'side_names', '_index',
+        'hp', 'max_hp', 'ac', 'side', 'initiative', 'conditions',
+        'order', 'turn', 'round', '_conscious', '_live_sides',
+    )
+
+    def __init__(
+        self,
+        ids: List[str],
+        names: List[str],
+        side_names: List[str],
+        hp: np.ndarray,
+        max_hp: np.ndarray,
+        ac: np.ndarray,
+        side: np.ndarray,
+        initiative: np.ndarray,
+        conditions: np.ndarray,
+        order: Optional[np.ndarray] = None,
+        turn: int = 0,
+        round: int = 1,
+    ):
+        self.ids = ids
+        self.names = names
+        self.side_names = side_names
+        self._index = {pid: i for i, pid in enumerate(ids)}
+        self.hp = hp
+        self.max_hp = max_hp
+        self.ac = ac
+        self.side = side
+        self.initiative = initiative
+        self.conditions = conditions
+        # Stable descending initiative order (ties keep input order)
+        self.order = order if order is not None else np.argsort(-initiative, kind='stable').astype(np.int32)
+        self.turn = turn
+        self.round = round
+        self._conscious = np.bincount(side[hp > 0], minlength=len(side_names)).astype(np.int32)
+        self._live_sides = int(np.count_nonzero(self._conscious))
+
+    @classmethod
+    def from_participants(cls, participants: List[Dict[str, Any]]) -> 'CombatState':
+        """Build from the participant dicts used by the combat tasks"""
+        side_names: List[str] = []
+        side_index: Dict[str, int] = {}
+        sides = []
+        conditions = []
+        for p in participants:
+            side = p.get('side', 'neutral')
+            if side not in side_index:
+                side_index[side] = len(side_names)
+                side_names.append(side)
+            sides.append(side_index[side])
+            conditions.append(condition_mask(p.get('conditions', [])))
+
+        return cls(
+            ids=[str(p.get('id', p.get('name', i))) for i, p in enumerate(participants)],
+            names=[p.get('name') for p in participants],
+            side_names=side_names,
+            hp=np.array([p.get('current_hp', 0) for p in participants], dtype=np.int32),
+            max_hp=np.array([p.get('max_hp', p.get('current_hp', 0)) for p in participants], dtype=np.int32),
+            ac=np.array([p.get('armor_class', 10) for p in participants], dtype=np.int16),
+            side=np.array(sides, dtype=np.int16),
+            initiative=np.array([p.get('initiative_total', 0) for p in participants], dtype=np.int16),
+            conditions=np.array(conditions, dtype=np.int32),
+        )
+
+    def copy(self) -> 'CombatState':
+        """Independent copy (arrays are copied, id/name lists are shared)"""
+        return CombatState(
+            self.ids, self.names, self.side_names,
+            self.hp.copy(), self.max_hp, self.ac, self.side, self.initiative.copy(),
+            self.conditions.copy(), self.order.copy(), self.turn, self.round,
+        )
+
+    def __len__(self) -> int:
+        return len(self.ids)
+
+    def index_of(self, participant_id: str) -> int:
+        return self._index[participant_id]
+
+    # --- HP -----------------------------------------------------------------
+
+    def apply_damage(self, index: int, amount: int) -> int:
+        """Apply damage (negative heals) to one participant; returns the new HP"""
+        before = int(self.hp[index])
+        after = max(0, min(int(self.max_hp[index]), before - amount))
+        self.hp[index] = after
+        if (before > 0) != (after > 0):
+            self._update_conscious(int(self.side[index]), 1 if after > 0 else -1)
+        return after
+
+    def heal(self, index: int, amount: int) -> int:
+        return self.apply_damage(index, -amount)
+
+    def apply_damage_batch(self, indices: Iterable[int], amounts: Iterable[int]) -> None:
+        """Apply many damage amounts at once (repeated indices accumulate)"""
+        idx = np.asarray(list(indices), dtype=np.intp)
+        if not idx.size:
+            return
+        total = np.bincount(idx, weights=np.asarray(list(amounts), dtype=np.float64), minlength=len(self))
+        touched = np.nonzero(total)[0]
+        before = self.hp[touched] > 0
+        self.hp[touched] = np.clip(self.hp[touched] - total[touched].astype(np.int32), 0, self.max_hp[touched])
+        after = self.hp[touched] > 0
+        changed = touched[before != after]
+        for i in changed.tolist():
+            self._update_conscious(int(self.side[i]), 1 if self.hp[i] > 0 else -1)
+
+    def _update_conscious(self, side: int, delta: int) -> None:
+        was_live = self._conscious[side] > 0
+        self._conscious[side] += delta
+        is_live = self._conscious[side] > 0
+        if was_live != is_live:
+            self._live_sides += 1 if is_live else -1
+
+    # --- Conditions ---------------------------------------------------------
+
+    def add_condition(self, index: int, condition: str) -> None:
+        self.conditions[index] |= _CONDITION_BITS[condition]
+
+    def remove_condition(self, index: int, condition: str) -> None:
+        self.conditions[index] &= ~_CONDITION_BITS[condition]
+
+    def has_condition(self, index: int, condition: str) -> bool:
+        return bool(self.conditions[index] & _CONDITION_BITS[condition])
+
+    # --- Turn order ---------------------------------------------------------
+
+    @property
+    def current(self) -> int:
+        """Index of the participant whose turn it is"""
+        return int(self.order[self.turn])
+
+    def advance_turn(self, skip_unconscious: bool = True) -> int:
+        """Move to the next participant in initiative order; returns its index"""
+        for _ in range(len(self.order)):
+            self.turn += 1
+            if self.turn >= len(self.order):
+                self.turn = 0
+                self.round += 1
+            if not skip_unconscious or self.hp[self.order[self.turn]] > 0:
+                break
+        return self.current
+
+    # --- End of combat ------------------------------------------------------
+
+    @property
+    def combat_should_end(self) -> bool:
+        return self._live_sides <= 1
+
+    @property
+    def winner(self) -> Optional[str]:
+        if self._live_sides != 1:
+            return None
+        return self.side_names[int(np.flatnonzero(self._conscious)[0])]
+
+    def side_summary(self) -> Dict[str, Dict[str, int]]:
+        """Per-side conscious/total counts, as returned by check_combat_end"""
+        totals = np.bincount(self.side, minlength=len(self.side_names))
+        return {
+            name: {'conscious': int(self._conscious[i]), 'total': int(totals[i])}
+            for i, name in enumerate(self.side_names)
+        }
+
+    # --- Serialization ------------------------------------------------------
+
+    def to_dict(self) -> Dict[str, Any]:
+        """Compact columnar form for passing between workers"""
+        return {
+            'version': STATE_VERSION,
+            'ids': self.ids,
+            'names': self.names,
+            'side_names': self.side_names,
+            'hp': self.hp.tolist(),
+            'max_hp': self.max_hp.tolist(),
+            'ac': self.ac.tolist(),
+            'side': self.side.tolist(),
+            'initiative': self.initiative.tolist(),
+            'conditions': self.conditions.tolist(),
+            'order': self.order.tolist(),
+            'turn': self.turn,
+            'round': self.round,
+        }
+
+    @classmethod
+    def from_dict(cls, data: Dict[str, Any]) -> 'CombatState':
+        if data.get('version') != STATE_VERSION:
+            raise ValueError(f"Unsupported combat state version: {data.get('version')}")
+        return cls(
+            ids=list(data['ids']),
+            names=list(data['names']),
+            side_names=list(data['side_names']),
+            hp=np.array(data['hp'], dtype=np.int32),
+            max_hp=np.array(data['max_hp'], dtype=np.int32),
+            ac=np.array(data['ac'], dtype=np.int16),
+            side=np.array(data['side'], dtype=np.int16),
+            initiative=np.array(data['initiative'], dtype=np.int16),
+            conditions=np.array(data['conditions'], dtype=np.int32),
+            order=np.array(data['order'], dtype=np.int32),
+            turn=data['turn'],
+            round=data['round'],
+        )
+
+    def to_participants(self) -> List[Dict[str, Any]]:
+        """Expand back into participant dicts"""
+        return [
+            {
+                'id': self.ids[i],
+                'name': self.names[i],
+                'side': self.side_names[self.side[i]],
+                'current_hp': int(self.hp[i]),
+                'max_hp': int(self.max_hp[i]),
+                'armor_class': int(self.ac[i]),
+                'initiative_total': int(self.initiative[i]),
+                'conditions': conditions_from_mask(int(self.conditions[i])),
+            }
+            for i in range(len(self))
+        ]
+
+
+def condition_mask(conditions: Iterable[str]) -> int:
+    """Bitmask for a list of condition names (unknown names are ignored)"""
+    mask = 0
+    for condition in conditions:
+        mask |= _CONDITION_BITS.get(condition, 0)
+    return mask
+
+
+def conditions_from_mask(mask: int) -> List[str]:
+    return [name for name, bit in _CONDITION_BITS.items() if mask & bit]
@@ -0,0 +1,203 @@
+"""
+Dice expression grammar.
+
+Expressions such as ``"2d20kh1 + 5"`` or ``"1d8 + 1d6 - 1"`` are parsed once
+into an immutable ``DiceExpression`` and kept in a bounded LRU keyed by the
+normalized expression, so hot expressions skip parsing entirely.
+
+Grammar (whitespace and case are ignored)::
+
+    expression := term (("+" | "-") term)*
+    term       := dice | integer
+    dice       := [count] "d" (sides | "%") [keep]
+    keep       := "k" ["h" | "l"] integer
+"""
+from dataclasses import dataclass
+from functools import lru_cache
+from typing import Callable, Dict, List, NamedTuple, Optional, Tuple
+import random
+import re
+
+# Upper bounds keep a single expression from monopolising a worker
+MAX_DICE_PER_TERM = 1000
+MAX_SIDES = 1000
+EXPRESSION_CACHE_SIZE = 1024
+
+_TERM_RE = re.compile(r'([+-]?)(?:(\d*)d(\d+|%)(?:k([hl]?)(\d+))?|(\d+))')
+
+# draw(count, sides) -> list of `count` integers in [1, sides]
+DrawFn = Callable[[int, int], List[int]]
+
+
+def _stdlib_draw(count: int, sides: int) -> List[int]:
+    """Draw dice from the module-level ``random`` generator"""
+    randint = random.randint
+    return [randint(1, sides) for _ in range(count)]
+
+
+class DiceRoll(NamedTuple):
+    """Outcome of rolling a compiled expression once"""
+    rolls: List[int]
+    dropped: List[int]
+    modifier: int
+    total: int
+
+
+@dataclass(frozen=True)
+class DiceTerm:
+    """``count`` dice with ``sides`` faces, optionally keeping the highest/lowest ``keep``"""
+    count: int
+    sides: int
+    sign: int = 1
+    keep: Optional[str] = None  # 'h' or 'l'
+    keep_count: int = 0
+
+    @property
+    def kept(self) -> int:
+        """Number of dice that contribute to the total"""
+        return min(self.keep_count, self.count) if self.keep else self.count
+
+    def roll(self, draw: DrawFn) -> Tuple[List[int], List[int]]:
+        """Roll the term and return ``(kept, dropped)`` dice"""
+        values = draw(self.count, self.sides)
+        if not self.keep:
+            return values, []
+        ordered = sorted(values, reverse=self.keep == 'h')
+        return ordered[:self.keep_count], ordered[self.keep_count:]
+
+    def __str__(self) -> str:
+        keep = f"k{self.keep}{self.keep_count}" if self.keep else ""
+        return f"{self.count}d{self.sides}{keep}"
+
+
+@dataclass(frozen=True)
+class DiceExpression:
+    """Compiled dice expression: signed dice terms plus a folded constant modifier"""
+    normalized: str
+    terms: Tuple[DiceTerm, ...]
+    modifier: int = 0
+
+    @property
+    def dice_counts(self) -> Dict[int, int]:
+        """Total number of dice rolled per die size"""
+        counts: Dict[int, int] = {}
+        for term in self.terms:
+            counts[term.sides] = counts.get(term.sides, 0) + term.count
+        return counts
+
+    @property
+    def min_total(self) -> int:
+        """Lowest possible total"""
+        return self.modifier + sum(
+            t.kept if t.sign > 0 else -t.kept * t.sides for t in self.terms
+        )
+
+    @property
+    def max_total(self) -> int:
+        """Highest possible total"""
+        return self.modifier + sum(
+            t.kept * t.sides if t.sign > 0 else -t.kept for t in self.terms
+        )
+
+    def roll(self, draw: DrawFn = _stdlib_draw) -> DiceRoll:
+        """Roll every term once using ``draw`` as the source of dice"""
+        rolls: List[int] = []
+        dropped: List[int] = []
+        total = self.modifier
+        for term in self.terms:
+            kept, lost = term.roll(draw)
+            rolls.extend(kept)
+            dropped.extend(lost)
+            total += term.sign * sum(kept)
+        return DiceRoll(rolls, dropped, self.modifier, total)
+
+    def with_advantage(self, advantage: str) -> 'DiceExpression':
+        """
+        Return the expression with advantage/disadvantage applied to its first
+        plain ``1d20`` term (``2d20kh1`` / ``2d20kl1``). Expressions without
+        such a term, or ``advantage == "normal"``, are returned unchanged.
+        """
+        if advantage not in ('advantage', 'disadvantage'):
+            return self
+        return _apply_advantage(self, advantage)
+
+    def __str__(self) -> str:
+        return self.normalized
+
+
+def normalize_expression(expression: str) -> str:
+    """Lowercase and strip whitespace so equivalent spellings share a cache entry"""
+    return ''.join(expression.lower().split())
+
+
+def compile_dice_expression(expression: str) -> DiceExpression:
+    """
+    Compile a dice expression, reusing a cached result when available
+
+    Args:
+        expression: Dice expression string
+
+    Returns:
+        Compiled expression
+
+    Raises:
+        ValueError: If the expression does not match the dice grammar
+    """
+    return _compile_normalized(normalize_expression(expression))
+
+
+@lru_cache(maxsize=EXPRESSION_CACHE_SIZE)
+def _compile_normalized(expr: str) -> DiceExpression:
+    return parse_normalized(expr)
+
+
+def parse_normalized(expr: str) -> DiceExpression:
+    """Parse an already-normalized expression without consulting the cache"""
+    if not expr:
+        raise ValueError("Empty dice expression")
+
+    terms: List[DiceTerm] = []
+    modifier = 0
+    pos = 0
+    while pos < len(expr):
+        match = _TERM_RE.match(expr, pos)
+        if not match or match.end() == pos:
+            raise ValueError(f"Invalid dice expression: {expr!r} at position {pos}")
+        sign_text, count_text, sides_text, keep, keep_count, constant = match.groups()
+        if pos > 0 and not sign_text:
+            raise ValueError(f"Missing operator in dice expression: {expr!r} at position {pos}")
+        sign = -1 if sign_text == '-' else 1
+
+        if constant is not None:
+            modifier += sign * int(constant)
+        else:
+            count = int(count_text) if count_text else 1
+            sides = 100 if sides_text == '%' else int(sides_text)
+            if not 1 <= count <= MAX_DICE_PER_TERM:
+                raise ValueError(f"Dice count must be between 1 and {MAX_DICE_PER_TERM}")
+            if not 1 <= sides <= MAX_SIDES:
+                raise ValueError(f"Dice sides must be between 1 and {MAX_SIDES}")
+            if keep is not None:
+                terms.append(DiceTerm(count, sides, sign, keep or 'h', int(keep_count)))
+            else:
+                terms.append(DiceTerm(count, sides, sign))
+        pos = match.end()
+
+    return DiceExpression(expr, tuple(terms), modifier)
+
+
+@lru_cache(maxsize=EXPRESSION_CACHE_SIZE)
+def _apply_advantage(expression: DiceExpression, advantage: str) -> DiceExpression:
+    keep = 'h' if advantage == 'advantage' else 'l'
+    terms = list(expression.terms)
+    for i, term in enumerate(terms):
+        if term.sides == 20 and term.count == 1 and not term.keep:
+            terms[i] = DiceTerm(2, 20, term.sign, keep, 1)
+            return DiceExpression(expression.normalized, tuple(terms), expression.modifier)
+    return expression
+
+
+def clear_expression_cache() -> None:
+    """Drop all cached compiled expressions"""
+    _compile_normalized.cache_clear()
+    _apply_advantage.cache_clear()
@@ -0,0 +1,92 @@
+"""
+Vectorized bulk dice rolling.
+
+Every die of every expression in a batch is drawn in a single
+``Generator.integers`` call with a per-column ``high`` bound; keep-highest/
+lowest and modifiers are then applied as array reductions. Intended for
+area effects and Monte Carlo checks where per-die Python calls dominate.
+"""
+from typing import List, NamedTuple, Optional, Sequence
+import numpy as np
+from app.services.dice import DiceExpression
+
+TOTAL_DTYPE = np.int32
+DIE_DTYPE = np.int16
+
+# Upper bounds keep a single batch from monopolising a worker (see app.services.dice)
+MAX_BATCH_ROLLS = 1_000_000     # expressions x n
+MAX_BATCH_DICE = 10_000_000     # dice drawn across the whole batch
+
+
+class BatchRoll(NamedTuple):
+    """Result of rolling ``len(expressions)`` expressions ``n`` times each"""
+    totals: np.ndarray                          # (len(expressions), n)
+    dice: Optional[List[np.ndarray]] = None     # per expression: (n, dice_count) raw dice
+
+
+def roll_expressions(
+    expressions: Sequence[DiceExpression],
+    n: int,
+    rng: Optional[np.random.Generator] = None,
+    include_dice: bool = False,
+) -> BatchRoll:
+    """
+    Roll each compiled expression ``n`` times
+
+    Args:
+        expressions: Compiled expressions (advantage already applied)
+        n: Repetitions per expression
+        rng: NumPy generator to draw from (a fresh one if omitted)
+        include_dice: Also return the raw per-die matrices
+
+    Returns:
+        BatchRoll with a totals matrix and optional per-die matrices
+
+    Raises:
+        ValueError: n below 1, or the batch exceeds MAX_BATCH_ROLLS or
+            MAX_BATCH_DICE
+    """
+    if n < 1:
+        raise ValueError("n must be at least 1")
+    if len(expressions) * n > MAX_BATCH_ROLLS:
+        raise ValueError(f"A batch can make at most {MAX_BATCH_ROLLS} rolls (expressions x n)")
+    if sum(t.count for expr in expressions for t in expr.terms) * n > MAX_BATCH_DICE:
+        raise ValueError(f"A batch can roll at most {MAX_BATCH_DICE} dice")
+    rng = rng if rng is not None else np.random.default_rng()
+
+    # Lay out every die of every expression as one column
+    sides = np.array(
+        [t.sides for expr in expressions for t in expr.terms for _ in range(t.count)],
+        dtype=np.int64,
+    )
+    draws = rng.integers(1, sides + 1, size=(n, sides.size), dtype=np.int64).astype(DIE_DTYPE) \
+        if sides.size else np.empty((n, 0), dtype=DIE_DTYPE)
+
+    totals = np.empty((len(expressions), n), dtype=TOTAL_DTYPE)
+    dice = [] if include_dice else None
+    col = 0
+    for row, expr in enumerate(expressions):
+        start = col
+        acc = np.full(n, expr.modifier, dtype=TOTAL_DTYPE)
+        for term in expr.terms:
+            block = draws[:, col:col + term.count]
+            col += term.count
+            acc += term.sign * _reduce_term(block, term.keep, term.keep_count)
+        totals[row] = acc
+        if dice is not None:
+            dice.append(draws[:, start:col])
+    return BatchRoll(totals, dice)
+
+
+def _reduce_term(block: np.ndarray, keep: Optional[str], keep_count: int) -> np.ndarray:
+    """Sum a term's dice per row, honouring keep-highest/lowest"""
+    if not keep or keep_count >= block.shape[1]:
+        return block.sum(axis=1, dtype=TOTAL_DTYPE)
+    if keep_count <= 0:
+        return np.zeros(block.shape[0], dtype=TOTAL_DTYPE)
+    if keep_count == 1:
+        extreme = block.max(axis=1) if keep == 'h' else block.min(axis=1)
+        return extreme.astype(TOTAL_DTYPE)
+    ordered = np.sort(block, axis=1)
+    kept = ordered[:, -keep_count:] if keep == 'h' else ordered[:, :keep_count]
+    return kept.sum(axis=1, dtype=TOTAL_DTYPE)
@@ -0,0 +1,198 @@
+"""
+Exact outcome distributions for dice expressions.
+
+Each term's PMF is built analytically (repeated convolution of the
+per-die uniform distribution, or an order-statistics DP for keep-highest/
+lowest), signed terms are convolved together and the constant modifier
+shifts the support. Distributions are memoized per compiled expression so
+repeated "chance to succeed" queries cost a cache lookup plus a slice sum.
+"""
+from functools import lru_cache
+from typing import Any, Dict, NamedTuple, Optional
+import math
+import numpy as np
+from app.services.dice import DiceExpression, DiceTerm, EXPRESSION_CACHE_SIZE, compile_dice_expression
+
+# Degree thresholds mirror rules_engine.resolve_check
+CRITICAL_MARGIN = 10
+
+# Upper bounds keep one exact distribution from monopolising a worker (see app.services.dice_batch)
+MAX_SUPPORT = 20_000            # possible totals of the whole expression
+MAX_KEEP_STEPS = 100_000        # order-statistics DP steps of one keep-highest/lowest term
+
+
+class Distribution(NamedTuple):
+    """PMF over consecutive integer totals starting at ``min_value``"""
+    min_value: int
+    probs: np.ndarray
+
+    @property
+    def max_value(self) -> int:
+        return self.min_value + len(self.probs) - 1
+
+    @property
+    def mean(self) -> float:
+        return float(np.dot(self._support(), self.probs))
+
+    @property
+    def variance(self) -> float:
+        support = self._support()
+        mean = np.dot(support, self.probs)
+        return float(np.dot((support - mean) ** 2, self.probs))
+
+    def prob_at_least(self, value: int) -> float:
+        """P(total >= value)"""
+        index = value - self.min_value
+        if index <= 0:
+            return 1.0
+        if index >= len(self.probs):
+            return 0.0
+        return float(self.probs[index:].sum())
+
+    def prob_at_most(self, value: int) -> float:
+        """P(total <= value)"""
+        return 1.0 - self.prob_at_least(value + 1)
+
+    def shift(self, offset: int) -> 'Distribution':
+        return Distribution(self.min_value + offset, self.probs)
+
+    def to_dict(self) -> Dict[int, float]:
+        return {self.min_value + i: float(p) for i, p in enumerate(self.probs)}
+
+    def _support(self) -> np.ndarray:
+        return np.arange(self.min_value, self.min_value + len(self.probs), dtype=np.float64)
+
+
+def expression_distribution(expression: str, advantage: str = "normal") -> Distribution:
+    """
+    Exact distribution of an expression's total
+
+    Args:
+        expression: Dice expression string
+        advantage: "normal", "advantage", or "disadvantage"
+
+    Returns:
+        Memoized Distribution (treat as read-only)
+
+    Raises:
+        ValueError: If the expression does not match the dice grammar, or
+            its distribution exceeds MAX_SUPPORT or MAX_KEEP_STEPS
+    """
+    return compiled_distribution(compile_dice_expression(expression).with_advantage(advantage))
+
+
+@lru_cache(maxsize=EXPRESSION_CACHE_SIZE)
+def compiled_distribution(expression: DiceExpression) -> Distribution:
+    """
+    Exact distribution of a compiled expression, memoized per expression
+
+    Raises:
+        ValueError: If the distribution exceeds MAX_SUPPORT or MAX_KEEP_STEPS
+    """
+    _check_size(expression)
+    result = Distribution(expression.modifier, np.ones(1))
+    for term in expression.terms:
+        result = _convolve(result, _signed_term_distribution(term))
+    result.probs.setflags(write=False)
+    return result
+
+
+def check_probabilities(dist: Distribution, dc: int) -> Dict[str, Any]:
+    """
+    Success chance and degree buckets for a check against ``dc``, using the
+    same thresholds as ``resolve_check``
+    """
+    p_success = dist.prob_at_least(dc)
+    p_critical_success = dist.prob_at_least(dc + CRITICAL_MARGIN)
+    p_critical_failure = dist.prob_at_most(dc - CRITICAL_MARGIN)
+    return {
+        'success': p_success,
+        'degrees': {
+            'critical_success': p_critical_success,
+            'success': p_success - p_critical_success,
+            'failure': 1.0 - p_success - p_critical_failure,
+            'critical_failure': p_critical_failure,
+        },
+    }
+
+
+def _check_size(expression: DiceExpression) -> None:
+    support = 1
+    for term in expression.terms:
+        if term.kept <= 0:
+            continue
+        support += term.kept * (term.sides - 1)
+        if term.keep and term.kept < term.count and _keep_steps(term.count, term.sides) > MAX_KEEP_STEPS:
+            raise ValueError(f"Keep terms are limited to {MAX_KEEP_STEPS} DP steps (sides x (count+1)(count+2)/2)")
+    if support > MAX_SUPPORT:
+        raise ValueError(f"An exact distribution can have at most {MAX_SUPPORT} possible totals")
+
+
+def _keep_steps(count: int, sides: int) -> int:
+    """Inner iterations of ``_keep_distribution``: one per face, placed and j"""
+    return sides * (count + 1) * (count + 2) // 2
+
+
+def _convolve(a: Distribution, b: Distribution) -> Distribution:
+    return Distribution(a.min_value + b.min_value, np.convolve(a.probs, b.probs))
+
+
+def _signed_term_distribution(term: DiceTerm) -> Distribution:
+    dist = _term_distribution(term.count, term.sides, term.keep, term.kept)
+    if term.sign > 0:
+        return dist
+    return Distribution(-dist.max_value, dist.probs[::-1])
+
+
+@lru_cache(maxsize=EXPRESSION_CACHE_SIZE)
+def _term_distribution(count: int, sides: int, keep: Optional[str], kept: int) -> Distribution:
+    if kept <= 0:
+        return Distribution(0, np.ones(1))
+    if not keep or kept >= count:
+        return _sum_distribution(count, sides)
+    return _keep_distribution(count, sides, kept, highest=keep == 'h')
+
+
+def _sum_distribution(count: int, sides: int) -> Distribution:
+    """Sum of ``count`` independent d``sides`` via convolution by squaring"""
+    result = np.ones(1)
+    power = np.full(sides, 1.0 / sides)
+    remaining = count
+    while remaining:
+        if remaining & 1:
+            result = np.convolve(result, power)
+        remaining >>= 1
+        if remaining:
+            power = np.convolve(power, power)
+    return Distribution(count, result)
+
+
+def _keep_distribution(count: int, sides: int, kept: int, highest: bool) -> Distribution:
+    """
+    Distribution of the sum of the ``kept`` highest (or lowest) of ``count``
+    dice. Faces are visited from the kept end inward; ``dp[m]`` holds the
+    probability mass of each kept-sum once ``m`` dice have been assigned.
+    """
+    log_sides = math.log(sides)
+    faces = range(sides, 0, -1) if highest else range(1, sides + 1)
+    width = kept * sides + 1
+    dp = np.zeros((count + 1, width))
+    dp[0, 0] = 1.0
+    for face in faces:
+        nxt = np.zeros_like(dp)
+        for placed in range(count + 1):
+            row = dp[placed]
+            if not row.any():
+                continue
+            remaining = count - placed
+            for j in range(remaining + 1):
+                weight = math.exp(math.log(math.comb(remaining, j)) - j * log_sides)
+                take = max(0, min(j, kept - placed))
+                shift = take * face
+                if shift:
+                    nxt[placed + j, shift:] += weight * row[:width - shift]
+                else:
+                    nxt[placed + j] += weight * row
+        dp = nxt
+    probs = dp[count]
+    return Distribution(kept, probs[kept:kept * sides + 1].copy())
@@ -0,0 +1,205 @@
+"""
+Monte Carlo encounter-difficulty simulator.
+
+Plays out complete combats from the same participant/attack data the combat
+tasks accept and reports win probabilities, a rounds-to-finish histogram and
+expected HP loss.
+
+Simulations are split into chunks of CHUNK_SIZE combats; chunk i draws from
+substream ``<stream_id>/<i>``. The chunking depends only on ``n``, so a
+stream gives the same result however many processes run the chunks.
+Chunks share nothing but their final tallies (plain lists, so they pass
+through Celery's JSON serializer). The ``simulate_encounter`` task fans
+chunks out across the worker pool as a chord. ``simulate_encounter`` here
+runs them in this process or on a process pool that is kept between calls.
+
+Participant fields used: ``id``/``name``, ``side``, ``current_hp``,
+``max_hp``, ``armor_class``, ``initiative_modifier`` and an ``attack_data``
+dict as accepted by ``resolve_attack`` (``attack_modifier``, ``damage_dice``,
+``damage_modifier``, ``advantage``) plus an optional ``multiattack`` count.
+"""
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from typing import Any, Dict, List, Optional, Tuple
+import multiprocessing
+import os
+import random
+import numpy as np
+from app.services.combat_state import CombatState
+from app.services.dice import compile_dice_expression
+from app.services.rng import RngStream
+
+MAX_ROUNDS = 100
+CHUNK_SIZE = 250
+# Upper bound keeps one request from monopolising the pool (see app.services.dice_batch)
+MAX_SIMULATIONS = 100_000
+
+_pools: Dict[int, ProcessPoolExecutor] = {}
+
+
+def plan_chunks(n: int, stream: RngStream) -> List[Tuple[int, str]]:
+    """
+    (combats, substream id) per chunk; depends only on ``n`` and the stream
+
+    Raises:
+        ValueError: n below 1 or above MAX_SIMULATIONS
+    """
+    if n < 1:
+        raise ValueError("n must be at least 1")
+    if n > MAX_SIMULATIONS:
+        raise ValueError(f"At most {MAX_SIMULATIONS} combats can be simulated per request")
+    counts = [min(CHUNK_SIZE, n - start) for start in range(0, n, CHUNK_SIZE)]
+    return list(zip(counts, (s.stream_id for s in stream.spawn(len(counts)))))
+
+
+def simulate_encounter(
+    participants: List[Dict[str, Any]],
+    n: int,
+    stream: RngStream,
+    workers: Optional[int] = None,
+) -> Dict[str, Any]:
+    """
+    Simulate ``n`` combats, spreading chunks over up to ``workers`` processes
+
+    Args:
+        participants: Participant dicts (see module docstring)
+        n: Number of combats to simulate
+        stream: RNG stream; chunk i uses substream ``<stream_id>/<i>``
+        workers: Process count (defaults to the CPU count; 1 runs inline)
+
+    Returns:
+        Aggregated outcome statistics
+    """
+    chunks = plan_chunks(n, stream)
+    workers = max(1, min(workers or os.cpu_count() or 1, len(chunks)))
+    # Daemonic processes (e.g. Celery's prefork children) may not start pools
+    if multiprocessing.current_process().daemon:
+        workers = 1
+
+    counts = [count for count, _ in chunks]
+    stream_ids = [stream_id for _, stream_id in chunks]
+    if workers == 1:
+        tallies = [simulate_chunk(participants, count, stream_id) for count, stream_id in chunks]
+    else:
+        pool = _pool(workers)
+        try:
+            tallies = list(pool.map(simulate_chunk, [participants] * len(chunks), counts, stream_ids))
+        except BrokenProcessPool:
+            _pools.pop(workers, None)
+            raise
+    return summarize(participants, tallies, n)
+
+
+def _pool(workers: int) -> ProcessPoolExecutor:
+    """Process pool of ``workers`` processes, started once and reused"""
+    pool = _pools.get(workers)
+    if pool is None:
+        pool = _pools[workers] = ProcessPoolExecutor(max_workers=workers)
+    return pool
+
+
+def simulate_chunk(participants: List[Dict[str, Any]], count: int, stream_id: str) -> Dict[str, List]:
+    """Run ``count`` combats (1 to CHUNK_SIZE) and return raw tallies"""
+    if not 1 <= count <= CHUNK_SIZE:
+        raise ValueError(f"A chunk runs between 1 and {CHUNK_SIZE} combats")
+    # Seed a fast stdlib generator from the substream's first block
+    rnd = random.Random(int(RngStream(stream_id).generator().integers(2 ** 63)))
+    randint = rnd.randint
+
+    def draw(dice: int, sides: int) -> List[int]:
+        return [randint(1, sides) for _ in range(dice)]
+
+    template = CombatState.from_participants(participants)
+    size = len(template)
+    attacks = [_attack_profile(p) for p in participants]
+    initiative_mod = [p.get('initiative_modifier', 0) for p in participants]
+    side_members = [np.flatnonzero(template.side == s).tolist() for s in range(len(template.side_names))]
+
+    wins = np.zeros(len(template.side_names) + 1, dtype=np.int64)  # last slot: no winner
+    rounds_hist = np.zeros(MAX_ROUNDS + 1, dtype=np.int64)
+    hp_lost = np.zeros(size, dtype=np.float64)
+    survived = np.zeros(size, dtype=np.int64)
+
+    for _ in range(count):
+        state = template.copy()
+        state.initiative[:] = [randint(1, 20) + m for m in initiative_mod]
+        state.order = np.argsort(-state.initiative, kind='stable').astype(np.int32)
+        state.turn = -1
+        state.round = 1
+
+        while not state.combat_should_end and state.round <= MAX_ROUNDS:
+            actor = state.advance_turn()
+            if state.hp[actor] <= 0:
+                break
+            _take_turn(state, actor, attacks[actor], side_members, randint, draw)
+
+        winner = state.winner
+        wins[state.side_names.index(winner) if winner is not None else -1] += 1
+        rounds_hist[min(state.round, MAX_ROUNDS)] += 1
+        hp_lost += state.max_hp - state.hp
+        survived += state.hp > 0
+
+    return {'wins': wins.tolist(), 'rounds': rounds_hist.tolist(), 'hp_lost': hp_lost.tolist(),
+            'survived': survived.tolist()}
+
+
+def _attack_profile(participant: Dict[str, Any]) -> Dict[str, Any]:
+    data = participant.get('attack_data', {})
+    return {
+        'modifier': data.get('attack_modifier', 0),
+        'advantage': data.get('advantage'),
+        'damage': compile_dice_expression(data.get('damage_dice', '1d6')),
+        'damage_modifier': data.get('damage_modifier', 0),
+        'multiattack': data.get('multiattack', 1),
+    }
+
+
+def _take_turn(state: CombatState, actor: int, attack: Dict[str, Any], side_members, randint, draw) -> None:
+    """Attack random conscious enemies, mirroring _resolve_attack's rules"""
+    own_side = state.side[actor]
+    for _ in range(attack['multiattack']):
+        enemies = [
+            i for s, members in enumerate(side_members) if s != own_side
+            for i in members if state.hp[i] > 0
+        ]
+        if not enemies:
+            return
+        target = enemies[randint(0, len(enemies) - 1)]
+
+        roll = randint(1, 20)
+        if attack['advantage'] == 'advantage':
+            roll = max(roll, randint(1, 20))
+        elif attack['advantage'] == 'disadvantage':
+            roll = min(roll, randint(1, 20))
+        if roll + attack['modifier'] < state.ac[target]:
+            continue
+
+        damage = attack['damage'].roll(draw).total
+        if roll == 20:
+            damage *= 2
+        state.apply_damage(target, max(0, damage + attack['damage_modifier']))
+
+
+def summarize(participants: List[Dict[str, Any]], tallies: List[Dict[str, List]], n: int) -> Dict[str, Any]:
+    """Outcome statistics from the tallies of every chunk"""
+    wins = np.sum([t['wins'] for t in tallies], axis=0)
+    rounds = np.sum([t['rounds'] for t in tallies], axis=0)
+    hp_lost = np.sum([t['hp_lost'] for t in tallies], axis=0)
+    survived = np.sum([t['survived'] for t in tallies], axis=0)
+    side_names = CombatState.from_participants(participants).side_names
+
+    round_values = np.arange(len(rounds))
+    sides = np.array([p.get('side', 'neutral') for p in participants])
+    return {
+        'simulations': n,
+        'win_probability': {name: float(wins[i] / n) for i, name in enumerate(side_names)},
+        'no_winner_probability': float(wins[-1] / n),
+        'expected_rounds': float(np.dot(round_values, rounds) / n),
+        'rounds_histogram': {int(r): int(c) for r, c in zip(round_values, rounds) if c},
+        'expected_hp_loss': {
+            name: float(hp_lost[sides == name].sum() / n) for name in side_names
+        },
+        'survival_probability': {
+            str(p.get('id', p.get('name', i))): float(survived[i] / n) for i, p in enumerate(participants)
+        },
+    }
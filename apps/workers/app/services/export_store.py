@@ -0,0 +1,229 @@
+"""
+Destinations for streamed exports: local files and object-store multipart
+uploads.
+
+Exporters write chunks into an ``ExportSink``. The sink coalesces them into
+buffers of ``buffer_size`` bytes, so memory stays bounded however long the
+document is. Only the resulting key and size go back into the task result.
+
+A destination is a file path, or ``s3://bucket/key`` for the object store
+(S3 API; MinIO in development). Object-store sinks upload each buffer as
+one part of a multipart upload. If the export or the final commit fails,
+the sink aborts: file sinks remove their partial file and object-store
+sinks abort the upload.
+
+The object store is configured with the MINIO_* settings; boto3 is only
+imported when an ``s3://`` destination is used. Without access keys the
+client falls back to the ambient AWS credentials (e.g. an ECS task role).
+When EXPORT_BUCKET is set, exports without a destination go to that bucket
+instead of EXPORT_DIR, so they outlive the worker that wrote them.
+"""
+from abc import ABC, abstractmethod
+from typing import Any, Dict, Iterable, List, Optional, Union
+import os
+import re
+import tempfile
+
+EXPORT_DIR = os.getenv("EXPORT_DIR", os.path.join(tempfile.gettempdir(), "exports"))
+EXPORT_BUCKET = os.getenv("EXPORT_BUCKET", "")
+OBJECT_STORE_ENDPOINT = os.getenv("MINIO_ENDPOINT", "localhost:9000")
+OBJECT_STORE_ACCESS_KEY = os.getenv("MINIO_ACCESS_KEY", "")
+OBJECT_STORE_SECRET_KEY = os.getenv("MINIO_SECRET_KEY", "")
+OBJECT_STORE_SSL = os.getenv("MINIO_USE_SSL", "false").lower() in ("1", "true", "yes")
+
+# S3 rejects multipart parts under 5 MiB (except the last)
+PART_SIZE = 8 * 2**20
+BUFFER_SIZE = 256 * 2**10
+
+_UNSAFE_NAME = re.compile(r'[^A-Za-z0-9._-]+')
+
+_client = None
+
+
+def safe_name(value: Any) -> str:
+    """``value`` reduced to characters that are safe in a file name"""
+    name = _UNSAFE_NAME.sub('_', str(value)).lstrip('.')
+    return name or '_'
+
+
+def confined_path(base: str, path: str) -> str:
+    """``path`` resolved under ``base`` (relative paths are taken from ``base``); escapes are rejected"""
+    root = os.path.realpath(base)
+    resolved = os.path.realpath(os.path.join(root, path))
+    if os.path.commonpath([root, resolved]) != root:
+        raise ValueError(f"Export path must be under {base}: {path}")
+    return resolved
+
+
+def default_destination(name: str) -> str:
+    """Object in EXPORT_BUCKET if one is configured, else a file under EXPORT_DIR"""
+    if EXPORT_BUCKET:
+        return f"s3://{EXPORT_BUCKET}/exports/{name}"
+    os.makedirs(EXPORT_DIR, exist_ok=True)
+    return os.path.join(EXPORT_DIR, name)
+
+
+def export_destination(destination: Optional[str], name: str) -> str:
+    """
+    Where to write an export named ``name``: the default destination, an
+    ``s3://`` destination as given, or a file path confined to EXPORT_DIR
+
+    Raises:
+        ValueError: If a file path escapes EXPORT_DIR
+    """
+    if not destination:
+        return default_destination(name)
+    if destination.startswith('s3://'):
+        return destination
+    os.makedirs(EXPORT_DIR, exist_ok=True)
+    return confined_path(EXPORT_DIR, destination)
+
+
+class ExportSink(ABC):
+    """Buffered byte sink; use as a context manager and ``write`` bytes or str"""
+
+    def __init__(self, buffer_size: int = BUFFER_SIZE):
+        self.buffer_size = buffer_size
+        self.size = 0
+        self._buffer: List[bytes] = []
+        self._buffered = 0
+
+    @property
+    @abstractmethod
+    def key(self) -> str:
+        """Where the export ends up (file path or ``s3://`` URL)"""
+
+    def write(self, data: Union[str, bytes]) -> None:
+        if isinstance(data, str):
+            data = data.encode('utf-8')
+        self._buffer.append(data)
+        self._buffered += len(data)
+        self.size += len(data)
+        if self._buffered >= self.buffer_size:
+            self.flush()
+
+    def write_all(self, chunks: Iterable[Union[str, bytes]]) -> int:
+        for chunk in chunks:
+            self.write(chunk)
+        return self.size
+
+    def flush(self) -> None:
+        if self._buffer:
+            self._emit(b''.join(self._buffer))
+            self._buffer, self._buffered = [], 0
+
+    def __enter__(self) -> 'ExportSink':
+        return self
+
+    def __exit__(self, exc_type, exc, tb) -> bool:
+        if exc_type is None:
+            try:
+                self.flush()
+                self._commit()
+            except BaseException:
+                self._abort()
+                raise
+        else:
+            self._abort()
+        return False
+
+    @abstractmethod
+    def _emit(self, data: bytes) -> None:
+        """Write one coalesced buffer to the destination"""
+
+    def _commit(self) -> None:
+        pass
+
+    def _abort(self) -> None:
+        pass
+
+
+class FileSink(ExportSink):
+    """Writes to a temporary file next to ``path`` and renames it into place on success"""
+
+    def __init__(self, path: str, buffer_size: int = BUFFER_SIZE):
+        super().__init__(buffer_size)
+        self.path = path
+        directory = os.path.dirname(os.path.abspath(path))
+        os.makedirs(directory, exist_ok=True)
+        fd, self._partial = tempfile.mkstemp(prefix='.partial-', dir=directory)
+        self._file = os.fdopen(fd, 'wb')
+
+    @property
+    def key(self) -> str:
+        return self.path
+
+    def _emit(self, data: bytes) -> None:
+        self._file.write(data)
+
+    def _commit(self) -> None:
+        self._file.close()
+        # mkstemp creates the file owner-only
+        os.chmod(self._partial, 0o644)
+        os.replace(self._partial, self.path)
+
+    def _abort(self) -> None:
+        self._file.close()
+        try:
+            os.unlink(self._partial)
+        except FileNotFoundError:
+            pass
+
+
+class ObjectStoreSink(ExportSink):
+    """Multipart upload to ``bucket``/``object_key``, one part per ``part_size`` bytes"""
+
+    def __init__(self, bucket: str, object_key: str, part_size: int = PART_SIZE, client: Any = None):
+        super().__init__(part_size)
+        self.bucket = bucket
+        self.object_key = object_key
+        self.client = client or object_store_client()
+        self._upload_id = self.client.create_multipart_upload(Bucket=bucket, Key=object_key)['UploadId']
+        self._parts: List[Dict[str, Any]] = []
+
+    @property
+    def key(self) -> str:
+        return f"s3://{self.bucket}/{self.object_key}"
+
+    def _emit(self, data: bytes) -> None:
+        number = len(self._parts) + 1
+        response = self.client.upload_part(
+            Bucket=self.bucket, Key=self.object_key, UploadId=self._upload_id, PartNumber=number, Body=data
+        )
+        self._parts.append({'ETag': response['ETag'], 'PartNumber': number})
+
+    def _commit(self) -> None:
+        if not self._parts:
+            # Multipart uploads need at least one part, even for an empty object
+            self._emit(b'')
+        self.client.complete_multipart_upload(
+            Bucket=self.bucket, Key=self.object_key, UploadId=self._upload_id,
+            MultipartUpload={'Parts': self._parts}
+        )
+
+    def _abort(self) -> None:
+        self.client.abort_multipart_upload(Bucket=self.bucket, Key=self.object_key, UploadId=self._upload_id)
+
+
+def open_sink(destination: str, buffer_size: int = BUFFER_SIZE) -> ExportSink:
+    """Sink for a file path or an ``s3://bucket/key`` destination"""
+    if destination.startswith('s3://'):
+        bucket, _, object_key = destination[len('s3://'):].partition('/')
+        if not bucket or not object_key:
+            raise ValueError(f"Object store destination needs a bucket and key: {destination}")
+        return ObjectStoreSink(bucket, object_key)
+    return FileSink(destination, buffer_size)
+
+
+def object_store_client():
+    """Shared S3 client for the configured object store"""
+    global _client
+    if _client is None:
+        import boto3
+        _client = boto3.client(
+            's3',
+            endpoint_url=f"{'https' if OBJECT_STORE_SSL else 'http'}://{OBJECT_STORE_ENDPOINT}",
+            aws_access_key_id=OBJECT_STORE_ACCESS_KEY or None,
+            aws_secret_access_key=OBJECT_STORE_SECRET_KEY or None,
+        )
+    return _client
@@ -0,0 +1,320 @@
+"""
+Field of view and party fog of war.
+
+Each party token's view is computed with symmetric shadowcasting over the
+obstacle raster, limited to its vision range (grid distance, 5 feet per
+cell). Hex maps are computed on their own odd-q cells instead (the hexes
+walls and obstacles touch, as for movement) by tracing hex lines, so fog
+cells are the hexes tokens stand on. Only the window around the token is
+stored. Party fog keeps a per-cell count of the views that see each cell,
+plus an ``explored`` mask.
+Moving a token then only subtracts its old window and adds the new one.
+Changing walls or doors recomputes only the views whose window contains a
+changed cell.
+
+Every update returns a delta (cells that became visible, became hidden or
+were explored for the first time) limited to the region it touched, so
+callers never have to resend the whole fog.
+
+Lighting is not modelled: a token sees everything in range that is not
+occluded.
+"""
+from typing import Any, Dict, Iterable, List, NamedTuple, Optional, Tuple
+import numpy as np
+from app.services import hex_grid
+from app.services.map_grid import decode_array, encode_array
+from app.services.obstacle_raster import hex_blocked_for_map, raster_for_map
+from app.services.token_index import FEET_PER_CELL, TokenIndex
+
+Cell = Tuple[int, int]
+Region = Tuple[int, int, int, int]  # row0, row1, col0, col1 (half-open)
+
+# Quadrant transforms from (depth, col) to map (dx, dy): north, east, south, west
+_QUADRANTS = ((0, 1, -1, 0), (1, 0, 0, 1), (0, 1, 1, 0), (-1, 0, 0, 1))
+
+
+def shadowcast(blocked: np.ndarray, origin: Cell, radius: int, region: Region) -> np.ndarray:
+    """
+    Cells visible from ``origin`` (symmetric shadowcasting)
+
+    Args:
+        blocked: Map-wide ``blocked[row, col]`` raster
+        origin: Viewer cell (col, row)
+        radius: Maximum grid distance in cells
+        region: The origin's radius window (row0, row1, col0, col1), clipped to
+            the map; every cell within ``radius`` falls inside it
+
+    Returns:
+        Bool mask over ``region``; walls bounding the view are visible
+    """
+    row0, row1, col0, col1 = region
+    rows, cols = blocked.shape
+    height, width = row1 - row0, col1 - col0
+    mask = np.zeros((height, width), dtype=bool)
+    ox, oy = origin
+    if not (0 <= ox < cols and 0 <= oy < rows):
+        return mask
+    mask[oy - row0, ox - col0] = True
+    # Plain lists index much faster than NumPy scalars in the inner loop
+    grid = blocked[row0:row1, col0:col1].tolist()
+
+    for dx_depth, dx_col, dy_depth, dy_col in _QUADRANTS:
+        # Slopes are exact rationals (numerator, denominator) to keep symmetry
+        stack = [(1, -1, 1, 1, 1)]
+        while stack:
+            depth, start_n, start_d, end_n, end_d = stack.pop()
+            if depth > radius:
+                continue
+            min_col = (2 * depth * start_n + start_d) // (2 * start_d)
+            max_col = -((-(2 * depth * end_n - end_d)) // (2 * end_d))
+            prev_wall: Optional[bool] = None
+            for col in range(min_col, max_col + 1):
+                x = ox + dx_depth * depth + dx_col * col - col0
+                y = oy + dy_depth * depth + dy_col * col - row0
+                inside = 0 <= x < width and 0 <= y < height
+                wall = not inside or grid[y][x]
+                if inside and (wall or (col * start_d >= depth * start_n and col * end_d <= depth * end_n)):
+                    mask[y, x] = True
+                if prev_wall and not wall:
+                    start_n, start_d = 2 * col - 1, 2 * depth
+                if prev_wall is False and wall:
+                    stack.append((depth + 1, start_n, start_d, 2 * col - 1, 2 * depth))
+                prev_wall = wall
+            if prev_wall is False:
+                stack.append((depth + 1, start_n, start_d, end_n, end_d))
+    return mask
+
+
+def hex_view(blocked: np.ndarray, origin: Cell, radius: int, region: Region) -> np.ndarray:
+    """
+    Hexes visible from ``origin`` on an odd-q hex map
+
+    A hex is visible when a hex line to it crosses no blocked hex before
+    reaching it. Each line is drawn twice, nudged to either side of the hex
+    edges it runs along, and either one being clear is enough; that keeps
+    views symmetric. Lines are traced one ring (distance) at a time, all
+    hexes of the ring together.
+
+    Args and return value are those of ``shadowcast`` over ``blocked[row,
+    col]`` hex cells, with ``radius`` in hex steps.
+    """
+    row0, row1, col0, col1 = region
+    rows, cols = blocked.shape
+    mask = np.zeros((row1 - row0, col1 - col0), dtype=bool)
+    ox, oy = origin
+    if not (0 <= ox < cols and 0 <= oy < rows):
+        return mask
+    q0, r0 = (int(v) for v in hex_grid.offset_to_axial(ox, oy))
+    # No hex of the region is further away than its farthest corner (plus rounding)
+    corners = np.array([(col0, row0), (col0, row1 - 1), (col1 - 1, row0), (col1 - 1, row1 - 1)])
+    radius = min(radius, int(hex_grid.offset_distance(ox, oy, corners[:, 0], corners[:, 1]).max()) + 1)
+    cells = hex_grid.range_offsets(radius)
+    col, row = hex_grid.axial_to_offset(cells[:, 0] + q0, cells[:, 1] + r0)
+    inside = (col >= col0) & (col < col1) & (row >= row0) & (row < row1)
+    if not blocked[row0:row1, col0:col1].any():
+        mask[row[inside] - row0, col[inside] - col0] = True
+        return mask
+
+    mask[oy - row0, ox - col0] = True
+    for depth in range(1, radius + 1):
+        # range_offsets is ordered by ring: ring ``depth`` holds 6 * depth hexes
+        ring = slice(3 * depth * (depth - 1) + 1, 3 * depth * (depth + 1) + 1)
+        keep = inside[ring]
+        if not keep.any():
+            continue
+        dq, dr = cells[ring][keep, 0], cells[ring][keep, 1]
+        # Hexes strictly between the origin and each ring hex
+        t = np.arange(1, depth) / depth
+        clear = np.zeros(len(dq), dtype=bool)
+        for nudge in (1e-6, -1e-6):
+            # The second line is only needed where the first one is blocked
+            todo = np.flatnonzero(~clear)
+            line_col, line_row = hex_grid.axial_to_offset(*hex_grid.cube_round(
+                q0 + dq[todo, None] * t + nudge, r0 + dr[todo, None] * t + nudge
+            ))
+            on_map = (line_col >= 0) & (line_col < cols) & (line_row >= 0) & (line_row < rows)
+            hit = np.zeros(line_col.shape, dtype=bool)
+            hit[on_map] = blocked[line_row[on_map], line_col[on_map]]
+            clear[todo] = ~hit.any(axis=1)
+        mask[row[ring][keep][clear] - row0, col[ring][keep][clear] - col0] = True
+    return mask
+
+
+class TokenView(NamedTuple):
+    origin: Cell
+    radius: int
+    region: Region
+    mask: np.ndarray
+
+
+class FogState:
+    """Per-token views and merged visibility for one party on one map"""
+
+    def __init__(self, shape: Tuple[int, int], party: Iterable[str], explored: Optional[np.ndarray] = None,
+                 grid_type: str = 'square'):
+        self.shape = shape
+        self.grid_type = grid_type
+        self.party = tuple(party)
+        self.views: Dict[str, TokenView] = {}
+        self.radii: Dict[str, int] = {}
+        self.counts = np.zeros(shape, dtype=np.int16)
+        self.explored = explored if explored is not None else np.zeros(shape, dtype=bool)
+
+    @classmethod
+    def from_map(cls, map_data: Dict[str, Any], index: TokenIndex, blocked: np.ndarray,
+                 party: Optional[Iterable[str]] = None) -> 'FogState':
+        """
+        Compute every party token's view (party defaults to ``pc`` tokens)
+
+        ``blocked`` is the map's ``blocked_for_map`` grid: the obstacle
+        raster, or hex cells on hex maps.
+        """
+        grid_type = map_data.get('grid_type', 'square')
+        tokens = {str(t.get('id', i)): t for i, t in enumerate(map_data.get('tokens', []))}
+        if party is None:
+            party = [tid for tid, t in tokens.items() if t.get('owner_kind') == 'pc']
+        stored = map_data.get('fog') or {}
+        explored = decode_explored(stored, blocked.shape) if stored.get('grid_type', 'square') == grid_type else None
+        fog = cls(blocked.shape, [str(p) for p in party if str(p) in index], explored, grid_type)
+        for token_id in fog.party:
+            fog.radii[token_id] = vision_radius(tokens.get(token_id, {}), blocked.shape, grid_type)
+            fog._add_view(token_id, view_origin(index, token_id), blocked)
+        return fog
+
+    @property
+    def visible(self) -> np.ndarray:
+        return self.counts > 0
+
+    def move_token(self, token_id: str, origin: Cell, blocked: np.ndarray) -> Dict[str, Any]:
+        """Recompute one token's view after it moves; returns the fog delta"""
+        if token_id not in self.views:
+            return _empty_delta()
+        box = _bounding([self.views[token_id].region, _window(origin, self.radii[token_id], self.shape)])
+        before = self._state_in(box)
+        self._remove_view(token_id)
+        self._add_view(token_id, origin, blocked)
+        return self._delta(box, before)
+
+    def update_obstacles(self, old: np.ndarray, new: np.ndarray) -> Dict[str, Any]:
+        """Recompute views that can be affected by cells that opened or closed"""
+        changed = np.argwhere(old != new)
+        affected = [
+            token_id for token_id, view in self.views.items()
+            if len(changed) and _region_contains_any(view.region, changed)
+        ]
+        if not affected:
+            return _empty_delta()
+        box = _bounding([self.views[token_id].region for token_id in affected])
+        before = self._state_in(box)
+        for token_id in affected:
+            origin = self._remove_view(token_id).origin
+            self._add_view(token_id, origin, new)
+        return self._delta(box, before)
+
+    def to_dict(self) -> Dict[str, Any]:
+        """Full fog as packed bitmaps (initial sync only; later updates are deltas)"""
+        return {
+            'grid_type': self.grid_type,
+            'shape': list(self.shape),
+            'visible': encode_array(np.packbits(self.visible, axis=None)),
+            'explored': encode_array(np.packbits(self.explored, axis=None)),
+            'tokens': {
+                token_id: {'origin': list(view.origin), 'radius': view.radius, 'visible_cells': int(view.mask.sum())}
+                for token_id, view in self.views.items()
+            },
+        }
+
+    # --- Internals ------------------------------------------------------------
+
+    def _add_view(self, token_id: str, origin: Cell, blocked: np.ndarray) -> TokenView:
+        radius = self.radii[token_id]
+        region = _window(origin, radius, self.shape)
+        compute = hex_view if self.grid_type == 'hex' else shadowcast
+        view = TokenView(origin, radius, region, compute(blocked, origin, radius, region))
+        row0, row1, col0, col1 = region
+        self.counts[row0:row1, col0:col1] += view.mask
+        self.explored[row0:row1, col0:col1] |= view.mask
+        self.views[token_id] = view
+        return view
+
+    def _remove_view(self, token_id: str) -> TokenView:
+        view = self.views.pop(token_id)
+        row0, row1, col0, col1 = view.region
+        self.counts[row0:row1, col0:col1] -= view.mask
+        return view
+
+    def _state_in(self, box: Region) -> Tuple[np.ndarray, np.ndarray]:
+        row0, row1, col0, col1 = box
+        return self.counts[row0:row1, col0:col1] > 0, self.explored[row0:row1, col0:col1].copy()
+
+    def _delta(self, box: Region, before: Tuple[np.ndarray, np.ndarray]) -> Dict[str, Any]:
+        """Cells whose visibility or explored state changed inside ``box``"""
+        visible_before, explored_before = before
+        visible_now, explored_now = self._state_in(box)
+        return {
+            'visible_added': _cells(visible_now & ~visible_before, box),
+            'visible_removed': _cells(visible_before & ~visible_now, box),
+            'explored_added': _cells(explored_now & ~explored_before, box),
+        }
+
+
+def vision_radius(token: Dict[str, Any], shape: Tuple[int, int], grid_type: str = 'square') -> int:
+    """Vision range in cells from the token's ``vision`` (range/darkvision in feet)"""
+    vision = token.get('vision') or {}
+    feet = max(vision.get('range', 0) or 0, vision.get('darkvision', 0) or 0)
+    if not feet:
+        # Far enough to reach every cell of the map
+        return max(shape) if grid_type == 'square' else sum(shape)
+    return int(feet // FEET_PER_CELL)
+
+
+def blocked_for_map(map_data: Dict[str, Any]) -> np.ndarray:
+    """Cells fog is computed over: the obstacle raster, or odd-q hex cells on hex maps"""
+    if map_data.get('grid_type') == 'hex':
+        return hex_blocked_for_map(map_data)
+    return raster_for_map(map_data).blocked
+
+
+def view_origin(index: TokenIndex, token_id: str) -> Cell:
+    """Cell a token sees from: the center cell of its footprint"""
+    col, row, size = index.position(token_id)
+    return col + (size - 1) // 2, row + (size - 1) // 2
+
+
+def _window(origin: Cell, radius: int, shape: Tuple[int, int]) -> Region:
+    rows, cols = shape
+    x, y = origin
+    row0, col0 = min(rows, max(0, y - radius)), min(cols, max(0, x - radius))
+    return row0, max(row0, min(rows, y + radius + 1)), col0, max(col0, min(cols, x + radius + 1))
+
+
+def _bounding(regions: List[Region]) -> Region:
+    return (
+        min(r[0] for r in regions), max(r[1] for r in regions),
+        min(r[2] for r in regions), max(r[3] for r in regions),
+    )
+
+
+def _region_contains_any(region: Region, cells: np.ndarray) -> bool:
+    row0, row1, col0, col1 = region
+    rows, cols = cells[:, 0], cells[:, 1]
+    return bool(np.any((rows >= row0) & (rows < row1) & (cols >= col0) & (cols < col1)))
+
+
+def _cells(mask: np.ndarray, box: Region) -> List[List[int]]:
+    """[col, row] map coordinates of the set cells in a box-relative mask"""
+    rows, cols = np.nonzero(mask)
+    return np.stack([cols + box[2], rows + box[0]], axis=1).tolist()
+
+
+def decode_explored(fog: Dict[str, Any], shape: Tuple[int, int]) -> Optional[np.ndarray]:
+    """Explored mask from stored fog ({'shape', 'explored'} as written by to_dict)"""
+    encoded = fog.get('explored')
+    if not isinstance(encoded, dict) or list(fog.get('shape', [])) != list(shape):
+        return None
+    bits = np.unpackbits(decode_array(encoded), count=shape[0] * shape[1])
+    return bits.reshape(shape).astype(bool)
+
+
+def _empty_delta() -> Dict[str, Any]:
+    return {'visible_added': [], 'visible_removed': [], 'explored_added': []}
@@ -0,0 +1,148 @@
+"""
+Hex coordinates for flat-top hex maps.
+
+Cells are stored in "odd-q" offset coordinates (col, row): odd columns
+are shifted down by half a hex. This is the layout ``GridGeometry`` draws.
+All arithmetic happens in integer axial coordinates (q, r), with cube
+s = -q - r implied. Pixel positions are converted with exact cube rounding,
+so a point always lands in the hex that contains it.
+
+Every function accepts scalars or NumPy arrays, so batches of points convert
+in one call. Direction, ring and range offset tables are computed once per
+radius and shared.
+
+``size`` is the hex's center-to-corner distance in pixels (the map's
+``grid_size``). Hex (0, 0) is centered on the pixel origin.
+"""
+from functools import lru_cache
+from typing import Tuple
+import math
+import numpy as np
+
+SQRT3 = math.sqrt(3)
+
+# Axial directions, clockwise from the lower-right neighbor
+DIRECTIONS = np.array([(1, 0), (1, -1), (0, -1), (-1, 0), (-1, 1), (0, 1)], dtype=np.int64)
+
+
+def cube_round(q, r) -> Tuple[np.ndarray, np.ndarray]:
+    """Round fractional axial coordinates to the containing hex"""
+    q = np.asarray(q, dtype=np.float64)
+    r = np.asarray(r, dtype=np.float64)
+    s = -q - r
+    rq, rr, rs = np.round(q), np.round(r), np.round(s)
+    dq, dr, ds = np.abs(rq - q), np.abs(rr - r), np.abs(rs - s)
+    # Fix the component with the largest rounding error so q + r + s == 0
+    fix_q = (dq > dr) & (dq > ds)
+    fix_r = ~fix_q & (dr > ds)
+    rq = np.where(fix_q, -rr - rs, rq)
+    rr = np.where(fix_r, -rq - rs, rr)
+    return rq.astype(np.int64), rr.astype(np.int64)
+
+
+def pixel_to_axial(x, y, size: float) -> Tuple[np.ndarray, np.ndarray]:
+    x = np.asarray(x, dtype=np.float64)
+    y = np.asarray(y, dtype=np.float64)
+    q = (2 / 3 * x) / size
+    r = (-1 / 3 * x + SQRT3 / 3 * y) / size
+    return cube_round(q, r)
+
+
+def axial_to_pixel(q, r, size: float) -> Tuple[np.ndarray, np.ndarray]:
+    """Pixel center of axial hexes"""
+    q = np.asarray(q, dtype=np.float64)
+    r = np.asarray(r, dtype=np.float64)
+    return size * 1.5 * q, size * SQRT3 * (r + q / 2)
+
+
+def axial_to_offset(q, r) -> Tuple[np.ndarray, np.ndarray]:
+    """Axial (q, r) to odd-q offset (col, row)"""
+    q = np.asarray(q, dtype=np.int64)
+    r = np.asarray(r, dtype=np.int64)
+    return q, r + (q - (q & 1)) // 2
+
+
+def offset_to_axial(col, row) -> Tuple[np.ndarray, np.ndarray]:
+    """Odd-q offset (col, row) to axial (q, r)"""
+    col = np.asarray(col, dtype=np.int64)
+    row = np.asarray(row, dtype=np.int64)
+    return col, row - (col - (col & 1)) // 2
+
+
+def pixel_to_offset(x, y, size: float) -> Tuple[np.ndarray, np.ndarray]:
+    return axial_to_offset(*pixel_to_axial(x, y, size))
+
+
+def offset_to_pixel(col, row, size: float) -> Tuple[np.ndarray, np.ndarray]:
+    return axial_to_pixel(*offset_to_axial(col, row), size)
+
+
+def distance(q1, r1, q2, r2) -> np.ndarray:
+    """Hex steps between axial coordinates"""
+    dq = np.asarray(q1, dtype=np.int64) - q2
+    dr = np.asarray(r1, dtype=np.int64) - r2
+    return (np.abs(dq) + np.abs(dr) + np.abs(dq + dr)) // 2
+
+
+def offset_distance(col1, row1, col2, row2) -> np.ndarray:
+    """Hex steps between offset coordinates"""
+    return distance(*offset_to_axial(col1, row1), *offset_to_axial(col2, row2))
+
+
+@lru_cache(maxsize=64)
+def ring_offsets(radius: int) -> np.ndarray:
+    """(6 * radius, 2) axial offsets exactly ``radius`` steps away (read-only)"""
+    if radius == 0:
+        cells = np.zeros((1, 2), dtype=np.int64)
+    else:
+        cells = []
+        q, r = DIRECTIONS[4] * radius
+        for direction in DIRECTIONS:
+            for _ in range(radius):
+                cells.append((q, r))
+                q, r = q + direction[0], r + direction[1]
+        cells = np.array(cells, dtype=np.int64)
+    cells.setflags(write=False)
+    return cells
+
+
+@lru_cache(maxsize=64)
+def range_offsets(radius: int) -> np.ndarray:
+    """(3r(r+1)+1, 2) axial offsets within ``radius`` steps, nearest first (read-only)"""
+    cells = np.concatenate([ring_offsets(k) for k in range(radius + 1)])
+    cells.setflags(write=False)
+    return cells
+
+
+def neighbors(q: int, r: int) -> np.ndarray:
+    """(6, 2) axial neighbors of one hex"""
+    return DIRECTIONS + (q, r)
+
+
+def hex_range(q: int, r: int, radius: int) -> np.ndarray:
+    """(N, 2) axial hexes within ``radius`` of (q, r)"""
+    return range_offsets(radius) + (q, r)
+
+
+def line(q1: int, r1: int, q2: int, r2: int) -> np.ndarray:
+    """(N, 2) axial hexes on the straight line between two hexes, inclusive"""
+    n = int(distance(q1, r1, q2, r2))
+    t = np.linspace(0, 1, n + 1)
+    # Nudge off exact hex edges so ties round consistently
+    q = q1 + (q2 - q1) * t + 1e-6
+    r = r1 + (r2 - r1) * t + 1e-6
+    return np.stack(cube_round(q, r), axis=1)
+
+
+def _offset_neighbor_table() -> Tuple[Tuple[Tuple[int, int], ...], ...]:
+    """(dcol, drow) of the six neighbors, indexed by column parity"""
+    table = []
+    for parity in (0, 1):
+        q, r = offset_to_axial(parity, 0)
+        cols, rows = axial_to_offset(DIRECTIONS[:, 0] + q, DIRECTIONS[:, 1] + r)
+        table.append(tuple((int(c) - parity, int(rr)) for c, rr in zip(cols, rows)))
+    return tuple(table)
+
+
+# Neighbor steps in offset coordinates for even and odd columns
+OFFSET_NEIGHBORS = _offset_neighbor_table()
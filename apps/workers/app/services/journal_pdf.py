@@ -0,0 +1,82 @@
+"""
+Session journal as a PDF, laid out with ``pdf_layout`` and written page by
+page to an export sink.
+
+The sections and fallbacks match the Markdown and HTML journals in
+``journal_render``.
+"""
+from typing import Any, Dict
+from app.services.export_store import ExportSink
+from app.services.pdf_layout import PdfWriter, TextFlow, TextStyle
+
+TITLE = TextStyle('bold', 20, 26, space_after=6)
+HEADING = TextStyle('bold', 14, 19, space_before=12, space_after=4)
+SUBHEADING = TextStyle('bold', 11, 15, space_before=6)
+BODY = TextStyle('regular', 10, 13)
+BULLET = TextStyle('regular', 10, 13, indent=12)
+DETAIL = TextStyle('italic', 9, 12, indent=24)
+
+
+def write(session_data: Dict[str, Any], sink: ExportSink) -> int:
+    """Lay out the journal into ``sink``; returns the number of pages"""
+    name = session_data.get('name', 'Unknown Session')
+    with TextFlow(PdfWriter(sink, title=f"Session Journal: {name}"), footer=str(name)) as flow:
+        flow.text(f"Session Journal: {name}", TITLE)
+
+        flow.text("Session Information", HEADING, keep_with_next=BODY.leading)
+        flow.text(f"Date: {session_data.get('started_at', 'Unknown')}\n"
+                  f"Duration: {session_data.get('duration', 'Unknown')}\n"
+                  f"Status: {session_data.get('status', 'Unknown')}", BODY)
+
+        if session_data.get('participants'):
+            flow.text("Participants", HEADING, keep_with_next=BULLET.leading)
+            for participant in session_data['participants']:
+                flow.text(f"• {participant.get('name', 'Unknown')} ({participant.get('type', 'Unknown')})", BULLET)
+
+        if session_data.get('events'):
+            flow.text("Events Timeline", HEADING, keep_with_next=SUBHEADING.leading + BODY.leading)
+            for event in session_data['events']:
+                flow.text(f"{event.get('timestamp', 'Unknown')} - {event.get('type', 'Unknown')}", SUBHEADING,
+                          keep_with_next=BODY.leading)
+                flow.text(str(event.get('description', 'No description')), BODY)
+
+        if session_data.get('rolls'):
+            flow.text("Dice Rolls", HEADING, keep_with_next=BULLET.leading)
+            for roll in session_data['rolls']:
+                flow.text(f"• {roll.get('expression', 'Unknown')}: {roll.get('result', 'Unknown')}", BULLET)
+
+        if session_data.get('rulings'):
+            flow.text("Rulings", HEADING, keep_with_next=SUBHEADING.leading + BODY.leading)
+            for ruling in session_data['rulings']:
+                flow.text(str(ruling.get('question', 'Unknown Question')), SUBHEADING, keep_with_next=BODY.leading)
+                flow.text(f"Answer: {ruling.get('answer', 'No answer provided')}", BODY)
+
+        if session_data.get('encounters'):
+            flow.text("Combat Encounters", HEADING, keep_with_next=SUBHEADING.leading + BODY.leading)
+            for encounter in session_data['encounters']:
+                flow.text(str(encounter.get('name', 'Unknown Encounter')), SUBHEADING, keep_with_next=BODY.leading)
+                flow.text(f"CR: {encounter.get('challenge_rating', 'Unknown')}\n"
+                          f"Outcome: {encounter.get('outcome', 'Unknown')}", BODY)
+
+        loot = session_data.get('loot')
+        if loot:
+            flow.text("Loot Found", HEADING, keep_with_next=SUBHEADING.leading)
+            if loot.get('coins'):
+                flow.text("Coins", SUBHEADING, keep_with_next=BULLET.leading)
+                for coin_type, amount in loot['coins'].items():
+                    flow.text(f"• {coin_type.title()}: {amount}", BULLET)
+            if loot.get('items'):
+                flow.text("Items", SUBHEADING, keep_with_next=BULLET.leading)
+                for item in loot['items']:
+                    flow.text(f"• {item.get('name', 'Unknown Item')} ({item.get('rarity', 'Unknown')})", BULLET)
+                    if item.get('value'):
+                        flow.text(f"Value: {item.get('value')} gp", DETAIL)
+                    if item.get('description'):
+                        flow.text(str(item.get('description')), DETAIL)
+            flow.text(f"Total Value: {loot.get('total_value', 0)} gp", SUBHEADING)
+
+        if session_data.get('notes'):
+            flow.text("Notes", HEADING, keep_with_next=BODY.leading)
+            flow.text(str(session_data['notes']), BODY)
+
+    return flow.pages
@@ -0,0 +1,105 @@
+"""
+Session journal rendering (Markdown and HTML) as a stream of text chunks.
+
+Sessions can have tens of thousands of events and rolls. The renderers are
+generators, so the journal is written straight to an export sink and never
+built as one string.
+
+Markdown is yielded one chunk per section entry (an event, a roll, a
+ruling, ...). HTML comes from the precompiled ``journal.html.j2`` template,
+which escapes all session content.
+"""
+from typing import Any, Dict, Iterator, Optional
+from app.services import templates
+
+
+def iter_markdown(session_data: Dict[str, Any]) -> Iterator[str]:
+    """Markdown journal chunks"""
+    return _joined(_markdown_blocks(session_data))
+
+
+def iter_html(session_data: Dict[str, Any], stylesheet_url: Optional[str] = None) -> Iterator[str]:
+    """HTML journal chunks from the precompiled, autoescaped journal template"""
+    return templates.stream('journal.html.j2', session=session_data, stylesheet_url=stylesheet_url)
+
+
+def render(session_data: Dict[str, Any], format: str, stylesheet_url: Optional[str] = None) -> Iterator[str]:
+    if format == 'markdown':
+        return iter_markdown(session_data)
+    if format == 'html':
+        return iter_html(session_data, stylesheet_url)
+    raise ValueError(f"Unsupported journal format: {format}")
+
+
+def _joined(blocks: Iterator[str]) -> Iterator[str]:
+    """Blocks separated by newlines, without building the whole document"""
+    first = True
+    for block in blocks:
+        if first:
+            first = False
+            yield block
+        else:
+            yield '\n' + block
+
+
+def _markdown_blocks(session_data: Dict[str, Any]) -> Iterator[str]:
+    yield (f"# Session Journal: {session_data.get('name', 'Unknown Session')}\n"
+           "\n"
+           "## Session Information\n"
+           f"- **Date**: {session_data.get('started_at', 'Unknown')}\n"
+           f"- **Duration**: {session_data.get('duration', 'Unknown')}\n"
+           f"- **Status**: {session_data.get('status', 'Unknown')}\n")
+
+    if session_data.get('participants'):
+        yield "## Participants"
+        for participant in session_data['participants']:
+            yield f"- **{participant.get('name', 'Unknown')}** ({participant.get('type', 'Unknown')})"
+        yield ""
+
+    if session_data.get('events'):
+        yield "## Events Timeline"
+        for event in session_data['events']:
+            yield (f"### {event.get('timestamp', 'Unknown')} - {event.get('type', 'Unknown')}\n"
+                   f"{event.get('description', 'No description')}\n")
+
+    if session_data.get('rolls'):
+        yield "## Dice Rolls"
+        for roll in session_data['rolls']:
+            yield f"- **{roll.get('expression', 'Unknown')}**: {roll.get('result', 'Unknown')}"
+        yield ""
+
+    if session_data.get('rulings'):
+        yield "## Rulings"
+        for ruling in session_data['rulings']:
+            yield (f"### {ruling.get('question', 'Unknown Question')}\n"
+                   f"**Answer**: {ruling.get('answer', 'No answer provided')}\n")
+
+    if session_data.get('encounters'):
+        yield "## Combat Encounters"
+        for encounter in session_data['encounters']:
+            yield (f"### {encounter.get('name', 'Unknown Encounter')}\n"
+                   f"- **CR**: {encounter.get('challenge_rating', 'Unknown')}\n"
+                   f"- **Outcome**: {encounter.get('outcome', 'Unknown')}\n")
+
+    loot = session_data.get('loot')
+    if loot:
+        yield "## Loot Found"
+        if loot.get('coins'):
+            yield "### Coins"
+            for coin_type, amount in loot['coins'].items():
+                yield f"- {coin_type.title()}: {amount}"
+            yield ""
+        if loot.get('items'):
+            yield "### Items"
+            for item in loot['items']:
+                lines = [f"- **{item.get('name', 'Unknown Item')}** ({item.get('rarity', 'Unknown')})"]
+                if item.get('value'):
+                    lines.append(f"  - Value: {item.get('value')} gp")
+                if item.get('description'):
+                    lines.append(f"  - {item.get('description')}")
+                lines.append("")
+                yield "\n".join(lines)
+        yield f"**Total Value**: {loot.get('total_value', 0)} gp\n"
+
+    if session_data.get('notes'):
+        yield f"## Notes\n{session_data['notes']}\n"
@@ -0,0 +1,208 @@
+"""
+Loot economy statistics, derived exactly from the loot tables.
+
+For every CR tier and hoard type this gives what ``generate_treasure_hoard``
+(or ``generate_individual_treasure``) yields on average without sampling:
+
+- expected gp value and its variance;
+- expected coins per coin type;
+- expected value per category;
+- the distribution of item counts, overall and per rarity.
+
+Coin totals are sums of independent dice; their exact distribution is a
+convolution, pushed through the same integer conversion the sampler
+applies. Every item slot is an independent Bernoulli draw, so item values
+add in mean and variance, and counts per rarity are Poisson-binomial.
+
+``cross_check`` samples the same tier with ``roll_batch`` and reports
+z-scores against the analytic figures.
+"""
+from functools import lru_cache
+from typing import Any, Dict, List, Optional, Sequence
+import numpy as np
+from app.services import loot_tables
+from app.services.loot_tables import LootSlot, LootTables, LootTier
+
+CATEGORIES = ('gems', 'art_objects', 'magic_items', 'small_items')
+
+# Sampled means further than this many standard errors from the analytic
+# value fail the cross-check
+CROSS_CHECK_Z = 4.0
+
+
+def hoard_statistics(tables: LootTables, tier_index: int, hoard_type: str = 'standard') -> Dict[str, Any]:
+    """Statistics of ``generate_treasure_hoard`` for one tier and hoard type"""
+    tier = tables.tiers[tier_index]
+    return _statistics(tables, tier_index, tables.multiplier(hoard_type), tier.slots, hoard_type)
+
+
+def individual_statistics(tables: LootTables, tier_index: int) -> Dict[str, Any]:
+    """Statistics of ``generate_individual_treasure`` for one tier"""
+    return _statistics(tables, tier_index, tables.multiplier('individual'), tables.small_items, 'individual')
+
+
+@lru_cache(maxsize=8)
+def statistics_table(path: str = loot_tables.LOOT_TABLES_PATH) -> Dict[str, Any]:
+    """
+    Statistics for every tier: treasure hoards per hoard type, and
+    individual treasure; computed once per loot table file
+    """
+    tables = loot_tables.registry(path)
+    tiers = range(len(tables.tiers))
+    return {
+        'tables_version': tables.version,
+        'tiers': [_tier_range(tables, t) for t in tiers],
+        'hoards': {h: [hoard_statistics(tables, t, h) for t in tiers] for h in tables.hoard_multipliers},
+        'individual_treasure': [individual_statistics(tables, t) for t in tiers],
+    }
+
+
+def cross_check(
+    tables: LootTables,
+    tier_index: int,
+    hoard_type: str,
+    samples: int,
+    generator: np.random.Generator,
+    individual: bool = False,
+) -> Dict[str, Any]:
+    """
+    Sample ``samples`` hoards of one tier and compare them with the analytic
+    statistics: total value mean and variance, and expected count per rarity
+    """
+    stats = individual_statistics(tables, tier_index) if individual else hoard_statistics(tables, tier_index, hoard_type)
+    cr = tables.tiers[tier_index].min_cr
+    batch = loot_tables.roll_batch(tables, [cr] * samples, [hoard_type] * samples, generator, [individual] * samples)
+    total = batch['coin_value'] + batch['item_value']
+
+    checks = {'total_value': _mean_check(total, stats['expected_value'], stats['variance'])}
+    # Standard error of the sample variance from the sampled fourth central
+    # moment: hoard values are far too heavy-tailed for the normal formula
+    sample_var = float(total.var(ddof=1)) if samples > 1 else 0.0
+    fourth = float(((total - total.mean()) ** 4).mean()) if samples else 0.0
+    var_se = np.sqrt(max(fourth - stats['variance'] ** 2 * (samples - 3) / max(samples - 1, 1), 0.0) / max(samples, 1))
+    checks['total_variance'] = {
+        'analytic': stats['variance'],
+        'sampled': sample_var,
+        'z': _z(sample_var - stats['variance'], var_se),
+    }
+    for rarity, dist in stats['rarity'].items():
+        counts = np.zeros(samples)
+        for category in CATEGORIES:
+            for row, found in enumerate(batch[category]):
+                counts[row] += sum(1 for item in found if item.get('rarity') == rarity)
+        checks[f"rarity:{rarity}"] = _mean_check(counts, dist['expected'], _variance(dist['distribution']))
+
+    return {
+        'tier': stats['tier'],
+        'hoard_type': stats['hoard_type'],
+        'samples': samples,
+        'checks': checks,
+        'ok': all(abs(c['z']) <= CROSS_CHECK_Z for c in checks.values()),
+    }
+
+
+def _statistics(
+    tables: LootTables,
+    tier_index: int,
+    multiplier: float,
+    slots: Sequence[LootSlot],
+    hoard_type: str,
+) -> Dict[str, Any]:
+    tier = tables.tiers[tier_index]
+    coins = _coin_statistics(tables, tier, multiplier)
+    mean = sum(c['expected_value'] for c in coins.values())
+    variance = sum(c['value_variance'] for c in coins.values())
+
+    by_category = {category: 0.0 for category in CATEGORIES if any(s.key == category for s in slots)}
+    by_rarity: Dict[str, List[float]] = {}
+    for slot in slots:
+        values, probs = _slot_values(slot)
+        value_mean = float(probs @ values)
+        value_square = float(probs @ values ** 2)
+        # Value is v with probability p and 0 otherwise
+        mean += slot.chance * value_mean
+        variance += slot.chance * value_square - (slot.chance * value_mean) ** 2
+        by_category[slot.key] += slot.chance * value_mean
+        if slot.rarity:
+            by_rarity.setdefault(slot.rarity, []).append(slot.chance)
+
+    return {
+        'tier': _tier_range(tables, tier_index),
+        'hoard_type': hoard_type,
+        'expected_value': mean,
+        'variance': variance,
+        'std_dev': float(np.sqrt(variance)),
+        'coins': {coin: {'expected': c['expected'], 'variance': c['variance']} for coin, c in coins.items()},
+        'expected_value_by_category': {'coins': sum(c['expected_value'] for c in coins.values()), **by_category},
+        'item_count': _count_distribution([s.chance for s in slots]),
+        'rarity': {rarity: _count_distribution(chances) for rarity, chances in by_rarity.items()},
+    }
+
+
+def _coin_statistics(tables: LootTables, tier: LootTier, multiplier: float) -> Dict[str, Dict[str, float]]:
+    """Exact mean and variance of each coin amount and its gp value"""
+    stats = {}
+    bounds = list(tier.coin_starts.tolist()) + [len(tier.coin_dice)]
+    for c, coin in enumerate(tier.coin_types):
+        pmf = np.ones(1)
+        for sides in tier.coin_dice[bounds[c]:bounds[c + 1]].tolist():
+            pmf = np.convolve(pmf, np.ones(sides) / sides)
+        # pmf[k] is P(sum == k + dice); same conversion as roll_coins
+        totals = np.arange(len(pmf)) + (bounds[c + 1] - bounds[c])
+        amounts = (totals * tables.coin_multiplier * multiplier).astype(np.int64).astype(np.float64)
+        mean = float(pmf @ amounts)
+        variance = float(pmf @ amounts ** 2) - mean ** 2
+        value = tables.coin_values.get(coin, 0)
+        stats[coin] = {
+            'expected': mean,
+            'variance': variance,
+            'expected_value': mean * value,
+            'value_variance': variance * value ** 2,
+        }
+    return stats
+
+
+def _slot_values(slot: LootSlot):
+    """Values a slot yields when it comes up, with their probabilities"""
+    if slot.key == 'magic_items':
+        return np.array([item['value'] for item in slot.pool], dtype=np.float64), slot.alias.probabilities()
+    values = np.arange(slot.min_value, slot.max_value + 1, dtype=np.float64)
+    return values, np.full(len(values), 1.0 / len(values))
+
+
+def _count_distribution(chances: Sequence[float]) -> Dict[str, Any]:
+    """Poisson-binomial distribution of how many of the independent slots come up"""
+    pmf = np.ones(1)
+    for p in chances:
+        pmf = np.convolve(pmf, [1.0 - p, p])
+    return {'expected': float(sum(chances)), 'distribution': pmf.tolist()}
+
+
+def _tier_range(tables: LootTables, tier_index: int) -> Dict[str, Optional[float]]:
+    """CR range of a tier: ``min_cr <= cr < max_cr`` (no upper bound for the last tier)"""
+    next_tier = tier_index + 1
+    return {
+        'min_cr': tables.tiers[tier_index].min_cr,
+        'max_cr': tables.tiers[next_tier].min_cr if next_tier < len(tables.tiers) else None,
+    }
+
+
+def _variance(pmf: Sequence[float]) -> float:
+    k = np.arange(len(pmf))
+    mean = float(np.dot(pmf, k))
+    return float(np.dot(pmf, k ** 2)) - mean ** 2
+
+
+def _mean_check(sample: np.ndarray, expected: float, variance: float) -> Dict[str, float]:
+    mean = float(sample.mean()) if len(sample) else 0.0
+    return {
+        'analytic': expected,
+        'sampled': mean,
+        'z': _z(mean - expected, np.sqrt(variance / max(len(sample), 1))),
+    }
+
+
+def _z(diff: float, se: float) -> float:
+    if se > 0:
+        return float(diff / se)
+    return 0.0 if abs(diff) < 1e-9 else float('inf')
@@ -0,0 +1,294 @@
+"""
+Loot tables, loaded once per worker from a data file.
+
+Tables live in ``app/data/loot_tables.json``; set ``LOOT_TABLES_PATH`` to
+use another file.
+
+Tiers are keyed by their lowest CR and found with ``bisect``, so every CR
+falls in exactly one tier:
+- a fractional CR such as 4.5 uses the tier below it;
+- a CR past the last tier uses the last tier.
+
+Weighted picks (gem and art names, magic items) use Walker alias tables,
+so each pick is one uniform draw and O(1) work. Entries default to weight
+1; give a ``weight`` to skew a pool.
+
+Each tier is compiled up front into:
+- the sides of every coin die, for one vectorized dice draw;
+- a flat list of slots (a gem, art object or magic item that appears with
+  some chance), rolled from one block of uniforms.
+Result dicts are copied from prebuilt templates. ``roll_batch`` does the same
+for many hoards at once, one block per tier.
+"""
+from bisect import bisect_right
+from functools import lru_cache
+from typing import Any, Dict, List, NamedTuple, Optional, Sequence, Tuple
+import hashlib
+import json
+import os
+import numpy as np
+
+LOOT_TABLES_PATH = os.getenv(
+    "LOOT_TABLES_PATH",
+    os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'data', 'loot_tables.json'),
+)
+
+
+class AliasTable:
+    """Walker/Vose alias table over ``len(weights)`` outcomes"""
+    __slots__ = ('prob', 'alias', '_prob', '_alias', '_n')
+
+    def __init__(self, weights: Sequence[float]):
+        w = np.asarray(weights, dtype=np.float64)
+        if w.ndim != 1 or len(w) == 0 or (w < 0).any() or w.sum() <= 0:
+            raise ValueError("Alias table needs at least one positive weight and no negative ones")
+        n = len(w)
+        prob = w * n / w.sum()
+        alias = np.arange(n)
+        small = [i for i in range(n) if prob[i] < 1.0]
+        large = [i for i in range(n) if prob[i] >= 1.0]
+        while small and large:
+            s, l = small.pop(), large.pop()
+            alias[s] = l
+            prob[l] -= 1.0 - prob[s]
+            (small if prob[l] < 1.0 else large).append(l)
+        # Whatever is left is 1 up to rounding
+        prob[small + large] = 1.0
+        self.prob, self.alias = prob, alias
+        # Plain lists: scalar indexing into NumPy arrays costs more than the pick
+        self._prob, self._alias, self._n = prob.tolist(), alias.tolist(), n
+
+    def __len__(self) -> int:
+        return self._n
+
+    def pick(self, u: float) -> int:
+        """Outcome index for one uniform ``u`` in [0, 1)"""
+        scaled = u * self._n
+        i = int(scaled)
+        return i if scaled - i < self._prob[i] else self._alias[i]
+
+    def probabilities(self) -> np.ndarray:
+        """Exact probability of each outcome under ``pick`` (the normalized weights, up to rounding)"""
+        p = self.prob.copy()
+        np.add.at(p, self.alias, 1.0 - self.prob)
+        return p / self._n
+
+    def pick_many(self, u: np.ndarray) -> np.ndarray:
+        """Outcome indexes for an array of uniforms"""
+        scaled = u * self._n
+        i = scaled.astype(np.int64)
+        return np.where(scaled - i < self.prob[i], i, self.alias[i])
+
+
+class LootSlot(NamedTuple):
+    """Something that appears in a hoard with probability ``chance``"""
+    key: str                            # result list: 'gems', 'art_objects', 'magic_items' or 'small_items'
+    rarity: Optional[str]
+    chance: float
+    min_value: int
+    max_value: int
+    pool: Tuple[Dict[str, Any], ...]    # result templates to pick from
+    alias: AliasTable
+
+
+class LootTier(NamedTuple):
+    min_cr: float
+    coin_types: Tuple[str, ...]
+    coin_dice: np.ndarray               # sides of every coin die, grouped by coin type
+    coin_starts: np.ndarray             # first die of each coin type in ``coin_dice``
+    slots: Tuple[LootSlot, ...]
+    chances: np.ndarray
+
+
+class LootTables:
+    """Compiled loot tables; get the shared instance from ``registry()``"""
+
+    def __init__(self, data: Dict[str, Any], version: str = ''):
+        self.version = version
+        self.coin_values: Dict[str, float] = dict(data['coin_values'])
+        self.coin_multiplier = data.get('coin_multiplier', 100)
+        self.hoard_multipliers: Dict[str, float] = dict(data['hoard_multipliers'])
+        attunement = set(data.get('attunement_rarities', ()))
+
+        gems = self._named_pools(data['gems'])
+        art = self._named_pools(data['art_objects'])
+        items = {
+            rarity: tuple(
+                {'name': i['name'], 'type': i['type'], 'rarity': rarity, 'value': i['value'],
+                 'description': f"A {rarity} magic item of great power.",
+                 'attunement_required': rarity in attunement}
+                for i in entries
+            )
+            for rarity, entries in data['magic_items'].items()
+        }
+        item_alias = {rarity: AliasTable([i.get('weight', 1) for i in entries]) for rarity, entries in data['magic_items'].items()}
+
+        tiers = []
+        for tier in sorted(data['tiers'], key=lambda t: t['min_cr']):
+            coins = [(coin, count, sides) for coin, (count, sides) in tier['coins'].items() if count > 0]
+            slots = [
+                LootSlot(key, s['rarity'], s['chance'], s['min_value'], s['max_value'], *pools[s['rarity']])
+                for key, pools in (('gems', gems), ('art_objects', art))
+                for s in tier.get(key, [])
+            ] + [
+                LootSlot('magic_items', s['rarity'], s['chance'], 0, 0, items[s['rarity']], item_alias[s['rarity']])
+                for s in tier.get('magic_items', [])
+                if items.get(s['rarity'])
+            ]
+            tiers.append(LootTier(
+                min_cr=tier['min_cr'],
+                coin_types=tuple(coin for coin, _, _ in coins),
+                coin_dice=np.repeat([sides for _, _, sides in coins], [count for _, count, _ in coins]).astype(np.int64),
+                coin_starts=np.cumsum([0] + [count for _, count, _ in coins[:-1]]).astype(np.int64),
+                slots=tuple(slots),
+                chances=np.array([s.chance for s in slots]),
+            ))
+        self.tiers: Tuple[LootTier, ...] = tuple(tiers)
+        self._bounds: List[float] = [t.min_cr for t in tiers]
+
+        small = [
+            LootSlot('small_items', None, i['chance'], i['value'], i['value'],
+                     ({'name': i['name'], 'value': i['value'], 'description': f"A small {i['name'].lower()}."},),
+                     AliasTable([1]))
+            for i in data.get('small_items', [])
+        ]
+        self.small_items: Tuple[LootSlot, ...] = tuple(small)
+        self.small_chances = np.array([s.chance for s in small])
+
+    def tier_index(self, cr: float) -> int:
+        """Index of the tier whose CR range contains ``cr`` (lowest tier below 0, last tier past the end)"""
+        return max(bisect_right(self._bounds, cr) - 1, 0)
+
+    def tier(self, cr: float) -> LootTier:
+        return self.tiers[self.tier_index(cr)]
+
+    def multiplier(self, hoard_type: str) -> float:
+        return self.hoard_multipliers.get(hoard_type, 1.0)
+
+    @staticmethod
+    def _named_pools(section: Dict[str, Any]) -> Dict[str, Tuple[Tuple[Dict[str, Any], ...], AliasTable]]:
+        """Per-rarity name templates and alias tables (names may carry a ``weight``)"""
+        pools = {}
+        for rarity, names in section['names'].items():
+            entries = [n if isinstance(n, dict) else {'name': n} for n in names]
+            description = section['descriptions'].get(rarity, '')
+            templates = tuple({'name': e['name'], 'rarity': rarity, 'value': 0, 'description': description} for e in entries)
+            pools[rarity] = (templates, AliasTable([e.get('weight', 1) for e in entries]))
+        return pools
+
+
+@lru_cache(maxsize=None)
+def registry(path: str = LOOT_TABLES_PATH) -> LootTables:
+    """Loot tables from ``path``, loaded and compiled once per worker"""
+    with open(path, 'rb') as f:
+        raw = f.read()
+    return LootTables(json.loads(raw), hashlib.sha1(raw).hexdigest()[:12])
+
+
+def roll_coins(tier: LootTier, multiplier: float, generator: np.random.Generator, coin_multiplier: int = 100) -> Dict[str, int]:
+    """Coin amounts for one hoard: every coin die of the tier in one draw"""
+    if not tier.coin_types:
+        return {}
+    # Scaled uniforms rather than ``integers(1, sides + 1)``: NumPy's
+    # per-element bounds path costs more than the whole rest of the hoard
+    rolls = (generator.random(len(tier.coin_dice)) * tier.coin_dice).astype(np.int64) + 1
+    totals = np.add.reduceat(rolls, tier.coin_starts)
+    return {coin: int(total * coin_multiplier * multiplier) for coin, total in zip(tier.coin_types, totals.tolist())}
+
+
+def roll_slots(slots: Sequence[LootSlot], chances: np.ndarray, generator: np.random.Generator) -> List[Tuple[str, Dict[str, Any]]]:
+    """
+    Which slots appear, as (result key, result) pairs in slot order
+
+    One block of uniforms per call: a presence draw, a value draw and a pick
+    draw per slot.
+    """
+    if not slots:
+        return []
+    u = generator.random((3, len(slots)))
+    return [
+        (slots[i].key, _slot_result(slots[i], u[1, i], u[2, i]))
+        for i in np.flatnonzero(u[0] < chances).tolist()
+    ]
+
+
+def roll_batch(
+    tables: LootTables,
+    challenge_ratings: Sequence[float],
+    hoard_types: Sequence[str],
+    generator: np.random.Generator,
+    individual: Optional[Sequence[bool]] = None,
+) -> Dict[str, Any]:
+    """
+    Loot for many hoards at once
+
+    Rows flagged in ``individual`` (by default, rows with hoard type
+    'individual') get individual treasure (coins and small items), the rest
+    get a hoard (coins, gems, art objects and magic items). Coin dice are rolled per tier as one ``(rows, dice)`` block and
+    presence draws per slot table as one ``(rows, slots)`` block; only the
+    hits are turned into result dicts.
+
+    Returns:
+        'coin_types', 'coins' (rows x coin types), 'coin_value' and
+        'item_value' arrays, per-row result lists under 'gems',
+        'art_objects', 'magic_items' and 'small_items', and the batch's
+        'rarity_breakdown'
+    """
+    n = len(challenge_ratings)
+    tier_idx = np.fromiter((tables.tier_index(cr) for cr in challenge_ratings), dtype=np.intp, count=n)
+    multiplier = np.fromiter((tables.multiplier(h) for h in hoard_types), dtype=np.float64, count=n)
+    if individual is None:
+        individual = [h == 'individual' for h in hoard_types]
+    individual = np.fromiter(individual, dtype=bool, count=n)
+
+    coin_types = tuple(c for c in tables.coin_values if any(c in t.coin_types for t in tables.tiers))
+    column = {c: i for i, c in enumerate(coin_types)}
+    coins = np.zeros((n, len(coin_types)), dtype=np.int64)
+    found: Dict[str, List[List[Dict[str, Any]]]] = {
+        key: [[] for _ in range(n)] for key in ('gems', 'art_objects', 'magic_items', 'small_items')
+    }
+    item_value = np.zeros(n, dtype=np.float64)
+    rarity_counts: Dict[str, int] = {}
+
+    def roll_rows(rows: np.ndarray, slots: Sequence[LootSlot], chances: np.ndarray) -> None:
+        if not rows.size or not slots:
+            return
+        u = generator.random((3, rows.size, len(slots)))
+        hit_rows, hit_slots = np.nonzero(u[0] < chances)
+        for r, i in zip(hit_rows.tolist(), hit_slots.tolist()):
+            slot, row = slots[i], int(rows[r])
+            result = _slot_result(slot, u[1, r, i], u[2, r, i])
+            found[slot.key][row].append(result)
+            item_value[row] += result['value']
+            if slot.rarity:
+                rarity_counts[slot.rarity] = rarity_counts.get(slot.rarity, 0) + 1
+
+    for t, tier in enumerate(tables.tiers):
+        rows = np.flatnonzero(tier_idx == t)
+        if not rows.size:
+            continue
+        if tier.coin_types:
+            rolls = (generator.random((rows.size, len(tier.coin_dice))) * tier.coin_dice).astype(np.int64) + 1
+            totals = np.add.reduceat(rolls, tier.coin_starts, axis=1)
+            cols = [column[c] for c in tier.coin_types]
+            coins[np.ix_(rows, cols)] = (totals * tables.coin_multiplier * multiplier[rows, None]).astype(np.int64)
+        roll_rows(rows[~individual[rows]], tier.slots, tier.chances)
+    roll_rows(np.flatnonzero(individual), tables.small_items, tables.small_chances)
+
+    coin_value = coins @ np.array([tables.coin_values[c] for c in coin_types], dtype=np.float64)
+    return {
+        'coin_types': coin_types,
+        'coins': coins,
+        'coin_value': coin_value,
+        'item_value': item_value,
+        **found,
+        'rarity_breakdown': rarity_counts,
+    }
+
+
+def _slot_result(slot: LootSlot, u_value: float, u_pick: float) -> Dict[str, Any]:
+    """Result dict for a slot that came up, from its value and pick uniforms"""
+    result = dict(slot.pool[slot.alias.pick(u_pick)])
+    if slot.key != 'magic_items':
+        result['value'] = slot.min_value + int(u_value * (slot.max_value - slot.min_value + 1))
+    return result
@@ -0,0 +1,140 @@
+"""
+Worker-local cache of derived map structures.
+
+Token indexes, obstacle rasters and similar structures are expensive to
+rebuild from ``map_data`` on every task call, so they are cached per worker
+under (map_id, version, kind). Maps sent without an ``id`` and ``version``
+are never cached.
+
+A task that changes a map updates the structures it touched in place and
+calls ``advance``. That re-keys every cached structure for the map under the
+next version, drops the kinds the change invalidates, and returns the new
+version for the caller to send next time.
+
+Kinds with one entry per token or query (``'reach:<token>:...'``) are
+bounded on their own, per map version and across maps, so they never evict
+the rasters and indexes the other tasks share.
+"""
+from collections import Counter, OrderedDict
+from typing import Any, Callable, Dict, Iterable, Optional, Tuple, TypeVar
+
+MAP_CACHE_SIZE = 256
+# Kind family (the part before ':') -> (entries per map version, entries in total)
+FAMILY_LIMITS = {'reach': (32, 1024)}
+
+T = TypeVar('T')
+_cache: 'OrderedDict[Tuple[str, Any, str], Any]' = OrderedDict()
+# Entries per family ('' for unbounded kinds) and per (map_id, version, family)
+_counts: Counter = Counter()
+
+
+def cached(map_data: Dict[str, Any], kind: str, build: Callable[[], T]) -> T:
+    """Cached ``kind`` structure for this map version, built on a miss"""
+    key = _map_key(map_data)
+    if key is None:
+        return build()
+    full_key = (*key, kind)
+    if full_key in _cache:
+        _cache.move_to_end(full_key)
+        return _cache[full_key]
+    value = build()
+    _store(full_key, value)
+    return value
+
+
+def peek(map_data: Dict[str, Any], kind: str) -> Optional[Any]:
+    """Cached ``kind`` structure for this map version, or None (never builds)"""
+    key = _map_key(map_data)
+    return None if key is None else _cache.get((*key, kind))
+
+
+def advance(
+    map_data: Dict[str, Any],
+    updated: Optional[Dict[str, Any]] = None,
+    invalidate: Iterable[str] = ()
+) -> Optional[int]:
+    """
+    Move this map's cached structures to the next version
+
+    Args:
+        map_data: Map as sent by the caller (``id`` and current ``version``)
+        updated: Structures already updated in place for the new version
+        invalidate: Kinds that the change makes stale; ``'reach'`` also
+            drops ``'reach:...'`` entries
+
+    Returns:
+        The next version, or None for uncached maps
+    """
+    key = _map_key(map_data)
+    if key is None:
+        return None
+    map_id, version = key
+    next_version = int(version) + 1
+    carried = {kind: _pop((map_id, version, kind)) for kind in _kinds(map_id, version)}
+    for stale in invalidate:
+        for kind in list(carried):
+            if kind == stale or kind.startswith(stale + ':'):
+                del carried[kind]
+    carried.update(updated or {})
+    for kind, value in carried.items():
+        _store((map_id, next_version, kind), value)
+    return next_version
+
+
+def discard(map_data: Dict[str, Any]) -> None:
+    """Drop every cached structure for this map version"""
+    key = _map_key(map_data)
+    if key is not None:
+        for kind in _kinds(*key):
+            _pop((*key, kind))
+
+
+def clear_map_cache() -> None:
+    _cache.clear()
+    _counts.clear()
+
+
+def _kinds(map_id: str, version: Any):
+    return [kind for (mid, ver, kind) in list(_cache) if mid == map_id and ver == version]
+
+
+def _map_key(map_data: Dict[str, Any]) -> Optional[Tuple[str, Any]]:
+    if map_data.get('id') is None or map_data.get('version') is None:
+        return None
+    return str(map_data['id']), map_data['version']
+
+
+def _family(kind: str) -> str:
+    family = kind.partition(':')[0]
+    return family if family in FAMILY_LIMITS else ''
+
+
+def _store(key: Tuple[str, Any, str], value: Any) -> None:
+    family = _family(key[2])
+    if key not in _cache:
+        _counts[family] += 1
+        _counts[(key[0], key[1], family)] += 1
+    _cache[key] = value
+    _cache.move_to_end(key)
+    per_map, total = FAMILY_LIMITS.get(family, (None, MAP_CACHE_SIZE))
+    if per_map is not None and _counts[(key[0], key[1], family)] > per_map:
+        _evict(family, lambda k: k[:2] == key[:2])
+    if _counts[family] > total:
+        _evict(family, lambda k: True)
+
+
+def _evict(family: str, match: Callable[[Tuple[str, Any, str]], bool]) -> None:
+    """Drop the least recently used ``family`` entry that ``match`` accepts"""
+    for key in _cache:
+        if _family(key[2]) == family and match(key):
+            _pop(key)
+            return
+
+
+def _pop(key: Tuple[str, Any, str]) -> Any:
+    family = _family(key[2])
+    _counts[family] -= 1
+    _counts[(key[0], key[1], family)] -= 1
+    if not _counts[(key[0], key[1], family)]:
+        del _counts[(key[0], key[1], family)]
+    return _cache.pop(key)
@@ -0,0 +1,164 @@
+"""
+Compact grid geometry.
+
+A map grid is fully described by its type, cell size and dimensions, so
+``generate_map_grid`` returns that descriptor plus the layout formula instead
+of one dict per cell. Clients that want precomputed geometry can ask for
+NumPy buffers (cell origins, centers and, for hex grids, vertices), shipped
+base64-encoded so they pass through the Celery JSON serializer. The old
+per-cell dict list is still available as an opt-in expansion and is built
+from the same vectorized arrays.
+
+Layout (legacy-compatible):
+    square: x = col * size, y = row * size
+    hex:    flat-top odd-q (see app.services.hex_grid); x, y is the hex
+            center: x = col * 1.5 * size, y = (row + 0.5 * (col % 2)) * sqrt(3) * size,
+            vertices at angle k * 60deg, radius ``size``, around (x, y)
+"""
+from dataclasses import dataclass
+from typing import Any, Dict, List, Tuple
+import base64
+import math
+import numpy as np
+from app.services import hex_grid
+
+GRID_TYPES = ('square', 'hex')
+SQRT3 = math.sqrt(3)
+_HEX_ANGLES = np.arange(6) * (math.pi / 3)
+
+
+@dataclass(frozen=True)
+class GridGeometry:
+    grid_type: str
+    grid_size: int
+    cols: int
+    rows: int
+
+    @classmethod
+    def for_map(cls, width: int, height: int, grid_size: int = 50, grid_type: str = 'square') -> 'GridGeometry':
+        """Grid covering a ``width`` x ``height`` pixel map"""
+        if grid_type not in GRID_TYPES:
+            raise ValueError(f"Unsupported grid type: {grid_type}")
+        if grid_size <= 0:
+            raise ValueError("grid_size must be positive")
+        if grid_type == 'square':
+            cols = math.ceil(width / grid_size)
+            rows = math.ceil(height / grid_size)
+        else:
+            cols = math.ceil(width / (grid_size * 2 * 0.75))
+            rows = math.ceil(height / (grid_size * SQRT3))
+        return cls(grid_type, grid_size, cols, rows)
+
+    @property
+    def total_cells(self) -> int:
+        return self.cols * self.rows
+
+    @property
+    def cell_width(self) -> float:
+        return self.grid_size if self.grid_type == 'square' else self.grid_size * 2
+
+    @property
+    def cell_height(self) -> float:
+        return self.grid_size if self.grid_type == 'square' else self.grid_size * SQRT3
+
+    def pixel_size(self) -> Tuple[int, int]:
+        """Width and height in pixels of the area the cells cover"""
+        if self.grid_type == 'square':
+            return self.cols * self.grid_size, self.rows * self.grid_size
+        # Hex columns overlap by a quarter width; odd columns hang half a hex lower
+        return (math.ceil((self.cols * 1.5 + 0.5) * self.grid_size),
+                math.ceil((self.rows + 0.5) * SQRT3 * self.grid_size))
+
+    def descriptor(self) -> Dict[str, Any]:
+        """Formula-only description; O(1) regardless of grid size"""
+        return {
+            'grid_type': self.grid_type,
+            'grid_size': self.grid_size,
+            'cols': self.cols,
+            'rows': self.rows,
+            'total_cells': self.total_cells,
+            'cell_width': self.cell_width,
+            'cell_height': self.cell_height,
+            'layout': 'square' if self.grid_type == 'square' else 'flat-top-odd-q',
+        }
+
+    # --- Buffers (row-major, index = row * cols + col) ------------------------
+
+    def origins(self) -> np.ndarray:
+        """(rows * cols, 2) float32 array of cell x, y"""
+        rows, cols = np.divmod(np.arange(self.total_cells), self.cols)
+        if self.grid_type == 'square':
+            x = cols * self.grid_size
+            y = rows * self.grid_size
+        else:
+            x, y = hex_grid.offset_to_pixel(cols, rows, self.grid_size)
+        return np.stack([x, y], axis=1).astype(np.float32)
+
+    def centers(self) -> np.ndarray:
+        """(rows * cols, 2) float32 array of cell center_x, center_y"""
+        if self.grid_type == 'square':
+            return self.origins() + self.grid_size // 2
+        # Hex origins already are the hex centers
+        return self.origins()
+
+    def vertices(self) -> np.ndarray:
+        """(rows * cols, 6, 2) float32 array of hex corner points"""
+        if self.grid_type != 'hex':
+            raise ValueError("Vertices are only stored for hex grids")
+        offsets = np.stack([np.cos(_HEX_ANGLES), np.sin(_HEX_ANGLES)], axis=1) * self.grid_size
+        return (self.origins()[:, None, :] + offsets[None, :, :]).astype(np.float32)
+
+    def buffers(self) -> Dict[str, Dict[str, Any]]:
+        """Encoded geometry buffers for clients that do not want to apply the formula"""
+        buffers = {'origins': encode_array(self.origins()), 'centers': encode_array(self.centers())}
+        if self.grid_type == 'hex':
+            buffers['vertices'] = encode_array(self.vertices())
+        return buffers
+
+    # --- Legacy expansion -----------------------------------------------------
+
+    def expand_cells(self) -> List[Dict[str, Any]]:
+        """Per-cell dicts in the format generate_map_grid used to return"""
+        rows, cols = np.divmod(np.arange(self.total_cells), self.cols)
+        rows, cols = rows.tolist(), cols.tolist()
+        if self.grid_type == 'square':
+            size = self.grid_size
+            half = size // 2
+            return [
+                {
+                    'id': f"{r}_{c}", 'row': r, 'col': c,
+                    'x': c * size, 'y': r * size, 'width': size, 'height': size,
+                    'center_x': c * size + half, 'center_y': r * size + half,
+                }
+                for r, c in zip(rows, cols)
+            ]
+
+        # Float64 here so the expansion matches the old per-cell arithmetic
+        width, height = self.cell_width, self.cell_height
+        xs = (np.asarray(cols) * (width * 0.75)).tolist()
+        ys = (np.asarray(rows) * height + (np.asarray(cols) % 2) * (height / 2)).tolist()
+        angles = [i * math.pi / 3 for i in range(6)]
+        offsets = [(self.grid_size * math.cos(a), self.grid_size * math.sin(a)) for a in angles]
+        return [
+            {
+                'id': f"{r}_{c}", 'row': r, 'col': c,
+                'x': x, 'y': y, 'width': width, 'height': height,
+                'center_x': x + width // 2, 'center_y': y + height // 2,
+                'points': [(x + dx, y + dy) for dx, dy in offsets],
+            }
+            for r, c, x, y in zip(rows, cols, xs, ys)
+        ]
+
+
+def encode_array(array: np.ndarray) -> Dict[str, Any]:
+    """JSON-safe form of a numeric array (little-endian bytes, base64)"""
+    array = np.ascontiguousarray(array)
+    return {
+        'dtype': array.dtype.newbyteorder('<').str,
+        'shape': list(array.shape),
+        'data': base64.b64encode(array.astype(array.dtype.newbyteorder('<'), copy=False).tobytes()).decode('ascii'),
+    }
+
+
+def decode_array(encoded: Dict[str, Any]) -> np.ndarray:
+    return np.frombuffer(base64.b64decode(encoded['data']), dtype=encoded['dtype']).reshape(encoded['shape'])
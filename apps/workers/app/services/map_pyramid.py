@@ -0,0 +1,312 @@
+"""
+Deep-zoom tile pyramids for map background images.
+
+The source image is read in horizontal bands of one tile row and fed
+through a cascade of levels:
+- Each level cuts full bands into tiles and writes them out.
+- It then halves the band (box filter) and passes it to the next coarser
+  level.
+- Each level holds at most one band of pending rows, so memory stays
+  bounded by about two tile rows of the source width, whatever the image
+  height.
+
+8-bit non-interlaced PNGs (the usual battlemap export) are never decoded
+whole:
+- The IDAT stream is inflated incrementally, one band of scanlines at a
+  time.
+- Pillow's own PNG decoder unfilters each band (``Image.frombytes`` with
+  the 'zip' decoder).
+- Each band is seeded with the previous band's last reconstructed row, so
+  Up/Average/Paeth filters stay exact across band edges.
+Their size, mode and palette are read from the PNG chunks, so Pillow's
+pixel limit (``Image.MAX_IMAGE_PIXELS``) never applies to them. Other
+sources (JPEG, WebP, interlaced or 16-bit PNG) are decoded once and then
+sliced the same way, and must be within that limit.
+
+Levels follow the Deep Zoom layout: level ``max_level`` is full size,
+each lower level is half the size (rounded up), and level 0 is 1x1. Tiles
+are written to ``{level}/{col}_{row}.{format}`` next to a ``manifest.json``.
+"""
+from typing import Any, Dict, Iterator, List, NamedTuple, Optional, Tuple
+import json
+import math
+import os
+import re
+import struct
+import zlib
+import structlog
+from PIL import Image
+
+logger = structlog.get_logger()
+
+PNG_SIGNATURE = b'\x89PNG\r\n\x1a\n'
+TILE_FORMATS = {'png': 'PNG', 'jpeg': 'JPEG', 'webp': 'WEBP'}
+READ_CHUNK = 1 << 20
+# 8-bit PNG color type -> (mode, channels); the raw mode is the mode
+_COLOR_TYPES = {0: ('L', 1), 2: ('RGB', 3), 3: ('P', 1), 4: ('LA', 2), 6: ('RGBA', 4)}
+_SIMPLE_TRNS = re.compile(b'^\xff*\x00\xff*$')
+
+
+class _PngInfo(NamedTuple):
+    """What a streamed decode needs from an 8-bit non-interlaced PNG"""
+    width: int
+    height: int
+    mode: str
+    channels: int
+    palette: Optional[bytes]
+    transparency: Any
+
+
+def iter_bands(path: str, band_height: int) -> Iterator[Image.Image]:
+    """Source image as consecutive ``band_height``-row bands (the last may be shorter)"""
+    png = _png_info(path)
+    if png is not None:
+        yield from _png_bands(path, png, band_height)
+        return
+    source = _open(path)
+    logger.info("Decoding pyramid source in full", format=source.format, size=source.size)
+    source.load()
+    for y in range(0, source.height, band_height):
+        yield source.crop((0, y, source.width, min(y + band_height, source.height)))
+
+
+def pyramid_levels(width: int, height: int, tile_size: int) -> List[Dict[str, int]]:
+    """Size and tile grid of every level, coarsest (1x1) first"""
+    max_level = math.ceil(math.log2(max(width, height, 1)))
+    levels = []
+    for level in range(max_level + 1):
+        scale = 2 ** (max_level - level)
+        w, h = max(1, math.ceil(width / scale)), max(1, math.ceil(height / scale))
+        levels.append({
+            'level': level, 'width': w, 'height': h,
+            'cols': math.ceil(w / tile_size), 'rows': math.ceil(h / tile_size),
+        })
+    return levels
+
+
+def build_pyramid(
+    source_path: str,
+    output_dir: str,
+    tile_size: int = 256,
+    tile_format: str = 'png'
+) -> Dict[str, Any]:
+    """
+    Slice an image into a tile pyramid under ``output_dir``
+
+    Returns:
+        The manifest (also written to ``output_dir/manifest.json``)
+    """
+    if tile_format not in TILE_FORMATS:
+        raise ValueError(f"Unsupported tile format: {tile_format}")
+    if tile_size <= 0 or tile_size % 2:
+        raise ValueError("tile_size must be a positive even number")
+
+    png = _png_info(source_path)
+    width, height = (png.width, png.height) if png is not None else _open(source_path).size
+    streamed = png is not None
+    levels = pyramid_levels(width, height, tile_size)
+    cascade = _Cascade(output_dir, levels, tile_size, tile_format)
+    for band in iter_bands(source_path, tile_size):
+        cascade.push(len(levels) - 1, _tile_mode(band, tile_format))
+    cascade.finish()
+
+    manifest = {
+        'width': width,
+        'height': height,
+        'tile_size': tile_size,
+        'overlap': 0,
+        'format': tile_format,
+        'layout': '{level}/{col}_{row}.' + tile_format,
+        'max_level': len(levels) - 1,
+        'levels': levels,
+        'tiles': cascade.tiles,
+        'streamed': streamed,
+    }
+    with open(os.path.join(output_dir, 'manifest.json'), 'w') as f:
+        json.dump(manifest, f)
+    return manifest
+
+
+class _Cascade:
+    """Per-level band buffers; full bands are tiled, halved and passed down"""
+
+    def __init__(self, output_dir: str, levels: List[Dict[str, int]], tile_size: int, tile_format: str):
+        self.output_dir = output_dir
+        self.levels = levels
+        self.tile_size = tile_size
+        self.tile_format = tile_format
+        self.pending: List[List[Image.Image]] = [[] for _ in levels]
+        self.next_row = [0] * len(levels)
+        self.tiles = 0
+        for level in levels:
+            os.makedirs(os.path.join(output_dir, str(level['level'])), exist_ok=True)
+
+    def push(self, level: int, band: Image.Image) -> None:
+        self.pending[level].append(band)
+        if sum(b.height for b in self.pending[level]) >= self.tile_size:
+            self._emit(level)
+
+    def finish(self) -> None:
+        # Finer levels flush first so their last halves reach coarser levels
+        for level in range(len(self.levels) - 1, -1, -1):
+            if self.pending[level]:
+                self._emit(level)
+
+    def _emit(self, level: int) -> None:
+        bands = self.pending[level]
+        self.pending[level] = []
+        if len(bands) == 1:
+            strip = bands[0]
+        else:
+            strip = Image.new(bands[0].mode, (bands[0].width, sum(b.height for b in bands)))
+            y = 0
+            for band in bands:
+                strip.paste(band, (0, y))
+                y += band.height
+
+        row = self.next_row[level]
+        self.next_row[level] += 1
+        directory = os.path.join(self.output_dir, str(level))
+        for col in range(self.levels[level]['cols']):
+            x = col * self.tile_size
+            tile = strip.crop((x, 0, min(x + self.tile_size, strip.width), strip.height))
+            tile.save(os.path.join(directory, f"{col}_{row}.{self.tile_format}"), format=TILE_FORMATS[self.tile_format])
+            self.tiles += 1
+        if level > 0:
+            self.push(level - 1, strip.reduce(2))
+
+
+def _open(path: str) -> Image.Image:
+    """Open a source that has to be decoded in full, within Pillow's pixel limit"""
+    advice = "too large to decode in full; use an 8-bit non-interlaced PNG"
+    try:
+        source = Image.open(path)
+    except Image.DecompressionBombError as e:
+        raise ValueError(f"{e}; {advice}") from e
+    limit = Image.MAX_IMAGE_PIXELS
+    if limit and source.width * source.height > limit:
+        raise ValueError(f"{source.format} image of {source.width}x{source.height} is {advice}")
+    return source
+
+
+def _png_info(path: str) -> Optional[_PngInfo]:
+    """Header, palette and transparency of a streamable PNG; None for any other image"""
+    with open(path, 'rb') as f:
+        if f.read(8) != PNG_SIGNATURE:
+            return None
+        length, kind = struct.unpack('>I4s', f.read(8))
+        if kind != b'IHDR':
+            return None
+        width, height, bit_depth, color_type, _, _, interlace = struct.unpack('>IIBBBBB', f.read(length))
+        if bit_depth != 8 or interlace or color_type not in _COLOR_TYPES:
+            return None
+        f.seek(4, os.SEEK_CUR)
+        mode, channels = _COLOR_TYPES[color_type]
+        palette = transparency = None
+        while True:
+            head = f.read(8)
+            if len(head) < 8:
+                break
+            length, kind = struct.unpack('>I4s', head)
+            if kind in (b'IDAT', b'IEND'):
+                break
+            if kind == b'PLTE':
+                palette = f.read(length)
+            elif kind == b'tRNS':
+                transparency = _transparency(mode, f.read(length))
+            else:
+                f.seek(length, os.SEEK_CUR)
+            f.seek(4, os.SEEK_CUR)
+    return _PngInfo(width, height, mode, channels, palette, transparency)
+
+
+def _transparency(mode: str, data: bytes) -> Any:
+    """tRNS chunk as Pillow stores it in ``info['transparency']``"""
+    if mode == 'P':
+        # One fully transparent entry is stored as its index, anything else as alpha per entry
+        return data.find(b'\x00') if _SIMPLE_TRNS.match(data) else data
+    if mode == 'L':
+        return struct.unpack('>H', data[:2])[0]
+    if mode == 'RGB':
+        return struct.unpack('>HHH', data[:6])
+    return None
+
+
+def _idat_chunks(path: str) -> Iterator[bytes]:
+    """IDAT payload in pieces of at most READ_CHUNK bytes"""
+    with open(path, 'rb') as f:
+        f.seek(len(PNG_SIGNATURE))
+        while True:
+            head = f.read(8)
+            if len(head) < 8:
+                return
+            length, kind = struct.unpack('>I4s', head)
+            if kind == b'IDAT':
+                remaining = length
+                while remaining:
+                    piece = f.read(min(remaining, READ_CHUNK))
+                    remaining -= len(piece)
+                    yield piece
+                f.seek(4, os.SEEK_CUR)
+            elif kind == b'IEND':
+                return
+            else:
+                f.seek(length + 4, os.SEEK_CUR)
+
+
+def _png_bands(path: str, png: _PngInfo, band_height: int) -> Iterator[Image.Image]:
+    width, height = png.width, png.height
+    stride = 1 + width * png.channels
+    band_bytes = band_height * stride
+
+    inflater = zlib.decompressobj()
+    pending = bytearray()
+    seed = b''
+    rows_done = 0
+    for piece in _idat_chunks(path):
+        data = piece
+        while data:
+            # Bounded inflate: a flat background can expand a thousandfold
+            pending += inflater.decompress(data, band_bytes)
+            data = inflater.unconsumed_tail
+            while len(pending) >= band_bytes and rows_done < height:
+                rows = min(band_height, height - rows_done)
+                band, seed = _unfilter(png, seed, bytes(pending[:rows * stride]), rows)
+                del pending[:rows * stride]
+                rows_done += rows
+                yield band
+    pending += inflater.flush()
+    if rows_done < height:
+        rows = height - rows_done
+        if len(pending) < rows * stride:
+            raise ValueError("Truncated PNG image data")
+        band, _ = _unfilter(png, seed, bytes(pending[:rows * stride]), rows)
+        yield band
+
+
+def _unfilter(png: _PngInfo, seed: bytes, filtered: bytes, rows: int) -> Tuple[Image.Image, bytes]:
+    """Decode filtered scanlines with Pillow's PNG decoder; returns (band, last raw row)"""
+    seed_rows = 1 if seed else 0
+    # Stored (level 0) deflate: the data only needs framing for the decoder
+    data = zlib.compress((b'\x00' + seed if seed else b'') + filtered, 0)
+    image = Image.frombytes(png.mode, (png.width, rows + seed_rows), data, 'zip', png.mode)
+    # Sliced as bytes: crop() would apply the pixel limit to very wide bands
+    raw = image.tobytes()
+    row_bytes = png.width * png.channels
+    last = raw[-row_bytes:]
+    band = Image.frombytes(png.mode, (png.width, rows), raw[seed_rows * row_bytes:]) if seed_rows else image
+    if png.palette is not None and png.mode == 'P':
+        band.putpalette(png.palette)
+    if png.transparency is not None:
+        band.info['transparency'] = png.transparency
+    return band, last
+
+
+def _tile_mode(band: Image.Image, tile_format: str) -> Image.Image:
+    """Convert a band to a mode the tile format can store"""
+    has_alpha = band.mode in ('RGBA', 'LA', 'PA') or 'transparency' in band.info
+    if tile_format == 'jpeg':
+        return band if band.mode in ('RGB', 'L') else band.convert('RGB')
+    if band.mode in ('RGB', 'RGBA', 'L', 'LA'):
+        return band
+    return band.convert('RGBA' if has_alpha else 'RGB')
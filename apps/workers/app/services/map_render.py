@@ -0,0 +1,455 @@
+"""
+Server-side map rendering (SVG and tiled PNG).
+
+A ``MapScene`` collects what gets drawn: grid, obstacles, walls, tokens
+and party fog. Fog comes from the cached FogState when there is one,
+otherwise from the stored explored mask.
+
+SVG is produced as a stream of text chunks and written straight to a file
+or buffer. The grid is emitted as a few long ``<path>`` elements and fog
+as run-length merged rects (one path of hexes per column on hex maps), so
+even large maps never build one huge string. In PNG tiles on hex maps,
+every pixel takes the fog of the hex it falls in.
+
+PNG is rendered in fixed-size tiles. Each tile has a signature built from
+the items and fog cells that touch it. Tiles are cached per map (stamped
+with the map version that rendered them), and a later render only redraws
+tiles whose signature changed. When a token moves, only the tiles under
+its old and new positions are redrawn. The full PNG is encoded one tile
+row at a time, so no full-size canvas is ever allocated.
+
+Exports are written under MAP_EXPORT_DIR. Paths from callers are resolved
+against it and rejected if they escape it.
+"""
+from collections import OrderedDict
+from dataclasses import dataclass, field
+from typing import IO, Any, Dict, Iterator, List, Optional, Tuple, Union
+import io
+import math
+import os
+import struct
+import tempfile
+import zlib
+import numpy as np
+from app.services import export_store, hex_grid, map_cache
+from app.services.fog_of_war import decode_explored
+from app.services.map_grid import GridGeometry
+from app.services.token_index import index_for_map
+
+TILE_SIZE = 256
+TILE_CACHE_MAPS = 32
+EXPORT_DIR = os.getenv("MAP_EXPORT_DIR", os.path.join(tempfile.gettempdir(), "map-exports"))
+PNG_SIGNATURE = b'\x89PNG\r\n\x1a\n'
+
+COLORS = {
+    'background': '#f4efe1',
+    'grid': '#c8bfa8',
+    'obstacle': '#5b4a3a',
+    'wall': '#2b2118',
+    'door': '#8b5a2b',
+    'pc': '#2f6fb0',
+    'npc': '#4a8a3a',
+    'monster': '#b03a2e',
+    'fog': '#000000',
+}
+EXPLORED_FOG_ALPHA = 0.55
+
+Output = Union[str, IO]
+
+
+@dataclass
+class MapScene:
+    width: int
+    height: int
+    geometry: GridGeometry
+    obstacles: List[Tuple[float, float, float, float]]
+    walls: List[Tuple[float, float, float, float, str]]
+    tokens: List[Tuple[str, float, float, float, str]]  # id, cx, cy, radius, color
+    fog_cell: int = 50
+    visible: Optional[np.ndarray] = None
+    explored: Optional[np.ndarray] = None
+    signature: Tuple = field(default=())
+
+    @classmethod
+    def from_map(cls, map_data: Dict[str, Any]) -> 'MapScene':
+        grid_size = map_data.get('grid_size', 50)
+        grid_type = map_data.get('grid_type', 'square')
+        cols, rows = map_data.get('cols'), map_data.get('rows')
+        width, height = map_data.get('width'), map_data.get('height')
+        if cols and rows:
+            geometry = GridGeometry(grid_type, grid_size, cols, rows)
+        else:
+            geometry = GridGeometry.for_map(width, height, grid_size, grid_type)
+        default_width, default_height = geometry.pixel_size()
+        width = int(width or default_width)
+        height = int(height or default_height)
+
+        index = index_for_map(map_data)
+        kinds = {str(t.get('id', i)): t.get('owner_kind', 'npc') for i, t in enumerate(map_data.get('tokens', []))}
+        tokens = []
+        for token_id, (_, _, size) in sorted(index.positions().items()):
+            cx, cy = index.center(token_id, grid_size, grid_type)
+            tokens.append((token_id, cx, cy, size * grid_size * 0.42, COLORS.get(kinds.get(token_id), COLORS['npc'])))
+
+        fog = map_cache.peek(map_data, 'fog')
+        visible = explored = None
+        if fog is not None:
+            visible, explored = fog.visible, fog.explored
+        elif (isinstance(map_data.get('fog'), dict) and map_data['fog'].get('shape')
+              and map_data['fog'].get('grid_type', 'square') == grid_type):
+            # Stored fog has no live views: explored cells render as dimmed
+            explored = decode_explored(map_data['fog'], tuple(map_data['fog']['shape']))
+            visible = np.zeros_like(explored) if explored is not None else None
+
+        return cls(
+            width=width,
+            height=height,
+            geometry=geometry,
+            obstacles=[(o.get('x', 0), o.get('y', 0), o.get('width', 0), o.get('height', 0))
+                       for o in map_data.get('obstacles', [])],
+            walls=[(w['x1'], w['y1'], w['x2'], w['y2'], 'door' if w.get('door') else 'wall')
+                   for w in map_data.get('walls', []) if not (w.get('door') and w.get('open'))],
+            tokens=tokens,
+            fog_cell=grid_size,
+            visible=visible,
+            explored=explored,
+            signature=(width, height, geometry),
+        )
+
+    def tile_grid(self, tile_size: int) -> Tuple[int, int]:
+        return math.ceil(self.width / tile_size), math.ceil(self.height / tile_size)
+
+
+# --- SVG ----------------------------------------------------------------------
+
+def iter_svg(scene: MapScene) -> Iterator[str]:
+    """SVG document as a stream of chunks"""
+    yield (f'<svg xmlns="http://www.w3.org/2000/svg" width="{scene.width}" height="{scene.height}" '
+           f'viewBox="0 0 {scene.width} {scene.height}">\n')
+    yield f'<rect width="100%" height="100%" fill="{COLORS["background"]}"/>\n'
+
+    yield f'<g fill="none" stroke="{COLORS["grid"]}" stroke-width="1">\n'
+    g = scene.geometry
+    if g.grid_type == 'square':
+        yield '<path d="' + ''.join(f'M{c * g.grid_size} 0V{scene.height}' for c in range(g.cols + 1))
+        yield ''.join(f'M0 {r * g.grid_size}H{scene.width}' for r in range(g.rows + 1)) + '"/>\n'
+    else:
+        for col in range(g.cols):
+            yield '<path d="' + _hex_path(col, np.arange(g.rows), g.grid_size) + '"/>\n'
+    yield '</g>\n'
+
+    yield f'<g fill="{COLORS["obstacle"]}">\n'
+    for x, y, w, h in scene.obstacles:
+        yield f'<rect x="{x}" y="{y}" width="{w}" height="{h}"/>\n'
+    yield '</g>\n<g stroke-width="4" stroke-linecap="round">\n'
+    for x1, y1, x2, y2, kind in scene.walls:
+        yield f'<line x1="{x1}" y1="{y1}" x2="{x2}" y2="{y2}" stroke="{COLORS[kind]}"/>\n'
+    yield '</g>\n<g stroke="#ffffff" stroke-width="2">\n'
+    for token_id, cx, cy, radius, color in scene.tokens:
+        yield f'<circle id="token-{_xml_attr(token_id)}" cx="{cx:.1f}" cy="{cy:.1f}" r="{radius:.1f}" fill="{color}"/>\n'
+    yield '</g>\n'
+
+    if scene.explored is not None:
+        yield f'<g fill="{COLORS["fog"]}">\n'
+        cell = scene.fog_cell
+        for opacity, mask in ((1.0, ~scene.explored), (EXPLORED_FOG_ALPHA, scene.explored & ~scene.visible)):
+            if g.grid_type == 'hex':
+                for col in np.flatnonzero(mask.any(axis=0)).tolist():
+                    rows = np.flatnonzero(mask[:, col])
+                    yield f'<path fill-opacity="{opacity}" d="{_hex_path(col, rows, g.grid_size)}"/>\n'
+                continue
+            for row, start, end in _runs(mask):
+                yield (f'<rect x="{start * cell}" y="{row * cell}" width="{(end - start) * cell}" '
+                       f'height="{cell}" fill-opacity="{opacity}"/>\n')
+        yield '</g>\n'
+    yield '</svg>\n'
+
+
+def write_svg(scene: MapScene, output: Output) -> int:
+    """Stream the SVG to a path or text/binary file object; returns bytes written"""
+    with _open_output(output) as (stream, binary):
+        size = 0
+        for chunk in iter_svg(scene):
+            data = chunk.encode('utf-8')
+            stream.write(data if binary else chunk)
+            size += len(data)
+    return size
+
+
+# --- PNG tiles ------------------------------------------------------------------
+
+_tile_cache: 'OrderedDict[str, Dict[str, Any]]' = OrderedDict()
+
+
+def tile_signatures(scene: MapScene, tile_size: int = TILE_SIZE) -> Dict[Tuple[int, int], int]:
+    """Per-tile hash of everything drawn on it (items are bucketed once by bbox)"""
+    tiles_x, tiles_y = scene.tile_grid(tile_size)
+    buckets: Dict[Tuple[int, int], List] = {}
+
+    def add(item, x0, y0, x1, y1):
+        for ty in range(max(0, int(y0 // tile_size)), min(tiles_y - 1, int(y1 // tile_size)) + 1):
+            for tx in range(max(0, int(x0 // tile_size)), min(tiles_x - 1, int(x1 // tile_size)) + 1):
+                buckets.setdefault((tx, ty), []).append(item)
+
+    for o in scene.obstacles:
+        add(('o',) + o, o[0], o[1], o[0] + o[2], o[1] + o[3])
+    for w in scene.walls:
+        add(('w',) + w, min(w[0], w[2]) - 2, min(w[1], w[3]) - 2, max(w[0], w[2]) + 2, max(w[1], w[3]) + 2)
+    for t in scene.tokens:
+        add(('t',) + t, t[1] - t[3] - 1, t[2] - t[3] - 1, t[1] + t[3] + 1, t[2] + t[3] + 1)
+
+    signatures = {}
+    for ty in range(tiles_y):
+        for tx in range(tiles_x):
+            fog = b''
+            if scene.explored is not None:
+                fog = _fog_window(scene, tx * tile_size, ty * tile_size, tile_size)
+                fog = fog[0].tobytes() + fog[1].tobytes()
+            signatures[(tx, ty)] = hash((scene.signature, tuple(buckets.get((tx, ty), ())), fog))
+    return signatures
+
+
+def render_tile(scene: MapScene, tx: int, ty: int, tile_size: int = TILE_SIZE):
+    """Render one tile to a PIL image"""
+    from PIL import Image, ImageDraw
+
+    ox, oy = tx * tile_size, ty * tile_size
+    image = Image.new('RGB', (tile_size, tile_size), COLORS['background'])
+    draw = ImageDraw.Draw(image)
+    g = scene.geometry
+
+    if g.grid_type == 'square':
+        for x in range(-(ox % g.grid_size), tile_size + 1, g.grid_size):
+            draw.line([(x, 0), (x, tile_size)], fill=COLORS['grid'])
+        for y in range(-(oy % g.grid_size), tile_size + 1, g.grid_size):
+            draw.line([(0, y), (tile_size, y)], fill=COLORS['grid'])
+    else:
+        size = g.grid_size
+        row0, row1, col0, col1 = _hex_span(size, ox, oy, tile_size)
+        row1, col1 = min(g.rows, row1), min(g.cols, col1)
+        corners = _hex_corners(size)
+        for col in range(col0, col1):
+            for row in range(row0, row1):
+                cx, cy = hex_grid.offset_to_pixel(col, row, size)
+                draw.polygon([(float(cx) + dx - ox, float(cy) + dy - oy) for dx, dy in corners], outline=COLORS['grid'])
+
+    for x, y, w, h in scene.obstacles:
+        if x < ox + tile_size and x + w > ox and y < oy + tile_size and y + h > oy:
+            draw.rectangle([x - ox, y - oy, x + w - ox, y + h - oy], fill=COLORS['obstacle'])
+    for x1, y1, x2, y2, kind in scene.walls:
+        draw.line([(x1 - ox, y1 - oy), (x2 - ox, y2 - oy)], fill=COLORS[kind], width=4)
+    for _, cx, cy, radius, color in scene.tokens:
+        if abs(cx - ox - tile_size / 2) <= tile_size / 2 + radius and abs(cy - oy - tile_size / 2) <= tile_size / 2 + radius:
+            draw.ellipse([cx - radius - ox, cy - radius - oy, cx + radius - ox, cy + radius - oy],
+                         fill=color, outline='#ffffff', width=2)
+
+    if scene.explored is not None:
+        image = _apply_fog(scene, image, ox, oy, tile_size)
+    return image
+
+
+def render_png(
+    map_data: Dict[str, Any],
+    output: Output,
+    tile_size: int = TILE_SIZE,
+    scene: Optional[MapScene] = None
+) -> Dict[str, Any]:
+    """
+    Render the map to one PNG, reusing cached tiles that are unchanged
+
+    Returns:
+        Bytes written plus how many tiles were rendered vs reused
+    """
+    scene = scene or MapScene.from_map(map_data)
+    tiles, rendered = cached_tiles(map_data, scene, tile_size)
+    with _open_output(output, binary=True) as (stream, _):
+        size = _write_png(stream, scene.width, scene.height, _tile_bands(scene, tiles, tile_size))
+    return {'size': size, 'tiles': len(tiles), 'rendered': rendered, 'reused': len(tiles) - rendered}
+
+
+def cached_tiles(map_data: Dict[str, Any], scene: MapScene, tile_size: int = TILE_SIZE) -> Tuple[Dict[Tuple[int, int], bytes], int]:
+    """PNG bytes for every tile, re-rendering only dirty ones; returns (tiles, rendered count)"""
+    key = f"{map_data.get('id')}:{tile_size}" if map_data.get('id') is not None else None
+    entry = _tile_cache.get(key) if key is not None else None
+    previous = entry['tiles'] if entry else {}
+
+    tiles: Dict[Tuple[int, int], Tuple[int, bytes]] = {}
+    rendered = 0
+    for position, signature in tile_signatures(scene, tile_size).items():
+        old = previous.get(position)
+        if old is not None and old[0] == signature:
+            tiles[position] = old
+            continue
+        buffer = io.BytesIO()
+        render_tile(scene, *position, tile_size).save(buffer, format='PNG')
+        tiles[position] = (signature, buffer.getvalue())
+        rendered += 1
+
+    if key is not None:
+        _tile_cache[key] = {'version': map_data.get('version'), 'tiles': tiles}
+        _tile_cache.move_to_end(key)
+        while len(_tile_cache) > TILE_CACHE_MAPS:
+            _tile_cache.popitem(last=False)
+    return {position: png for position, (_, png) in tiles.items()}, rendered
+
+
+def clear_tile_cache() -> None:
+    _tile_cache.clear()
+
+
+def export_path(map_data: Dict[str, Any], extension: str) -> str:
+    """Default file for an export under MAP_EXPORT_DIR"""
+    os.makedirs(EXPORT_DIR, exist_ok=True)
+    name = export_store.safe_name(f"map-{map_data.get('id', 'anonymous')}-v{map_data.get('version', 0)}")
+    return os.path.join(EXPORT_DIR, f"{name}.{extension}")
+
+
+def export_target(path: str) -> str:
+    """A caller-supplied export path, confined to MAP_EXPORT_DIR"""
+    os.makedirs(EXPORT_DIR, exist_ok=True)
+    return export_store.confined_path(EXPORT_DIR, path)
+
+
+# --- Helpers --------------------------------------------------------------------
+
+class _open_output:
+    """Context manager yielding (stream, is_binary) for a path or file object"""
+
+    def __init__(self, output: Output, binary: bool = False):
+        self.output = output
+        self.binary = binary
+        self.owned = None
+
+    def __enter__(self):
+        if isinstance(self.output, (str, os.PathLike)):
+            self.owned = open(self.output, 'wb')
+            return self.owned, True
+        return self.output, self.binary or isinstance(self.output, (io.BufferedIOBase, io.RawIOBase))
+
+    def __exit__(self, *exc):
+        if self.owned is not None:
+            self.owned.close()
+        return False
+
+
+def _tile_bands(scene: MapScene, tiles: Dict[Tuple[int, int], bytes], tile_size: int) -> Iterator[np.ndarray]:
+    """The image as RGB row bands of one tile row each, stitched from the tile PNGs"""
+    from PIL import Image
+
+    tiles_x, tiles_y = scene.tile_grid(tile_size)
+    for ty in range(tiles_y):
+        height = min(tile_size, scene.height - ty * tile_size)
+        band = np.empty((height, scene.width, 3), dtype=np.uint8)
+        for tx in range(tiles_x):
+            x = tx * tile_size
+            width = min(tile_size, scene.width - x)
+            tile = np.asarray(Image.open(io.BytesIO(tiles[(tx, ty)])).convert('RGB'))
+            band[:, x:x + width] = tile[:height, :width]
+        yield band
+
+
+def _write_png(stream: IO, width: int, height: int, bands: Iterator[np.ndarray]) -> int:
+    """8-bit RGB PNG from row bands, deflated as they arrive; returns bytes written"""
+    stream.write(PNG_SIGNATURE)
+    size = len(PNG_SIGNATURE)
+    size += _png_chunk(stream, b'IHDR', struct.pack('>IIBBBBB', width, height, 8, 2, 0, 0, 0))
+    compressor = zlib.compressobj(6)
+    for band in bands:
+        # Sub filter: each byte minus the same channel of the pixel to its left
+        filtered = band.copy()
+        filtered[:, 1:] -= band[:, :-1]
+        rows = np.empty((band.shape[0], 1 + width * 3), dtype=np.uint8)
+        rows[:, 0] = 1
+        rows[:, 1:] = filtered.reshape(band.shape[0], -1)
+        data = compressor.compress(rows.tobytes())
+        if data:
+            size += _png_chunk(stream, b'IDAT', data)
+    size += _png_chunk(stream, b'IDAT', compressor.flush())
+    return size + _png_chunk(stream, b'IEND', b'')
+
+
+def _png_chunk(stream: IO, kind: bytes, data: bytes) -> int:
+    stream.write(struct.pack('>I', len(data)) + kind)
+    stream.write(data)
+    stream.write(struct.pack('>I', zlib.crc32(data, zlib.crc32(kind))))
+    return 12 + len(data)
+
+
+def _runs(mask: np.ndarray) -> Iterator[Tuple[int, int, int]]:
+    """(row, start, end) runs of True cells, row by row"""
+    for row in np.flatnonzero(mask.any(axis=1)).tolist():
+        padded = np.concatenate(([False], mask[row], [False]))
+        edges = np.flatnonzero(padded[1:] != padded[:-1])
+        for start, end in zip(edges[::2].tolist(), edges[1::2].tolist()):
+            yield row, start, end
+
+
+def _hex_corners(size: float) -> List[Tuple[float, float]]:
+    return [(size * math.cos(i * math.pi / 3), size * math.sin(i * math.pi / 3)) for i in range(6)]
+
+
+def _hex_path(col: int, rows: np.ndarray, size: float) -> str:
+    """SVG path data outlining the hexes ``rows`` of one column"""
+    xs, ys = hex_grid.offset_to_pixel(col, rows, size)
+    corners = _hex_corners(size)
+    return ''.join(
+        'M' + 'L'.join(f'{x + dx:.1f} {y + dy:.1f}' for dx, dy in corners) + 'Z'
+        for x, y in zip(np.broadcast_to(xs, ys.shape).tolist(), ys.tolist())
+    )
+
+
+def _hex_span(size: float, ox: int, oy: int, tile_size: int) -> Tuple[int, int, int, int]:
+    """(row0, row1, col0, col1) of the hexes that can touch a tile (upper bounds unclipped)"""
+    col0 = max(0, int((ox - size) // (1.5 * size)))
+    col1 = int((ox + tile_size + size) // (1.5 * size)) + 1
+    row0 = max(0, int((oy - size) // (hex_grid.SQRT3 * size)) - 1)
+    row1 = int((oy + tile_size + size) // (hex_grid.SQRT3 * size)) + 1
+    return row0, row1, col0, col1
+
+
+def _fog_window(scene: MapScene, ox: int, oy: int, tile_size: int) -> Tuple[np.ndarray, np.ndarray]:
+    """Explored and visible fog cells under a tile (the hexes touching it on hex maps)"""
+    if scene.geometry.grid_type == 'hex':
+        r0, r1, c0, c1 = _hex_span(scene.geometry.grid_size, ox, oy, tile_size)
+    else:
+        cell = scene.fog_cell
+        r0, r1 = oy // cell, (oy + tile_size - 1) // cell + 1
+        c0, c1 = ox // cell, (ox + tile_size - 1) // cell + 1
+    return scene.explored[r0:r1, c0:c1], scene.visible[r0:r1, c0:c1]
+
+
+def _fog_alpha(explored: np.ndarray, visible: np.ndarray) -> np.ndarray:
+    return np.where(explored, np.where(visible, 0, int(255 * EXPLORED_FOG_ALPHA)), 255).astype(np.uint8)
+
+
+def _hex_fog_pixels(scene: MapScene, ox: int, oy: int, tile_size: int) -> np.ndarray:
+    """Fog alpha for every pixel of a tile on a hex map, from the hex the pixel falls in"""
+    ys, xs = np.mgrid[oy:oy + tile_size, ox:ox + tile_size] + 0.5
+    cols, rows = hex_grid.pixel_to_offset(xs, ys, scene.geometry.grid_size)
+    height, width = scene.explored.shape
+    inside = (cols >= 0) & (cols < width) & (rows >= 0) & (rows < height)
+    # Pixels outside the hex grid stay hidden
+    alpha = np.full(cols.shape, 255, dtype=np.uint8)
+    alpha[inside] = _fog_alpha(scene.explored[rows[inside], cols[inside]], scene.visible[rows[inside], cols[inside]])
+    return alpha
+
+
+def _apply_fog(scene: MapScene, image, ox: int, oy: int, tile_size: int):
+    from PIL import Image
+
+    if scene.geometry.grid_type == 'hex':
+        per_pixel = _hex_fog_pixels(scene, ox, oy, tile_size)
+    else:
+        alpha = _fog_alpha(*_fog_window(scene, ox, oy, tile_size))
+        # Cells outside the fog raster stay hidden
+        cell = scene.fog_cell
+        full = np.full(((tile_size + oy % cell) // cell + 1, (tile_size + ox % cell) // cell + 1), 255, dtype=np.uint8)
+        full[:alpha.shape[0], :alpha.shape[1]] = alpha
+        per_pixel = np.repeat(np.repeat(full, cell, axis=0), cell, axis=1)
+        per_pixel = per_pixel[oy % cell:oy % cell + tile_size, ox % cell:ox % cell + tile_size]
+    shade = Image.new('RGB', image.size, COLORS['fog'])
+    return Image.composite(shade, image, Image.fromarray(np.ascontiguousarray(per_pixel), mode='L'))
+
+
+def _xml_attr(value: str) -> str:
+    return value.replace('&', '&amp;').replace('"', '&quot;').replace('<', '&lt;')
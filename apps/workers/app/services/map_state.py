@@ -0,0 +1,389 @@
+"""
+Versioned map state shared by the map workers.
+
+Callers sync a map once (``sync_map_state``) and afterwards send a
+reference ``{'id': map_id, 'version': n}`` instead of the full
+``map_data``. Changes travel as small deltas:
+
+    {'op': 'move_token', 'token_id': 't1', 'grid_x': 4, 'grid_y': 7}
+    {'op': 'add_token', 'token': {...}}          {'op': 'remove_token', 'token_id': 't1'}
+    {'op': 'add_wall', 'wall': {'id', ...}}      {'op': 'remove_wall', 'wall_id': 'w1'}
+    {'op': 'set_door', 'wall_id': 'w1', 'open': True}
+    {'op': 'add_obstacle', 'obstacle': {...}}    {'op': 'remove_obstacle', 'obstacle_id': 'o1'}
+    {'op': 'set', 'key': 'difficult_terrain', 'value': [...]}
+
+Redis holds the authoritative state for each map:
+- ``map:{id}:version``: the current version.
+- ``map:{id}:snapshot``: the full map JSON at ``map:{id}:snapshot_version``.
+- ``map:{id}:log``: one entry of deltas per version after the snapshot.
+
+A commit is a compare-and-set on the version, so two workers can never
+apply changes on top of the same version. Every SNAPSHOT_EVERY versions,
+the committing worker writes a new snapshot and trims the log.
+
+Each worker keeps recently served maps in memory. A reference to the
+version it holds costs no Redis round-trip. A newer version is reached by
+replaying only the missing log entries. Derived structures in
+``map_cache`` are keyed by the same (map_id, version).
+"""
+from collections import OrderedDict
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+import json
+import os
+from app.services import map_cache
+
+REDIS_URL = os.getenv("MAP_STATE_REDIS_URL", os.getenv("REDIS_URL", "redis://localhost:6379/0"))
+MAP_STATE_TTL = int(os.getenv("MAP_STATE_TTL", str(7 * 24 * 3600)))
+SNAPSHOT_EVERY = 100
+SNAPSHOT_RETRIES = 3
+LOCAL_MAPS = 64
+
+TOKEN_OPS = ('move_token', 'add_token', 'remove_token')
+GEOMETRY_OPS = ('add_wall', 'remove_wall', 'set_door', 'add_obstacle', 'remove_obstacle')
+DELTA_OPS = TOKEN_OPS + GEOMETRY_OPS + ('set',)
+GEOMETRY_KEYS = ('walls', 'obstacles')
+
+# KEYS: version, log, snapshot, snapshot_version; ARGV: expected version, entry, ttl
+# Every key of the map gets a fresh TTL, so an active map never loses its
+# snapshot between two snapshot writes
+_COMMIT = """
+local current = tonumber(redis.call('GET', KEYS[1]))
+if current == nil then return {-1, 0} end
+if current ~= tonumber(ARGV[1]) then return {-2, current} end
+local length = redis.call('RPUSH', KEYS[2], ARGV[2])
+redis.call('SET', KEYS[1], current + 1, 'EX', ARGV[3])
+redis.call('EXPIRE', KEYS[2], ARGV[3])
+redis.call('EXPIRE', KEYS[3], ARGV[3])
+redis.call('EXPIRE', KEYS[4], ARGV[3])
+return {current + 1, length}
+"""
+
+# KEYS: snapshot_version, log; ARGV: after
+# Log entry i is version snapshot_version + 1 + i; reading both in one script
+# keeps the index right while another worker trims the log
+_LOG_AFTER = """
+local base = tonumber(redis.call('GET', KEYS[1]) or '0')
+return redis.call('LRANGE', KEYS[2], math.max(0, tonumber(ARGV[1]) - base), -1)
+"""
+
+# KEYS: snapshot, snapshot_version, log, version; ARGV: version, snapshot, ttl
+_SNAPSHOT = """
+local snapshot_version = tonumber(redis.call('GET', KEYS[2]) or '0')
+local version = tonumber(ARGV[1])
+if version <= snapshot_version then return 0 end
+redis.call('SET', KEYS[1], ARGV[2], 'EX', ARGV[3])
+redis.call('SET', KEYS[2], version, 'EX', ARGV[3])
+redis.call('LTRIM', KEYS[3], version - snapshot_version, -1)
+redis.call('EXPIRE', KEYS[4], ARGV[3])
+return 1
+"""
+
+# KEYS: version, snapshot, snapshot_version, log; ARGV: requested version, snapshot, ttl
+_SYNC = """
+local current = tonumber(redis.call('GET', KEYS[1]) or '-1')
+local version = math.max(tonumber(ARGV[1]), current + 1)
+redis.call('SET', KEYS[1], version, 'EX', ARGV[3])
+redis.call('SET', KEYS[2], ARGV[2], 'EX', ARGV[3])
+redis.call('SET', KEYS[3], version, 'EX', ARGV[3])
+redis.call('DEL', KEYS[4])
+return version
+"""
+
+
+class MapVersionConflict(Exception):
+    """The referenced version is not the map's current version"""
+
+    def __init__(self, map_id: str, version: Any, current: Optional[int]):
+        super().__init__(f"Map {map_id} is at version {current}, not {version}")
+        self.map_id = map_id
+        self.version = version
+        self.current = current
+
+
+class MapNotSynced(LookupError):
+    """No state is stored for this map (never synced, or expired)"""
+
+
+_local: 'OrderedDict[str, Dict[str, Any]]' = OrderedDict()
+_redis = None
+_scripts: Dict[str, Any] = {}
+
+
+def is_reference(map_data: Dict[str, Any]) -> bool:
+    """Whether ``map_data`` is a bare {'id', 'version'} reference"""
+    return map_data.get('id') is not None and set(map_data) <= {'id', 'version'}
+
+
+def resolve(map_data: Dict[str, Any]) -> Dict[str, Any]:
+    """Full map for a reference; full ``map_data`` is returned unchanged"""
+    if not is_reference(map_data):
+        return map_data
+    return load(str(map_data['id']), map_data.get('version'))
+
+
+def load(map_id: str, version: Optional[int] = None) -> Dict[str, Any]:
+    """
+    Map state at ``version`` (default: latest)
+
+    The returned dict is this worker's shared copy: read it, and change it
+    only through ``commit``.
+
+    Raises:
+        MapVersionConflict: ``version`` is older than the stored state or
+            newer than any committed version
+        MapNotSynced: Nothing is stored for ``map_id``
+    """
+    local = _local.get(map_id)
+    if local is not None:
+        if version is not None and local['version'] == version:
+            _local.move_to_end(map_id)
+            return local
+        if version is not None and version < local['version']:
+            raise MapVersionConflict(map_id, version, local['version'])
+        entries = _log_entries(map_id, after=local['version'])
+        if not entries or entries[0]['version'] == local['version'] + 1:
+            # Catch up by replaying only what this worker has not seen
+            _replay(local, entries, version)
+            if version is None or local['version'] == version:
+                _local.move_to_end(map_id)
+                return local
+            raise MapVersionConflict(map_id, version, local['version'])
+
+    for _ in range(SNAPSHOT_RETRIES):
+        snapshot, snapshot_version = _snapshot(map_id)
+        if version is not None and version < snapshot_version:
+            raise MapVersionConflict(map_id, version, _current_version(map_id))
+        entries = _log_entries(map_id, after=snapshot_version)
+        # A newer snapshot written in between trimmed the log: read it instead
+        if not entries or entries[0]['version'] == snapshot_version + 1:
+            break
+    else:
+        raise MapVersionConflict(map_id, version, _current_version(map_id))
+    map_data = json.loads(snapshot)
+    map_data['id'] = map_id
+    map_data['version'] = snapshot_version
+    _replay(map_data, entries, version)
+    if version is not None and map_data['version'] != version:
+        raise MapVersionConflict(map_id, version, map_data['version'])
+    _remember(map_id, map_data)
+    return map_data
+
+
+def sync(map_data: Dict[str, Any]) -> int:
+    """
+    Store a full map as the new state and return its version
+
+    The version is never lower than one already stored, so cached
+    structures for older content are never reused.
+    """
+    map_id = str(map_data['id'])
+    content = {k: v for k, v in map_data.items() if k not in ('id', 'version')}
+    keys = _keys(map_id)
+    version = int(_script('sync')(
+        keys=[keys['version'], keys['snapshot'], keys['snapshot_version'], keys['log']],
+        args=[int(map_data.get('version') or 0), json.dumps(content), MAP_STATE_TTL],
+    ))
+    _remember(map_id, {**content, 'id': map_id, 'version': version})
+    return version
+
+
+def commit(
+    map_data: Dict[str, Any],
+    deltas: List[Dict[str, Any]],
+    updated: Optional[Dict[str, Any]] = None,
+    invalidate: Optional[Iterable[str]] = None
+) -> int:
+    """
+    Apply deltas on top of ``map_data``'s version and return the new version
+
+    Args:
+        map_data: Current state as returned by ``load``/``resolve``
+        deltas: Changes to apply, in order
+        updated: Cached structures already updated in place for the deltas
+        invalidate: Cached kinds the deltas make stale (default: derived
+            from the delta ops, minus ``updated``)
+
+    Raises:
+        MapVersionConflict: Another change was committed first. Structures
+            updated in place for this version are dropped.
+    """
+    for delta in deltas:
+        check_delta(map_data, delta)
+    map_id, version = str(map_data['id']), int(map_data['version'])
+    keys = _keys(map_id)
+    entry = json.dumps({'version': version + 1, 'deltas': deltas})
+    new_version, length = _script('commit')(
+        keys=[keys['version'], keys['log'], keys['snapshot'], keys['snapshot_version']],
+        args=[version, entry, MAP_STATE_TTL],
+    )
+    if new_version == -1:
+        raise MapNotSynced(f"Map {map_id} has no stored state")
+    if new_version == -2:
+        map_cache.discard(map_data)
+        raise MapVersionConflict(map_id, version, int(length))
+
+    if invalidate is None:
+        invalidate = [kind for kind in stale_kinds(deltas) if kind not in (updated or {})]
+    apply_deltas(map_data, deltas)
+    map_cache.advance(map_data, updated=updated, invalidate=invalidate)
+    map_data['version'] = int(new_version)
+    _remember(map_id, map_data)
+
+    if length >= SNAPSHOT_EVERY:
+        content = {k: v for k, v in map_data.items() if k not in ('id', 'version')}
+        _script('snapshot')(
+            keys=[keys['snapshot'], keys['snapshot_version'], keys['log'], keys['version']],
+            args=[new_version, json.dumps(content), MAP_STATE_TTL],
+        )
+    return int(new_version)
+
+
+def check_delta(map_data: Dict[str, Any], delta: Dict[str, Any]) -> None:
+    """Raise ValueError if ``delta`` cannot be applied to ``map_data``"""
+    op = delta.get('op')
+    if op not in DELTA_OPS:
+        raise ValueError(f"Unsupported map delta: {op}")
+    if op in ('move_token', 'remove_token'):
+        find_token(map_data, delta['token_id'])
+    elif op in ('remove_wall', 'set_door'):
+        _find(map_data.get('walls', []), delta['wall_id'], 'wall')
+    elif op == 'remove_obstacle':
+        _find(map_data.get('obstacles', []), delta['obstacle_id'], 'obstacle')
+    elif op == 'set' and delta.get('key') in ('id', 'version', 'tokens'):
+        raise ValueError(f"Map key cannot be set by a delta: {delta.get('key')}")
+
+
+def apply_deltas(map_data: Dict[str, Any], deltas: Iterable[Dict[str, Any]]) -> None:
+    """Apply deltas to map content in place (the version is not changed)"""
+    for delta in deltas:
+        op = delta['op']
+        if op == 'move_token':
+            token = find_token(map_data, delta['token_id'])
+            if 'grid_x' in delta:
+                token['grid_x'], token['grid_y'] = delta['grid_x'], delta['grid_y']
+            else:
+                token.pop('grid_x', None)
+                token.pop('grid_y', None)
+            for key in ('x', 'y'):
+                if key in delta:
+                    token[key] = delta[key]
+        elif op == 'add_token':
+            map_data.setdefault('tokens', []).append(delta['token'])
+        elif op == 'remove_token':
+            map_data['tokens'].remove(find_token(map_data, delta['token_id']))
+        elif op == 'add_wall':
+            map_data.setdefault('walls', []).append(delta['wall'])
+        elif op == 'remove_wall':
+            map_data['walls'].remove(_find(map_data['walls'], delta['wall_id'], 'wall'))
+        elif op == 'set_door':
+            _find(map_data['walls'], delta['wall_id'], 'wall')['open'] = bool(delta['open'])
+        elif op == 'add_obstacle':
+            map_data.setdefault('obstacles', []).append(delta['obstacle'])
+        elif op == 'remove_obstacle':
+            map_data['obstacles'].remove(_find(map_data['obstacles'], delta['obstacle_id'], 'obstacle'))
+        elif op == 'set':
+            map_data[delta['key']] = delta['value']
+
+
+def changes_geometry(delta: Dict[str, Any]) -> bool:
+    return delta['op'] in GEOMETRY_OPS or (delta['op'] == 'set' and delta.get('key') in GEOMETRY_KEYS)
+
+
+def stale_kinds(deltas: Iterable[Dict[str, Any]]) -> List[str]:
+    """Cached structure kinds made stale by ``deltas``"""
+    kinds = set()
+    for delta in deltas:
+        if delta['op'] in TOKEN_OPS:
+            kinds.update(('tokens', 'fog', 'reach'))
+        elif changes_geometry(delta):
+            kinds.update(('obstacles', 'terrain', 'fog', 'reach'))
+        elif delta.get('key') == 'difficult_terrain':
+            kinds.update(('terrain', 'reach'))
+        elif delta.get('key') == 'fog':
+            kinds.add('fog')
+    return sorted(kinds)
+
+
+def find_token(map_data: Dict[str, Any], token_id: Any) -> Dict[str, Any]:
+    for i, token in enumerate(map_data.get('tokens', [])):
+        if str(token.get('id', i)) == str(token_id):
+            return token
+    raise ValueError(f"Unknown token: {token_id}")
+
+
+def clear_local_state() -> None:
+    _local.clear()
+
+
+# --- Internals ------------------------------------------------------------------
+
+def _find(items: List[Dict[str, Any]], item_id: Any, kind: str) -> Dict[str, Any]:
+    for item in items:
+        if str(item.get('id')) == str(item_id):
+            return item
+    raise ValueError(f"Unknown {kind}: {item_id}")
+
+
+def _replay(map_data: Dict[str, Any], entries: List[Dict[str, Any]], up_to: Optional[int]) -> None:
+    """Apply logged entries in order, stopping after version ``up_to``"""
+    for entry in entries:
+        if up_to is not None and entry['version'] > up_to:
+            break
+        apply_deltas(map_data, entry['deltas'])
+        map_cache.advance(map_data, invalidate=stale_kinds(entry['deltas']))
+        map_data['version'] = entry['version']
+
+
+def _remember(map_id: str, map_data: Dict[str, Any]) -> None:
+    _local[map_id] = map_data
+    _local.move_to_end(map_id)
+    while len(_local) > LOCAL_MAPS:
+        _local.popitem(last=False)
+
+
+def _keys(map_id: str) -> Dict[str, str]:
+    # Hash tag keeps every key of a map in one cluster slot (scripts need that)
+    prefix = f"map:{{{map_id}}}"
+    return {
+        'version': f"{prefix}:version",
+        'snapshot': f"{prefix}:snapshot",
+        'snapshot_version': f"{prefix}:snapshot_version",
+        'log': f"{prefix}:log",
+    }
+
+
+def _snapshot(map_id: str) -> Tuple[str, int]:
+    keys = _keys(map_id)
+    snapshot, version = _client().mget(keys['snapshot'], keys['snapshot_version'])
+    if snapshot is None or version is None:
+        raise MapNotSynced(f"Map {map_id} has no stored state")
+    return snapshot, int(version)
+
+
+def _current_version(map_id: str) -> Optional[int]:
+    version = _client().get(_keys(map_id)['version'])
+    return None if version is None else int(version)
+
+
+def _log_entries(map_id: str, after: int) -> List[Dict[str, Any]]:
+    """Logged entries newer than ``after``, oldest first"""
+    keys = _keys(map_id)
+    raw_entries = _script('log_after')(keys=[keys['snapshot_version'], keys['log']], args=[after])
+    entries = [json.loads(raw) for raw in raw_entries]
+    return [entry for entry in entries if entry['version'] > after]
+
+
+def _client():
+    global _redis
+    if _redis is None:
+        # Imported on first use: only tasks sent map references need Redis
+        import redis
+        _redis = redis.Redis.from_url(REDIS_URL)
+    return _redis
+
+
+def _script(name: str):
+    if name not in _scripts:
+        source = {'commit': _COMMIT, 'log_after': _LOG_AFTER, 'snapshot': _SNAPSHOT, 'sync': _SYNC}[name]
+        _scripts[name] = _client().register_script(source)
+    return _scripts[name]
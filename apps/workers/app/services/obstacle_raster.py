@@ -0,0 +1,266 @@
+"""
+Obstacle raster and grid-traversal line of sight.
+
+Obstacle rectangles and wall segments are rasterized once per map version
+into a boolean grid aligned with the map's cells. Line of sight then walks
+the cells a ray crosses (Amanatides-Woo DDA), so each query costs the ray's
+length in cells, whatever the number of obstacles. ``visible_from`` traces many
+rays at once by stepping all of them together with NumPy.
+
+A cell counts as blocked if any part of an obstacle covers it. Cells
+outside the raster are open. Walls flagged as open doors are skipped.
+
+The raster's cells are ``grid_size`` pixel squares laid over the map's
+whole pixel extent, which on hex maps is wider and taller than cols x rows
+squares, so rays are traced in pixel space on either grid. Movement on hex
+maps needs hex cells instead: ``hex_rect_cells`` and ``hex_segment_cells``
+sample a rect or segment at a fraction of a hex and map each sample to its
+odd-q cell with ``hex_grid.pixel_to_offset``; ``hex_blocked`` collects them
+into a ``blocked[row, col]`` grid of hexes.
+"""
+import math
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+import numpy as np
+from app.services import hex_grid
+from app.services.map_cache import cached
+from app.services.map_grid import GridGeometry
+
+Cell = Tuple[int, int]
+
+
+class ObstacleRaster:
+    """Boolean ``blocked[row, col]`` grid with ``cell_size`` pixels per cell"""
+    __slots__ = ('blocked', 'cell_size')
+
+    def __init__(self, blocked: np.ndarray, cell_size: float):
+        self.blocked = blocked
+        self.cell_size = cell_size
+
+    @classmethod
+    def from_map(cls, map_data: Dict[str, Any]) -> 'ObstacleRaster':
+        """Rasterize ``map_data['obstacles']`` (pixel rects) and ``map_data['walls']`` (segments)"""
+        cell_size = map_data.get('grid_size', 50)
+        obstacles = map_data.get('obstacles', [])
+        walls = closed_walls(map_data)
+
+        cols, rows = map_data.get('cols'), map_data.get('rows')
+        width, height = map_data.get('width'), map_data.get('height')
+        if cols and rows:
+            width, height = GridGeometry(map_data.get('grid_type', 'square'), cell_size, cols, rows).pixel_size()
+        if width and height:
+            cols, rows = math.ceil(width / cell_size), math.ceil(height / cell_size)
+        else:
+            # Size the raster to the geometry when the map size is unknown
+            right = [o.get('x', 0) + o.get('width', 0) for o in obstacles] + [max(w['x1'], w['x2']) for w in walls]
+            bottom = [o.get('y', 0) + o.get('height', 0) for o in obstacles] + [max(w['y1'], w['y2']) for w in walls]
+            cols = int(max(right, default=0) // cell_size) + 1
+            rows = int(max(bottom, default=0) // cell_size) + 1
+
+        blocked = np.zeros((rows, cols), dtype=bool)
+        fill_rects(blocked, obstacles, cell_size, True)
+        for w in walls:
+            for col, row in traverse(w['x1'] / cell_size, w['y1'] / cell_size, w['x2'] / cell_size, w['y2'] / cell_size):
+                if 0 <= row < rows and 0 <= col < cols:
+                    blocked[row, col] = True
+        return cls(blocked, cell_size)
+
+    @property
+    def shape(self) -> Tuple[int, int]:
+        return self.blocked.shape
+
+    def is_blocked(self, col: int, row: int) -> bool:
+        rows, cols = self.blocked.shape
+        return 0 <= row < rows and 0 <= col < cols and bool(self.blocked[row, col])
+
+    def first_blocked(self, x0: float, y0: float, x1: float, y1: float) -> Optional[Cell]:
+        """First blocked cell on the pixel segment (x0, y0)-(x1, y1), or None if clear"""
+        cs = self.cell_size
+        for col, row in traverse(x0 / cs, y0 / cs, x1 / cs, y1 / cs):
+            if self.is_blocked(col, row):
+                return col, row
+        return None
+
+    def visible_from(self, x0: float, y0: float, targets: np.ndarray) -> np.ndarray:
+        """
+        Line of sight from one pixel point to many
+
+        Args:
+            x0, y0: Viewer position in pixels
+            targets: (N, 2) array of target pixel positions
+
+        Returns:
+            (N,) bool array, True where the ray is unobstructed
+        """
+        targets = np.asarray(targets, dtype=np.float64).reshape(-1, 2)
+        n = len(targets)
+        if not n:
+            return np.zeros(0, dtype=bool)
+
+        cs = self.cell_size
+        rows, cols = self.blocked.shape
+        sx, sy = x0 / cs, y0 / cs
+        ex, ey = targets[:, 0] / cs, targets[:, 1] / cs
+        col = np.full(n, math.floor(sx), dtype=np.int64)
+        row = np.full(n, math.floor(sy), dtype=np.int64)
+        end_col, end_row = np.floor(ex).astype(np.int64), np.floor(ey).astype(np.int64)
+        step_x, step_y = np.sign(end_col - col), np.sign(end_row - row)
+        t_max_x, t_delta_x = _dda_setup(sx, ex - sx, col, step_x)
+        t_max_y, t_delta_y = _dda_setup(sy, ey - sy, row, step_y)
+
+        remaining = np.abs(end_col - col) + np.abs(end_row - row)
+        clear = np.ones(n, dtype=bool)
+        for _ in range(int(remaining.max()) + 1):
+            active = clear & (remaining >= 0)
+            if not active.any():
+                break
+            inside = active & (row >= 0) & (row < rows) & (col >= 0) & (col < cols)
+            hit = np.zeros(n, dtype=bool)
+            hit[inside] = self.blocked[row[inside], col[inside]]
+            clear &= ~hit
+
+            # Step along whichever axis crosses its next cell boundary first
+            move_x = ((t_max_x < t_max_y) & (col != end_col)) | (row == end_row)
+            move_y = ~move_x
+            col = np.where(move_x, col + step_x, col)
+            t_max_x = np.where(move_x, t_max_x + t_delta_x, t_max_x)
+            row = np.where(move_y, row + step_y, row)
+            t_max_y = np.where(move_y, t_max_y + t_delta_y, t_max_y)
+            remaining -= 1
+        return clear
+
+
+def traverse(x0: float, y0: float, x1: float, y1: float) -> Iterator[Cell]:
+    """Cells crossed by a segment given in cell units, start to end (DDA)"""
+    col, row = math.floor(x0), math.floor(y0)
+    end_col, end_row = math.floor(x1), math.floor(y1)
+    dx, dy = x1 - x0, y1 - y0
+    step_x = (end_col > col) - (end_col < col)
+    step_y = (end_row > row) - (end_row < row)
+    t_delta_x = abs(1 / dx) if dx else math.inf
+    t_delta_y = abs(1 / dy) if dy else math.inf
+    t_max_x = ((col + (step_x > 0)) - x0) / dx if step_x else math.inf
+    t_max_y = ((row + (step_y > 0)) - y0) / dy if step_y else math.inf
+
+    yield col, row
+    for _ in range(abs(end_col - col) + abs(end_row - row)):
+        if (t_max_x < t_max_y and col != end_col) or row == end_row:
+            col += step_x
+            t_max_x += t_delta_x
+        else:
+            row += step_y
+            t_max_y += t_delta_y
+        yield col, row
+
+
+def closed_walls(map_data: Dict[str, Any]) -> List[Dict[str, Any]]:
+    """Walls that block, i.e. all but open doors"""
+    return [w for w in map_data.get('walls', []) if not (w.get('door') and w.get('open'))]
+
+
+def hex_rect_cells(rect: Dict[str, Any], size: float) -> Tuple[np.ndarray, np.ndarray]:
+    """Odd-q (cols, rows) of the hexes a pixel rect (x, y, width, height) overlaps, with repeats"""
+    x, y = rect.get('x', 0), rect.get('y', 0)
+    xs = _samples(x, x + rect.get('width', 0), size / 4)
+    ys = _samples(y, y + rect.get('height', 0), size / 4)
+    gx, gy = np.meshgrid(xs, ys)
+    return hex_grid.pixel_to_offset(gx.ravel(), gy.ravel(), size)
+
+
+def hex_segment_cells(x1: float, y1: float, x2: float, y2: float, size: float) -> Tuple[np.ndarray, np.ndarray]:
+    """Odd-q (cols, rows) of the hexes a pixel segment crosses, with repeats"""
+    n = max(1, math.ceil(math.hypot(x2 - x1, y2 - y1) / (size / 4)))
+    t = np.linspace(0.0, 1.0, n + 1)
+    return hex_grid.pixel_to_offset(x1 + (x2 - x1) * t, y1 + (y2 - y1) * t, size)
+
+
+def hex_obstacle_cells(map_data: Dict[str, Any]) -> List[Tuple[np.ndarray, np.ndarray]]:
+    """Odd-q cells of every obstacle and closed wall on a hex map, with repeats"""
+    size = map_data.get('grid_size', 50)
+    cells = [hex_rect_cells(o, size) for o in map_data.get('obstacles', [])]
+    cells += [hex_segment_cells(w['x1'], w['y1'], w['x2'], w['y2'], size) for w in closed_walls(map_data)]
+    return cells
+
+
+def hex_shape(map_data: Dict[str, Any], cells: List[Tuple[np.ndarray, np.ndarray]]) -> Tuple[int, int]:
+    """(rows, cols) of a hex map's cell grid"""
+    cols, rows = map_data.get('cols'), map_data.get('rows')
+    if not cols or not rows:
+        # Size the grid to the geometry when the grid dimensions are unknown
+        cols = max((int(c.max()) for c, _ in cells), default=0) + 1
+        rows = max((int(r.max()) for _, r in cells), default=0) + 1
+    return rows, cols
+
+
+def hex_blocked(map_data: Dict[str, Any]) -> np.ndarray:
+    """``blocked[row, col]`` over odd-q hex cells: every hex an obstacle or closed wall touches"""
+    cells = hex_obstacle_cells(map_data)
+    blocked = np.zeros(hex_shape(map_data, cells), dtype=bool)
+    for c, r in cells:
+        fill_cells(blocked, c, r, True)
+    return blocked
+
+
+def fill_cells(grid: np.ndarray, cols: np.ndarray, rows: np.ndarray, value: Any) -> None:
+    """Set ``grid[rows, cols]``, skipping cells outside the grid"""
+    height, width = grid.shape
+    inside = (cols >= 0) & (cols < width) & (rows >= 0) & (rows < height)
+    grid[rows[inside], cols[inside]] = value
+
+
+def raster_for_map(map_data: Dict[str, Any]) -> ObstacleRaster:
+    """Obstacle raster for this map, cached per map version"""
+    return cached(map_data, 'obstacles', lambda: ObstacleRaster.from_map(map_data))
+
+
+def hex_blocked_for_map(map_data: Dict[str, Any]) -> np.ndarray:
+    """``hex_blocked`` for this map, cached per map version (dropped with 'obstacles')"""
+    return cached(map_data, 'obstacles:hex', lambda: hex_blocked(map_data))
+
+
+def obstacles_at(map_data: Dict[str, Any], cell: Cell) -> List[Dict[str, Any]]:
+    """Obstacles and walls covering a cell (only used to report what blocked a ray)"""
+    cell_size = map_data.get('grid_size', 50)
+    col, row = cell
+    found = []
+    for o in map_data.get('obstacles', []):
+        x, y = o.get('x', 0), o.get('y', 0)
+        c0, c1 = _cell_span(x, x + o.get('width', 0), cell_size)
+        r0, r1 = _cell_span(y, y + o.get('height', 0), cell_size)
+        if c0 <= col <= c1 and r0 <= row <= r1:
+            found.append(o)
+    for w in closed_walls(map_data):
+        if cell in traverse(w['x1'] / cell_size, w['y1'] / cell_size, w['x2'] / cell_size, w['y2'] / cell_size):
+            found.append(w)
+    return found
+
+
+def fill_rects(grid: np.ndarray, rects: List[Dict[str, Any]], cell_size: float, value: Any) -> None:
+    """Set every cell of ``grid`` overlapped by a pixel rect (x, y, width, height)"""
+    for rect in rects:
+        x, y = rect.get('x', 0), rect.get('y', 0)
+        c0, c1 = _cell_span(x, x + rect.get('width', 0), cell_size)
+        r0, r1 = _cell_span(y, y + rect.get('height', 0), cell_size)
+        grid[max(r0, 0):max(r1 + 1, 0), max(c0, 0):max(c1 + 1, 0)] = value
+
+
+def _cell_span(start: float, end: float, cell_size: float) -> Tuple[int, int]:
+    """First and last cell index overlapped by the pixel interval [start, end]"""
+    first = math.floor(start / cell_size)
+    last = max(first, math.ceil(end / cell_size) - 1)
+    return first, last
+
+
+def _samples(start: float, end: float, spacing: float) -> np.ndarray:
+    """Points at most ``spacing`` apart across [start, end], just inside the ends"""
+    # Inset so a hex that only touches an edge is not counted, as with _cell_span
+    inset = min((end - start) / 2, spacing * 1e-3)
+    n = max(1, math.ceil((end - start) / spacing))
+    return np.linspace(start + inset, end - inset, n + 1)
+
+
+def _dda_setup(start: float, delta: np.ndarray, cell: np.ndarray, step: np.ndarray):
+    """Per-ray t at the first boundary crossing and t per cell along one axis"""
+    with np.errstate(divide='ignore', invalid='ignore'):
+        t_delta = np.where(step != 0, np.abs(1 / delta), np.inf)
+        t_max = np.where(step != 0, (cell + (step > 0) - start) / delta, np.inf)
+    return t_max, t_delta
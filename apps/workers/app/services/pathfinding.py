@@ -0,0 +1,258 @@
+"""
+Movement pathfinding on the map grid.
+
+Movement costs follow the grid rules: every step (square diagonals and
+the six hex neighbors included) costs 5 feet, and entering difficult
+terrain costs 10. Walls and obstacles are impassable. On square maps
+they come from the obstacle raster; on hex maps they are rasterized into
+odd-q hex cells, the same cells tokens stand on. A creature's footprint
+must fit entirely on passable cells, and square-grid diagonal steps may
+not squeeze between two blocked cells. Hostile tokens block movement.
+Allied tokens can be moved through but not stopped on.
+
+``find_path`` runs A* (grid distance heuristic) for a single destination.
+``distance_field`` runs a multi-source Dijkstra bounded by a movement
+budget, restricted to the window the budget can reach. Reachability fields
+are cached per (map version, token position, speed). The terrain cost grid
+is cached per map version and dropped whenever obstacles change.
+"""
+from typing import Any, Dict, Iterable, List, NamedTuple, Optional, Set, Tuple
+import heapq
+import numpy as np
+from app.services.hex_grid import OFFSET_NEIGHBORS
+from app.services.map_cache import cached
+from app.services.obstacle_raster import (
+    ObstacleRaster, fill_cells, fill_rects, hex_obstacle_cells, hex_rect_cells, hex_shape, raster_for_map
+)
+from app.services.token_index import FEET_PER_CELL, TokenIndex, index_for_map
+
+Cell = Tuple[int, int]
+
+IMPASSABLE = -1
+DIFFICULT_COST = 2 * FEET_PER_CELL
+DEFAULT_SPEED = 30
+_NEIGHBORS = ((1, 0), (-1, 0), (0, 1), (0, -1), (1, 1), (1, -1), (-1, 1), (-1, -1))
+
+
+class DistanceField(NamedTuple):
+    """Movement cost in feet from the sources; ``cost[row, col]`` is relative to ``origin``"""
+    origin: Cell
+    cost: np.ndarray
+    endable: np.ndarray
+
+    def reachable(self) -> List[List[int]]:
+        """[col, row, feet] for every cell the creature can end its move on"""
+        rows, cols = np.nonzero((self.cost >= 0) & self.endable)
+        feet = self.cost[rows, cols]
+        return np.stack([cols + self.origin[0], rows + self.origin[1], feet], axis=1).tolist()
+
+
+def terrain_costs(map_data: Dict[str, Any], raster: ObstacleRaster) -> np.ndarray:
+    """Feet to enter each cell: 5, 10 in difficult terrain, IMPASSABLE for obstacles"""
+    costs = np.full(raster.shape, FEET_PER_CELL, dtype=np.int16)
+    fill_rects(costs, map_data.get('difficult_terrain', []), raster.cell_size, DIFFICULT_COST)
+    costs[raster.blocked] = IMPASSABLE
+    return costs
+
+
+def hex_terrain_costs(map_data: Dict[str, Any]) -> np.ndarray:
+    """``terrain_costs`` over odd-q hex cells (``costs[row, col]``) for hex maps"""
+    size = map_data.get('grid_size', 50)
+    blocked = hex_obstacle_cells(map_data)
+    difficult = [hex_rect_cells(t, size) for t in map_data.get('difficult_terrain', [])]
+
+    costs = np.full(hex_shape(map_data, blocked + difficult), FEET_PER_CELL, dtype=np.int16)
+    for c, r in difficult:
+        fill_cells(costs, c, r, DIFFICULT_COST)
+    for c, r in blocked:
+        fill_cells(costs, c, r, IMPASSABLE)
+    return costs
+
+
+def terrain_for_map(map_data: Dict[str, Any]) -> np.ndarray:
+    """Terrain cost grid for this map (hex cells on hex maps), cached per map version"""
+    if map_data.get('grid_type') == 'hex':
+        return cached(map_data, 'terrain', lambda: hex_terrain_costs(map_data))
+    return cached(map_data, 'terrain', lambda: terrain_costs(map_data, raster_for_map(map_data)))
+
+
+def movement_grid(
+    terrain: np.ndarray,
+    index: TokenIndex,
+    size: int,
+    hostile: Iterable[str],
+    allied: Iterable[str]
+) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Step costs and end-of-move flags for a creature with a ``size`` footprint
+
+    Returns:
+        (cost, endable) indexed by the footprint's top-left cell; cost is the
+        most expensive cell under the footprint or IMPASSABLE
+    """
+    costs = terrain.copy()
+    endable = np.ones(terrain.shape, dtype=bool)
+    rows, cols = terrain.shape
+    for token_id in hostile:
+        col, row, t_size = index.position(token_id)
+        costs[max(row, 0):max(row + t_size, 0), max(col, 0):max(col + t_size, 0)] = IMPASSABLE
+    for token_id in allied:
+        col, row, t_size = index.position(token_id)
+        endable[max(row, 0):max(row + t_size, 0), max(col, 0):max(col + t_size, 0)] = False
+
+    if size > 1:
+        # Footprint cost is the max over its cells; any impassable cell blocks
+        blocked = np.where(costs == IMPASSABLE, np.int16(10_000), costs)
+        window = np.lib.stride_tricks.sliding_window_view(blocked, (size, size))
+        footprint = window.max(axis=(2, 3))
+        costs = np.full(terrain.shape, IMPASSABLE, dtype=np.int16)
+        costs[:rows - size + 1, :cols - size + 1] = np.where(footprint >= 10_000, IMPASSABLE, footprint)
+        free = np.lib.stride_tricks.sliding_window_view(endable, (size, size)).all(axis=(2, 3))
+        endable = np.zeros(terrain.shape, dtype=bool)
+        endable[:rows - size + 1, :cols - size + 1] = free
+    return costs, endable
+
+
+def distance_field(
+    costs: np.ndarray,
+    endable: np.ndarray,
+    sources: Iterable[Cell],
+    budget: int,
+    grid_type: str = 'square'
+) -> DistanceField:
+    """
+    Multi-source Dijkstra over ``costs`` limited to ``budget`` feet
+
+    Only the window the budget can reach around the sources is searched.
+    """
+    hex_map = grid_type == 'hex'
+    sources = list(sources)
+    rows, cols = costs.shape
+    reach = budget // FEET_PER_CELL
+    col0 = max(0, min(c for c, _ in sources) - reach)
+    row0 = max(0, min(r for _, r in sources) - reach)
+    col1 = min(cols, max(c for c, _ in sources) + reach + 1)
+    row1 = min(rows, max(r for _, r in sources) + reach + 1)
+    window = costs[row0:row1, col0:col1].tolist()
+    height, width = row1 - row0, col1 - col0
+
+    dist = np.full((height, width), -1, dtype=np.int32)
+    best: Dict[Cell, int] = {}
+    heap = []
+    for col, row in sources:
+        if 0 <= col - col0 < width and 0 <= row - row0 < height:
+            best[(col - col0, row - row0)] = 0
+            heap.append((0, col - col0, row - row0))
+    heapq.heapify(heap)
+
+    while heap:
+        d, x, y = heapq.heappop(heap)
+        if best.get((x, y), -1) != d or dist[y, x] >= 0:
+            continue
+        dist[y, x] = d
+        for dx, dy in (OFFSET_NEIGHBORS[(x + col0) & 1] if hex_map else _NEIGHBORS):
+            nx, ny = x + dx, y + dy
+            if not (0 <= nx < width and 0 <= ny < height):
+                continue
+            step = window[ny][nx]
+            if step == IMPASSABLE or _squeezes(window, x, y, dx, dy, hex_map):
+                continue
+            nd = d + step
+            if nd <= budget and nd < best.get((nx, ny), budget + 1):
+                best[(nx, ny)] = nd
+                heapq.heappush(heap, (nd, nx, ny))
+
+    return DistanceField((col0, row0), dist, endable[row0:row1, col0:col1])
+
+
+def find_path(
+    costs: np.ndarray,
+    start: Cell,
+    goal: Cell,
+    max_cost: Optional[int] = None,
+    grid_type: str = 'square'
+) -> Optional[Tuple[List[Cell], int]]:
+    """A* from ``start`` to ``goal``; returns (cells including both ends, feet) or None"""
+    rows, cols = costs.shape
+    gx, gy = goal
+    if not (0 <= gx < cols and 0 <= gy < rows) or costs[gy, gx] == IMPASSABLE:
+        return None
+    grid = costs.tolist()
+    hex_map = grid_type == 'hex'
+    gq, gr = gx, gy - (gx - (gx & 1)) // 2
+
+    def heuristic(x: int, y: int) -> int:
+        if hex_map:
+            # Inline odd-q -> axial distance; NumPy per node would dominate
+            dq, dr = x - gq, y - (x - (x & 1)) // 2 - gr
+            return (abs(dq) + abs(dr) + abs(dq + dr)) // 2 * FEET_PER_CELL
+        return max(abs(x - gx), abs(y - gy)) * FEET_PER_CELL
+
+    best = {start: 0}
+    came_from: Dict[Cell, Cell] = {}
+    closed: Set[Cell] = set()
+    heap = [(heuristic(*start), 0, start)]
+    while heap:
+        _, d, cell = heapq.heappop(heap)
+        if cell in closed:
+            continue
+        if cell == goal:
+            path = [cell]
+            while cell in came_from:
+                cell = came_from[cell]
+                path.append(cell)
+            return path[::-1], d
+        closed.add(cell)
+        x, y = cell
+        for dx, dy in (OFFSET_NEIGHBORS[x & 1] if hex_map else _NEIGHBORS):
+            nx, ny = x + dx, y + dy
+            if not (0 <= nx < cols and 0 <= ny < rows):
+                continue
+            step = grid[ny][nx]
+            if step == IMPASSABLE or _squeezes(grid, x, y, dx, dy, hex_map):
+                continue
+            nd = d + step
+            if max_cost is not None and nd > max_cost:
+                continue
+            if nd < best.get((nx, ny), nd + 1):
+                best[(nx, ny)] = nd
+                came_from[(nx, ny)] = cell
+                heapq.heappush(heap, (nd + heuristic(nx, ny), nd, (nx, ny)))
+    return None
+
+
+def _squeezes(grid: List[List[int]], x: int, y: int, dx: int, dy: int, hex_map: bool) -> bool:
+    """Whether a square-grid diagonal step passes between two blocked cells"""
+    return not hex_map and dx != 0 and dy != 0 and grid[y][x + dx] == IMPASSABLE and grid[y + dy][x] == IMPASSABLE
+
+
+def token_sides(map_data: Dict[str, Any]) -> Dict[str, str]:
+    """Side of every token: explicit ``side``, else monsters vs everyone else"""
+    return {
+        str(t.get('id', i)): t.get('side') or ('monsters' if t.get('owner_kind') == 'monster' else 'party')
+        for i, t in enumerate(map_data.get('tokens', []))
+    }
+
+
+def token_movement_grid(map_data: Dict[str, Any], token_id: str) -> Tuple[np.ndarray, np.ndarray]:
+    """Movement grid for one token, treating other tokens as hostile or allied by side"""
+    index = index_for_map(map_data)
+    sides = token_sides(map_data)
+    own_side = sides.get(token_id)
+    others = [t for t in index.positions() if t != token_id]
+    hostile = [t for t in others if sides.get(t) != own_side]
+    allied = [t for t in others if sides.get(t) == own_side]
+    size = index.position(token_id)[2]
+    return movement_grid(terrain_for_map(map_data), index, size, hostile, allied)
+
+
+def reachable_for_token(map_data: Dict[str, Any], token_id: str, speed: int) -> DistanceField:
+    """Where a token can move this turn, cached per (map version, position, speed)"""
+    col, row, size = index_for_map(map_data).position(token_id)
+    kind = f"reach:{token_id}:{col}:{row}:{size}:{speed}"
+
+    def build() -> DistanceField:
+        costs, endable = token_movement_grid(map_data, token_id)
+        return distance_field(costs, endable, [(col, row)], speed, map_data.get('grid_type', 'square'))
+
+    return cached(map_data, kind, build)
@@ -0,0 +1,257 @@
+"""
+Streaming PDF layout: flowing text written to an export sink page by page.
+
+``TextFlow`` wraps text into lines and fills pages top to bottom. Each
+full page is compressed and handed to ``PdfWriter``, which writes it to
+the sink straight away. Between pages only the byte offsets of written
+objects are kept, for the cross-reference table. Memory therefore stays
+bounded however many pages a journal runs to.
+
+Text is set in the standard Helvetica faces, which every PDF reader has
+built in, so no font is embedded. Line wrapping needs glyph widths. These
+come from ``app/data/pdf_fonts.json`` and are loaded once per process by
+``fonts()``, along with the serialized font objects. Text is encoded as
+WinAnsi (cp1252); characters outside it print as '?'.
+"""
+from functools import lru_cache
+from typing import Dict, List, NamedTuple, Optional, Tuple
+import json
+import os
+import zlib
+from app.services.export_store import ExportSink
+
+PDF_FONTS_PATH = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'data', 'pdf_fonts.json')
+
+# Points; US Letter
+PAGE_SIZE = (612.0, 792.0)
+MARGIN = 54.0
+
+# Face -> (resource name, PDF base font, metrics in pdf_fonts.json)
+FACES = {
+    'regular': ('F1', 'Helvetica', 'Helvetica'),
+    'bold': ('F2', 'Helvetica-Bold', 'Helvetica-Bold'),
+    'italic': ('F3', 'Helvetica-Oblique', 'Helvetica'),
+}
+
+_ESCAPES = {ord('\\'): b'\\\\', ord('('): b'\\(', ord(')'): b'\\)'}
+
+
+class Font(NamedTuple):
+    resource: str
+    base_font: str
+    widths: List[int]  # by WinAnsi code, in 1/1000 em
+    pdf_object: bytes
+
+    def encode(self, text: str) -> bytes:
+        return text.encode('cp1252', errors='replace')
+
+    def width(self, encoded: bytes, size: float) -> float:
+        return sum(map(self.widths.__getitem__, encoded)) * size / 1000.0
+
+
+@lru_cache(maxsize=None)
+def fonts() -> Dict[str, Font]:
+    """Fonts by face, loaded once per process"""
+    with open(PDF_FONTS_PATH) as f:
+        metrics = json.load(f)
+    loaded = {}
+    for face, (resource, base_font, metrics_name) in FACES.items():
+        m = metrics[metrics_name]
+        widths = [m['missing_width']] * 256
+        widths[m['first_char']:m['first_char'] + len(m['widths'])] = m['widths']
+        for code, width in m['extra'].items():
+            widths[int(code)] = width
+        pdf_object = f"<< /Type /Font /Subtype /Type1 /BaseFont /{base_font} /Encoding /WinAnsiEncoding >>".encode()
+        loaded[face] = Font(resource, base_font, widths, pdf_object)
+    return loaded
+
+
+class TextStyle(NamedTuple):
+    face: str
+    size: float
+    leading: float
+    indent: float = 0.0
+    space_before: float = 0.0
+    space_after: float = 0.0
+
+
+def pdf_string(encoded: bytes) -> bytes:
+    """PDF literal string for already-encoded text"""
+    if b'\\' in encoded or b'(' in encoded or b')' in encoded:
+        encoded = b''.join(_ESCAPES.get(c, bytes((c,))) for c in encoded)
+    return b'(' + encoded + b')'
+
+
+class PdfWriter:
+    """
+    Writes PDF objects to ``sink`` as they are produced.
+
+    Objects 1 and 2 (catalog and page tree) are reserved and written by
+    ``close``, once every page is known.
+    """
+    CATALOG, PAGES = 1, 2
+
+    def __init__(self, sink: ExportSink, page_size: Tuple[float, float] = PAGE_SIZE, title: Optional[str] = None):
+        self.sink = sink
+        self.page_size = page_size
+        self.title = title
+        self.pages: List[int] = []
+        self._offsets: Dict[int, int] = {}
+        self._next = self.PAGES + 1
+        self._start = sink.size
+        sink.write(b'%PDF-1.4\n%\xe2\xe3\xcf\xd3\n')
+        font_refs = []
+        for font in fonts().values():
+            font_refs.append(f"/{font.resource} {self._add(font.pdf_object)} 0 R")
+        self._resources = f"<< /Font << {' '.join(font_refs)} >> >>".encode()
+
+    def _reserve(self) -> int:
+        number, self._next = self._next, self._next + 1
+        return number
+
+    def _write(self, number: int, body: bytes) -> None:
+        self._offsets[number] = self.sink.size - self._start
+        self.sink.write(b'%d 0 obj\n' % number + body + b'\nendobj\n')
+
+    def _add(self, body: bytes) -> int:
+        number = self._reserve()
+        self._write(number, body)
+        return number
+
+    def add_page(self, content: bytes) -> None:
+        data = zlib.compress(content)
+        contents = self._add(b'<< /Length %d /Filter /FlateDecode >>\nstream\n' % len(data) + data + b'\nendstream')
+        width, height = self.page_size
+        self.pages.append(self._add(
+            b'<< /Type /Page /Parent %d 0 R /MediaBox [0 0 %s %s] /Resources %s /Contents %d 0 R >>'
+            % (self.PAGES, _num(width), _num(height), self._resources, contents)
+        ))
+
+    def close(self) -> None:
+        kids = b' '.join(b'%d 0 R' % page for page in self.pages)
+        self._write(self.PAGES, b'<< /Type /Pages /Kids [%s] /Count %d >>' % (kids, len(self.pages)))
+        self._write(self.CATALOG, b'<< /Type /Catalog /Pages %d 0 R >>' % self.PAGES)
+        info = b'<< /Producer (AI Dungeon Master)'
+        if self.title:
+            info += b' /Title ' + pdf_string(self.title.encode('cp1252', errors='replace'))
+        info = self._add(info + b' >>')
+
+        xref = self.sink.size - self._start
+        count = self._next
+        entries = [b'0000000000 65535 f \n']
+        entries.extend(b'%010d 00000 n \n' % self._offsets[number] for number in range(1, count))
+        self.sink.write(b'xref\n0 %d\n' % count + b''.join(entries))
+        self.sink.write(b'trailer\n<< /Size %d /Root %d 0 R /Info %d 0 R >>\nstartxref\n%d\n%%%%EOF\n'
+                        % (count, self.CATALOG, info, xref))
+
+
+class TextFlow:
+    """
+    Lays text out top to bottom and starts a new page when one is full.
+
+    Use as a context manager around a ``PdfWriter``; leaving it finishes the
+    last page and closes the document.
+    """
+
+    def __init__(self, writer: PdfWriter, margin: float = MARGIN, footer: Optional[str] = None):
+        self.writer = writer
+        self.fonts = fonts()
+        self.margin = margin
+        self.footer = footer
+        width, height = writer.page_size
+        self.width = width - 2 * margin
+        self.top = height - margin
+        self._ops: List[bytes] = []
+        self._y = self.top
+
+    def __enter__(self) -> 'TextFlow':
+        return self
+
+    def __exit__(self, exc_type, exc, tb) -> bool:
+        if exc_type is None:
+            if self._ops or not self.writer.pages:
+                self.page_break()
+            self.writer.close()
+        return False
+
+    @property
+    def pages(self) -> int:
+        return len(self.writer.pages)
+
+    def page_break(self) -> None:
+        if self.footer is not None:
+            self._footer()
+        self.writer.add_page(b'\n'.join(self._ops))
+        self._ops = []
+        self._y = self.top
+
+    def space(self, height: float) -> None:
+        # Space at the top of a page is dropped
+        if self._y < self.top:
+            self._y -= height
+
+    def keep(self, height: float) -> None:
+        """Start a new page unless ``height`` points still fit on this one"""
+        if self._y - height < self.margin:
+            self.page_break()
+
+    def text(self, text: str, style: TextStyle, keep_with_next: float = 0.0) -> None:
+        """A paragraph in ``style``; newlines in ``text`` start new lines"""
+        font = self.fonts[style.face]
+        self.space(style.space_before)
+        self.keep(style.leading + keep_with_next)
+        width = self.width - style.indent
+        # Only the baseline changes from line to line
+        prefix = self._prefix(font, style.size, self.margin + style.indent)
+        for line in text.split('\n'):
+            for encoded in self._wrap(font.encode(line.replace('\t', '    ')), font, style.size, width):
+                if self._y - style.leading < self.margin:
+                    self.page_break()
+                self._y -= style.leading
+                self._ops.append(prefix + _num(self._y) + b' Td ' + pdf_string(encoded) + b' Tj ET')
+        self.space(style.space_after)
+
+    @staticmethod
+    def _prefix(font: Font, size: float, x: float) -> bytes:
+        return b'BT /%s %s Tf %s ' % (font.resource.encode(), _num(size), _num(x))
+
+    def _footer(self) -> None:
+        font = self.fonts['regular']
+        label = font.encode(f"{self.footer} \u2013 page {self.pages + 1}" if self.footer else f"Page {self.pages + 1}")
+        x = self.margin + (self.width - font.width(label, 8)) / 2
+        self._ops.append(self._prefix(font, 8, x) + _num(self.margin / 2) + b' Td ' + pdf_string(label) + b' Tj ET')
+
+    @staticmethod
+    def _wrap(encoded: bytes, font: Font, size: float, width: float) -> List[bytes]:
+        """Greedy word wrap; words longer than a line are split"""
+        if font.width(encoded, size) <= width:
+            return [encoded]
+        lines, line, line_width = [], [], 0.0
+        space = font.width(b' ', size)
+        for word in encoded.split(b' '):
+            word_width = font.width(word, size)
+            while word_width > width:
+                # Split at the last character that still fits
+                cut, cut_width = 0, 0.0
+                while cut < len(word) and cut_width + font.width(word[cut:cut + 1], size) <= width:
+                    cut_width += font.width(word[cut:cut + 1], size)
+                    cut += 1
+                cut = max(cut, 1)
+                if line:
+                    lines.append(b' '.join(line))
+                lines.append(word[:cut])
+                line, line_width = [], 0.0
+                word = word[cut:]
+                word_width = font.width(word, size)
+            if line and line_width + space + word_width > width:
+                lines.append(b' '.join(line))
+                line, line_width = [], 0.0
+            line_width += (space if line else 0.0) + word_width
+            line.append(word)
+        if line:
+            lines.append(b' '.join(line))
+        return lines
+
+
+def _num(value: float) -> bytes:
+    return (b'%.2f' % value).rstrip(b'0').rstrip(b'.') or b'0'
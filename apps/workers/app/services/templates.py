@@ -0,0 +1,58 @@
+"""
+Precompiled Jinja2 templates for HTML exports.
+
+Templates live in ``app/templates``. They share ``layout.html.j2``, which
+holds the page head and stylesheet, so that markup is part of the compiled
+layout rather than rebuilt per export. Each template is compiled once per
+process and kept by the environment. ``preload`` runs at worker start
+(before the pool forks) so tasks never compile. Compiled bytecode is also
+cached under TEMPLATE_CACHE_DIR, so a restarted worker skips the Jinja
+compiler too.
+
+Templates named ``*.html.j2`` are autoescaped. ``stream`` yields the
+rendered output in chunks for an export sink.
+"""
+from functools import lru_cache
+from typing import Any, Iterator
+import os
+import tempfile
+from jinja2 import Environment, FileSystemBytecodeCache, FileSystemLoader, Template, select_autoescape
+
+TEMPLATE_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'templates')
+TEMPLATE_CACHE_DIR = os.getenv("TEMPLATE_CACHE_DIR", os.path.join(tempfile.gettempdir(), "template-cache"))
+
+
+@lru_cache(maxsize=None)
+def environment() -> Environment:
+    os.makedirs(TEMPLATE_CACHE_DIR, exist_ok=True)
+    return Environment(
+        loader=FileSystemLoader(TEMPLATE_DIR),
+        autoescape=select_autoescape(enabled_extensions=('html.j2',), default_for_string=True),
+        bytecode_cache=FileSystemBytecodeCache(TEMPLATE_CACHE_DIR),
+        # Templates never change under a running worker
+        auto_reload=False,
+        cache_size=-1,
+        trim_blocks=True,
+        lstrip_blocks=True,
+    )
+
+
+def get(name: str) -> Template:
+    return environment().get_template(name)
+
+
+def stream(name: str, **context: Any) -> Iterator[str]:
+    """Rendered chunks of template ``name``"""
+    return get(name).generate(**context)
+
+
+def render(name: str, **context: Any) -> str:
+    return get(name).render(**context)
+
+
+def preload() -> int:
+    """Compile every template now; returns how many were loaded"""
+    names = environment().list_templates(filter_func=lambda name: name.endswith('.j2'))
+    for name in names:
+        get(name)
+    return len(names)
@@ -0,0 +1,211 @@
+"""
+Spatial index for tokens on a map grid.
+
+Tokens are hashed by every grid cell their footprint covers (a large
+creature covers 2x2 cells, huge 3x3, gargantuan 4x4), so collision checks
+cost O(footprint) and area queries cost O(min(area, tokens)) instead of a
+scan over every token per query. Moves update only the cells that change.
+
+Indexes are cached per map version (see app.services.map_cache); tasks
+that move tokens update the cached index in place and advance the version.
+"""
+from typing import Any, Dict, Iterable, List, Optional, Set, Tuple
+import numpy as np
+from app.services import hex_grid
+from app.services.map_cache import cached
+
+FEET_PER_CELL = 5
+TOKEN_SIZES = {'tiny': 1, 'small': 1, 'medium': 1, 'large': 2, 'huge': 3, 'gargantuan': 4}
+
+Cell = Tuple[int, int]
+
+
+def token_footprint(token: Dict[str, Any]) -> int:
+    """Side length in cells of a token's square footprint"""
+    size = token.get('size', 'medium')
+    if isinstance(size, str):
+        return TOKEN_SIZES.get(size.lower(), 1)
+    return max(1, int(size))
+
+
+def token_cell(token: Dict[str, Any], grid_size: int, grid_type: str = 'square') -> Cell:
+    """Top-left grid cell of a token (grid_x/grid_y, else derived from pixel x/y)"""
+    if 'grid_x' in token and 'grid_y' in token:
+        return int(token['grid_x']), int(token['grid_y'])
+    if grid_type == 'hex':
+        col, row = hex_grid.pixel_to_offset(token.get('x', 0), token.get('y', 0), grid_size)
+        return int(col), int(row)
+    return int(token.get('x', 0) // grid_size), int(token.get('y', 0) // grid_size)
+
+
+class TokenIndex:
+    """Uniform grid hash from occupied cell to token ids"""
+
+    def __init__(self):
+        self._cells: Dict[Cell, Set[str]] = {}
+        self._tokens: Dict[str, Tuple[int, int, int]] = {}
+
+    @classmethod
+    def from_tokens(cls, tokens: Iterable[Dict[str, Any]], grid_size: int = 50, grid_type: str = 'square') -> 'TokenIndex':
+        index = cls()
+        for i, token in enumerate(tokens):
+            col, row = token_cell(token, grid_size, grid_type)
+            index.insert(str(token.get('id', i)), col, row, token_footprint(token))
+        return index
+
+    def __len__(self) -> int:
+        return len(self._tokens)
+
+    def __contains__(self, token_id: str) -> bool:
+        return token_id in self._tokens
+
+    def position(self, token_id: str) -> Tuple[int, int, int]:
+        """(col, row, footprint) of a token"""
+        return self._tokens[token_id]
+
+    def positions(self) -> Dict[str, Tuple[int, int, int]]:
+        """(col, row, footprint) of every token, keyed by id"""
+        return self._tokens
+
+    def center(self, token_id: str, grid_size: float, grid_type: str = 'square') -> Tuple[float, float]:
+        """Pixel center of a token's footprint (its hex center on hex maps)"""
+        col, row, size = self._tokens[token_id]
+        if grid_type == 'hex':
+            x, y = hex_grid.offset_to_pixel(col, row, grid_size)
+            return float(x), float(y)
+        return (col + size / 2) * grid_size, (row + size / 2) * grid_size
+
+    # --- Updates --------------------------------------------------------------
+
+    def insert(self, token_id: str, col: int, row: int, size: int = 1) -> None:
+        if token_id in self._tokens:
+            raise ValueError(f"Token already indexed: {token_id}")
+        self._tokens[token_id] = (col, row, size)
+        for cell in _footprint(col, row, size):
+            self._cells.setdefault(cell, set()).add(token_id)
+
+    def remove(self, token_id: str) -> None:
+        col, row, size = self._tokens.pop(token_id)
+        for cell in _footprint(col, row, size):
+            self._discard(cell, token_id)
+
+    def move(self, token_id: str, col: int, row: int, size: Optional[int] = None) -> None:
+        """Move (or resize) a token, touching only the cells that change"""
+        old_col, old_row, old_size = self._tokens[token_id]
+        size = old_size if size is None else size
+        old_cells = set(_footprint(old_col, old_row, old_size))
+        new_cells = set(_footprint(col, row, size))
+        for cell in old_cells - new_cells:
+            self._discard(cell, token_id)
+        for cell in new_cells - old_cells:
+            self._cells.setdefault(cell, set()).add(token_id)
+        self._tokens[token_id] = (col, row, size)
+
+    def upsert(self, token_id: str, col: int, row: int, size: int = 1) -> None:
+        if token_id in self._tokens:
+            self.move(token_id, col, row, size)
+        else:
+            self.insert(token_id, col, row, size)
+
+    def _discard(self, cell: Cell, token_id: str) -> None:
+        occupants = self._cells.get(cell)
+        if occupants is not None:
+            occupants.discard(token_id)
+            if not occupants:
+                del self._cells[cell]
+
+    # --- Queries --------------------------------------------------------------
+
+    def collisions(self, col: int, row: int, size: int = 1, ignore: Optional[str] = None) -> Set[str]:
+        """Tokens occupying any cell of the given footprint"""
+        found: Set[str] = set()
+        for cell in _footprint(col, row, size):
+            found.update(self._cells.get(cell, ()))
+        found.discard(ignore)
+        return found
+
+    def at_cells(self, cells: Iterable[Cell]) -> Set[str]:
+        """Tokens occupying any of ``cells`` (e.g. an area-of-effect mask)"""
+        cells = cells if isinstance(cells, (set, frozenset)) else set(cells)
+        if len(cells) > len(self._cells):
+            return {t for cell, occupants in self._cells.items() if cell in cells for t in occupants}
+        found: Set[str] = set()
+        for cell in cells:
+            found.update(self._cells.get(cell, ()))
+        return found
+
+    def in_area(self, col0: int, row0: int, col1: int, row1: int) -> Set[str]:
+        """Tokens overlapping the inclusive cell rectangle (col0, row0)-(col1, row1)"""
+        if col1 < col0 or row1 < row0:
+            return set()
+        area = (col1 - col0 + 1) * (row1 - row0 + 1)
+        if area > len(self._cells):
+            # Cheaper to walk the occupied cells than the rectangle
+            found = set()
+            for (col, row), occupants in self._cells.items():
+                if col0 <= col <= col1 and row0 <= row <= row1:
+                    found.update(occupants)
+            return found
+
+        found = set()
+        for row in range(row0, row1 + 1):
+            for col in range(col0, col1 + 1):
+                found.update(self._cells.get((col, row), ()))
+        return found
+
+    def within(
+        self,
+        col: int,
+        row: int,
+        feet: float,
+        size: int = 1,
+        ignore: Optional[str] = None,
+        grid_type: str = 'square'
+    ) -> Dict[str, int]:
+        """
+        Tokens within ``feet`` of a footprint, using grid distance between the
+        closest cells (diagonals count as one square; hex steps on hex maps);
+        maps id to feet.
+        """
+        reach = int(feet // FEET_PER_CELL)
+        # A hex step moves at most one column and one row, so the box holds every hex in reach
+        candidates = self.in_area(col - reach, row - reach, col + size - 1 + reach, row + size - 1 + reach)
+        candidates.discard(ignore)
+        if grid_type == 'hex':
+            return self._within_hex(col, row, size, reach, candidates)
+        result = {}
+        for token_id in candidates:
+            t_col, t_row, t_size = self._tokens[token_id]
+            gap_x = max(0, t_col - (col + size - 1), col - (t_col + t_size - 1))
+            gap_y = max(0, t_row - (row + size - 1), row - (t_row + t_size - 1))
+            # Adjacent footprints are 5 feet apart, overlapping ones 0
+            distance = max(gap_x, gap_y) * FEET_PER_CELL
+            result[token_id] = distance
+        return result
+
+    def _within_hex(self, col: int, row: int, size: int, reach: int, candidates: Set[str]) -> Dict[str, int]:
+        """``within`` for hex maps: fewest hex steps between any two footprint cells"""
+        if not candidates:
+            return {}
+        ids = sorted(candidates)
+        cells = [_footprint(*self._tokens[token_id]) for token_id in ids]
+        starts = np.cumsum([0] + [len(c) for c in cells[:-1]])
+        target = np.array([cell for c in cells for cell in c], dtype=np.int64)
+        source = np.array(_footprint(col, row, size), dtype=np.int64)
+        steps = hex_grid.offset_distance(source[:, 0:1], source[:, 1:2], target[:, 0], target[:, 1]).min(axis=0)
+        nearest = np.minimum.reduceat(steps, starts)
+        return {
+            token_id: int(d) * FEET_PER_CELL
+            for token_id, d in zip(ids, nearest.tolist()) if d <= reach
+        }
+
+
+def _footprint(col: int, row: int, size: int) -> List[Cell]:
+    return [(col + dx, row + dy) for dy in range(size) for dx in range(size)]
+
+
+def index_for_map(map_data: Dict[str, Any]) -> TokenIndex:
+    """Index for ``map_data['tokens']``, cached per map version"""
+    return cached(map_data, 'tokens', lambda: TokenIndex.from_tokens(
+        map_data.get('tokens', []), map_data.get('grid_size', 50), map_data.get('grid_type', 'square')
+    ))
@@ -1,61 +1,43 @@
-from celery import shared_task
+from celery import chord, shared_task
 import structlog
-from typing import Dict, Any, List, Optional
+from typing import Dict, Any, List, Optional, Tuple, Union
 from datetime import datetime
-import random
+import numpy as np
+from app.services.dice import compile_dice_expression
+from app.services import encounter_simulator
+from app.services.combat_state import CombatState
+from app.services.dice_batch import roll_expressions
+from app.services.rng import BlockRandom, RngSpec, RngStream
 
 logger = structlog.get_logger()
 
+# Tasks below are thin wrappers: they open the RNG stream, log once and turn
+# exceptions into error dicts. The underscore-prefixed cores do the work and
+# call each other directly, so composing them never goes through task dispatch.
+
+def _roll_d20(modifier: int, advantage: Optional[str], rand: BlockRandom) -> Tuple[int, int]:
+    """Roll 1d20 + modifier with advantage/disadvantage; returns (natural roll, total)"""
+    roll = rand.randint(1, 20)
+    if advantage == 'advantage':
+        roll = max(roll, rand.randint(1, 20))
+    elif advantage == 'disadvantage':
+        roll = min(roll, rand.randint(1, 20))
+    return roll, roll + modifier
+
 @shared_task
-def roll_initiative(participants: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+def roll_initiative(participants: List[Dict[str, Any]], rng: RngSpec = None) -> List[Dict[str, Any]]:
     """
     Roll initiative for all participants in an encounter
     
     Args:
         participants: List of participant data with initiative modifiers
+        rng: RNG stream spec {"stream_id", "offset"}; anonymous stream if omitted
     
     Returns:
         List of participants with initiative rolls and order
     """
     try:
-        logger.info("Rolling initiative", participant_count=len(participants))
-        
-        initiative_results = []
-        
-        for participant in participants:
-            # Roll initiative (1d20 + modifier)
-            initiative_roll = random.randint(1, 20)
-            modifier = participant.get('initiative_modifier', 0)
-            total = initiative_roll + modifier
-            
-            # Handle advantage/disadvantage
-            if participant.get('initiative_advantage') == 'advantage':
-                second_roll = random.randint(1, 20)
-                total = max(initiative_roll + modifier, second_roll + modifier)
-                initiative_roll = max(initiative_roll, second_roll)
-            elif participant.get('initiative_advantage') == 'disadvantage':
-                second_roll = random.randint(1, 20)
-                total = min(initiative_roll + modifier, second_roll + modifier)
-                initiative_roll = min(initiative_roll, second_roll)
-            
-            result = {
-                **participant,
-                'initiative_roll': initiative_roll,
-                'initiative_total': total,
-                'initiative_modifier': modifier
-            }
-            initiative_results.append(result)
-        
-        # Sort by initiative total (highest first), then by modifier, then randomly
-        initiative_results.sort(
-            key=lambda x: (x['initiative_total'], x['initiative_modifier'], random.random()),
-            reverse=True
-        )
-        
-        # Add turn order
-        for i, participant in enumerate(initiative_results):
-            participant['turn_order'] = i + 1
-        
+        initiative_results = _roll_initiative(participants, RngStream.from_spec(rng).block())
         logger.info("Initiative rolled", results=initiative_results)
         return initiative_results
         
@@ -63,11 +45,43 @@ def roll_initiative(participants: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
         logger.error("Initiative roll failed", error=str(e))
         return []
 
+def _roll_initiative(participants: List[Dict[str, Any]], rand: BlockRandom) -> List[Dict[str, Any]]:
+    """Roll and order initiative from one RNG block"""
+    record = rand.record()
+    initiative_results = []
+    
+    for participant in participants:
+        # Roll initiative (1d20 + modifier)
+        modifier = participant.get('initiative_modifier', 0)
+        initiative_roll, total = _roll_d20(modifier, participant.get('initiative_advantage'), rand)
+        
+        result = {
+            **participant,
+            'initiative_roll': initiative_roll,
+            'initiative_total': total,
+            'initiative_modifier': modifier,
+            'initiative_rng': record
+        }
+        initiative_results.append(result)
+    
+    # Sort by initiative total (highest first), then by modifier, then randomly
+    initiative_results.sort(
+        key=lambda x: (x['initiative_total'], x['initiative_modifier'], rand.random()),
+        reverse=True
+    )
+    
+    # Add turn order
+    for i, participant in enumerate(initiative_results):
+        participant['turn_order'] = i + 1
+    
+    return initiative_results
+
 @shared_task
 def resolve_attack(
     attacker: Dict[str, Any],
     target: Dict[str, Any],
-    attack_data: Dict[str, Any]
+    attack_data: Dict[str, Any],
+    rng: RngSpec = None
 ) -> Dict[str, Any]:
     """
     Resolve an attack action
@@ -76,76 +90,194 @@ def resolve_attack(
         attacker: Attacker data
         target: Target data
         attack_data: Attack details (weapon, modifiers, etc.)
+        rng: RNG stream spec {"stream_id", "offset"}; anonymous stream if omitted
     
     Returns:
         Attack resolution result
     """
     try:
-        logger.info("Resolving attack", 
-                   attacker=attacker.get('name'),
-                   target=target.get('name'))
-        
-        # Roll attack
-        attack_roll = random.randint(1, 20)
-        attack_modifier = attack_data.get('attack_modifier', 0)
-        attack_total = attack_roll + attack_modifier
-        
-        # Handle advantage/disadvantage
-        if attack_data.get('advantage') == 'advantage':
-            second_roll = random.randint(1, 20)
-            attack_total = max(attack_roll + attack_modifier, second_roll + attack_modifier)
-            attack_roll = max(attack_roll, second_roll)
-        elif attack_data.get('advantage') == 'disadvantage':
-            second_roll = random.randint(1, 20)
-            attack_total = min(attack_roll + attack_modifier, second_roll + attack_modifier)
-            attack_roll = min(attack_roll, second_roll)
+        result = _resolve_attack(attacker, target, attack_data, RngStream.from_spec(rng).block())
+        logger.info("Attack resolved", result=result)
+        return result
         
-        # Determine hit
-        ac = target.get('armor_class', 10)
-        hit = attack_total >= ac
-        critical_hit = attack_roll == 20
-        critical_miss = attack_roll == 1
+    except Exception as e:
+        logger.error("Attack resolution failed", error=str(e))
+        return {'error': f'Attack resolution failed: {str(e)}'}
+
+def _resolve_attack(
+    attacker: Dict[str, Any],
+    target: Dict[str, Any],
+    attack_data: Dict[str, Any],
+    rand: BlockRandom
+) -> Dict[str, Any]:
+    """Resolve an attack (and its damage) from one RNG block"""
+    # Roll attack
+    attack_modifier = attack_data.get('attack_modifier', 0)
+    attack_roll, attack_total = _roll_d20(attack_modifier, attack_data.get('advantage'), rand)
+    
+    # Determine hit
+    ac = target.get('armor_class', 10)
+    hit = attack_total >= ac
+    critical_hit = attack_roll == 20
+    critical_miss = attack_roll == 1
+    
+    result = {
+        'attacker': attacker.get('name'),
+        'target': target.get('name'),
+        'attack_roll': attack_roll,
+        'attack_total': attack_total,
+        'target_ac': ac,
+        'hit': hit,
+        'critical_hit': critical_hit,
+        'critical_miss': critical_miss,
+        'damage': 0,
+        'rng': rand.record()
+    }
+    
+    # Calculate damage if hit
+    if hit:
+        damage_dice = attack_data.get('damage_dice', '1d6')
+        damage_modifier = attack_data.get('damage_modifier', 0)
         
-        result = {
-            'attacker': attacker.get('name'),
-            'target': target.get('name'),
-            'attack_roll': attack_roll,
-            'attack_total': attack_total,
-            'target_ac': ac,
-            'hit': hit,
-            'critical_hit': critical_hit,
-            'critical_miss': critical_miss,
-            'damage': 0
-        }
+        damage_roll = compile_dice_expression(damage_dice).roll(rand.draw).total
         
-        # Calculate damage if hit
-        if hit:
-            damage_dice = attack_data.get('damage_dice', '1d6')
-            damage_modifier = attack_data.get('damage_modifier', 0)
-            
-            # Parse damage dice
-            dice_count, dice_sides = map(int, damage_dice.split('d'))
-            damage_roll = sum(random.randint(1, dice_sides) for _ in range(dice_count))
-            
-            if critical_hit:
-                damage_roll *= 2
-            
-            total_damage = damage_roll + damage_modifier
-            result['damage'] = max(0, total_damage)
-            result['damage_roll'] = damage_roll
-            result['damage_modifier'] = damage_modifier
+        if critical_hit:
+            damage_roll *= 2
         
-        logger.info("Attack resolved", result=result)
+        total_damage = damage_roll + damage_modifier
+        result['damage'] = max(0, total_damage)
+        result['damage_roll'] = damage_roll
+        result['damage_modifier'] = damage_modifier
+    
+    return result
+
+@shared_task
+def resolve_attack_batch(
+    attackers: List[Dict[str, Any]],
+    targets: List[Dict[str, Any]],
+    attack_data: Union[Dict[str, Any], List[Dict[str, Any]]],
+    pairing: str = 'all',
+    rng: RngSpec = None
+) -> Dict[str, Any]:
+    """
+    Resolve many attacks in one vectorized pass (area effects, multiattack,
+    large encounters)
+    
+    Args:
+        attackers: Attacker data
+        targets: Target data
+        attack_data: Attack details shared by all attackers, or one dict per
+            attacker; 'multiattack' sets the number of attacks per pairing
+        pairing: 'all' (every attacker attacks every target) or 'zip'
+            (attacker i attacks target i modulo the number of targets)
+        rng: RNG stream spec {"stream_id", "offset"}; anonymous stream if omitted
+    
+    Returns:
+        Columnar attack results (one list entry per attack) plus damage per target id
+    """
+    try:
+        result = _resolve_attack_batch(
+            attackers, targets, attack_data, pairing, RngStream.from_spec(rng).block()
+        )
+        logger.info("Attack batch resolved",
+                   attacks=result['count'],
+                   hits=sum(result['hit']),
+                   damage_by_target=result['damage_by_target'])
         return result
         
     except Exception as e:
-        logger.error("Attack resolution failed", error=str(e))
-        return {'error': f'Attack resolution failed: {str(e)}'}
+        logger.error("Attack batch resolution failed", error=str(e))
+        return {'error': f'Attack batch resolution failed: {str(e)}'}
+
+_ADVANTAGE_CODES = {'advantage': 1, 'disadvantage': -1}
+
+def _resolve_attack_batch(
+    attackers: List[Dict[str, Any]],
+    targets: List[Dict[str, Any]],
+    attack_data: Union[Dict[str, Any], List[Dict[str, Any]]],
+    pairing: str,
+    rand: BlockRandom
+) -> Dict[str, Any]:
+    """Vectorized equivalent of _resolve_attack over every (attacker, target) pairing"""
+    per_attacker = attack_data if isinstance(attack_data, list) else [attack_data] * len(attackers)
+    if len(per_attacker) != len(attackers):
+        raise ValueError("attack_data list must have one entry per attacker")
+    
+    # Expand the pairings into one row per attack
+    rows: List[Tuple[int, int]] = []
+    for a, data in enumerate(per_attacker):
+        if pairing == 'all':
+            paired = range(len(targets))
+        elif pairing == 'zip':
+            paired = [a % len(targets)] if targets else []
+        else:
+            raise ValueError(f"Unsupported pairing: {pairing}")
+        for t in paired:
+            rows.extend([(a, t)] * data.get('multiattack', 1))
+    
+    count = len(rows)
+    attacker_idx = np.fromiter((a for a, _ in rows), dtype=np.intp, count=count)
+    target_idx = np.fromiter((t for _, t in rows), dtype=np.intp, count=count)
+    attack_modifier = np.array([d.get('attack_modifier', 0) for d in per_attacker], dtype=np.int32)[attacker_idx]
+    advantage = np.array([_ADVANTAGE_CODES.get(d.get('advantage'), 0) for d in per_attacker], dtype=np.int8)[attacker_idx]
+    target_ac = np.array([t.get('armor_class', 10) for t in targets], dtype=np.int32)[target_idx]
+    
+    # Attack rolls: two d20s per attack, reduced by advantage state
+    generator = rand.generator
+    d20 = generator.integers(1, 21, size=(count, 2), dtype=np.int32)
+    attack_roll = np.where(advantage > 0, d20.max(axis=1), np.where(advantage < 0, d20.min(axis=1), d20[:, 0]))
+    attack_total = attack_roll + attack_modifier
+    hit = attack_total >= target_ac
+    critical_hit = attack_roll == 20
+    critical_miss = attack_roll == 1
+    
+    # Damage: one vectorized roll per distinct damage expression
+    damage = np.zeros(count, dtype=np.int32)
+    by_expression: Dict[str, List[int]] = {}
+    for a, data in enumerate(per_attacker):
+        by_expression.setdefault(data.get('damage_dice', '1d6'), []).append(a)
+    for expression, owners in by_expression.items():
+        mask = hit & np.isin(attacker_idx, owners)
+        n = int(mask.sum())
+        if not n:
+            continue
+        roll = roll_expressions([compile_dice_expression(expression)], n, rng=generator).totals[0]
+        damage[mask] = roll
+    damage[critical_hit] *= 2
+    damage_modifier = np.array([d.get('damage_modifier', 0) for d in per_attacker], dtype=np.int32)[attacker_idx]
+    damage = np.where(hit, np.maximum(0, damage + damage_modifier), 0)
+    
+    # Keyed by participant id; two targets can share a name
+    target_ids = [str(t.get('id', t.get('name', i))) for i, t in enumerate(targets)]
+    damage_by_target: Dict[str, int] = {}
+    target_damage = np.bincount(target_idx, weights=damage, minlength=len(targets))
+    for participant_id, amount in zip(target_ids, target_damage.tolist()):
+        damage_by_target[participant_id] = damage_by_target.get(participant_id, 0) + int(amount)
+    
+    attacker_names = [a.get('name') for a in attackers]
+    target_names = [t.get('name') for t in targets]
+    target_rows = target_idx.tolist()
+    return {
+        'count': count,
+        'attacker': [attacker_names[a] for a in attacker_idx.tolist()],
+        'target': [target_names[t] for t in target_rows],
+        'target_id': [target_ids[t] for t in target_rows],
+        'attack_roll': attack_roll.tolist(),
+        'attack_total': attack_total.tolist(),
+        'target_ac': target_ac.tolist(),
+        'hit': hit.tolist(),
+        'critical_hit': critical_hit.tolist(),
+        'critical_miss': critical_miss.tolist(),
+        'damage': damage.tolist(),
+        'damage_by_target': damage_by_target,
+        'rng': rand.record()
+    }
 
 @shared_task
 def resolve_save(
     saver: Dict[str, Any],
-    save_data: Dict[str, Any]
+    save_data: Dict[str, Any],
+    rng: RngSpec = None
 ) -> Dict[str, Any]:
     """
     Resolve a saving throw
@@ -153,58 +285,13 @@ def resolve_save(
     Args:
         saver: Character making the save
         save_data: Save details (DC, save type, etc.)
+        rng: RNG stream spec {"stream_id", "offset"}; anonymous stream if omitted
     
     Returns:
         Save resolution result
     """
     try:
-        logger.info("Resolving save", 
-                   saver=saver.get('name'),
-                   save_type=save_data.get('save_type'))
-        
-        # Roll save
-        save_roll = random.randint(1, 20)
-        save_modifier = save_data.get('save_modifier', 0)
-        save_total = save_roll + save_modifier
-        
-        # Handle advantage/disadvantage
-        if save_data.get('advantage') == 'advantage':
-            second_roll = random.randint(1, 20)
-            save_total = max(save_roll + save_modifier, second_roll + save_modifier)
-            save_roll = max(save_roll, second_roll)
-        elif save_data.get('advantage') == 'disadvantage':
-            second_roll = random.randint(1, 20)
-            save_total = min(save_roll + save_modifier, second_roll + save_modifier)
-            save_roll = min(save_roll, second_roll)
-        
-        # Determine success
-        dc = save_data.get('dc', 10)
-        success = save_total >= dc
-        critical_success = save_roll == 20
-        critical_failure = save_roll == 1
-        
-        # Determine degree of success/failure
-        if save_total >= dc + 10:
-            degree = 'critical_success'
-        elif save_total <= dc - 10:
-            degree = 'critical_failure'
-        elif success:
-            degree = 'success'
-        else:
-            degree = 'failure'
-        
-        result = {
-            'saver': saver.get('name'),
-            'save_type': save_data.get('save_type'),
-            'save_roll': save_roll,
-            'save_total': save_total,
-            'dc': dc,
-            'success': success,
-            'critical_success': critical_success,
-            'critical_failure': critical_failure,
-            'degree': degree
-        }
-        
+        result = _resolve_save(saver, save_data, RngStream.from_spec(rng).block())
         logger.info("Save resolved", result=result)
         return result
         
@@ -212,12 +299,141 @@ def resolve_save(
         logger.error("Save resolution failed", error=str(e))
         return {'error': f'Save resolution failed: {str(e)}'}
 
+def _resolve_save(
+    saver: Dict[str, Any],
+    save_data: Dict[str, Any],
+    rand: BlockRandom
+) -> Dict[str, Any]:
+    """Resolve a saving throw from one RNG block"""
+    # Roll save
+    save_modifier = save_data.get('save_modifier', 0)
+    save_roll, save_total = _roll_d20(save_modifier, save_data.get('advantage'), rand)
+    
+    # Determine success
+    dc = save_data.get('dc', 10)
+    success = save_total >= dc
+    critical_success = save_roll == 20
+    critical_failure = save_roll == 1
+    
+    # Determine degree of success/failure
+    if save_total >= dc + 10:
+        degree = 'critical_success'
+    elif save_total <= dc - 10:
+        degree = 'critical_failure'
+    elif success:
+        degree = 'success'
+    else:
+        degree = 'failure'
+    
+    return {
+        'saver': saver.get('name'),
+        'save_type': save_data.get('save_type'),
+        'save_roll': save_roll,
+        'save_total': save_total,
+        'dc': dc,
+        'success': success,
+        'critical_success': critical_success,
+        'critical_failure': critical_failure,
+        'degree': degree,
+        'rng': rand.record()
+    }
+
+@shared_task
+def resolve_save_batch(
+    savers: List[Dict[str, Any]],
+    save_data: Dict[str, Any],
+    rng: RngSpec = None
+) -> Dict[str, Any]:
+    """
+    Resolve one effect's saving throws for many creatures (area spells, auras)
+    
+    Args:
+        savers: Creatures making the save; each may carry 'saves' (save type ->
+            modifier), 'save_modifier' and 'save_advantage'
+        save_data: 'dc', 'save_type', 'advantage', and optionally 'damage_dice',
+            'damage_modifier' and 'half_on_success' (default True)
+        rng: RNG stream spec {"stream_id", "offset"}; anonymous stream if omitted
+    
+    Returns:
+        Columnar save results plus damage per participant id
+    """
+    try:
+        result = _resolve_save_batch(savers, save_data, RngStream.from_spec(rng).block())
+        logger.info("Save batch resolved",
+                   saves=result['count'],
+                   successes=sum(result['success']),
+                   damage_by_target=result['damage_by_target'])
+        return result
+        
+    except Exception as e:
+        logger.error("Save batch resolution failed", error=str(e))
+        return {'error': f'Save batch resolution failed: {str(e)}'}
+
+def _resolve_save_batch(
+    savers: List[Dict[str, Any]],
+    save_data: Dict[str, Any],
+    rand: BlockRandom
+) -> Dict[str, Any]:
+    """Vectorized _resolve_save over every saver, with one shared damage roll"""
+    count = len(savers)
+    save_type = save_data.get('save_type')
+    default_modifier = save_data.get('save_modifier', 0)
+    modifier = np.array(
+        [s.get('saves', {}).get(save_type, s.get('save_modifier', default_modifier)) for s in savers],
+        dtype=np.int32
+    )
+    advantage = np.array(
+        [_ADVANTAGE_CODES.get(s.get('save_advantage', save_data.get('advantage')), 0) for s in savers],
+        dtype=np.int8
+    )
+    
+    generator = rand.generator
+    d20 = generator.integers(1, 21, size=(count, 2), dtype=np.int32)
+    save_roll = np.where(advantage > 0, d20.max(axis=1), np.where(advantage < 0, d20.min(axis=1), d20[:, 0]))
+    save_total = save_roll + modifier
+    dc = save_data.get('dc', 10)
+    success = save_total >= dc
+    degree = np.where(save_total >= dc + 10, 'critical_success',
+                      np.where(save_total <= dc - 10, 'critical_failure',
+                               np.where(success, 'success', 'failure')))
+    
+    # Area effects roll damage once and apply it to every target
+    damage = np.zeros(count, dtype=np.int32)
+    damage_roll = None
+    if save_data.get('damage_dice') and count:
+        rolled = roll_expressions([compile_dice_expression(save_data['damage_dice'])], 1, rng=generator)
+        damage_roll = max(0, int(rolled.totals[0][0]) + save_data.get('damage_modifier', 0))
+        on_success = damage_roll // 2 if save_data.get('half_on_success', True) else 0
+        damage = np.where(success, on_success, damage_roll).astype(np.int32)
+    
+    ids = [str(s.get('id', s.get('name', i))) for i, s in enumerate(savers)]
+    damage_by_target: Dict[str, int] = {}
+    for participant_id, amount in zip(ids, damage.tolist()):
+        damage_by_target[participant_id] = damage_by_target.get(participant_id, 0) + amount
+    
+    return {
+        'count': count,
+        'saver': [s.get('name') for s in savers],
+        'participant_id': ids,
+        'save_type': save_type,
+        'dc': dc,
+        'save_roll': save_roll.tolist(),
+        'save_total': save_total.tolist(),
+        'success': success.tolist(),
+        'degree': degree.tolist(),
+        'damage_roll': damage_roll,
+        'damage': damage.tolist(),
+        'damage_by_target': damage_by_target,
+        'rng': rand.record()
+    }
+
 @shared_task
 def process_turn(
     actor: Dict[str, Any],
     action: str,
     action_data: Dict[str, Any],
-    targets: List[Dict[str, Any]] = None
+    targets: List[Dict[str, Any]] = None,
+    rng: RngSpec = None
 ) -> Dict[str, Any]:
     """
     Process a combat turn
@@ -225,52 +441,17 @@ def process_turn(
     Args:
         actor: Character taking the turn
         action: Type of action (attack, cast, move, etc.)
-        action_data: Action details
+        action_data: Action details ('batch': True resolves an attack against
+            all targets in one vectorized pass with a columnar result; a cast
+            with 'save' resolves that save for all targets via resolve_save_batch)
         targets: List of targets (if applicable)
+        rng: RNG stream spec {"stream_id", "offset"}; anonymous stream if omitted
     
     Returns:
         Turn resolution result
     """
     try:
-        logger.info("Processing turn", 
-                   actor=actor.get('name'),
-                   action=action)
-        
-        result = {
-            'actor': actor.get('name'),
-            'action': action,
-            'timestamp': datetime.utcnow().isoformat(),
-            'results': []
-        }
-        
-        if action == 'attack':
-            if targets:
-                for target in targets:
-                    attack_result = resolve_attack(actor, target, action_data)
-                    result['results'].append(attack_result)
-        elif action == 'save':
-            save_result = resolve_save(actor, action_data)
-            result['results'].append(save_result)
-        elif action == 'cast':
-            # Handle spell casting
-            result['results'].append({
-                'type': 'spell_cast',
-                'spell': action_data.get('spell_name'),
-                'level': action_data.get('spell_level', 1)
-            })
-        elif action == 'move':
-            # Handle movement
-            result['results'].append({
-                'type': 'movement',
-                'distance': action_data.get('distance', 0),
-                'direction': action_data.get('direction', 'forward')
-            })
-        else:
-            result['results'].append({
-                'type': 'action',
-                'description': action_data.get('description', 'Unknown action')
-            })
-        
+        result = _process_turn(actor, action, action_data, targets, RngStream.from_spec(rng))
         logger.info("Turn processed", result=result)
         return result
         
@@ -278,6 +459,57 @@ def process_turn(
         logger.error("Turn processing failed", error=str(e))
         return {'error': f'Turn processing failed: {str(e)}'}
 
+def _process_turn(
+    actor: Dict[str, Any],
+    action: str,
+    action_data: Dict[str, Any],
+    targets: Optional[List[Dict[str, Any]]],
+    stream: RngStream
+) -> Dict[str, Any]:
+    """Process a turn; each attack or save draws its own block from ``stream``"""
+    result = {
+        'actor': actor.get('name'),
+        'action': action,
+        'timestamp': datetime.utcnow().isoformat(),
+        'results': []
+    }
+    
+    if action == 'attack' and targets and action_data.get('batch'):
+        # One vectorized pass returning a single columnar result
+        result['results'].append(_resolve_attack_batch([actor], targets, action_data, 'all', stream.block()))
+    elif action == 'attack':
+        if targets:
+            for target in targets:
+                result['results'].append(_resolve_attack(actor, target, action_data, stream.block()))
+    elif action == 'save':
+        result['results'].append(_resolve_save(actor, action_data, stream.block()))
+    elif action == 'cast':
+        # Handle spell casting
+        cast = {
+            'type': 'spell_cast',
+            'spell': action_data.get('spell_name'),
+            'level': action_data.get('spell_level', 1)
+        }
+        if action_data.get('save') and targets:
+            # Targets come pre-selected, e.g. by map_service.select_area_targets
+            cast['saves'] = _resolve_save_batch(targets, action_data['save'], stream.block())
+        result['results'].append(cast)
+    elif action == 'move':
+        # Handle movement
+        result['results'].append({
+            'type': 'movement',
+            'distance': action_data.get('distance', 0),
+            'direction': action_data.get('direction', 'forward')
+        })
+    else:
+        result['results'].append({
+            'type': 'action',
+            'description': action_data.get('description', 'Unknown action')
+        })
+    
+    result['rng'] = stream.record()
+    return result
+
 @shared_task
 def check_combat_end(
     participants: List[Dict[str, Any]]
@@ -292,40 +524,181 @@ def check_combat_end(
         Combat end check result
     """
     try:
-        logger.info("Checking combat end", participant_count=len(participants))
+        result = _check_combat_end(participants)
+        logger.info("Combat end check completed", result=result)
+        return result
         
-        # Count conscious participants by side
-        sides = {}
-        for participant in participants:
-            side = participant.get('side', 'neutral')
-            if side not in sides:
-                sides[side] = {'conscious': 0, 'total': 0}
-            
-            sides[side]['total'] += 1
-            if participant.get('current_hp', 0) > 0:
-                sides[side]['conscious'] += 1
+    except Exception as e:
+        logger.error("Combat end check failed", error=str(e))
+        return {'error': f'Combat end check failed: {str(e)}'}
+
+def _check_combat_end(participants: List[Dict[str, Any]]) -> Dict[str, Any]:
+    """Tally conscious participants per side and decide whether combat is over"""
+    # Count conscious participants by side
+    sides = {}
+    for participant in participants:
+        side = participant.get('side', 'neutral')
+        if side not in sides:
+            sides[side] = {'conscious': 0, 'total': 0}
         
-        # Check for combat end conditions
-        conscious_sides = [side for side, data in sides.items() if data['conscious'] > 0]
+        sides[side]['total'] += 1
+        if participant.get('current_hp', 0) > 0:
+            sides[side]['conscious'] += 1
+    
+    # Check for combat end conditions
+    conscious_sides = [side for side, data in sides.items() if data['conscious'] > 0]
+    
+    if len(conscious_sides) <= 1:
+        # Combat should end
+        winner = conscious_sides[0] if conscious_sides else None
+        return {
+            'combat_should_end': True,
+            'winner': winner,
+            'reason': 'One or fewer sides have conscious participants',
+            'sides': sides
+        }
+    
+    return {
+        'combat_should_end': False,
+        'sides': sides
+    }
+
+@shared_task(bind=True)
+def simulate_encounter(
+    self,
+    participants: List[Dict[str, Any]],
+    simulations: int = 1000,
+    workers: int = None,
+    rng: RngSpec = None
+) -> Dict[str, Any]:
+    """
+    Estimate encounter difficulty by playing out many full combats
+    
+    The combats are split into fixed-size chunks (see encounter_simulator).
+    Unless ``workers`` is 1, this task replaces itself with a chord: one
+    simulate_encounter_chunk task per chunk, then summarize_encounter. The
+    chunks then run in parallel on every worker consuming the queue. The
+    result is the same either way.
+    
+    Args:
+        participants: Participants as for check_combat_end, each with an
+            'attack_data' dict as for resolve_attack
+        simulations: Number of combats to simulate (1 to MAX_SIMULATIONS)
+        workers: 1 runs every chunk inside this task; when called directly
+            (not as a task), the number of local processes
+        rng: RNG stream spec {"stream_id", "offset"}; anonymous stream if omitted
+    
+    Returns:
+        Win probability per side, rounds-to-finish histogram, expected HP
+        loss per side and survival probability per participant
+    """
+    try:
+        stream = RngStream.from_spec(rng)
+        try:
+            chunks = encounter_simulator.plan_chunks(simulations, stream)
+        except ValueError as e:
+            return {'error': f'Invalid simulation count: {str(e)}'}
+        if self.request.called_directly:
+            result = encounter_simulator.simulate_encounter(participants, simulations, stream, workers)
+            return _encounter_result(result, stream.stream_id, simulations)
+        if workers == 1 or len(chunks) == 1:
+            tallies = [encounter_simulator.simulate_chunk(participants, count, stream_id) for count, stream_id in chunks]
+            result = encounter_simulator.summarize(participants, tallies, simulations)
+            return _encounter_result(result, stream.stream_id, simulations)
+        fan_out = chord(
+            [simulate_encounter_chunk.s(participants, count, stream_id) for count, stream_id in chunks],
+            summarize_encounter.s(participants, simulations, stream.stream_id)
+        )
         
-        if len(conscious_sides) <= 1:
-            # Combat should end
-            winner = conscious_sides[0] if conscious_sides else None
-            result = {
-                'combat_should_end': True,
-                'winner': winner,
-                'reason': 'One or fewer sides have conscious participants',
-                'sides': sides
-            }
-        else:
-            result = {
-                'combat_should_end': False,
-                'sides': sides
-            }
+    except Exception as e:
+        logger.error("Encounter simulation failed", error=str(e))
+        return {'error': f'Encounter simulation failed: {str(e)}'}
+    
+    # Outside the try: replace() ends this task by raising celery's Ignore
+    return self.replace(fan_out)
+
+@shared_task
+def simulate_encounter_chunk(participants: List[Dict[str, Any]], count: int, stream_id: str) -> Dict[str, Any]:
+    """One chunk of simulate_encounter: raw tallies for ``count`` combats on substream ``stream_id``"""
+    try:
+        return encounter_simulator.simulate_chunk(participants, count, stream_id)
+    except Exception as e:
+        logger.error("Encounter simulation chunk failed", stream_id=stream_id, error=str(e))
+        return {'error': f'Encounter simulation chunk failed: {str(e)}'}
+
+@shared_task
+def summarize_encounter(
+    tallies: List[Dict[str, Any]],
+    participants: List[Dict[str, Any]],
+    simulations: int,
+    stream_id: str
+) -> Dict[str, Any]:
+    """Chord callback of simulate_encounter: merge the chunk tallies"""
+    try:
+        failed = [t['error'] for t in tallies if 'error' in t]
+        if failed:
+            return {'error': f'Encounter simulation failed: {failed[0]}'}
+        result = encounter_simulator.summarize(participants, tallies, simulations)
+        return _encounter_result(result, stream_id, simulations)
         
-        logger.info("Combat end check completed", result=result)
+    except Exception as e:
+        logger.error("Encounter simulation failed", error=str(e))
+        return {'error': f'Encounter simulation failed: {str(e)}'}
+
+def _encounter_result(result: Dict[str, Any], stream_id: str, simulations: int) -> Dict[str, Any]:
+    result['rng'] = {'stream_id': stream_id, 'substreams': f"{stream_id}/*"}
+    logger.info("Encounter simulated",
+               simulations=simulations,
+               win_probability=result['win_probability'],
+               expected_rounds=result['expected_rounds'])
+    return result
+
+@shared_task
+def update_combat_state(
+    state: Dict[str, Any],
+    damage: Dict[str, int] = None,
+    advance_turn: bool = False
+) -> Dict[str, Any]:
+    """
+    Apply damage/healing to a serialized CombatState and optionally advance the turn
+    
+    Args:
+        state: CombatState.to_dict() output (or participant list to start a new state)
+        damage: Participant id -> damage (negative values heal)
+        advance_turn: Move to the next conscious participant after applying damage
+    
+    Returns:
+        Updated serialized state plus end-of-combat status and whose turn it is
+    """
+    try:
+        combat = CombatState.from_participants(state) if isinstance(state, list) else CombatState.from_dict(state)
+        result = _update_combat_state(combat, damage, advance_turn)
+        logger.info("Combat state updated",
+                   round=result['round'],
+                   current=result['current'],
+                   combat_should_end=result['combat_should_end'])
         return result
         
     except Exception as e:
-        logger.error("Combat end check failed", error=str(e))
-        return {'error': f'Combat end check failed: {str(e)}'}
+        logger.error("Combat state update failed", error=str(e))
+        return {'error': f'Combat state update failed: {str(e)}'}
+
+def _update_combat_state(
+    combat: CombatState,
+    damage: Optional[Dict[str, int]],
+    advance_turn: bool
+) -> Dict[str, Any]:
+    """Mutate ``combat`` in place and summarize it"""
+    if damage:
+        combat.apply_damage_batch([combat.index_of(pid) for pid in damage], damage.values())
+    if advance_turn:
+        combat.advance_turn()
+    
+    return {
+        'state': combat.to_dict(),
+        'combat_should_end': combat.combat_should_end,
+        'winner': combat.winner,
+        'sides': combat.side_summary(),
+        'current': combat.ids[combat.current] if len(combat) else None,
+        'round': combat.round
+    }
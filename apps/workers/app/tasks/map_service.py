@@ -3,6 +3,15 @@ import structlog
 from typing import Dict, Any, List, Optional, Tuple
 import json
 import math
+import os
+import numpy as np
+from app.services.aoe_templates import template_cells, tokens_in_cells
+from app.services.fog_of_war import FogState, blocked_for_map, view_origin
+from app.services.map_grid import GridGeometry
+from app.services.obstacle_raster import ObstacleRaster, hex_blocked, obstacles_at, raster_for_map
+from app.services.pathfinding import DEFAULT_SPEED, find_path, reachable_for_token, token_movement_grid
+from app.services import export_store, hex_grid, map_cache, map_pyramid, map_render, map_state
+from app.services.token_index import FEET_PER_CELL, TokenIndex, index_for_map, token_cell, token_footprint
 
 logger = structlog.get_logger()
 
@@ -11,7 +20,9 @@ def generate_map_grid(
     width: int,
     height: int,
     grid_size: int = 50,
-    grid_type: str = 'square'
+    grid_type: str = 'square',
+    include_buffers: bool = False,
+    expand_cells: bool = False
 ) -> Dict[str, Any]:
     """
     Generate a grid for a map
@@ -21,9 +32,11 @@ def generate_map_grid(
         height: Map height in pixels
         grid_size: Size of each grid cell in pixels
         grid_type: Type of grid ('square', 'hex')
+        include_buffers: Add base64 origin/center/vertex buffers
+        expand_cells: Add the legacy per-cell dict list (large for big maps)
     
     Returns:
-        Grid configuration and cell data
+        Compact grid descriptor (see app.services.map_grid for the layout formula)
     """
     try:
         logger.info("Generating map grid", 
@@ -32,104 +45,26 @@ def generate_map_grid(
                    grid_size=grid_size, 
                    grid_type=grid_type)
         
-        if grid_type == 'square':
-            return _generate_square_grid(width, height, grid_size)
-        elif grid_type == 'hex':
-            return _generate_hex_grid(width, height, grid_size)
-        else:
-            raise ValueError(f"Unsupported grid type: {grid_type}")
+        geometry = GridGeometry.for_map(width, height, grid_size, grid_type)
+        result = geometry.descriptor()
+        if include_buffers:
+            result['buffers'] = geometry.buffers()
+        if expand_cells:
+            result['cells'] = geometry.expand_cells()
+        return result
             
     except Exception as e:
         logger.error("Grid generation failed", error=str(e))
         return {'error': f'Grid generation failed: {str(e)}'}
 
-def _generate_square_grid(width: int, height: int, grid_size: int) -> Dict[str, Any]:
-    """Generate a square grid"""
-    cols = math.ceil(width / grid_size)
-    rows = math.ceil(height / grid_size)
-    
-    cells = []
-    for row in range(rows):
-        for col in range(cols):
-            cell = {
-                'id': f"{row}_{col}",
-                'row': row,
-                'col': col,
-                'x': col * grid_size,
-                'y': row * grid_size,
-                'width': grid_size,
-                'height': grid_size,
-                'center_x': col * grid_size + grid_size // 2,
-                'center_y': row * grid_size + grid_size // 2
-            }
-            cells.append(cell)
-    
-    return {
-        'grid_type': 'square',
-        'grid_size': grid_size,
-        'cols': cols,
-        'rows': rows,
-        'cells': cells,
-        'total_cells': len(cells)
-    }
-
-def _generate_hex_grid(width: int, height: int, grid_size: int) -> Dict[str, Any]:
-    """Generate a hexagonal grid"""
-    # Hex grid calculations
-    hex_width = grid_size * 2
-    hex_height = grid_size * math.sqrt(3)
-    
-    cols = math.ceil(width / (hex_width * 0.75))
-    rows = math.ceil(height / hex_height)
-    
-    cells = []
-    for row in range(rows):
-        for col in range(cols):
-            x = col * hex_width * 0.75
-            y = row * hex_height
-            if col % 2 == 1:
-                y += hex_height / 2
-            
-            cell = {
-                'id': f"{row}_{col}",
-                'row': row,
-                'col': col,
-                'x': x,
-                'y': y,
-                'width': hex_width,
-                'height': hex_height,
-                'center_x': x + hex_width // 2,
-                'center_y': y + hex_height // 2,
-                'points': _calculate_hex_points(x, y, grid_size)
-            }
-            cells.append(cell)
-    
-    return {
-        'grid_type': 'hex',
-        'grid_size': grid_size,
-        'cols': cols,
-        'rows': rows,
-        'cells': cells,
-        'total_cells': len(cells)
-    }
-
-def _calculate_hex_points(center_x: float, center_y: float, size: int) -> List[Tuple[float, float]]:
-    """Calculate the six points of a hexagon"""
-    points = []
-    for i in range(6):
-        angle = i * math.pi / 3
-        x = center_x + size * math.cos(angle)
-        y = center_y + size * math.sin(angle)
-        points.append((x, y))
-    return points
-
 @shared_task
 def calculate_distance(
     x1: float,
     y1: float,
     x2: float,
     y2: float,
-    grid_type: str = 'square'
+    grid_type: str = 'square',
+    grid_size: int = 50
 ) -> Dict[str, Any]:
     """
     Calculate distance between two points on a grid
@@ -138,6 +73,7 @@ def calculate_distance(
         x1, y1: First point coordinates
         x2, y2: Second point coordinates
         grid_type: Type of grid ('square', 'hex')
+        grid_size: Hex size in pixels (hex grids take pixel coordinates)
     
     Returns:
         Distance calculation result
@@ -155,10 +91,13 @@ def calculate_distance(
                 'method': 'manhattan'
             }
         elif grid_type == 'hex':
-            # Hex distance calculation
-            distance = _calculate_hex_distance(x1, y1, x2, y2)
+            # Whole hex steps between the hexes containing each point
+            q1, r1 = hex_grid.pixel_to_axial(x1, y1, grid_size)
+            q2, r2 = hex_grid.pixel_to_axial(x2, y2, grid_size)
+            distance = int(hex_grid.distance(q1, r1, q2, r2))
             return {
                 'distance': distance,
+                'feet': distance * FEET_PER_CELL,
                 'grid_type': grid_type,
                 'method': 'hex'
             }
@@ -175,17 +114,6 @@ def calculate_distance(
         logger.error("Distance calculation failed", error=str(e))
         return {'error': f'Distance calculation failed: {str(e)}'}
 
-def _calculate_hex_distance(x1: float, y1: float, x2: float, y2: float) -> float:
-    """Calculate distance on a hex grid"""
-    # Convert to hex coordinates
-    q1 = (x1 * math.sqrt(3) / 3 - y1 / 3)
-    r1 = y1 * 2 / 3
-    q2 = (x2 * math.sqrt(3) / 3 - y2 / 3)
-    r2 = y2 * 2 / 3
-    
-    # Hex distance formula
-    return (abs(q1 - q2) + abs(r1 - r2) + abs(q1 + r1 - q2 - r2)) / 2
-
 @shared_task
 def place_token(
     token_data: Dict[str, Any],
@@ -196,7 +124,8 @@ def place_token(
     
     Args:
         token_data: Token information (position, size, type, etc.)
-        map_data: Map configuration and grid data
+        map_data: Map configuration and grid data, or a synced
+            {'id', 'version'} reference (the move is then committed as a delta)
     
     Returns:
         Token placement result with grid position
@@ -207,6 +136,8 @@ def place_token(
                    x=token_data.get('x'),
                    y=token_data.get('y'))
         
+        reference = map_state.is_reference(map_data)
+        map_data = map_state.resolve(map_data)
         x = token_data.get('x', 0)
         y = token_data.get('y', 0)
         grid_size = map_data.get('grid_size', 50)
@@ -217,9 +148,9 @@ def place_token(
             grid_x = int(x // grid_size)
             grid_y = int(y // grid_size)
         else:  # hex
-            # Convert to hex coordinates
-            grid_x = int(x // (grid_size * 1.5))
-            grid_y = int(y // (grid_size * math.sqrt(3)))
+            # Offset (col, row) of the hex containing the point
+            col, row = hex_grid.pixel_to_offset(x, y, grid_size)
+            grid_x, grid_y = int(col), int(row)
         
         # Validate placement
         if not _is_valid_position(grid_x, grid_y, map_data):
@@ -229,12 +160,26 @@ def place_token(
             }
         
         # Check for collision with other tokens
-        if _check_token_collision(token_data, map_data):
+        index = index_for_map(map_data)
+        collisions = _check_token_collision(token_data, map_data, grid_x, grid_y, index)
+        if collisions:
             return {
                 'success': False,
-                'error': 'Token collision detected'
+                'error': 'Token collision detected',
+                'colliding_tokens': collisions
             }
         
+        token_id = str(token_data.get('id'))
+        if token_id in index:
+            delta = {'op': 'move_token', 'token_id': token_id, 'x': x, 'y': y, 'grid_x': grid_x, 'grid_y': grid_y}
+        else:
+            delta = {'op': 'add_token', 'token': {**token_data, 'grid_x': grid_x, 'grid_y': grid_y}}
+        index.upsert(token_id, grid_x, grid_y, token_footprint(token_data))
+        
+        # Keep cached party fog in step with the move instead of dropping it
+        fog = map_cache.peek(map_data, 'fog')
+        fog_delta = fog.move_token(token_id, view_origin(index, token_id), blocked_for_map(map_data)) if fog else None
+        
         result = {
             'success': True,
             'token_id': token_data.get('id'),
@@ -242,12 +187,19 @@ def place_token(
             'grid_y': grid_y,
             'pixel_x': x,
             'pixel_y': y,
-            'cell_id': f"{grid_y}_{grid_x}"
+            'cell_id': f"{grid_y}_{grid_x}",
+            'fog_delta': fog_delta
         }
+        if reference:
+            result['map_version'] = map_state.commit(map_data, [delta], updated={'tokens': index}, invalidate=['reach'])
+        else:
+            result['map_version'] = map_cache.advance(map_data, updated={'tokens': index}, invalidate=['reach'])
         
         logger.info("Token placed successfully", result=result)
         return result
         
+    except map_state.MapVersionConflict as e:
+        return {'success': False, 'error': str(e), 'current_version': e.current}
     except Exception as e:
         logger.error("Token placement failed", error=str(e))
         return {'error': f'Token placement failed: {str(e)}'}
@@ -258,11 +210,84 @@ def _is_valid_position(grid_x: int, grid_y: int, map_data: Dict[str, Any]) -> bo
     rows = map_data.get('rows', 0)
     return 0 <= grid_x < cols and 0 <= grid_y < rows
 
-def _check_token_collision(token_data: Dict[str, Any], map_data: Dict[str, Any]) -> bool:
-    """Check if token placement would collide with existing tokens"""
-    # TODO: Implement collision detection with existing tokens
-    # For now, assume no collision
-    return False
+def _check_token_collision(
+    token_data: Dict[str, Any],
+    map_data: Dict[str, Any],
+    grid_x: int,
+    grid_y: int,
+    index: Optional[TokenIndex] = None
+) -> List[str]:
+    """Ids of tokens whose footprint overlaps the token placed at (grid_x, grid_y)"""
+    index = index if index is not None else index_for_map(map_data)
+    collisions = index.collisions(grid_x, grid_y, token_footprint(token_data), ignore=str(token_data.get('id')))
+    return sorted(collisions)
+
+@shared_task
+def find_tokens_within(
+    map_data: Dict[str, Any],
+    feet: float,
+    token_id: Optional[str] = None,
+    grid_x: Optional[int] = None,
+    grid_y: Optional[int] = None,
+    size: int = 1
+) -> Dict[str, Any]:
+    """
+    Find tokens within a distance of a token or a cell (auras, reach, emanations)
+    
+    Args:
+        map_data: Map configuration with tokens, plus id/version to reuse the index
+        feet: Radius in feet (grid distance, 5 feet per cell; hex steps on hex maps)
+        token_id: Measure from this token's footprint (excluded from the result)
+        grid_x, grid_y: Measure from this cell instead of a token
+        size: Footprint in cells when measuring from a cell
+    
+    Returns:
+        Matching token ids with their distance in feet, nearest first
+    """
+    try:
+        map_data = map_state.resolve(map_data)
+        index = index_for_map(map_data)
+        if token_id is not None:
+            grid_x, grid_y, size = index.position(str(token_id))
+        elif grid_x is None or grid_y is None:
+            raise ValueError("Either token_id or grid_x/grid_y is required")
+        
+        found = index.within(grid_x, grid_y, feet, size, ignore=None if token_id is None else str(token_id),
+                             grid_type=map_data.get('grid_type', 'square'))
+        tokens = [{'token_id': t, 'distance': d} for t, d in sorted(found.items(), key=lambda item: (item[1], item[0]))]
+        return {'tokens': tokens, 'count': len(tokens), 'feet': feet}
+        
+    except Exception as e:
+        logger.error("Token range query failed", error=str(e))
+        return {'error': f'Token range query failed: {str(e)}'}
+
+@shared_task
+def find_tokens_in_area(
+    map_data: Dict[str, Any],
+    grid_x: int,
+    grid_y: int,
+    width: int,
+    height: int
+) -> Dict[str, Any]:
+    """
+    Find tokens overlapping a rectangle of cells
+    
+    Args:
+        map_data: Map configuration with tokens, plus id/version to reuse the index
+        grid_x, grid_y: Top-left cell of the area
+        width, height: Area size in cells
+    
+    Returns:
+        Ids of tokens with at least one occupied cell in the area
+    """
+    try:
+        map_data = map_state.resolve(map_data)
+        found = index_for_map(map_data).in_area(grid_x, grid_y, grid_x + width - 1, grid_y + height - 1)
+        return {'tokens': sorted(found), 'count': len(found)}
+        
+    except Exception as e:
+        logger.error("Token area query failed", error=str(e))
+        return {'error': f'Token area query failed: {str(e)}'}
 
 @shared_task
 def calculate_line_of_sight(
@@ -278,7 +303,7 @@ def calculate_line_of_sight(
     Args:
         start_x, start_y: Starting point coordinates
         end_x, end_y: Ending point coordinates
-        map_data: Map configuration with obstacles
+        map_data: Map configuration with obstacles and walls
     
     Returns:
         Line of sight calculation result
@@ -287,26 +312,17 @@ def calculate_line_of_sight(
         logger.info("Calculating line of sight", 
                    start=(start_x, start_y),
                    end=(end_x, end_y))
+        map_data = map_state.resolve(map_data)
         
-        # Get obstacles from map data
-        obstacles = map_data.get('obstacles', [])
-        
-        # Simple line of sight calculation
-        has_line_of_sight = True
-        blocked_points = []
-        
-        # Check if line intersects with any obstacles
-        for obstacle in obstacles:
-            if _line_intersects_obstacle(start_x, start_y, end_x, end_y, obstacle):
-                has_line_of_sight = False
-                blocked_points.append(obstacle)
-                break
+        # Walk the raster cells under the ray; cost is the ray length in cells
+        blocked_at = raster_for_map(map_data).first_blocked(start_x, start_y, end_x, end_y)
         
         result = {
-            'has_line_of_sight': has_line_of_sight,
+            'has_line_of_sight': blocked_at is None,
             'start_point': (start_x, start_y),
             'end_point': (end_x, end_y),
-            'blocked_by': blocked_points,
+            'blocked_at': blocked_at,
+            'blocked_by': obstacles_at(map_data, blocked_at) if blocked_at is not None else [],
             'distance': math.sqrt((end_x - start_x) ** 2 + (end_y - start_y) ** 2)
         }
         
@@ -317,105 +333,467 @@ def calculate_line_of_sight(
         logger.error("Line of sight calculation failed", error=str(e))
         return {'error': f'Line of sight calculation failed: {str(e)}'}
 
-def _line_intersects_obstacle(
-    x1: float, y1: float, 
-    x2: float, y2: float, 
-    obstacle: Dict[str, Any]
-) -> bool:
-    """Check if a line intersects with an obstacle"""
-    # Simple rectangle intersection check
-    ox = obstacle.get('x', 0)
-    oy = obstacle.get('y', 0)
-    ow = obstacle.get('width', 0)
-    oh = obstacle.get('height', 0)
-    
-    # Check if line intersects with rectangle
-    return _line_intersects_rectangle(x1, y1, x2, y2, ox, oy, ow, oh)
+@shared_task
+def calculate_visible_tokens(
+    map_data: Dict[str, Any],
+    token_id: str,
+    target_ids: Optional[List[str]] = None
+) -> Dict[str, Any]:
+    """
+    Determine which tokens a token can see, tracing every ray in one batch
+    
+    Args:
+        map_data: Map configuration with tokens, obstacles and walls
+        token_id: Viewing token
+        target_ids: Tokens to test (defaults to every other token on the map)
+    
+    Returns:
+        Visible and hidden token ids (center-to-center line of sight)
+    """
+    try:
+        map_data = map_state.resolve(map_data)
+        index = index_for_map(map_data)
+        grid_size = map_data.get('grid_size', 50)
+        grid_type = map_data.get('grid_type', 'square')
+        token_id = str(token_id)
+        viewer_x, viewer_y = index.center(token_id, grid_size, grid_type)
+        
+        if target_ids is None:
+            targets = [t for t in index.positions() if t != token_id]
+        else:
+            targets = [str(t) for t in target_ids]
+        centers = np.array([index.center(t, grid_size, grid_type) for t in targets], dtype=np.float64)
+        visible = raster_for_map(map_data).visible_from(viewer_x, viewer_y, centers)
+        
+        return {
+            'token_id': token_id,
+            'visible': [t for t, seen in zip(targets, visible.tolist()) if seen],
+            'hidden': [t for t, seen in zip(targets, visible.tolist()) if not seen]
+        }
+        
+    except Exception as e:
+        logger.error("Visibility calculation failed", error=str(e))
+        return {'error': f'Visibility calculation failed: {str(e)}'}
+
+@shared_task
+def compute_fog(
+    map_data: Dict[str, Any],
+    party_ids: Optional[List[str]] = None
+) -> Dict[str, Any]:
+    """
+    Compute party fog of war from every party token's field of view
+    
+    Args:
+        map_data: Map configuration with tokens (``vision`` ranges), obstacles,
+            walls and optionally previously ``explored`` fog
+        party_ids: Tokens whose views are merged (defaults to ``pc`` tokens)
+    
+    Returns:
+        Packed visible/explored bitmaps; follow-up changes go through update_fog
+    """
+    try:
+        map_data = map_state.resolve(map_data)
+        fog = _fog_for_map(map_data, party_ids)
+        return fog.to_dict()
+        
+    except Exception as e:
+        logger.error("Fog computation failed", error=str(e))
+        return {'error': f'Fog computation failed: {str(e)}'}
+
+@shared_task
+def update_fog(
+    map_data: Dict[str, Any],
+    token_moves: Optional[Dict[str, Dict[str, int]]] = None,
+    map_changes: Optional[Dict[str, Any]] = None,
+    party_ids: Optional[List[str]] = None
+) -> Dict[str, Any]:
+    """
+    Apply token moves and wall/door/obstacle changes, returning fog deltas
+    
+    Args:
+        map_data: Map as of the caller's current version, or a synced
+            {'id', 'version'} reference (changes are then committed as deltas)
+        token_moves: New positions, {token_id: {'grid_x', 'grid_y'}}
+        map_changes: Replacement 'walls', 'obstacles' and/or 'difficult_terrain'
+            lists (e.g. a door opened)
+        party_ids: Tokens whose views are merged (defaults to ``pc`` tokens)
+    
+    Returns:
+        Cells that became visible, hidden or explored, and the next map version
+    """
+    try:
+        reference = map_state.is_reference(map_data)
+        map_data = map_state.resolve(map_data)
+        deltas = [
+            {'op': 'move_token', 'token_id': str(token_id), 'grid_x': int(position['grid_x']), 'grid_y': int(position['grid_y'])}
+            for token_id, position in (token_moves or {}).items()
+        ]
+        deltas += [{'op': 'set', 'key': key, 'value': value} for key, value in (map_changes or {}).items()]
+        return _apply_map_deltas(map_data, deltas, party_ids, commit=reference)
+        
+    except map_state.MapVersionConflict as e:
+        return {'success': False, 'error': str(e), 'current_version': e.current}
+    except Exception as e:
+        logger.error("Fog update failed", error=str(e))
+        return {'error': f'Fog update failed: {str(e)}'}
+
+@shared_task
+def sync_map_state(map_data: Dict[str, Any]) -> Dict[str, Any]:
+    """
+    Store a full map as the shared map state
+    
+    Afterwards tasks can be sent {'id', 'version'} instead of the whole map,
+    and changes sent to ``apply_map_deltas``.
+    
+    Args:
+        map_data: Full map including its ``id``
+    
+    Returns:
+        The version to reference the map by
+    """
+    try:
+        if map_data.get('id') is None:
+            return {'success': False, 'error': 'Map id is required'}
+        version = map_state.sync(map_data)
+        logger.info("Map state synced", map_id=map_data['id'], version=version)
+        return {'success': True, 'map_id': map_data['id'], 'map_version': version}
+        
+    except Exception as e:
+        logger.error("Map state sync failed", error=str(e))
+        return {'error': f'Map state sync failed: {str(e)}'}
+
+@shared_task
+def apply_map_deltas(
+    map_ref: Dict[str, Any],
+    deltas: List[Dict[str, Any]],
+    party_ids: Optional[List[str]] = None
+) -> Dict[str, Any]:
+    """
+    Apply small changes (token moved, wall added, door opened) to a synced map
+    
+    Args:
+        map_ref: {'id', 'version'} of the map as the caller last saw it
+        deltas: Changes in order (see ``map_state`` for the delta ops)
+        party_ids: Tokens whose views are merged (defaults to ``pc`` tokens)
+    
+    Returns:
+        Fog deltas and the new map version, or the current version on a
+        conflict so the caller can catch up and retry
+    """
+    try:
+        if not map_state.is_reference(map_ref):
+            return {'success': False, 'error': 'Expected a map reference {id, version}'}
+        map_data = map_state.resolve(map_ref)
+        return {'success': True, **_apply_map_deltas(map_data, deltas, party_ids, commit=True)}
+        
+    except map_state.MapVersionConflict as e:
+        return {'success': False, 'error': str(e), 'current_version': e.current}
+    except Exception as e:
+        logger.error("Map delta application failed", error=str(e))
+        return {'error': f'Map delta application failed: {str(e)}'}
 
-def _line_intersects_rectangle(
-    x1: float, y1: float, 
-    x2: float, y2: float,
-    rx: float, ry: float, 
-    rw: float, rh: float
-) -> bool:
-    """Check if line intersects with rectangle"""
-    # Check if either endpoint is inside the rectangle
-    if (rx <= x1 <= rx + rw and ry <= y1 <= ry + rh) or \
-       (rx <= x2 <= rx + rw and ry <= y2 <= ry + rh):
-        return True
-    
-    # Check if line intersects with any of the rectangle's edges
-    edges = [
-        (rx, ry, rx + rw, ry),           # Top edge
-        (rx + rw, ry, rx + rw, ry + rh), # Right edge
-        (rx, ry + rh, rx + rw, ry + rh), # Bottom edge
-        (rx, ry, rx, ry + rh)            # Left edge
-    ]
-    
-    for ex1, ey1, ex2, ey2 in edges:
-        if _lines_intersect(x1, y1, x2, y2, ex1, ey1, ex2, ey2):
-            return True
-    
-    return False
+def _apply_map_deltas(
+    map_data: Dict[str, Any],
+    deltas: List[Dict[str, Any]],
+    party_ids: Optional[List[str]],
+    commit: bool
+) -> Dict[str, Any]:
+    """
+    Update cached structures in place for ``deltas`` and move to the next version
+    
+    With ``commit`` the deltas are also committed to the shared map state;
+    otherwise the caller owns ``map_data`` and only the cache advances.
+    """
+    for delta in deltas:
+        map_state.check_delta(map_data, delta)
+    grid_size = map_data.get('grid_size', 50)
+    grid_type = map_data.get('grid_type', 'square')
+    index = index_for_map(map_data)
+    blocked = blocked_for_map(map_data)
+    fog = _fog_for_map(map_data, party_ids)
+    fog_deltas = []
+    fog_reset = False
+    
+    for delta in deltas:
+        op = delta['op']
+        if op == 'move_token':
+            token_id = str(delta['token_id'])
+            col, row = (delta['grid_x'], delta['grid_y']) if 'grid_x' in delta else token_cell(delta, grid_size, grid_type)
+            index.move(token_id, int(col), int(row))
+            fog_deltas.append(fog.move_token(token_id, view_origin(index, token_id), blocked))
+        elif op == 'add_token':
+            token = delta['token']
+            index.upsert(str(token['id']), *token_cell(token, grid_size, grid_type), token_footprint(token))
+            fog_reset = fog_reset or token.get('owner_kind') == 'pc' or str(token['id']) in (party_ids or [])
+        elif op == 'remove_token':
+            token_id = str(delta['token_id'])
+            index.remove(token_id)
+            fog_reset = fog_reset or token_id in fog.views
+    
+    updated = {'tokens': index}
+    invalidate = ['reach']
+    geometry = [delta for delta in deltas if map_state.changes_geometry(delta)]
+    if geometry:
+        preview = {
+            **map_data,
+            'walls': [dict(w) for w in map_data.get('walls', [])],
+            'obstacles': [dict(o) for o in map_data.get('obstacles', [])]
+        }
+        map_state.apply_deltas(preview, geometry)
+        updated['obstacles'] = ObstacleRaster.from_map(preview)
+        if grid_type == 'hex':
+            updated['obstacles:hex'] = new_blocked = hex_blocked(preview)
+        else:
+            new_blocked = updated['obstacles'].blocked
+        fog_deltas.append(fog.update_obstacles(blocked, new_blocked))
+    if geometry or any(d['op'] == 'set' and d['key'] == 'difficult_terrain' for d in deltas):
+        invalidate.append('terrain')
+    if fog_reset or any(d['op'] == 'set' and d['key'] == 'fog' for d in deltas):
+        # Party membership or stored fog changed: rebuilt on the next fog call
+        invalidate.append('fog')
+        fog_deltas = []
+    else:
+        updated['fog'] = fog
+    
+    if commit:
+        version = map_state.commit(map_data, deltas, updated=updated, invalidate=invalidate)
+    else:
+        version = map_cache.advance(map_data, updated=updated, invalidate=invalidate)
+    return {**_merge_fog_deltas(fog_deltas), 'fog_reset': 'fog' in invalidate, 'map_version': version}
 
-def _lines_intersect(
-    x1: float, y1: float, x2: float, y2: float,
-    x3: float, y3: float, x4: float, y4: float
-) -> bool:
-    """Check if two line segments intersect"""
-    def ccw(A, B, C):
-        return (C[1] - A[1]) * (B[0] - A[0]) > (B[1] - A[1]) * (C[0] - A[0])
-    
-    A = (x1, y1)
-    B = (x2, y2)
-    C = (x3, y3)
-    D = (x4, y4)
-    
-    return ccw(A, C, D) != ccw(B, C, D) and ccw(A, B, C) != ccw(A, B, D)
+def _fog_for_map(map_data: Dict[str, Any], party_ids: Optional[List[str]]) -> FogState:
+    build = lambda: FogState.from_map(map_data, index_for_map(map_data), blocked_for_map(map_data), party_ids)
+    fog = map_cache.cached(map_data, 'fog', build)
+    if party_ids is not None and fog.party != tuple(str(p) for p in party_ids):
+        fog = build()
+    return fog
+
+def _merge_fog_deltas(deltas: List[Dict[str, Any]]) -> Dict[str, Any]:
+    """Combine successive deltas; a cell revealed then hidden again cancels out"""
+    visible: Dict[Tuple[int, int], bool] = {}
+    explored = set()
+    for delta in deltas:
+        for cell in delta['visible_added']:
+            key = tuple(cell)
+            if visible.get(key) is False:
+                del visible[key]
+            else:
+                visible[key] = True
+        for cell in delta['visible_removed']:
+            key = tuple(cell)
+            if visible.get(key) is True:
+                del visible[key]
+            else:
+                visible[key] = False
+        explored.update(tuple(cell) for cell in delta['explored_added'])
+    return {
+        'visible_added': sorted(list(c) for c, seen in visible.items() if seen),
+        'visible_removed': sorted(list(c) for c, seen in visible.items() if not seen),
+        'explored_added': sorted(list(c) for c in explored)
+    }
+
+@shared_task
+def find_movement_path(
+    map_data: Dict[str, Any],
+    token_id: str,
+    goal_x: int,
+    goal_y: int,
+    max_cost: Optional[int] = None
+) -> Dict[str, Any]:
+    """
+    Find the cheapest movement path for a token (A*)
+    
+    Args:
+        map_data: Map configuration with tokens, obstacles, walls and difficult terrain
+        token_id: Moving token
+        goal_x, goal_y: Destination cell (top-left of the token's footprint)
+        max_cost: Give up on paths longer than this many feet
+    
+    Returns:
+        Path as [col, row] cells including start and goal, and its cost in feet
+    """
+    try:
+        map_data = map_state.resolve(map_data)
+        token_id = str(token_id)
+        col, row, _ = index_for_map(map_data).position(token_id)
+        costs, endable = token_movement_grid(map_data, token_id)
+        found = None
+        if 0 <= goal_y < endable.shape[0] and 0 <= goal_x < endable.shape[1] and endable[goal_y, goal_x]:
+            found = find_path(costs, (col, row), (goal_x, goal_y), max_cost, map_data.get('grid_type', 'square'))
+        if found is None:
+            return {'found': False, 'path': [], 'cost': None}
+        path, cost = found
+        return {'found': True, 'path': [list(cell) for cell in path], 'cost': cost}
+        
+    except Exception as e:
+        logger.error("Pathfinding failed", error=str(e))
+        return {'error': f'Pathfinding failed: {str(e)}'}
+
+@shared_task
+def calculate_reachable(
+    map_data: Dict[str, Any],
+    token_ids: Optional[List[str]] = None,
+    speed: Optional[int] = None
+) -> Dict[str, Any]:
+    """
+    Cells each token can move to this turn (bounded Dijkstra, cached per map version)
+    
+    Args:
+        map_data: Map configuration with tokens, obstacles, walls and difficult terrain
+        token_ids: Tokens to evaluate (defaults to every token on the map)
+        speed: Movement budget in feet (defaults to each token's ``speed``, else 30)
+    
+    Returns:
+        Per token, reachable [col, row, feet] cells
+    """
+    try:
+        map_data = map_state.resolve(map_data)
+        index = index_for_map(map_data)
+        speeds = {str(t.get('id', i)): t.get('speed', DEFAULT_SPEED) for i, t in enumerate(map_data.get('tokens', []))}
+        token_ids = [str(t) for t in token_ids] if token_ids is not None else list(index.positions())
+        
+        result = {}
+        for token_id in token_ids:
+            field = reachable_for_token(map_data, token_id, speed if speed is not None else speeds.get(token_id, DEFAULT_SPEED))
+            cells = field.reachable()
+            result[token_id] = {'cells': cells, 'count': len(cells)}
+        return {'tokens': result}
+        
+    except Exception as e:
+        logger.error("Reachability calculation failed", error=str(e))
+        return {'error': f'Reachability calculation failed: {str(e)}'}
+
+@shared_task
+def select_area_targets(
+    map_data: Dict[str, Any],
+    template: Dict[str, Any],
+    exclude: Optional[List[str]] = None
+) -> Dict[str, Any]:
+    """
+    Find the cells and tokens covered by an area-of-effect template
+    
+    Args:
+        map_data: Map configuration with tokens
+        template: {'shape': 'sphere'|'cylinder'|'cone'|'line'|'cube', 'size' (feet),
+            'direction' (degrees), 'width' (line width, feet), and either
+            'origin' [x, y] in pixels or 'origin_token' (measured from its center)}
+        exclude: Token ids to leave out (e.g. the caster)
+    
+    Returns:
+        Covered [col, row] cells and affected token ids, ready for resolve_save_batch
+    """
+    try:
+        map_data = map_state.resolve(map_data)
+        grid_size = map_data.get('grid_size', 50)
+        grid_type = map_data.get('grid_type', 'square')
+        index = index_for_map(map_data)
+        if template.get('origin_token') is not None:
+            origin = index.center(str(template['origin_token']), grid_size, grid_type)
+        else:
+            origin = tuple(template['origin'])
+        
+        cells = template_cells(template, origin, grid_size, grid_type)
+        targets = tokens_in_cells(index, cells, exclude=[str(t) for t in exclude or []])
+        return {'cells': cells.tolist(), 'targets': targets, 'count': len(targets)}
+        
+    except Exception as e:
+        logger.error("Area target selection failed", error=str(e))
+        return {'error': f'Area target selection failed: {str(e)}'}
 
 @shared_task
 def export_map(
     map_data: Dict[str, Any],
-    format: str = 'json'
+    format: str = 'json',
+    output_path: Optional[str] = None
 ) -> Dict[str, Any]:
     """
     Export map data in various formats
     
+    The export is written to a file under MAP_EXPORT_DIR (``output_path``
+    or a default name); only its path and size go into the task result.
+    PNG exports reuse cached tiles that did not change since the last render.
+    
     Args:
         map_data: Map configuration and data
         format: Export format ('json', 'png', 'svg')
+        output_path: File to write instead of the default export path,
+            relative to MAP_EXPORT_DIR; paths outside it are rejected
     
     Returns:
-        Export result with data or file path
+        Export result with file path and size
     """
     try:
         logger.info("Exporting map", format=format)
+        map_data = map_state.resolve(map_data)
         
-        if format == 'json':
-            return {
-                'success': True,
-                'format': format,
-                'data': map_data,
-                'size': len(json.dumps(map_data))
-            }
-        elif format == 'png':
-            # TODO: Implement PNG export
+        if format not in ('json', 'png', 'svg'):
             return {
                 'success': False,
-                'error': 'PNG export not yet implemented'
+                'error': f'Unsupported format: {format}'
             }
+        path = map_render.export_target(output_path) if output_path else map_render.export_path(map_data, format)
+        result = {'success': True, 'format': format, 'path': path}
+        
+        if format == 'json':
+            payload = json.dumps(map_data).encode('utf-8')
+            with open(path, 'wb') as f:
+                f.write(payload)
+            result['size'] = len(payload)
         elif format == 'svg':
-            # TODO: Implement SVG export
-            return {
-                'success': False,
-                'error': 'SVG export not yet implemented'
-            }
+            result['size'] = map_render.write_svg(map_render.MapScene.from_map(map_data), path)
         else:
-            return {
-                'success': False,
-                'error': f'Unsupported format: {format}'
-            }
+            result.update(map_render.render_png(map_data, path))
+        return result
             
     except Exception as e:
         logger.error("Map export failed", error=str(e))
         return {'error': f'Map export failed: {str(e)}'}
+
+@shared_task
+def generate_map_pyramid(
+    source_path: str,
+    map_id: Optional[str] = None,
+    output_dir: Optional[str] = None,
+    tile_size: int = map_render.TILE_SIZE,
+    tile_format: str = 'png'
+) -> Dict[str, Any]:
+    """
+    Slice a map background into a deep-zoom tile pyramid
+    
+    Tiles are streamed out band by band, so large images are never held
+    in memory whole. Clients read the manifest and fetch only the tiles
+    in view at their zoom level.
+    
+    Args:
+        source_path: Background image file
+        map_id: Map the background belongs to (names the default output)
+        output_dir: Directory for tiles and manifest.json, relative to
+            MAP_EXPORT_DIR (default ``pyramids/map-{map_id}``); paths
+            outside it are rejected
+        tile_size: Tile edge in pixels
+        tile_format: 'png', 'jpeg' or 'webp'
+    
+    Returns:
+        Manifest path plus image size, level count and tile count
+    """
+    try:
+        logger.info("Generating map pyramid", map_id=map_id, source=source_path)
+        
+        name = export_store.safe_name(map_id or os.path.splitext(os.path.basename(source_path))[0])
+        output_dir = map_render.export_target(output_dir or os.path.join('pyramids', f"map-{name}"))
+        manifest = map_pyramid.build_pyramid(source_path, output_dir, tile_size, tile_format)
+        
+        return {
+            'success': True,
+            'output_dir': output_dir,
+            'manifest_path': os.path.join(output_dir, 'manifest.json'),
+            'width': manifest['width'],
+            'height': manifest['height'],
+            'levels': manifest['max_level'] + 1,
+            'tiles': manifest['tiles'],
+            'streamed': manifest['streamed']
+        }
+        
+    except Exception as e:
+        logger.error("Map pyramid generation failed", error=str(e))
+        return {'error': f'Map pyramid generation failed: {str(e)}'}
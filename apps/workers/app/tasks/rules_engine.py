@@ -1,85 +1,120 @@
 from celery import shared_task
-import re
-import random
 import structlog
-from typing import Dict, Any, List, Tuple
+from typing import Dict, Any, List, Optional, Tuple
+from app.services.dice import compile_dice_expression
+from app.services.dice_batch import roll_expressions
+from app.services.dice_probability import check_probabilities, compiled_distribution
+from app.services.rng import BlockRandom, RngSpec, RngStream
 
 logger = structlog.get_logger()
 
 @shared_task
-def roll_dice(expression: str, advantage: str = "normal") -> Dict[str, Any]:
+def roll_dice(expression: str, advantage: str = "normal", rng: RngSpec = None) -> Dict[str, Any]:
     """
     Parse and execute dice expressions like "2d20kh1 + 5" or "1d6"
     
     Args:
         expression: Dice expression string
         advantage: "normal", "advantage", or "disadvantage"
+        rng: RNG stream spec {"stream_id", "offset"}; anonymous stream if omitted
     
     Returns:
         Dict with roll results
     """
     try:
-        logger.info("Rolling dice", expression=expression, advantage=advantage)
+        result = _roll_dice(expression, advantage, RngStream.from_spec(rng).block())
+        logger.info("Dice roll completed", result=result)
+        return result
         
-        # Parse the expression
-        parsed = parse_dice_expression(expression)
-        if not parsed:
-            return {"error": "Invalid dice expression"}
+    except ValueError:
+        return {"error": "Invalid dice expression"}
+    except Exception as e:
+        logger.error("Dice roll failed", expression=expression, error=str(e))
+        return {"error": f"Dice roll failed: {str(e)}"}
+
+def _roll_dice(expression: str, advantage: str, rand: BlockRandom) -> Dict[str, Any]:
+    """Roll a dice expression from one RNG block (raises ValueError if invalid)"""
+    # Advantage/disadvantage turns the first 1d20 term into 2d20kh1/2d20kl1
+    compiled = compile_dice_expression(expression).with_advantage(advantage)
+    outcome = compiled.roll(rand.draw)
+    
+    return {
+        "expression": expression,
+        "advantage": advantage,
+        "rolls": outcome.rolls,
+        "dropped": outcome.dropped,
+        "modifier": outcome.modifier,
+        "total": outcome.total,
+        "raw_expression": expression,
+        "rng": rand.record()
+    }
+
+@shared_task
+def roll_dice_batch(
+    expressions: List[str],
+    n: int = 1,
+    advantage: str = "normal",
+    include_dice: bool = False,
+    rng: RngSpec = None
+) -> Dict[str, Any]:
+    """
+    Roll many dice expressions, or one expression many times, in a single
+    vectorized pass (area damage, Monte Carlo checks)
+    
+    Args:
+        expressions: Dice expression strings
+        n: Number of repetitions per expression (bounded by MAX_BATCH_ROLLS
+            and MAX_BATCH_DICE across the batch)
+        advantage: "normal", "advantage", or "disadvantage" (applied to every expression)
+        include_dice: Include the raw per-die matrix for each expression
+        rng: RNG stream spec {"stream_id", "offset"}; anonymous stream if omitted
+    
+    Returns:
+        Dict with a totals matrix (one row of n totals per expression) and
+        per-expression summary statistics
+    """
+    try:
+        logger.info("Rolling dice batch", expression_count=len(expressions), n=n, advantage=advantage)
+        
+        try:
+            compiled = [compile_dice_expression(expr).with_advantage(advantage) for expr in expressions]
+        except ValueError as e:
+            return {"error": f"Invalid dice expression: {str(e)}"}
         
-        # Roll the dice
-        rolls = []
-        for dice_type, count in parsed.items():
-            for _ in range(count):
-                roll = random.randint(1, dice_type)
-                rolls.append(roll)
-        
-        # Handle advantage/disadvantage for d20 rolls
-        if advantage != "normal" and 20 in parsed:
-            d20_rolls = [r for r in rolls if r <= 20]
-            if len(d20_rolls) >= 2:
-                if advantage == "advantage":
-                    rolls = [max(d20_rolls[:2])] + [r for r in rolls if r > 20]
-                elif advantage == "disadvantage":
-                    rolls = [min(d20_rolls[:2])] + [r for r in rolls if r > 20]
-        
-        # Calculate total
-        total = sum(rolls)
-        
-        # Handle keep highest/lowest (kh/kl)
-        if "kh" in expression or "kl" in expression:
-            keep_match = re.search(r'k([hl])(\d+)', expression)
-            if keep_match:
-                keep_type, keep_count = keep_match.groups()
-                keep_count = int(keep_count)
-                
-                if keep_type == "h":
-                    rolls = sorted(rolls, reverse=True)[:keep_count]
-                else:  # keep lowest
-                    rolls = sorted(rolls)[:keep_count]
-                
-                total = sum(rolls)
+        rand = RngStream.from_spec(rng).block()
+        try:
+            batch = roll_expressions(compiled, n, rng=rand.generator, include_dice=include_dice)
+        except ValueError as e:
+            return {"error": f"Invalid dice batch: {str(e)}"}
+        totals = batch.totals
         
         result = {
-            "expression": expression,
+            "expressions": expressions,
             "advantage": advantage,
-            "rolls": rolls,
-            "total": total,
-            "raw_expression": expression
+            "n": n,
+            "totals": totals.tolist(),
+            "mean": totals.mean(axis=1).tolist() if len(expressions) else [],
+            "min": totals.min(axis=1).tolist() if len(expressions) else [],
+            "max": totals.max(axis=1).tolist() if len(expressions) else [],
+            "rng": rand.record()
         }
+        if include_dice:
+            result["dice"] = [matrix.tolist() for matrix in batch.dice]
         
-        logger.info("Dice roll completed", result=result)
+        logger.info("Dice batch completed", expression_count=len(expressions), n=n)
         return result
         
     except Exception as e:
-        logger.error("Dice roll failed", expression=expression, error=str(e))
-        return {"error": f"Dice roll failed: {str(e)}"}
+        logger.error("Dice batch failed", error=str(e))
+        return {"error": f"Dice batch failed: {str(e)}"}
 
 @shared_task
 def resolve_check(
     expression: str, 
     dc: int, 
     advantage: str = "normal",
-    modifiers: Dict[str, int] = None
+    modifiers: Dict[str, int] = None,
+    rng: RngSpec = None
 ) -> Dict[str, Any]:
     """
     Resolve a skill check or saving throw
@@ -89,86 +124,180 @@ def resolve_check(
         dc: Difficulty class
         advantage: "normal", "advantage", or "disadvantage"
         modifiers: Additional modifiers to apply
+        rng: RNG stream spec {"stream_id", "offset"}; anonymous stream if omitted
     
     Returns:
         Dict with check results
     """
     try:
-        logger.info("Resolving check", expression=expression, dc=dc, advantage=advantage)
+        result = _resolve_check(expression, dc, advantage, modifiers, RngStream.from_spec(rng).block())
+        logger.info("Check resolved", result=result)
+        return result
         
-        # Roll the dice
-        roll_result = roll_dice(expression, advantage)
-        if "error" in roll_result:
-            return roll_result
+    except ValueError:
+        return {"error": "Invalid dice expression"}
+    except Exception as e:
+        logger.error("Check resolution failed", expression=expression, error=str(e))
+        return {"error": f"Check resolution failed: {str(e)}"}
+
+def _resolve_check(
+    expression: str,
+    dc: int,
+    advantage: str,
+    modifiers: Optional[Dict[str, int]],
+    rand: BlockRandom
+) -> Dict[str, Any]:
+    """Resolve a check from one RNG block (raises ValueError if invalid)"""
+    roll_result = _roll_dice(expression, advantage, rand)
+    total = roll_result["total"]
+    
+    # Apply modifiers
+    if modifiers:
+        total += sum(modifiers.values())
+        roll_result["modifiers"] = modifiers
+        roll_result["total"] = total
+    
+    # Determine success
+    success = total >= dc
+    margin = total - dc
+    
+    # Determine degree of success/failure
+    if total >= dc + 10:
+        degree = "critical_success"
+    elif total <= dc - 10:
+        degree = "critical_failure"
+    elif success:
+        degree = "success"
+    else:
+        degree = "failure"
+    
+    return {
+        **roll_result,
+        "dc": dc,
+        "success": success,
+        "margin": margin,
+        "degree": degree
+    }
+
+@shared_task
+def resolve_damage(expression: str, damage_type: str = "bludgeoning", rng: RngSpec = None) -> Dict[str, Any]:
+    """
+    Resolve damage rolls
+    
+    Args:
+        expression: Damage dice expression
+        damage_type: Type of damage
+        rng: RNG stream spec {"stream_id", "offset"}; anonymous stream if omitted
+    
+    Returns:
+        Dict with damage results
+    """
+    try:
+        result = _resolve_damage(expression, damage_type, RngStream.from_spec(rng).block())
+        logger.info("Damage resolved", result=result)
+        return result
         
-        total = roll_result["total"]
+    except ValueError:
+        return {"error": "Invalid dice expression"}
+    except Exception as e:
+        logger.error("Damage resolution failed", expression=expression, error=str(e))
+        return {"error": f"Damage resolution failed: {str(e)}"}
+
+def _resolve_damage(expression: str, damage_type: str, rand: BlockRandom) -> Dict[str, Any]:
+    """Resolve a damage roll from one RNG block (raises ValueError if invalid)"""
+    return {
+        **_roll_dice(expression, "normal", rand),
+        "damage_type": damage_type
+    }
+
+@shared_task
+def calculate_check_probability(
+    expression: str,
+    dc: int,
+    advantage: str = "normal",
+    modifiers: Dict[str, int] = None
+) -> Dict[str, Any]:
+    """
+    Exact chance that a check succeeds, without rolling
+    
+    Args:
+        expression: Dice expression (usually "1d20 + modifier")
+        dc: Difficulty class
+        advantage: "normal", "advantage", or "disadvantage"
+        modifiers: Additional modifiers to apply
+    
+    Returns:
+        Dict with success probability, degree bucket probabilities and expected total
+    """
+    try:
+        try:
+            compiled = compile_dice_expression(expression).with_advantage(advantage)
+        except ValueError:
+            return {"error": "Invalid dice expression"}
+        try:
+            dist = compiled_distribution(compiled)
+        except ValueError as e:
+            return {"error": f"Expression too large for an exact distribution: {str(e)}"}
         
-        # Apply modifiers
         if modifiers:
-            for modifier_name, modifier_value in modifiers.items():
-                total += modifier_value
-                roll_result["modifiers"] = modifiers
-                roll_result["total"] = total
-        
-        # Determine success
-        success = total >= dc
-        margin = total - dc
-        
-        # Determine degree of success/failure
-        if total >= dc + 10:
-            degree = "critical_success"
-        elif total <= dc - 10:
-            degree = "critical_failure"
-        elif success:
-            degree = "success"
-        else:
-            degree = "failure"
+            dist = dist.shift(sum(modifiers.values()))
         
+        odds = check_probabilities(dist, dc)
         result = {
-            **roll_result,
+            "expression": expression,
+            "advantage": advantage,
             "dc": dc,
-            "success": success,
-            "margin": margin,
-            "degree": degree
+            "success_probability": odds["success"],
+            "degree_probabilities": odds["degrees"],
+            "expected_total": dist.mean
         }
         
-        logger.info("Check resolved", result=result)
+        logger.info("Check probability calculated", expression=expression, dc=dc,
+                    success_probability=result["success_probability"])
         return result
         
     except Exception as e:
-        logger.error("Check resolution failed", expression=expression, error=str(e))
-        return {"error": f"Check resolution failed: {str(e)}"}
+        logger.error("Check probability calculation failed", expression=expression, error=str(e))
+        return {"error": f"Check probability calculation failed: {str(e)}"}
 
 @shared_task
-def resolve_damage(expression: str, damage_type: str = "bludgeoning") -> Dict[str, Any]:
+def calculate_damage_distribution(expression: str, include_pmf: bool = False) -> Dict[str, Any]:
     """
-    Resolve damage rolls
+    Exact expected damage and spread of a damage expression, without rolling
     
     Args:
         expression: Damage dice expression
-        damage_type: Type of damage
+        include_pmf: Include the full {total: probability} table
     
     Returns:
-        Dict with damage results
+        Dict with expected value, standard deviation and range
     """
     try:
-        logger.info("Resolving damage", expression=expression, damage_type=damage_type)
-        
-        roll_result = roll_dice(expression)
-        if "error" in roll_result:
-            return roll_result
+        try:
+            compiled = compile_dice_expression(expression)
+        except ValueError:
+            return {"error": "Invalid dice expression"}
+        try:
+            dist = compiled_distribution(compiled)
+        except ValueError as e:
+            return {"error": f"Expression too large for an exact distribution: {str(e)}"}
         
         result = {
-            **roll_result,
-            "damage_type": damage_type
+            "expression": expression,
+            "expected": dist.mean,
+            "stddev": dist.variance ** 0.5,
+            "min": dist.min_value,
+            "max": dist.max_value
         }
+        if include_pmf:
+            result["pmf"] = dist.to_dict()
         
-        logger.info("Damage resolved", result=result)
+        logger.info("Damage distribution calculated", expression=expression, expected=result["expected"])
         return result
         
     except Exception as e:
-        logger.error("Damage resolution failed", expression=expression, error=str(e))
-        return {"error": f"Damage resolution failed: {str(e)}"}
+        logger.error("Damage distribution calculation failed", expression=expression, error=str(e))
+        return {"error": f"Damage distribution calculation failed: {str(e)}"}
 
 def parse_dice_expression(expression: str) -> Dict[int, int]:
     """
@@ -181,25 +310,9 @@ def parse_dice_expression(expression: str) -> Dict[int, int]:
         Dict mapping dice type to count
     """
     try:
-        # Remove spaces and convert to lowercase
-        expr = expression.lower().replace(" ", "")
+        return compile_dice_expression(expression).dice_counts
         
-        # Find all dice patterns (e.g., "2d20", "1d6")
-        dice_pattern = r'(\d+)d(\d+)'
-        matches = re.findall(dice_pattern, expr)
-        
-        if not matches:
-            return {}
-        
-        dice_counts = {}
-        for count, dice_type in matches:
-            dice_type = int(dice_type)
-            count = int(count)
-            dice_counts[dice_type] = dice_counts.get(dice_type, 0) + count
-        
-        return dice_counts
-        
-    except Exception as e:
+    except ValueError as e:
         logger.error("Failed to parse dice expression", expression=expression, error=str(e))
         return {}
 
@@ -0,0 +1,59 @@
+"""
+Benchmark: area-of-effect target selection (cached template masks plus the
+token index) vs testing every token against the shape.
+
+Run from apps/workers:
+    python -m benchmarks.bench_aoe
+"""
+import math
+import time
+import numpy as np
+from app.services.aoe_templates import template_cells, template_offsets, tokens_in_cells
+from app.services.token_index import TokenIndex
+
+MAP_CELLS = 200
+TOKENS = 500
+CASTS = 2_000
+GRID_SIZE = 50
+
+
+def _scan_sphere(tokens, origin, radius_feet):
+    # Per-token test against the template, as a caller without an index would
+    ox, oy = origin[0] / GRID_SIZE * 5, origin[1] / GRID_SIZE * 5
+    return [
+        t['id'] for t in tokens
+        if math.hypot((t['grid_x'] + 0.5) * 5 - ox, (t['grid_y'] + 0.5) * 5 - oy) <= radius_feet
+    ]
+
+
+def main() -> None:
+    rng = np.random.default_rng(9)
+    tokens = [{'id': str(i), 'grid_x': int(rng.integers(MAP_CELLS)), 'grid_y': int(rng.integers(MAP_CELLS))}
+              for i in range(TOKENS)]
+    index = TokenIndex.from_tokens(tokens)
+    origins = rng.uniform(0, MAP_CELLS * GRID_SIZE, (CASTS, 2)).tolist()
+    template = {'shape': 'sphere', 'size': 20}
+
+    start = time.perf_counter()
+    for origin in origins:
+        _scan_sphere(tokens, origin, 20)
+    scan = time.perf_counter() - start
+
+    template_offsets.cache_clear()
+    start = time.perf_counter()
+    template_offsets('cone', 60, 37)
+    cold = time.perf_counter() - start
+
+    start = time.perf_counter()
+    for origin in origins:
+        tokens_in_cells(index, template_cells(template, origin, GRID_SIZE))
+    indexed = time.perf_counter() - start
+
+    print(f"{TOKENS} tokens on {MAP_CELLS}x{MAP_CELLS} cells, {CASTS} 20 ft spheres")
+    print(f"  per-token scan            {scan / CASTS * 1e6:8.1f} us/cast")
+    print(f"  cached mask + token index {indexed / CASTS * 1e6:8.1f} us/cast  x{scan / indexed:.1f}")
+    print(f"  uncached 60 ft cone mask  {cold * 1e6:8.1f} us (built once per shape/size/direction)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,33 @@
+"""
+Micro-benchmark: dice expression parse + roll throughput, cached vs uncached.
+
+Run from apps/workers:
+    python -m benchmarks.bench_dice
+"""
+import time
+from app.services.dice import (
+    _stdlib_draw,
+    compile_dice_expression,
+    normalize_expression,
+    parse_normalized,
+)
+
+EXPRESSIONS = ["1d20+5", "2d20kh1 + 5", "1d8 + 3", "8d6", "4d6kh3", "1d20 - 1"]
+ITERATIONS = 200_000
+
+
+def _bench(label: str, fn) -> None:
+    start = time.perf_counter()
+    for i in range(ITERATIONS):
+        fn(EXPRESSIONS[i % len(EXPRESSIONS)]).roll(_stdlib_draw)
+    elapsed = time.perf_counter() - start
+    print(f"{label:<10} {ITERATIONS / elapsed:>12,.0f} parse+roll/s")
+
+
+def main() -> None:
+    _bench("uncached", lambda expr: parse_normalized(normalize_expression(expr)))
+    _bench("cached", compile_dice_expression)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,45 @@
+"""
+Benchmark: vectorized roll_dice_batch vs the per-call roll_dice path.
+
+Run from apps/workers:
+    python -m benchmarks.bench_dice_batch
+"""
+import time
+import structlog
+from app.tasks.rules_engine import roll_dice, roll_dice_batch
+
+# Silence per-roll logging so the benchmark measures dice, not log output
+structlog.configure(logger_factory=structlog.ReturnLoggerFactory())
+
+CASES = [
+    ("fireball x20 targets", ["8d6"] * 20, 1),
+    ("monte carlo 1d20+5 adv", ["1d20+5"], 10_000),
+    ("4d6kh3 stat arrays", ["4d6kh3"] * 6, 1_000),
+]
+
+
+def _per_call(expressions, n, advantage):
+    for expr in expressions:
+        for _ in range(n):
+            roll_dice(expr, advantage)
+
+
+def main() -> None:
+    for label, expressions, n in CASES:
+        advantage = "advantage" if "adv" in label else "normal"
+        rolls = len(expressions) * n
+
+        start = time.perf_counter()
+        _per_call(expressions, n, advantage)
+        per_call = time.perf_counter() - start
+
+        start = time.perf_counter()
+        roll_dice_batch(expressions, n, advantage)
+        batch = time.perf_counter() - start
+
+        print(f"{label:<26} {rolls:>7} rolls  per-call {per_call * 1e3:8.2f} ms  "
+              f"batch {batch * 1e3:7.2f} ms  x{per_call / batch:6.1f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,56 @@
+"""
+Benchmark: incremental fog updates vs recomputing the party fog per move.
+
+Run from apps/workers:
+    python -m benchmarks.bench_fog
+"""
+import time
+import numpy as np
+from app.services.fog_of_war import FogState, view_origin
+from app.services.obstacle_raster import ObstacleRaster
+from app.services.token_index import TokenIndex
+
+MAP_CELLS = 200
+PARTY = 6
+MOVES = 50
+
+
+def _map(rng, vision_feet):
+    tokens = [
+        {'id': f"pc{i}", 'grid_x': int(rng.integers(MAP_CELLS)), 'grid_y': int(rng.integers(MAP_CELLS)),
+         'owner_kind': 'pc', 'vision': {'range': vision_feet}}
+        for i in range(PARTY)
+    ]
+    return {'grid_size': 50, 'cols': MAP_CELLS, 'rows': MAP_CELLS, 'tokens': tokens}
+
+
+def main() -> None:
+    rng = np.random.default_rng(5)
+    raster = ObstacleRaster(rng.random((MAP_CELLS, MAP_CELLS)) < 0.15, 50)
+    moves = [(f"pc{rng.integers(PARTY)}", int(rng.integers(MAP_CELLS)), int(rng.integers(MAP_CELLS))) for _ in range(MOVES)]
+
+    print(f"{MAP_CELLS}x{MAP_CELLS} cells, {PARTY} party tokens, {MOVES} moves")
+    for vision_feet in (60, 120, 0):
+        map_data = _map(rng, vision_feet)
+        index = TokenIndex.from_tokens(map_data['tokens'])
+
+        start = time.perf_counter()
+        fog = FogState.from_map(map_data, index, raster.blocked)
+        full = time.perf_counter() - start
+
+        start = time.perf_counter()
+        delta_cells = 0
+        for token_id, col, row in moves:
+            index.move(token_id, col, row)
+            delta = fog.move_token(token_id, view_origin(index, token_id), raster.blocked)
+            delta_cells += sum(len(cells) for cells in delta.values())
+        incremental = (time.perf_counter() - start) / MOVES
+
+        label = f"{vision_feet} ft" if vision_feet else "unlimited"
+        print(f"  vision {label:<10} full recompute {full * 1e3:8.2f} ms  "
+              f"per move {incremental * 1e3:7.2f} ms  x{full / incremental:5.1f}  "
+              f"~{delta_cells // MOVES} delta cells/move")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,96 @@
+"""
+Benchmark: journal export of a long session (100k events, 100k rolls),
+streamed to a file vs built in memory and returned as the task result.
+PDF is only ever streamed (laid out page by page).
+
+Each run happens in a child process that builds its own session data, so
+peak RSS is measured per run; the "data only" run is the floor every export
+shares.
+
+Run from apps/workers:
+    python -m benchmarks.bench_journal
+"""
+import json
+import logging
+import multiprocessing
+import os
+import resource
+import shutil
+import tempfile
+import time
+import structlog
+from app.services import export_store, journal_render
+from app.tasks.exporter import export_session_journal
+
+EVENTS = 100_000
+ROLLS = 100_000
+
+logging.basicConfig(handlers=[logging.NullHandler()], level=logging.INFO)
+structlog.configure(
+    processors=[structlog.processors.JSONRenderer()],
+    logger_factory=structlog.stdlib.LoggerFactory(),
+)
+
+
+def _session():
+    return {
+        'id': 'bench', 'name': 'Six-hour delve', 'started_at': '2026-01-01T18:00:00', 'duration': '6h',
+        'status': 'completed',
+        'participants': [{'name': f"Hero {i}", 'type': 'pc'} for i in range(5)],
+        'events': [
+            {'timestamp': f"{18 + i // 20000}:{i // 400 % 60:02d}:{i % 60:02d}", 'type': 'narration',
+             'description': f"The party presses deeper into the vault; chamber {i} smells of old smoke and wet stone."}
+            for i in range(EVENTS)
+        ],
+        'rolls': [{'expression': '1d20+5', 'result': 6 + i % 20} for i in range(ROLLS)],
+    }
+
+
+def _data_only(format: str, out: str) -> None:
+    _session()
+
+
+def _streamed(format: str, out: str) -> None:
+    result = export_session_journal(_session(), format, destination=out)
+    json.loads(json.dumps(result))
+
+
+def _in_memory(format: str, out: str) -> None:
+    # What the task did before: whole document in memory, content in the result
+    content = ''.join(journal_render.render(_session(), format))
+    json.loads(json.dumps({'success': True, 'format': format, 'content': content, 'size': len(content)}))
+
+
+def _run(target, format: str, out: str):
+    start = time.perf_counter()
+    process = multiprocessing.get_context('fork').Process(target=target, args=(format, out))
+    process.start()
+    process.join()
+    elapsed = time.perf_counter() - start
+    return elapsed, resource.getrusage(resource.RUSAGE_CHILDREN).ru_maxrss / 1024
+
+
+def main() -> None:
+    # Journal file destinations must be under EXPORT_DIR
+    os.makedirs(export_store.EXPORT_DIR, exist_ok=True)
+    workdir = tempfile.mkdtemp(prefix='bench-journal-', dir=export_store.EXPORT_DIR)
+    try:
+        print(f"{EVENTS} events, {ROLLS} rolls")
+        # ru_maxrss for children is the max over all children so far, so go
+        # from the smallest expected peak to the largest
+        elapsed, rss = _run(_data_only, 'markdown', '')
+        print(f"  session data only         {elapsed:6.2f} s  peak RSS {rss:6.0f} MiB")
+        for format in ('markdown', 'html', 'pdf'):
+            out = os.path.join(workdir, f"journal.{format}")
+            elapsed, rss = _run(_streamed, format, out)
+            print(f"  {format:<8} streamed to file {elapsed:6.2f} s  peak RSS {rss:6.0f} MiB  "
+                  f"{os.path.getsize(out) / 2**20:5.1f} MiB written")
+        for format in ('markdown', 'html'):
+            elapsed, rss = _run(_in_memory, format, '')
+            print(f"  {format:<8} in memory        {elapsed:6.2f} s  peak RSS {rss:6.0f} MiB")
+    finally:
+        shutil.rmtree(workdir, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    main()
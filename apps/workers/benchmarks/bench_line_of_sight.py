@@ -0,0 +1,55 @@
+"""
+Benchmark: raster line of sight as obstacle count grows, and batched
+visibility vs one ray at a time.
+
+Run from apps/workers:
+    python -m benchmarks.bench_line_of_sight
+"""
+import random
+import time
+import numpy as np
+from app.services.obstacle_raster import ObstacleRaster
+
+MAP_CELLS = 100
+GRID_SIZE = 50
+RAYS = 500
+
+
+def _map(rnd, obstacles):
+    extent = MAP_CELLS * GRID_SIZE
+    return {
+        'grid_size': GRID_SIZE, 'cols': MAP_CELLS, 'rows': MAP_CELLS,
+        'obstacles': [
+            {'x': rnd.uniform(0, extent), 'y': rnd.uniform(0, extent), 'width': rnd.uniform(10, 60), 'height': rnd.uniform(10, 60)}
+            for _ in range(obstacles)
+        ],
+    }
+
+
+def main() -> None:
+    rnd = random.Random(3)
+    extent = MAP_CELLS * GRID_SIZE
+    viewer = (extent / 2, extent / 2)
+    targets = np.array([(rnd.uniform(0, extent), rnd.uniform(0, extent)) for _ in range(RAYS)])
+
+    print(f"{MAP_CELLS}x{MAP_CELLS} cells, {RAYS} rays from the map center")
+    for obstacles in (10, 100, 1_000, 10_000):
+        start = time.perf_counter()
+        raster = ObstacleRaster.from_map(_map(rnd, obstacles))
+        build = time.perf_counter() - start
+
+        start = time.perf_counter()
+        for x, y in targets:
+            raster.first_blocked(viewer[0], viewer[1], x, y)
+        single = time.perf_counter() - start
+
+        start = time.perf_counter()
+        raster.visible_from(viewer[0], viewer[1], targets)
+        batch = time.perf_counter() - start
+
+        print(f"  {obstacles:>6} obstacles  raster {build * 1e3:7.2f} ms  "
+              f"per-ray {single / RAYS * 1e6:6.1f} us  batch {batch / RAYS * 1e6:6.2f} us/ray")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,86 @@
+"""
+Benchmark: treasure hoards per second across the CR range.
+
+Reports the full tasks (logging included) and the sampling alone: tier
+lookup, coin dice and item slots from the loot table registry. Then a
+dungeon (60 room hoards, 120 monsters) one task per hoard vs one
+generate_loot_batch, counting the JSON each puts through the broker.
+
+Run from apps/workers:
+    python -m benchmarks.bench_loot
+"""
+import json
+import logging
+import time
+import structlog
+from app.services import loot_tables
+from app.services.rng import RngStream
+from app.tasks.loot_gen import generate_individual_treasure, generate_loot_batch, generate_treasure_hoard
+
+# Render log lines for real (JSON to a null handler) so logging cost is counted
+logging.basicConfig(handlers=[logging.NullHandler()], level=logging.INFO)
+structlog.configure(
+    processors=[structlog.processors.JSONRenderer()],
+    logger_factory=structlog.stdlib.LoggerFactory(),
+)
+
+CRS = (0.25, 1, 3, 4.5, 7, 10, 13, 16.5, 19, 24)
+HOARDS = 20_000
+ROOMS = 60
+MONSTERS = 120
+DUNGEONS = 50
+
+
+def _sample_hoard(cr, stream) -> None:
+    tables = loot_tables.registry()
+    tier = tables.tier(cr)
+    generator = stream.generator()
+    loot_tables.roll_coins(tier, tables.multiplier('standard'), generator, tables.coin_multiplier)
+    loot_tables.roll_slots(tier.slots, tier.chances, generator)
+
+
+def main() -> None:
+    for label, generate in (
+        ("treasure hoard", lambda cr, stream: generate_treasure_hoard(cr, 'standard', rng=stream)),
+        ("individual", lambda cr, stream: generate_individual_treasure(cr, rng=stream)),
+        ("sampling only", _sample_hoard),
+    ):
+        stream = RngStream("bench:loot")
+        start = time.perf_counter()
+        for i in range(HOARDS):
+            generate(CRS[i % len(CRS)], stream)
+        elapsed = time.perf_counter() - start
+        print(f"{label:<16} {HOARDS / elapsed:10.0f} hoards/s  {elapsed / HOARDS * 1e6:7.1f} us/hoard")
+
+    specs = [[CRS[i % len(CRS)], 'standard'] for i in range(ROOMS)] + \
+            [[CRS[i % len(CRS)], 'individual', 'humanoid'] for i in range(MONSTERS)]
+    stream = RngStream("bench:loot-dungeon")
+    start = time.perf_counter()
+    for _ in range(DUNGEONS):
+        per_task_bytes = 0
+        for cr, hoard_type, *creature in specs:
+            if hoard_type == 'individual':
+                result = generate_individual_treasure(cr, *creature, rng=stream)
+            else:
+                result = generate_treasure_hoard(cr, hoard_type, rng=stream)
+            per_task_bytes += _round_trip(result)
+    per_task = (time.perf_counter() - start) / DUNGEONS
+
+    start = time.perf_counter()
+    for _ in range(DUNGEONS):
+        batch_bytes = _round_trip(generate_loot_batch(specs, rng=stream))
+    batch = (time.perf_counter() - start) / DUNGEONS
+
+    print(f"dungeon of {ROOMS} rooms + {MONSTERS} monsters")
+    print(f"  one task per hoard  {len(specs):4d} results  {per_task_bytes / 1024:7.1f} KiB  {per_task * 1e3:7.2f} ms")
+    print(f"  generate_loot_batch {1:4d} result   {batch_bytes / 1024:7.1f} KiB  {batch * 1e3:7.2f} ms  x{per_task / batch:5.1f}")
+
+
+def _round_trip(result) -> int:
+    payload = json.dumps(result)
+    json.loads(payload)
+    return len(payload)
+
+
+if __name__ == "__main__":
+    main()
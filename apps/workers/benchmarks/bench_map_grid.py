@@ -0,0 +1,41 @@
+"""
+Benchmark: compact grid descriptor vs the legacy per-cell expansion.
+
+Run from apps/workers:
+    python -m benchmarks.bench_map_grid
+"""
+import json
+import time
+import structlog
+from app.tasks.map_service import generate_map_grid
+
+# Silence task logging so the benchmark measures grid generation
+structlog.configure(logger_factory=structlog.ReturnLoggerFactory())
+
+CASES = [
+    ("square 200x200", 10_000, 10_000, 50, 'square'),
+    ("hex ~200x200", 15_000, 17_320, 50, 'hex'),
+]
+
+
+def _measure(label, **options):
+    start = time.perf_counter()
+    result = generate_map_grid(**options)
+    elapsed = time.perf_counter() - start
+    size = len(json.dumps(result))
+    print(f"  {label:<10} {elapsed * 1e3:9.2f} ms  {size / 1024:10.1f} KiB")
+    return elapsed, size
+
+
+def main() -> None:
+    for label, width, height, grid_size, grid_type in CASES:
+        options = dict(width=width, height=height, grid_size=grid_size, grid_type=grid_type)
+        print(f"{label} ({generate_map_grid(**options)['total_cells']} cells)")
+        compact = _measure("compact", **options)
+        _measure("buffers", include_buffers=True, **options)
+        legacy = _measure("cells", expand_cells=True, **options)
+        print(f"  compact vs cells: x{legacy[0] / compact[0]:.0f} faster, x{legacy[1] / compact[1]:.0f} smaller")
+
+
+if __name__ == "__main__":
+    main()
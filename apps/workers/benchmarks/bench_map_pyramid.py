@@ -0,0 +1,86 @@
+"""
+Benchmark: streamed deep-zoom pyramid of a 10k x 10k PNG vs a full decode.
+
+Each run happens in a child process so peak RSS is measured per run.
+
+Run from apps/workers:
+    python -m benchmarks.bench_map_pyramid
+"""
+import multiprocessing
+import os
+import resource
+import shutil
+import struct
+import tempfile
+import time
+import zlib
+import numpy as np
+from PIL import Image
+from app.services.map_pyramid import build_pyramid
+
+SIZE = 10_000
+BAND = 256
+
+
+def _write_png(path: str) -> None:
+    """Write a SIZE x SIZE RGB test map band by band (never held in memory)"""
+    def chunk(kind: bytes, data: bytes) -> bytes:
+        return struct.pack('>I', len(data)) + kind + data + struct.pack('>I', zlib.crc32(kind + data))
+
+    compressor = zlib.compressobj(6)
+    x = np.arange(SIZE)
+    with open(path, 'wb') as f:
+        f.write(b'\x89PNG\r\n\x1a\n')
+        f.write(chunk(b'IHDR', struct.pack('>IIBBBBB', SIZE, SIZE, 8, 2, 0, 0, 0)))
+        for y0 in range(0, SIZE, BAND):
+            y = np.arange(y0, min(y0 + BAND, SIZE))[:, None]
+            # Stone-floor pattern with 50 px grid lines
+            shade = 120 + 40 * np.sin(x / 37.0) * np.cos(y / 53.0)
+            grid = ((x % 50 == 0) | (y % 50 == 0))
+            rgb = np.stack([shade, shade * 0.9, shade * 0.8], axis=-1)
+            rgb[grid] = 40
+            rows = np.concatenate([np.zeros((len(y), 1), np.uint8), rgb.astype(np.uint8).reshape(len(y), -1)], axis=1)
+            f.write(chunk(b'IDAT', compressor.compress(rows.tobytes())))
+        f.write(chunk(b'IDAT', compressor.flush()))
+        f.write(chunk(b'IEND', b''))
+
+
+def _pyramid(path: str, out: str) -> None:
+    build_pyramid(path, out, 256, 'png')
+
+
+def _full_decode(path: str, _out: str) -> None:
+    Image.MAX_IMAGE_PIXELS = None
+    Image.open(path).load()
+
+
+def _run(target, path: str, out: str):
+    start = time.perf_counter()
+    process = multiprocessing.get_context('fork').Process(target=target, args=(path, out))
+    process.start()
+    process.join()
+    elapsed = time.perf_counter() - start
+    return elapsed, resource.getrusage(resource.RUSAGE_CHILDREN).ru_maxrss / 1024
+
+
+def main() -> None:
+    workdir = tempfile.mkdtemp(prefix='bench-pyramid-')
+    try:
+        path = os.path.join(workdir, 'map.png')
+        _write_png(path)
+        print(f"{SIZE}x{SIZE} PNG, {os.path.getsize(path) / 2**20:.1f} MiB on disk, "
+              f"{SIZE * SIZE * 3 / 2**20:.0f} MiB decoded")
+
+        elapsed, rss = _run(_pyramid, path, os.path.join(workdir, 'tiles'))
+        tiles = sum(len(files) for _, _, files in os.walk(os.path.join(workdir, 'tiles')))
+        print(f"  streamed pyramid  {elapsed:6.1f} s  peak RSS {rss:7.0f} MiB  {tiles} files")
+
+        # ru_maxrss for children is the max over all children so far, so run this last
+        elapsed, rss = _run(_full_decode, path, '')
+        print(f"  full decode only  {elapsed:6.1f} s  peak RSS {rss:7.0f} MiB")
+    finally:
+        shutil.rmtree(workdir, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    main()
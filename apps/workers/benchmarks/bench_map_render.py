@@ -0,0 +1,75 @@
+"""
+Benchmark: full tiled PNG render vs re-render after one token moves, and SVG streaming.
+
+Run from apps/workers:
+    python -m benchmarks.bench_map_render
+"""
+import io
+import time
+import numpy as np
+from app.services import map_cache, map_render
+from app.services.map_render import MapScene
+
+MAP_CELLS = 100
+TOKENS = 40
+MOVES = 10
+
+
+def _map(rng):
+    size = 50
+    obstacles = [
+        {'x': int(x) * size, 'y': int(y) * size, 'width': size * 2, 'height': size}
+        for x, y in rng.integers(0, MAP_CELLS - 2, size=(60, 2))
+    ]
+    tokens = [
+        {'id': f"t{i}", 'grid_x': int(rng.integers(MAP_CELLS)), 'grid_y': int(rng.integers(MAP_CELLS)),
+         'owner_kind': 'monster' if i % 3 else 'pc'}
+        for i in range(TOKENS)
+    ]
+    return {'id': 'bench', 'version': 1, 'grid_size': size, 'cols': MAP_CELLS, 'rows': MAP_CELLS,
+            'width': MAP_CELLS * size, 'height': MAP_CELLS * size, 'obstacles': obstacles, 'tokens': tokens}
+
+
+def main() -> None:
+    rng = np.random.default_rng(17)
+    map_data = _map(rng)
+    map_render.clear_tile_cache()
+    map_cache.clear_map_cache()
+
+    start = time.perf_counter()
+    tiles, _ = map_render.cached_tiles(map_data, MapScene.from_map(map_data))
+    tiles_time = time.perf_counter() - start
+
+    start = time.perf_counter()
+    rendered = 0
+    for _ in range(MOVES):
+        token = map_data['tokens'][int(rng.integers(TOKENS))]
+        token['grid_x'] = min(MAP_CELLS - 1, token['grid_x'] + 1)
+        map_data['version'] += 1
+        rendered += map_render.cached_tiles(map_data, MapScene.from_map(map_data))[1]
+    tiles_move = (time.perf_counter() - start) / MOVES
+
+    map_render.clear_tile_cache()
+    start = time.perf_counter()
+    map_render.render_png(map_data, io.BytesIO())
+    full_time = time.perf_counter() - start
+
+    start = time.perf_counter()
+    map_render.render_png(map_data, io.BytesIO())
+    stitch_time = time.perf_counter() - start
+
+    start = time.perf_counter()
+    svg_bytes = map_render.write_svg(MapScene.from_map(map_data), io.BytesIO())
+    svg_time = time.perf_counter() - start
+
+    print(f"{MAP_CELLS}x{MAP_CELLS} cells, {TOKENS} tokens, {len(tiles)} tiles of {map_render.TILE_SIZE}px")
+    print(f"  tiles, cold cache      {tiles_time * 1e3:8.1f} ms")
+    print(f"  tiles after a move     {tiles_move * 1e3:8.1f} ms  x{tiles_time / tiles_move:5.1f}  "
+          f"~{rendered / MOVES:.1f} tiles re-rendered")
+    print(f"  PNG export, cold       {full_time * 1e3:8.1f} ms")
+    print(f"  PNG export, all reused {stitch_time * 1e3:8.1f} ms  (stitch + encode)")
+    print(f"  SVG stream             {svg_time * 1e3:8.1f} ms  {svg_bytes / 1024:.0f} KiB")
+
+
+if __name__ == "__main__":
+    main()
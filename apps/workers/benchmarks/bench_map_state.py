@@ -0,0 +1,73 @@
+"""
+Benchmark: per-move task payload with full map_data vs a map reference plus a delta.
+
+Measures the JSON a token move puts on the broker (serialize + deserialize,
+as Celery does with the json serializer) and the worker-side cost of
+applying the delta to its local copy.
+
+Run from apps/workers:
+    python -m benchmarks.bench_map_state
+"""
+import json
+import time
+import numpy as np
+from app.services.map_state import apply_deltas
+
+MAP_CELLS = 200
+OBSTACLES = 4000
+WALLS = 3000
+TOKENS = 60
+MOVES = 200
+
+
+def _map(rng):
+    size = 50
+    return {
+        'id': 'bench', 'version': 1, 'grid_size': size, 'cols': MAP_CELLS, 'rows': MAP_CELLS,
+        'obstacles': [
+            {'id': f"o{i}", 'x': int(x) * size, 'y': int(y) * size, 'width': size, 'height': size}
+            for i, (x, y) in enumerate(rng.integers(0, MAP_CELLS, size=(OBSTACLES, 2)))
+        ],
+        'walls': [
+            {'id': f"w{i}", 'x1': int(a) * size, 'y1': int(b) * size, 'x2': int(a) * size + size * 4, 'y2': int(b) * size}
+            for i, (a, b) in enumerate(rng.integers(0, MAP_CELLS, size=(WALLS, 2)))
+        ],
+        'tokens': [
+            {'id': f"t{i}", 'grid_x': int(x), 'grid_y': int(y), 'owner_kind': 'pc' if i < 5 else 'monster'}
+            for i, (x, y) in enumerate(rng.integers(0, MAP_CELLS, size=(TOKENS, 2)))
+        ],
+    }
+
+
+def _round_trip(args) -> int:
+    payload = json.dumps(args)
+    json.loads(payload)
+    return len(payload)
+
+
+def main() -> None:
+    rng = np.random.default_rng(19)
+    map_data = _map(rng)
+    moves = [(f"t{rng.integers(TOKENS)}", int(rng.integers(MAP_CELLS)), int(rng.integers(MAP_CELLS))) for _ in range(MOVES)]
+
+    start = time.perf_counter()
+    for token_id, col, row in moves:
+        full_bytes = _round_trip([{'id': token_id, 'x': col * 50, 'y': row * 50}, map_data])
+    full = (time.perf_counter() - start) / MOVES
+
+    start = time.perf_counter()
+    for token_id, col, row in moves:
+        delta = {'op': 'move_token', 'token_id': token_id, 'grid_x': col, 'grid_y': row}
+        delta_bytes = _round_trip([{'id': 'bench', 'version': map_data['version']}, [delta]])
+        apply_deltas(map_data, [delta])
+        map_data['version'] += 1
+    by_reference = (time.perf_counter() - start) / MOVES
+
+    print(f"{MAP_CELLS}x{MAP_CELLS} map, {OBSTACLES} obstacles, {WALLS} walls, {TOKENS} tokens, {MOVES} moves")
+    print(f"  full map_data     {full_bytes / 1024:8.1f} KiB/move  {full * 1e3:7.3f} ms/move")
+    print(f"  reference + delta {delta_bytes / 1024:8.1f} KiB/move  {by_reference * 1e3:7.3f} ms/move  "
+          f"x{full / by_reference:6.0f}")
+
+
+if __name__ == "__main__":
+    main()
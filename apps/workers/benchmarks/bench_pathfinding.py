@@ -0,0 +1,92 @@
+"""
+Benchmark: per-round reachability for every creature (cold vs cached
+distance fields) and single-path A*, plus a hex-map check that paths go
+around a known wall.
+
+Run from apps/workers:
+    python -m benchmarks.bench_pathfinding
+"""
+import time
+import numpy as np
+from app.services import hex_grid, map_cache
+from app.services.pathfinding import IMPASSABLE, find_path, reachable_for_token, terrain_for_map, token_movement_grid
+
+MAP_CELLS = 150
+CREATURES = 60
+PATHS = 50
+
+
+def _map(rng):
+    extent = MAP_CELLS * 50
+    tokens = [
+        {'id': f"t{i}", 'grid_x': int(rng.integers(MAP_CELLS)), 'grid_y': int(rng.integers(MAP_CELLS)),
+         'owner_kind': 'monster' if i % 3 else 'pc', 'speed': int(rng.choice([25, 30, 40]))}
+        for i in range(CREATURES)
+    ]
+    obstacles = [
+        {'x': float(rng.uniform(0, extent)), 'y': float(rng.uniform(0, extent)), 'width': 150.0, 'height': 50.0}
+        for _ in range(600)
+    ]
+    difficult = [
+        {'x': float(rng.uniform(0, extent)), 'y': float(rng.uniform(0, extent)), 'width': 300.0, 'height': 300.0}
+        for _ in range(40)
+    ]
+    return {'id': 'bench', 'version': 1, 'grid_size': 50, 'cols': MAP_CELLS, 'rows': MAP_CELLS,
+            'tokens': tokens, 'obstacles': obstacles, 'difficult_terrain': difficult}
+
+
+def _round(map_data):
+    for token in map_data['tokens']:
+        reachable_for_token(map_data, token['id'], token['speed'])
+
+
+def _check_hex_wall() -> None:
+    """A wall at x=225 (the center line of hex column 3) from the top of the map to y=300"""
+    size = 50
+    map_data = {'id': 'hex-wall', 'version': 1, 'grid_type': 'hex', 'grid_size': size, 'cols': 12, 'rows': 10,
+                'walls': [{'x1': 225, 'y1': -50, 'x2': 225, 'y2': 300}],
+                'obstacles': [{'x': 155, 'y': 428, 'width': 10, 'height': 10}]}
+    costs = terrain_for_map(map_data)
+    # The obstacle sits inside hex (2, 5), centered at (150, 433); a square raster puts it in (3, 8)
+    assert costs[5, 2] == IMPASSABLE and costs[5, 3] != IMPASSABLE and costs[8, 3] != IMPASSABLE
+    assert all(costs[row, 3] == IMPASSABLE for row in range(4)) and costs[4, 3] != IMPASSABLE
+
+    path, feet = find_path(costs, (0, 3), (8, 3), grid_type='hex')
+    cols, rows = np.array(path).T
+    x, y = hex_grid.offset_to_pixel(cols, rows, size)
+    # Every step across x=225 happens below the end of the wall
+    crossings = [max(y[i], y[i + 1]) for i in range(len(path) - 1) if (x[i] - 225) * (x[i + 1] - 225) <= 0]
+    assert all(ys > 300 for ys in crossings), path
+    assert all(costs[r, c] != IMPASSABLE for c, r in path)
+    print(f"  hex wall detour             {len(path) - 1} steps, {feet} ft")
+
+
+def main() -> None:
+    rng = np.random.default_rng(11)
+    map_data = _map(rng)
+    map_cache.clear_map_cache()
+
+    start = time.perf_counter()
+    _round(map_data)
+    cold = time.perf_counter() - start
+
+    start = time.perf_counter()
+    _round(map_data)
+    warm = time.perf_counter() - start
+
+    costs, _ = token_movement_grid(map_data, 't0')
+    goals = [(int(rng.integers(MAP_CELLS)), int(rng.integers(MAP_CELLS))) for _ in range(PATHS)]
+    origin = (map_data['tokens'][0]['grid_x'], map_data['tokens'][0]['grid_y'])
+    start = time.perf_counter()
+    found = sum(find_path(costs, origin, goal) is not None for goal in goals)
+    astar = (time.perf_counter() - start) / PATHS
+
+    print(f"{MAP_CELLS}x{MAP_CELLS} cells, {CREATURES} creatures")
+    print(f"  reachability round, cold    {cold * 1e3:8.2f} ms  ({cold / CREATURES * 1e3:.2f} ms/creature)")
+    print(f"  reachability round, cached  {warm * 1e3:8.2f} ms")
+    print(f"  A* across the map           {astar * 1e3:8.2f} ms/path  ({found}/{PATHS} reachable)")
+    _check_hex_wall()
+
+
+if __name__ == "__main__":
+    main()
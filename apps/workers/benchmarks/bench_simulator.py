@@ -0,0 +1,41 @@
+"""
+Benchmark: encounter simulator scaling with process count (results are
+identical for every count).
+
+Run from apps/workers:
+    python -m benchmarks.bench_simulator
+"""
+import os
+import time
+from app.services.encounter_simulator import simulate_encounter
+from app.services.rng import RngStream
+
+PARTY = [
+    {'id': f'pc{i}', 'side': 'party', 'current_hp': 30, 'armor_class': 16, 'initiative_modifier': 2,
+     'attack_data': {'attack_modifier': 6, 'damage_dice': '1d8', 'damage_modifier': 4, 'multiattack': 2}}
+    for i in range(4)
+]
+SKELETONS = [
+    {'id': f'sk{i}', 'side': 'monsters', 'current_hp': 13, 'armor_class': 13, 'initiative_modifier': 2,
+     'attack_data': {'attack_modifier': 4, 'damage_dice': '1d6', 'damage_modifier': 2}}
+    for i in range(12)
+]
+SIMULATIONS = 4_000
+
+
+def main() -> None:
+    cores = os.cpu_count() or 1
+    baseline = None
+    for workers in sorted({1, 2, 4, cores}):
+        if workers > cores:
+            continue
+        start = time.perf_counter()
+        result = simulate_encounter(PARTY + SKELETONS, SIMULATIONS, RngStream("bench:sim"), workers)
+        elapsed = time.perf_counter() - start
+        baseline = baseline or elapsed
+        print(f"{workers:>3} workers {SIMULATIONS / elapsed:>9,.0f} combats/s  speedup x{baseline / elapsed:4.1f}  "
+              f"party win {result['win_probability']['party']:.3f}")
+
+
+if __name__ == "__main__":
+    main()
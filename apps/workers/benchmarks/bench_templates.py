@@ -0,0 +1,119 @@
+"""
+Benchmark: HTML journal render throughput, the previous f-string renderer vs
+the precompiled, autoescaped Jinja2 template, for a long session (100k
+events, 100k rolls). Also times loading the template set with a cold Jinja
+compile vs from the bytecode cache (a restarted worker).
+
+Run from apps/workers:
+    python -m benchmarks.bench_templates
+"""
+import shutil
+import tempfile
+import time
+from typing import Any, Dict
+from jinja2 import Environment, FileSystemBytecodeCache, FileSystemLoader, select_autoescape
+from app.services import journal_render, templates
+
+EVENTS = 100_000
+ROLLS = 100_000
+REPEATS = 3
+
+
+def _session():
+    return {
+        'id': 'bench', 'name': 'Six-hour delve', 'started_at': '2026-01-01T18:00:00', 'duration': '6h',
+        'status': 'completed',
+        'participants': [{'name': f"Hero {i}", 'type': 'pc'} for i in range(5)],
+        'events': [
+            {'timestamp': f"{18 + i // 20000}:{i // 400 % 60:02d}:{i % 60:02d}", 'type': 'narration',
+             'description': f"The party presses deeper into the vault; chamber {i} smells of old smoke & wet stone."}
+            for i in range(EVENTS)
+        ],
+        'rolls': [{'expression': '1d20+5', 'result': 6 + i % 20} for i in range(ROLLS)],
+    }
+
+
+def _legacy_html(session_data: Dict[str, Any]) -> str:
+    # The sections of the previous exporter's _generate_html_journal that the
+    # benchmark session uses (no escaping)
+    html_lines = ["<!DOCTYPE html>", "<html lang='en'>", "<head>", "    <title>Session Journal</title>",
+                  "</head>", "<body>"]
+    html_lines.append(f"<h1>Session Journal: {session_data.get('name', 'Unknown Session')}</h1>")
+    html_lines.append("<div class='info'>")
+    html_lines.append("<h2>Session Information</h2>")
+    html_lines.append(f"<p><strong>Date:</strong> {session_data.get('started_at', 'Unknown')}</p>")
+    html_lines.append(f"<p><strong>Duration:</strong> {session_data.get('duration', 'Unknown')}</p>")
+    html_lines.append(f"<p><strong>Status:</strong> {session_data.get('status', 'Unknown')}</p>")
+    html_lines.append("</div>")
+    if session_data.get('participants'):
+        html_lines.append("<h2>Participants</h2>")
+        html_lines.append("<ul>")
+        for participant in session_data['participants']:
+            html_lines.append(f"<li><strong>{participant.get('name', 'Unknown')}</strong> ({participant.get('type', 'Unknown')})</li>")
+        html_lines.append("</ul>")
+    if session_data.get('events'):
+        html_lines.append("<h2>Events Timeline</h2>")
+        for event in session_data['events']:
+            html_lines.append("<div class='event'>")
+            html_lines.append(f"<h3>{event.get('timestamp', 'Unknown')} - {event.get('type', 'Unknown')}</h3>")
+            html_lines.append(f"<p>{event.get('description', 'No description')}</p>")
+            html_lines.append("</div>")
+    if session_data.get('rolls'):
+        html_lines.append("<h2>Dice Rolls</h2>")
+        for roll in session_data['rolls']:
+            html_lines.append(f"<div class='roll'><strong>{roll.get('expression', 'Unknown')}:</strong> {roll.get('result', 'Unknown')}</div>")
+    html_lines.append("</body>")
+    html_lines.append("</html>")
+    return "\n".join(html_lines)
+
+
+def _best(render) -> tuple:
+    best, size = float('inf'), 0
+    for _ in range(REPEATS):
+        start = time.perf_counter()
+        size = render()
+        best = min(best, time.perf_counter() - start)
+    return best, size
+
+
+def _load_templates(cache_dir: str) -> float:
+    environment = Environment(
+        loader=FileSystemLoader(templates.TEMPLATE_DIR),
+        autoescape=select_autoescape(enabled_extensions=('html.j2',)),
+        bytecode_cache=FileSystemBytecodeCache(cache_dir),
+        trim_blocks=True,
+        lstrip_blocks=True,
+    )
+    start = time.perf_counter()
+    for name in environment.list_templates(filter_func=lambda name: name.endswith('.j2')):
+        environment.get_template(name)
+    return time.perf_counter() - start
+
+
+def main() -> None:
+    session = _session()
+    entries = EVENTS + ROLLS
+    print(f"{EVENTS} events, {ROLLS} rolls, best of {REPEATS}")
+
+    templates.preload()
+    runs = [
+        ('f-string, joined', lambda: len(_legacy_html(session).encode('utf-8'))),
+        ('template, joined', lambda: len(''.join(journal_render.render(session, 'html')).encode('utf-8'))),
+        ('template, streamed', lambda: sum(len(chunk.encode('utf-8')) for chunk in journal_render.render(session, 'html'))),
+    ]
+    for label, render in runs:
+        elapsed, size = _best(render)
+        print(f"  {label:<20} {elapsed * 1000:7.1f} ms  {entries / elapsed / 1000:6.0f}k entries/s  "
+              f"{size / 2**20 / elapsed:6.1f} MiB/s")
+
+    cache_dir = tempfile.mkdtemp(prefix='bench-templates-')
+    try:
+        cold = _load_templates(cache_dir)
+        cached = min(_load_templates(cache_dir) for _ in range(REPEATS))
+        print(f"  load templates: compile {cold * 1000:.2f} ms, from bytecode cache {cached * 1000:.2f} ms")
+    finally:
+        shutil.rmtree(cache_dir, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,69 @@
+"""
+Benchmark: spatial-index token queries vs a linear scan over map tokens.
+
+Run from apps/workers:
+    python -m benchmarks.bench_token_index
+"""
+import random
+import time
+from app.services.token_index import FEET_PER_CELL, TokenIndex, token_footprint
+
+MAP_CELLS = 200
+TOKENS = 500
+QUERIES = 2_000
+AURA_FEET = 30
+
+
+def _tokens(rnd):
+    sizes = ['medium'] * 6 + ['small', 'large', 'huge', 'gargantuan']
+    return [
+        {'id': str(i), 'grid_x': rnd.randrange(MAP_CELLS), 'grid_y': rnd.randrange(MAP_CELLS), 'size': rnd.choice(sizes)}
+        for i in range(TOKENS)
+    ]
+
+
+def _scan_within(tokens, col, row, feet):
+    reach = feet // FEET_PER_CELL
+    found = []
+    for token in tokens:
+        size = token_footprint(token)
+        gap_x = max(0, token['grid_x'] - col, col - (token['grid_x'] + size - 1))
+        gap_y = max(0, token['grid_y'] - row, row - (token['grid_y'] + size - 1))
+        if max(gap_x, gap_y) <= reach:
+            found.append(token['id'])
+    return found
+
+
+def main() -> None:
+    rnd = random.Random(7)
+    tokens = _tokens(rnd)
+    points = [(rnd.randrange(MAP_CELLS), rnd.randrange(MAP_CELLS)) for _ in range(QUERIES)]
+
+    start = time.perf_counter()
+    index = TokenIndex.from_tokens(tokens)
+    build = time.perf_counter() - start
+
+    start = time.perf_counter()
+    for col, row in points:
+        _scan_within(tokens, col, row, AURA_FEET)
+    scan = time.perf_counter() - start
+
+    start = time.perf_counter()
+    for col, row in points:
+        index.within(col, row, AURA_FEET)
+    indexed = time.perf_counter() - start
+
+    start = time.perf_counter()
+    for i, (col, row) in enumerate(points):
+        index.move(tokens[i % TOKENS]['id'], col, row)
+    moves = time.perf_counter() - start
+
+    print(f"{TOKENS} tokens on {MAP_CELLS}x{MAP_CELLS} cells, {QUERIES} queries")
+    print(f"  build index          {build * 1e3:8.2f} ms")
+    print(f"  {AURA_FEET} ft aura: scan      {scan / QUERIES * 1e6:8.1f} us/query")
+    print(f"  {AURA_FEET} ft aura: index     {indexed / QUERIES * 1e6:8.1f} us/query  x{scan / indexed:.1f}")
+    print(f"  incremental move     {moves / QUERIES * 1e6:8.1f} us/move")
+
+
+if __name__ == "__main__":
+    main()
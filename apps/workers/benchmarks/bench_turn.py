@@ -0,0 +1,51 @@
+"""
+Benchmark: per-turn latency for an attack with damage.
+
+"task composition" reproduces the old structure, where process_turn called
+the resolve_attack task object per target (task __call__ + a structlog line
+with the full result at every layer). "core" is the current process_turn,
+which composes the plain cores and logs once.
+
+Run from apps/workers:
+    python -m benchmarks.bench_turn
+"""
+import logging
+import time
+import structlog
+from app.services.rng import RngStream
+from app.tasks.combat_runtime import process_turn, resolve_attack
+
+# Render log lines for real (JSON to a null handler) so logging cost is counted
+logging.basicConfig(handlers=[logging.NullHandler()], level=logging.INFO)
+structlog.configure(
+    processors=[structlog.processors.JSONRenderer()],
+    logger_factory=structlog.stdlib.LoggerFactory(),
+)
+
+ACTOR = {'name': 'Fighter'}
+TARGETS = [{'name': f'Goblin {i}', 'armor_class': 13} for i in range(3)]
+ATTACK = {'attack_modifier': 5, 'damage_dice': '1d8', 'damage_modifier': 3}
+TURNS = 5_000
+
+
+def _task_composition(stream: RngStream) -> None:
+    results = [resolve_attack(ACTOR, target, ATTACK, stream) for target in TARGETS]
+    structlog.get_logger().info("Turn processed", result={'results': results})
+
+
+def _core(stream: RngStream) -> None:
+    process_turn(ACTOR, 'attack', ATTACK, TARGETS, stream)
+
+
+def main() -> None:
+    for label, fn in (("task composition", _task_composition), ("core", _core)):
+        stream = RngStream("bench:turn")
+        start = time.perf_counter()
+        for _ in range(TURNS):
+            fn(stream)
+        elapsed = time.perf_counter() - start
+        print(f"{label:<18} {elapsed / TURNS * 1e6:8.1f} us/turn ({len(TARGETS)} attacks)")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,4 +1,5 @@
 from celery import Celery
+from celery.signals import worker_init
 import os
 from dotenv import load_dotenv
 
@@ -31,7 +32,19 @@ celery_app.conf.update(
     task_soft_time_limit=25 * 60,  # 25 minutes
     worker_prefetch_multiplier=1,
     worker_max_tasks_per_child=1000,
+    # Document exports are long and CPU-bound; they run on their own
+    # workers so rules and combat tasks never queue behind them
+    task_routes={
+        "app.tasks.exporter.*": {"queue": "exports"},
+    },
 )
 
+@worker_init.connect
+def preload_export_assets(**_):
+    """Compile export templates and load PDF fonts once, before the pool forks"""
+    from app.services import pdf_layout, templates
+    templates.preload()
+    pdf_layout.fonts()
+
 if __name__ == "__main__":
     celery_app.start()
@@ -0,0 +1,75 @@
+"""
+Unit tests for exact dice distributions: brute-force enumeration and size limits.
+"""
+import itertools
+from collections import Counter
+from fractions import Fraction
+
+import pytest
+
+from app.services.dice import compile_dice_expression
+from app.services.dice_probability import (
+    MAX_KEEP_STEPS, MAX_SUPPORT, _keep_distribution, _sum_distribution, compiled_distribution,
+    expression_distribution,
+)
+from app.tasks.rules_engine import calculate_check_probability, calculate_damage_distribution
+
+
+def _enumerate(count, sides, keep=None, kept=None):
+    """Exact PMF of a term by rolling every combination of faces"""
+    totals = Counter()
+    for faces in itertools.product(range(1, sides + 1), repeat=count):
+        if keep:
+            faces = sorted(faces, reverse=keep == 'h')[:kept]
+        totals[sum(faces)] += 1
+    return {total: Fraction(n, sides ** count) for total, n in totals.items()}
+
+
+def _assert_matches(dist, expected):
+    assert dist.min_value == min(expected) and dist.max_value == max(expected)
+    for total, p in dist.to_dict().items():
+        assert p == pytest.approx(float(expected.get(total, 0)), abs=1e-12)
+
+
+@pytest.mark.parametrize('count,sides', [(1, 20), (2, 6), (3, 4), (4, 6), (5, 3), (3, 1)])
+def test_sum_matches_enumeration(count, sides):
+    _assert_matches(_sum_distribution(count, sides), _enumerate(count, sides))
+
+
+@pytest.mark.parametrize('count,sides,kept', [(2, 20, 1), (4, 6, 3), (4, 6, 1), (5, 4, 2), (3, 5, 2), (6, 3, 4)])
+@pytest.mark.parametrize('keep', ['h', 'l'])
+def test_keep_matches_enumeration(count, sides, kept, keep):
+    _assert_matches(_keep_distribution(count, sides, kept, highest=keep == 'h'), _enumerate(count, sides, keep, kept))
+
+
+def test_expression_combines_terms():
+    left, right = _enumerate(2, 6), _enumerate(1, 4)
+    expected = Counter()
+    for a, pa in left.items():
+        for b, pb in right.items():
+            expected[a - b + 3] += pa * pb
+
+    _assert_matches(expression_distribution("2d6 - 1d4 + 3"), expected)
+
+
+def test_advantage_matches_enumeration():
+    expected = {total + 2: p for total, p in _enumerate(2, 20, 'h', 1).items()}
+
+    _assert_matches(expression_distribution("1d20 + 2", "advantage"), expected)
+
+
+def test_oversized_distributions_are_rejected():
+    with pytest.raises(ValueError, match=str(MAX_SUPPORT)):
+        compiled_distribution(compile_dice_expression("1000d1000"))
+    with pytest.raises(ValueError, match=str(MAX_KEEP_STEPS)):
+        compiled_distribution(compile_dice_expression("200d6kh3"))
+
+
+def test_tasks_report_oversized_distributions():
+    damage = calculate_damage_distribution("1000d1000")
+    check = calculate_check_probability("500d100kh250", 10)
+
+    assert damage['error'].startswith("Expression too large for an exact distribution")
+    assert check['error'].startswith("Expression too large for an exact distribution")
+    assert calculate_damage_distribution("2d") == {"error": "Invalid dice expression"}
+    assert calculate_damage_distribution("4d6kh3")['max'] == 18
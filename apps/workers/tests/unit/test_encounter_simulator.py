@@ -0,0 +1,50 @@
+"""
+Unit tests for the encounter simulator's request bounds and reproducibility.
+"""
+import pytest
+
+from app.services import encounter_simulator
+from app.services.encounter_simulator import CHUNK_SIZE, MAX_SIMULATIONS, plan_chunks, simulate_chunk
+from app.services.rng import RngStream
+from app.tasks.combat_runtime import simulate_encounter
+
+PARTICIPANTS = [
+    {'id': 'hero', 'side': 'party', 'current_hp': 30, 'max_hp': 30, 'armor_class': 15,
+     'attack_data': {'attack_modifier': 5, 'damage_dice': '1d8', 'damage_modifier': 3}},
+    {'id': 'ogre', 'side': 'monsters', 'current_hp': 40, 'max_hp': 40, 'armor_class': 11,
+     'attack_data': {'attack_modifier': 4, 'damage_dice': '2d6', 'damage_modifier': 2}},
+]
+
+
+@pytest.mark.parametrize('n', [0, -5, MAX_SIMULATIONS + 1])
+def test_plan_chunks_rejects_out_of_range_counts(n):
+    with pytest.raises(ValueError):
+        plan_chunks(n, RngStream('bounds'))
+
+
+def test_plan_chunks_covers_n():
+    chunks = plan_chunks(CHUNK_SIZE * 2 + 1, RngStream('plan'))
+
+    assert [count for count, _ in chunks] == [CHUNK_SIZE, CHUNK_SIZE, 1]
+    assert [stream_id for _, stream_id in chunks] == ['plan/0', 'plan/1', 'plan/2']
+
+
+@pytest.mark.parametrize('simulations', [0, -1, MAX_SIMULATIONS + 1])
+def test_task_reports_invalid_simulation_counts(simulations):
+    result = simulate_encounter(PARTICIPANTS, simulations, workers=1)
+
+    assert result['error'].startswith('Invalid simulation count')
+
+
+def test_chunk_rejects_oversized_counts():
+    with pytest.raises(ValueError):
+        simulate_chunk(PARTICIPANTS, CHUNK_SIZE + 1, 'chunk/0')
+
+
+def test_result_is_reproducible_across_worker_counts():
+    spec = {'stream_id': 'repro', 'offset': 0}
+    inline = simulate_encounter(PARTICIPANTS, 600, workers=1, rng=spec)
+    direct = encounter_simulator.simulate_encounter(PARTICIPANTS, 600, RngStream('repro'), workers=1)
+
+    assert inline['win_probability'] == direct['win_probability']
+    assert sum(inline['win_probability'].values()) == pytest.approx(1.0)
@@ -0,0 +1,48 @@
+"""
+Unit tests for session journal export destinations.
+"""
+import os
+
+import pytest
+
+from app.services import export_store
+from app.tasks.exporter import export_session_journal
+
+SESSION = {'id': 'abc', 'name': 'Vault', 'events': [{'timestamp': '18:00', 'type': 'narration', 'description': 'Hi'}]}
+
+
+@pytest.fixture(autouse=True)
+def export_dir(tmp_path, monkeypatch):
+    monkeypatch.setattr(export_store, 'EXPORT_DIR', str(tmp_path / 'exports'))
+    monkeypatch.setattr(export_store, 'EXPORT_BUCKET', '')
+    return tmp_path / 'exports'
+
+
+def test_default_destination_is_under_export_dir(export_dir):
+    result = export_session_journal(SESSION)
+
+    assert result['success']
+    assert os.path.dirname(result['key']) == str(export_dir)
+    assert os.path.getsize(result['key']) == result['size']
+
+
+def test_relative_destination_is_taken_from_export_dir(export_dir):
+    result = export_session_journal(SESSION, 'html', destination='journals/abc.html')
+
+    assert result['key'] == str(export_dir / 'journals' / 'abc.html')
+
+
+@pytest.mark.parametrize('destination', ['../escape.md', '/etc/cron.d/journal', 'a/../../escape.md'])
+def test_destination_outside_export_dir_is_rejected(tmp_path, destination):
+    result = export_session_journal(SESSION, destination=destination)
+
+    assert result['success'] is False
+    assert 'must be under' in result['error']
+    assert not (tmp_path / 'escape.md').exists()
+
+
+def test_bucket_is_the_default_when_configured(monkeypatch):
+    monkeypatch.setattr(export_store, 'EXPORT_BUCKET', 'exports-bucket')
+
+    assert export_store.export_destination(None, 'j.md') == 's3://exports-bucket/exports/j.md'
+    assert export_store.export_destination('s3://other/k.md', 'j.md') == 's3://other/k.md'
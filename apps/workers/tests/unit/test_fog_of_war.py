@@ -0,0 +1,166 @@
+"""
+Unit tests for field of view and incremental party fog, on square and hex maps.
+"""
+import numpy as np
+import pytest
+
+from app.services import hex_grid
+from app.services.fog_of_war import FogState, _window, blocked_for_map, hex_view, shadowcast, view_origin
+from app.services.map_cache import clear_map_cache
+from app.services.map_grid import decode_array
+from app.services.token_index import TokenIndex
+from app.tasks.map_service import compute_fog, update_fog
+
+SIZE = 50
+
+
+@pytest.fixture(autouse=True)
+def empty_cache():
+    clear_map_cache()
+    yield
+    clear_map_cache()
+
+
+def _hex_reference(blocked, origin, radius):
+    """Every hex within ``radius`` whose nudged hex line is clear, one line at a time"""
+    rows, cols = blocked.shape
+    q0, r0 = (int(v) for v in hex_grid.offset_to_axial(*origin))
+    seen = set()
+    for row in range(rows):
+        for col in range(cols):
+            q, r = (int(v) for v in hex_grid.offset_to_axial(col, row))
+            d = int(hex_grid.distance(q0, r0, q, r))
+            if d > radius:
+                continue
+            for nudge in (1e-6, -1e-6):
+                t = np.linspace(0, 1, d + 1)[1:-1]
+                lq, lr = hex_grid.cube_round(q0 + (q - q0) * t + nudge, r0 + (r - r0) * t + nudge)
+                lc, lrow = hex_grid.axial_to_offset(lq, lr)
+                if not any(0 <= c < cols and 0 <= y < rows and blocked[y, c] for c, y in zip(lc, lrow)):
+                    seen.add((col, row))
+    return seen
+
+
+def _view(blocked, origin, radius):
+    region = _window(origin, radius, blocked.shape)
+    mask = hex_view(blocked, origin, radius, region)
+    rows, cols = np.nonzero(mask)
+    return {(int(c) + region[2], int(r) + region[0]) for r, c in zip(rows, cols)}
+
+
+def test_hex_view_on_open_map_is_the_hex_range():
+    blocked = np.zeros((15, 15), dtype=bool)
+    seen = _view(blocked, (7, 7), 4)
+
+    expected = {
+        (c, r) for r in range(15) for c in range(15)
+        if int(hex_grid.offset_distance(7, 7, c, r)) <= 4
+    }
+    assert seen == expected
+
+
+@pytest.mark.parametrize('seed', range(4))
+def test_hex_view_matches_line_by_line_reference(seed):
+    rng = np.random.default_rng(seed)
+    blocked = rng.random((14, 16)) < 0.2
+    origin = (int(rng.integers(16)), int(rng.integers(14)))
+    blocked[origin[1], origin[0]] = False
+
+    for radius in (3, 30):
+        assert _view(blocked, origin, radius) == _hex_reference(blocked, origin, radius)
+
+
+def test_hex_view_is_symmetric():
+    rng = np.random.default_rng(11)
+    blocked = rng.random((12, 12)) < 0.25
+    open_cells = [(c, r) for r in range(12) for c in range(12) if not blocked[r, c]]
+    views = {cell: _view(blocked, cell, 30) for cell in open_cells}
+
+    for a in open_cells:
+        for b in open_cells:
+            assert (b in views[a]) == (a in views[b])
+
+
+def test_hex_walls_are_visible_but_hide_what_is_behind():
+    blocked = np.zeros((9, 12), dtype=bool)
+    blocked[:, 6] = True
+    seen = _view(blocked, (2, 4), 30)
+
+    assert all((6, r) in seen for r in range(2, 7))
+    assert not any((c, r) in seen for r in range(9) for c in range(7, 12))
+
+
+def test_window_holds_every_hex_in_range():
+    for radius in range(1, 6):
+        for origin in ((10, 10), (11, 10)):
+            row0, row1, col0, col1 = _window(origin, radius, (30, 30))
+            q0, r0 = hex_grid.offset_to_axial(*origin)
+            cells = hex_grid.range_offsets(radius)
+            cols, rows = hex_grid.axial_to_offset(cells[:, 0] + q0, cells[:, 1] + r0)
+            assert ((cols >= col0) & (cols < col1) & (rows >= row0) & (rows < row1)).all()
+
+
+def test_square_view_is_unchanged():
+    blocked = np.zeros((9, 9), dtype=bool)
+    blocked[:, 5] = True
+    mask = shadowcast(blocked, (2, 4), 20, (0, 9, 0, 9))
+
+    assert mask[:, :6].all() and not mask[:, 6:].any()
+
+
+def _hex_map():
+    return {
+        'id': 'hexfog', 'version': 1, 'grid_type': 'hex', 'grid_size': SIZE, 'cols': 20, 'rows': 20,
+        # A wall across the right part of the map, past cols x grid_size pixels
+        'walls': [{'id': 'w', 'x1': 1200, 'y1': 0, 'x2': 1200, 'y2': 2000}],
+        'tokens': [{'id': 'pc', 'grid_x': 2, 'grid_y': 5, 'owner_kind': 'pc'}],
+    }
+
+
+def test_hex_fog_is_computed_on_hex_cells():
+    map_data = _hex_map()
+    fog = FogState.from_map(map_data, TokenIndex.from_tokens(map_data['tokens']), blocked_for_map(map_data))
+    wall_col = int(hex_grid.pixel_to_offset(1200, 300, SIZE)[0])
+
+    assert fog.shape == (20, 20)
+    assert fog.visible[:, :wall_col].all()
+    assert not fog.visible[:, wall_col + 1:].any()
+
+
+def test_hex_fog_through_the_tasks():
+    map_data = _hex_map()
+    result = compute_fog(map_data)
+    visible = np.unpackbits(decode_array(result['visible']), count=400).reshape(20, 20).astype(bool)
+
+    assert result['grid_type'] == 'hex' and result['shape'] == [20, 20]
+    assert visible[5, 10] and not visible[5, 18]
+
+    # Opening the far side: remove the wall, the hexes behind it appear
+    delta = update_fog(map_data, map_changes={'walls': []})
+    assert [18, 5] in delta['visible_added']
+    assert not delta['visible_removed']
+
+    moved = update_fog({**map_data, 'walls': [], 'version': delta['map_version']},
+                       token_moves={'pc': {'grid_x': 3, 'grid_y': 5}})
+    assert moved['map_version'] == delta['map_version'] + 1
+
+
+def test_hex_fog_move_matches_full_recompute():
+    rng = np.random.default_rng(3)
+    map_data = {
+        'grid_type': 'hex', 'grid_size': SIZE, 'cols': 16, 'rows': 12,
+        'obstacles': [{'x': int(x), 'y': int(y), 'width': 40, 'height': 40} for x, y in rng.integers(0, 900, (12, 2))],
+        'tokens': [
+            {'id': 'a', 'grid_x': 1, 'grid_y': 1, 'owner_kind': 'pc', 'vision': {'range': 30}},
+            {'id': 'b', 'grid_x': 12, 'grid_y': 9, 'owner_kind': 'pc'},
+        ],
+    }
+    blocked = blocked_for_map(map_data)
+    index = TokenIndex.from_tokens(map_data['tokens'])
+    fog = FogState.from_map(map_data, index, blocked)
+
+    index.move('a', 8, 6)
+    fog.move_token('a', view_origin(index, 'a'), blocked)
+    fresh = FogState.from_map(map_data, index, blocked)
+
+    assert (fog.visible == fresh.visible).all()
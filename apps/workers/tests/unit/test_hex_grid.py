@@ -0,0 +1,117 @@
+"""
+Unit tests for hex coordinate conversions and hex grid geometry.
+"""
+import numpy as np
+import pytest
+
+from app.services import hex_grid
+from app.services.map_grid import GridGeometry
+
+SIZE = 50
+
+
+def _corners(col, row, size=SIZE):
+    x, y = hex_grid.offset_to_pixel(col, row, size)
+    angles = np.radians(np.arange(6) * 60)
+    return float(x) + size * np.cos(angles), float(y) + size * np.sin(angles)
+
+
+def _slow_round(q, r):
+    """Reference cube rounding: nearest hex center by brute force"""
+    best = None
+    for dq in (-1, 0, 1, 2):
+        for dr in (-1, 0, 1, 2):
+            cq, cr = int(np.floor(q)) + dq, int(np.floor(r)) + dr
+            x, y = hex_grid.axial_to_pixel(cq, cr, 1)
+            px, py = hex_grid.axial_to_pixel(q, r, 1)
+            d = (x - px) ** 2 + (y - py) ** 2
+            if best is None or d < best[0]:
+                best = (d, cq, cr)
+    return best[1], best[2]
+
+
+def test_offset_axial_round_trip():
+    cols, rows = np.meshgrid(np.arange(-7, 8), np.arange(-7, 8))
+    q, r = hex_grid.offset_to_axial(cols, rows)
+    back_cols, back_rows = hex_grid.axial_to_offset(q, r)
+
+    assert (back_cols == cols).all() and (back_rows == rows).all()
+
+
+def test_odd_columns_are_shifted_down():
+    _, y_even = hex_grid.offset_to_pixel(2, 3, SIZE)
+    _, y_odd = hex_grid.offset_to_pixel(3, 3, SIZE)
+
+    assert float(y_odd - y_even) == pytest.approx(hex_grid.SQRT3 * SIZE / 2)
+
+
+def test_pixels_land_in_the_containing_hex():
+    rng = np.random.default_rng(1)
+    x = rng.uniform(-500, 2000, 5000)
+    y = rng.uniform(-500, 2000, 5000)
+    cols, rows = hex_grid.pixel_to_offset(x, y, SIZE)
+    cx, cy = hex_grid.offset_to_pixel(cols, rows, SIZE)
+    own = np.hypot(x - cx, y - cy)
+
+    # No neighbouring center is closer than the chosen one
+    for parity in (0, 1):
+        for dcol, drow in hex_grid.OFFSET_NEIGHBORS[parity]:
+            mask = (cols & 1) == parity
+            nx, ny = hex_grid.offset_to_pixel(cols[mask] + dcol, rows[mask] + drow, SIZE)
+            assert (own[mask] <= np.hypot(x[mask] - nx, y[mask] - ny) + 1e-9).all()
+
+
+def test_cube_round_matches_nearest_center():
+    rng = np.random.default_rng(2)
+    for q, r in rng.uniform(-5, 5, size=(300, 2)):
+        rq, rr = hex_grid.cube_round(q, r)
+        assert (int(rq), int(rr)) == _slow_round(q, r)
+
+
+def test_offset_neighbors_are_one_step_away():
+    for col in (4, 5):
+        for dcol, drow in hex_grid.OFFSET_NEIGHBORS[col & 1]:
+            assert int(hex_grid.offset_distance(col, 6, col + dcol, 6 + drow)) == 1
+        assert len(set(hex_grid.OFFSET_NEIGHBORS[col & 1])) == 6
+
+
+def test_rings_and_ranges():
+    for radius in range(5):
+        ring = hex_grid.ring_offsets(radius)
+        assert len(ring) == max(1, 6 * radius)
+        assert (hex_grid.distance(0, 0, ring[:, 0], ring[:, 1]) == radius).all()
+        cells = hex_grid.range_offsets(radius)
+        assert len({tuple(c) for c in cells.tolist()}) == 3 * radius * (radius + 1) + 1
+
+
+def test_line_steps_through_adjacent_hexes():
+    cells = hex_grid.line(0, 0, 5, -2)
+
+    assert tuple(cells[0]) == (0, 0) and tuple(cells[-1]) == (5, -2)
+    assert len(cells) == int(hex_grid.distance(0, 0, 5, -2)) + 1
+    steps = hex_grid.distance(cells[:-1, 0], cells[:-1, 1], cells[1:, 0], cells[1:, 1])
+    assert (steps == 1).all()
+
+
+def test_geometry_centers_fall_in_their_own_hex():
+    geometry = GridGeometry.for_map(900, 700, SIZE, 'hex')
+    centers = geometry.centers()
+    cols, rows = hex_grid.pixel_to_offset(centers[:, 0], centers[:, 1], SIZE)
+    expected_rows, expected_cols = np.divmod(np.arange(geometry.total_cells), geometry.cols)
+
+    assert (cols == expected_cols).all() and (rows == expected_rows).all()
+
+
+def test_geometry_vertices_are_hex_corners():
+    geometry = GridGeometry.for_map(400, 400, SIZE, 'hex')
+    vertices = geometry.vertices()
+    col, row = 3, 2
+    xs, ys = _corners(col, row)
+
+    assert np.allclose(vertices[row * geometry.cols + col], np.stack([xs, ys], axis=1), atol=1e-3)
+
+
+def test_square_centers_are_cell_middles():
+    geometry = GridGeometry.for_map(200, 100, SIZE, 'square')
+
+    assert geometry.centers()[geometry.cols + 1].tolist() == [75.0, 75.0]
@@ -0,0 +1,98 @@
+"""
+Unit tests for the obstacle raster and the line-of-sight tasks.
+"""
+import numpy as np
+import pytest
+
+from app.services import hex_grid
+from app.services.map_cache import clear_map_cache
+from app.services.obstacle_raster import ObstacleRaster
+from app.tasks.map_service import calculate_line_of_sight, calculate_visible_tokens
+
+SIZE = 50
+
+
+@pytest.fixture(autouse=True)
+def empty_cache():
+    clear_map_cache()
+    yield
+    clear_map_cache()
+
+
+def _wall(x):
+    return {'id': 'w', 'x1': x, 'y1': 0, 'x2': x, 'y2': 2000}
+
+
+def _hex_map(**extra):
+    return {
+        'grid_type': 'hex', 'grid_size': SIZE, 'cols': 20, 'rows': 20, 'walls': [_wall(1200)],
+        'tokens': [
+            {'id': 'viewer', 'grid_x': 2, 'grid_y': 5},
+            {'id': 'near', 'grid_x': 10, 'grid_y': 5},
+            {'id': 'far', 'grid_x': 18, 'grid_y': 5},
+            {'id': 'low', 'grid_x': 3, 'grid_y': 19},
+        ],
+        **extra,
+    }
+
+
+def test_raster_covers_the_hex_pixel_extent():
+    raster = ObstacleRaster.from_map(_hex_map())
+    rows, cols = raster.shape
+    # Every hex center must fall inside the raster
+    x, y = hex_grid.offset_to_pixel(19, 19, SIZE)
+
+    assert cols * SIZE > float(x) and rows * SIZE > float(y)
+    assert raster.blocked[:, 1200 // SIZE].any()
+
+
+def test_square_raster_matches_the_grid():
+    raster = ObstacleRaster.from_map({'grid_size': SIZE, 'cols': 8, 'rows': 6, 'walls': [_wall(100)]})
+
+    assert raster.shape == (6, 8)
+    assert raster.blocked[:, 2].all()
+
+
+def test_raster_sized_from_map_pixels():
+    raster = ObstacleRaster.from_map({'grid_size': SIZE, 'width': 1020, 'height': 480})
+
+    assert raster.shape == (10, 21)
+
+
+def test_hex_visible_tokens_stop_at_far_walls():
+    result = calculate_visible_tokens(_hex_map(), 'viewer')
+
+    assert sorted(result['visible']) == ['low', 'near']
+    assert result['hidden'] == ['far']
+
+
+def test_hex_visible_tokens_use_hex_centers():
+    # A wall just right of the viewer's hex center, but left of its square-grid center
+    cx, cy = hex_grid.offset_to_pixel(2, 5, SIZE)
+    map_data = _hex_map(walls=[{'id': 'w', 'x1': float(cx) + 10, 'y1': 0, 'x2': float(cx) + 10, 'y2': 2000}])
+
+    result = calculate_visible_tokens(map_data, 'viewer', ['near'])
+
+    assert result['hidden'] == ['near']
+
+
+def test_hex_line_of_sight_task():
+    x0, y0 = (float(v) for v in hex_grid.offset_to_pixel(2, 5, SIZE))
+    x1, y1 = (float(v) for v in hex_grid.offset_to_pixel(18, 5, SIZE))
+
+    result = calculate_line_of_sight(x0, y0, x1, y1, _hex_map())
+
+    assert result['has_line_of_sight'] is False
+    assert result['blocked_at'][0] == 1200 // SIZE
+
+
+def test_visible_from_matches_single_rays():
+    rng = np.random.default_rng(5)
+    blocked = rng.random((30, 30)) < 0.15
+    raster = ObstacleRaster(blocked, SIZE)
+    targets = rng.uniform(0, 30 * SIZE, size=(200, 2))
+
+    batch = raster.visible_from(725.0, 725.0, targets)
+    single = [raster.first_blocked(725.0, 725.0, x, y) is None for x, y in targets]
+
+    assert batch.tolist() == single
@@ -0,0 +1,90 @@
+"""
+Unit tests for alias-table sampling and loot tier lookup.
+"""
+import numpy as np
+import pytest
+
+from app.services.loot_tables import AliasTable, registry, roll_batch, roll_coins
+
+
+@pytest.mark.parametrize('weights', [
+    [1],
+    [1, 1, 1, 1],
+    [5, 1, 0, 2],
+    [0.1, 0.2, 0.3, 0.4, 10.0],
+    list(range(1, 40)),
+])
+def test_alias_probabilities_are_the_normalized_weights(weights):
+    table = AliasTable(weights)
+    expected = np.asarray(weights, dtype=np.float64) / sum(weights)
+
+    assert np.allclose(table.probabilities(), expected)
+
+
+def test_alias_pick_is_exact_on_a_uniform_grid():
+    weights = [3, 1, 4, 1, 5, 9, 2, 6]
+    table = AliasTable(weights)
+    # Midpoints of a fine grid over [0, 1): each outcome's share is its exact probability
+    steps = 8 * 3000
+    u = (np.arange(steps) + 0.5) / steps
+    counts = np.bincount(table.pick_many(u), minlength=len(weights)) / steps
+
+    assert np.allclose(counts, np.asarray(weights) / sum(weights), atol=1e-3)
+    assert [table.pick(x) for x in u[::97]] == table.pick_many(u[::97]).tolist()
+
+
+def test_alias_never_picks_zero_weights():
+    table = AliasTable([0, 2, 0, 1])
+    picks = table.pick_many(np.random.default_rng(0).random(10_000))
+
+    assert set(picks.tolist()) <= {1, 3}
+
+
+@pytest.mark.parametrize('weights', [[], [0, 0], [1, -1]])
+def test_alias_rejects_bad_weights(weights):
+    with pytest.raises(ValueError):
+        AliasTable(weights)
+
+
+def test_tier_lookup_by_lowest_cr():
+    tables = registry()
+    bounds = [t.min_cr for t in tables.tiers]
+
+    assert tables.tier_index(-1) == 0
+    assert tables.tier_index(bounds[0]) == 0
+    for i, bound in enumerate(bounds[1:], start=1):
+        assert tables.tier_index(bound) == i
+        assert tables.tier_index(bound - 0.5) == i - 1
+    assert tables.tier_index(1000) == len(bounds) - 1
+
+
+def test_coins_stay_within_dice_bounds():
+    tables = registry()
+    tier = tables.tiers[-1]
+    generator = np.random.default_rng(4)
+    starts = tier.coin_starts.tolist() + [len(tier.coin_dice)]
+    low = [(b - a) * tables.coin_multiplier for a, b in zip(starts, starts[1:])]
+    high = [int(tier.coin_dice[a:b].sum()) * tables.coin_multiplier for a, b in zip(starts, starts[1:])]
+
+    for _ in range(200):
+        coins = roll_coins(tier, 1.0, generator, tables.coin_multiplier)
+        for coin, lo, hi in zip(tier.coin_types, low, high):
+            assert lo <= coins[coin] <= hi
+
+
+def test_batch_is_reproducible_and_shaped():
+    tables = registry()
+    crs = [0, 3, 7.5, 12, 30]
+    kinds = ['individual', 'hoard', 'hoard', 'individual', 'hoard']
+
+    first = roll_batch(tables, crs, kinds, np.random.default_rng(9))
+    second = roll_batch(tables, crs, kinds, np.random.default_rng(9))
+
+    assert first['coins'].shape == (len(crs), len(first['coin_types']))
+    assert (first['coins'] == second['coins']).all()
+    assert first['magic_items'] == second['magic_items']
+    for row, kind in enumerate(kinds):
+        if kind == 'individual':
+            assert not first['gems'][row] and not first['magic_items'][row]
+        else:
+            assert not first['small_items'][row]
@@ -0,0 +1,86 @@
+"""
+Unit tests for the worker-local map cache: versioning and per-kind bounds.
+"""
+import pytest
+
+from app.services import map_cache
+from app.services.map_cache import advance, cached, clear_map_cache, discard, peek
+
+
+@pytest.fixture(autouse=True)
+def small_limits(monkeypatch):
+    monkeypatch.setattr(map_cache, 'MAP_CACHE_SIZE', 4)
+    monkeypatch.setattr(map_cache, 'FAMILY_LIMITS', {'reach': (3, 5)})
+    clear_map_cache()
+    yield
+    clear_map_cache()
+
+
+def _map(map_id, version=1):
+    return {'id': map_id, 'version': version}
+
+
+def test_reach_entries_do_not_evict_map_structures():
+    map_data = _map('m')
+    cached(map_data, 'obstacles', lambda: 'raster')
+    cached(map_data, 'tokens', lambda: 'index')
+    for i in range(20):
+        cached(map_data, f"reach:t{i}", lambda: i)
+
+    assert peek(map_data, 'obstacles') == 'raster'
+    assert peek(map_data, 'tokens') == 'index'
+
+
+def test_reach_entries_are_bounded_per_map():
+    map_data = _map('m')
+    for i in range(5):
+        cached(map_data, f"reach:t{i}", lambda: i)
+
+    assert [peek(map_data, f"reach:t{i}") for i in range(5)] == [None, None, 2, 3, 4]
+
+
+def test_reach_entries_are_bounded_across_maps():
+    for m in range(3):
+        for i in range(2):
+            cached(_map(m), f"reach:t{i}", lambda: (m, i))
+
+    kept = [(m, i) for m in range(3) for i in range(2) if peek(_map(m), f"reach:t{i}") is not None]
+    assert kept == [(0, 1), (1, 0), (1, 1), (2, 0), (2, 1)]
+
+
+def test_recently_used_reach_entries_are_kept():
+    map_data = _map('m')
+    for i in range(3):
+        cached(map_data, f"reach:t{i}", lambda: i)
+    cached(map_data, "reach:t0", lambda: 'rebuilt')
+    cached(map_data, "reach:t3", lambda: 3)
+
+    assert peek(map_data, "reach:t0") == 0
+    assert peek(map_data, "reach:t1") is None
+
+
+def test_structures_use_the_shared_lru():
+    for m in range(5):
+        cached(_map(m), 'obstacles', lambda: m)
+
+    assert peek(_map(0), 'obstacles') is None
+    assert peek(_map(4), 'obstacles') == 4
+
+
+def test_advance_and_discard_keep_the_bounds():
+    map_data = _map('m')
+    cached(map_data, 'tokens', lambda: 'index')
+    for i in range(3):
+        cached(map_data, f"reach:t{i}", lambda: i)
+
+    version = advance(map_data, invalidate=['reach'])
+    moved = _map('m', version)
+    assert peek(moved, 'tokens') == 'index' and peek(moved, 'reach:t0') is None
+
+    for i in range(3):
+        cached(moved, f"reach:t{i}", lambda: i)
+    discard(moved)
+    for i in range(3):
+        cached(_map('other'), f"reach:t{i}", lambda: i)
+    assert all(peek(_map('other'), f"reach:t{i}") == i for i in range(3))
+    assert +map_cache._counts == {'reach': 3, ('other', 1, 'reach'): 3}
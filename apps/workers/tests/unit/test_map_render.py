@@ -0,0 +1,99 @@
+"""
+Unit tests for map rendering: scene size and party fog on square and hex maps.
+"""
+import io
+
+import numpy as np
+import pytest
+from PIL import Image
+
+from app.services import hex_grid, map_render
+from app.services.map_cache import clear_map_cache
+from app.services.map_render import MapScene, render_png, render_tile, write_svg
+from app.tasks.map_service import compute_fog
+
+SIZE = 50
+
+
+@pytest.fixture(autouse=True)
+def empty_caches():
+    clear_map_cache()
+    map_render.clear_tile_cache()
+    yield
+    clear_map_cache()
+    map_render.clear_tile_cache()
+
+
+def _hex_map(walls):
+    return {
+        'id': 'render-hex', 'version': 1, 'grid_type': 'hex', 'grid_size': SIZE, 'cols': 20, 'rows': 20,
+        'walls': walls,
+        'tokens': [{'id': 'pc', 'grid_x': 2, 'grid_y': 5, 'owner_kind': 'pc'}],
+    }
+
+
+def _pixel(scene, x, y, tile_size=256):
+    tx, ty = x // tile_size, y // tile_size
+    return render_tile(scene, tx, ty, tile_size).getpixel((x - tx * tile_size, y - ty * tile_size))
+
+
+def _hex_center(col, row):
+    x, y = hex_grid.offset_to_pixel(col, row, SIZE)
+    # Just off the center so tokens and grid lines do not cover the sample
+    return int(x) + 12, int(y) + 12
+
+
+def test_hex_scene_covers_the_hex_extent():
+    scene = MapScene.from_map(_hex_map([]))
+
+    assert scene.width == int(np.ceil((20 * 1.5 + 0.5) * SIZE))
+    assert scene.height == int(np.ceil(20.5 * hex_grid.SQRT3 * SIZE))
+
+
+def test_hex_fog_is_drawn_per_hex():
+    map_data = _hex_map([])
+    compute_fog(map_data)
+    scene = MapScene.from_map(map_data)
+    black = (0, 0, 0)
+
+    # Everything is in view: hexes far right and at the bottom are not fogged
+    for col, row in ((18, 5), (19, 19), (3, 18)):
+        assert _pixel(scene, *_hex_center(col, row)) != black
+
+
+def test_hex_fog_hides_hexes_behind_walls():
+    map_data = _hex_map([{'id': 'w', 'x1': 1200, 'y1': 0, 'x2': 1200, 'y2': 2000}])
+    compute_fog(map_data)
+    scene = MapScene.from_map(map_data)
+
+    assert _pixel(scene, *_hex_center(10, 5)) != (0, 0, 0)
+    assert _pixel(scene, *_hex_center(18, 5)) == (0, 0, 0)
+
+
+def test_hex_fog_svg_outlines_hexes():
+    map_data = _hex_map([{'id': 'w', 'x1': 1200, 'y1': 0, 'x2': 1200, 'y2': 2000}])
+    compute_fog(map_data)
+    buffer = io.StringIO()
+    write_svg(MapScene.from_map(map_data), buffer)
+    svg = buffer.getvalue()
+    fog = svg[svg.rindex('<g fill="#000000">'):]
+
+    assert '<path fill-opacity="1.0"' in fog
+    assert '<rect' not in fog
+
+
+def test_square_fog_png_renders(tmp_path):
+    map_data = {
+        'id': 'render-square', 'version': 1, 'grid_size': SIZE, 'cols': 12, 'rows': 8,
+        'walls': [{'id': 'w', 'x1': 300, 'y1': 0, 'x2': 300, 'y2': 400}],
+        'tokens': [{'id': 'pc', 'grid_x': 1, 'grid_y': 1, 'owner_kind': 'pc'}],
+    }
+    compute_fog(map_data)
+    path = tmp_path / 'map.png'
+    result = render_png(map_data, str(path))
+
+    with Image.open(path) as image:
+        assert image.size == (600, 400)
+        assert image.getpixel((520, 200)) == (0, 0, 0)
+        assert image.getpixel((120, 200)) != (0, 0, 0)
+    assert result['rendered'] == result['tiles']
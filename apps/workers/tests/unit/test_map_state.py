@@ -0,0 +1,197 @@
+"""
+Unit tests for the versioned map state and its Redis scripts.
+"""
+import fakeredis
+import pytest
+
+from app.services import map_cache, map_state
+from app.services.map_state import MapNotSynced, MapVersionConflict
+
+
+@pytest.fixture(autouse=True)
+def redis_client(monkeypatch):
+    client = fakeredis.FakeRedis()
+    monkeypatch.setattr(map_state, '_redis', client)
+    monkeypatch.setattr(map_state, '_scripts', {})
+    map_state.clear_local_state()
+    map_cache.clear_map_cache()
+    yield client
+    map_state.clear_local_state()
+    map_cache.clear_map_cache()
+
+
+def _map():
+    return {
+        'id': 'm1', 'version': 0, 'grid_size': 50, 'cols': 10, 'rows': 10,
+        'tokens': [{'id': 't1', 'grid_x': 0, 'grid_y': 0}],
+        'walls': [],
+    }
+
+
+def _move(x, y):
+    return {'op': 'move_token', 'token_id': 't1', 'grid_x': x, 'grid_y': y}
+
+
+def _token(map_data):
+    return map_state.find_token(map_data, 't1')
+
+
+def _other_worker():
+    """Forget this worker's copies, as a different worker process would"""
+    map_state.clear_local_state()
+    map_cache.clear_map_cache()
+
+
+def test_sync_then_load_reference():
+    version = map_state.sync(_map())
+    _other_worker()
+
+    loaded = map_state.resolve({'id': 'm1', 'version': version})
+
+    assert loaded['version'] == version
+    assert _token(loaded) == {'id': 't1', 'grid_x': 0, 'grid_y': 0}
+
+
+def test_sync_never_lowers_the_version():
+    first = map_state.sync(_map())
+    second = map_state.sync(_map())
+
+    assert second == first + 1
+
+
+def test_commit_on_stale_version_conflicts():
+    version = map_state.sync(_map())
+    _other_worker()
+    mine = map_state.load('m1', version)
+    mine = {**mine, 'tokens': [dict(t) for t in mine['tokens']]}
+    _other_worker()
+    theirs = map_state.load('m1', version)
+
+    assert map_state.commit(theirs, [_move(1, 1)]) == version + 1
+    with pytest.raises(MapVersionConflict) as conflict:
+        map_state.commit(mine, [_move(2, 2)])
+
+    assert conflict.value.current == version + 1
+    _other_worker()
+    assert _token(map_state.load('m1'))['grid_x'] == 1
+
+
+def test_commit_without_stored_state():
+    with pytest.raises(MapNotSynced):
+        map_state.commit(_map(), [_move(1, 1)])
+
+
+def test_load_replays_from_callers_version():
+    version = map_state.sync(_map())
+    _other_worker()
+    reader = map_state.load('m1', version)
+
+    writer = dict(reader, tokens=[dict(t) for t in reader['tokens']])
+    for step in range(1, 4):
+        writer['version'] = map_state.commit(writer, [_move(step, step)])
+
+    # The reader's copy (still at ``version``) catches up from the log only
+    map_state._local['m1'] = reader
+    assert [e['version'] for e in map_state._log_entries('m1', after=version + 1)] == [
+        version + 2, version + 3
+    ]
+    caught_up = map_state.load('m1', version + 2)
+
+    assert caught_up is reader
+    assert caught_up['version'] == version + 2
+    assert _token(caught_up)['grid_x'] == 2
+
+
+def test_load_older_than_local_copy_conflicts():
+    version = map_state.sync(_map())
+    map_state.commit(map_state.load('m1', version), [_move(1, 1)])
+
+    with pytest.raises(MapVersionConflict):
+        map_state.load('m1', version)
+
+
+def test_load_newer_than_committed_conflicts():
+    version = map_state.sync(_map())
+    _other_worker()
+
+    with pytest.raises(MapVersionConflict):
+        map_state.load('m1', version + 5)
+
+
+def test_snapshot_trims_log_and_serves_new_readers(monkeypatch, redis_client):
+    monkeypatch.setattr(map_state, 'SNAPSHOT_EVERY', 3)
+    version = map_state.sync(_map())
+    writer = map_state.load('m1', version)
+    for step in range(1, 5):
+        map_state.commit(writer, [_move(step, 0)])
+    keys = map_state._keys('m1')
+
+    # The third entry triggered a snapshot at version + 3; one entry is left
+    assert int(redis_client.get(keys['snapshot_version'])) == version + 3
+    assert redis_client.llen(keys['log']) == 1
+    assert [e['version'] for e in map_state._log_entries('m1', after=version + 3)] == [version + 4]
+
+    _other_worker()
+    latest = map_state.load('m1')
+    assert latest['version'] == version + 4
+    assert _token(latest)['grid_x'] == 4
+
+    # Versions before the snapshot can no longer be rebuilt
+    _other_worker()
+    with pytest.raises(MapVersionConflict):
+        map_state.load('m1', version + 1)
+
+
+def test_load_falls_back_to_snapshot_when_log_was_trimmed(monkeypatch):
+    monkeypatch.setattr(map_state, 'SNAPSHOT_EVERY', 2)
+    version = map_state.sync(_map())
+    _other_worker()
+    stale = map_state.load('m1', version)
+
+    writer = dict(stale, tokens=[dict(t) for t in stale['tokens']])
+    for step in range(1, 6):
+        writer['version'] = map_state.commit(writer, [_move(step, 0)])
+
+    # The log no longer starts right after the stale copy: load the snapshot
+    map_state._local['m1'] = stale
+    latest = map_state.load('m1')
+
+    assert latest is not stale
+    assert latest['version'] == version + 5
+    assert _token(latest)['grid_x'] == 5
+
+
+def test_commit_refreshes_every_key_ttl(monkeypatch, redis_client):
+    version = map_state.sync(_map())
+    keys = map_state._keys('m1')
+    monkeypatch.setattr(map_state, 'MAP_STATE_TTL', 10_000_000)
+
+    map_state.commit(map_state.load('m1', version), [_move(1, 1)])
+
+    for key in keys.values():
+        assert redis_client.ttl(key) > 7 * 24 * 3600
+
+
+def test_commit_moves_cached_structures_to_new_version():
+    version = map_state.sync(_map())
+    map_data = map_state.load('m1', version)
+    map_cache.cached(map_data, 'obstacles', lambda: 'raster')
+    map_cache.cached(map_data, 'tokens', lambda: 'index')
+
+    map_state.commit(map_data, [_move(1, 1)])
+
+    assert map_cache.peek(map_data, 'obstacles') == 'raster'
+    assert map_cache.peek(map_data, 'tokens') is None
+
+
+def test_rejects_invalid_deltas():
+    version = map_state.sync(_map())
+    map_data = map_state.load('m1', version)
+
+    with pytest.raises(ValueError):
+        map_state.commit(map_data, [{'op': 'teleport'}])
+    with pytest.raises(ValueError):
+        map_state.commit(map_data, [_move(1, 1), {'op': 'remove_token', 'token_id': 'nope'}])
+    with pytest.raises(ValueError):
+        map_state.commit(map_data, [{'op': 'set', 'key': 'version', 'value': 9}])
+    assert map_state._current_version('m1') == version
@@ -0,0 +1,124 @@
+"""
+Unit tests for A* and the bounded movement distance fields.
+"""
+import numpy as np
+import pytest
+
+from app.services.hex_grid import offset_to_pixel
+from app.services.map_cache import clear_map_cache
+from app.services.pathfinding import (
+    DIFFICULT_COST, IMPASSABLE, distance_field, find_path, hex_terrain_costs, movement_grid,
+    reachable_for_token, terrain_for_map
+)
+from app.services.token_index import FEET_PER_CELL, TokenIndex
+
+
+@pytest.fixture(autouse=True)
+def empty_cache():
+    clear_map_cache()
+    yield
+    clear_map_cache()
+
+
+def _random_costs(seed, shape=(24, 24)):
+    rng = np.random.default_rng(seed)
+    costs = rng.choice([FEET_PER_CELL, FEET_PER_CELL, DIFFICULT_COST, IMPASSABLE], size=shape).astype(np.int16)
+    costs[0, 0] = FEET_PER_CELL
+    return costs
+
+
+@pytest.mark.parametrize('grid_type', ['square', 'hex'])
+@pytest.mark.parametrize('seed', range(5))
+def test_astar_matches_dijkstra(grid_type, seed):
+    costs = _random_costs(seed)
+    endable = np.ones(costs.shape, dtype=bool)
+    field = distance_field(costs, endable, [(0, 0)], 10_000, grid_type)
+
+    for row in range(0, costs.shape[0], 3):
+        for col in range(0, costs.shape[1], 3):
+            result = find_path(costs, (0, 0), (col, row), grid_type=grid_type)
+            expected = int(field.cost[row, col])
+            if expected < 0:
+                assert result is None
+                continue
+            path, feet = result
+            assert feet == expected
+            assert path[0] == (0, 0) and path[-1] == (col, row)
+            # The path's own step costs add up to the reported cost
+            assert sum(int(costs[y, x]) for x, y in path[1:]) == feet
+
+
+def test_square_diagonal_cannot_squeeze_between_blocked_cells():
+    costs = np.full((2, 2), FEET_PER_CELL, dtype=np.int16)
+    costs[0, 1] = costs[1, 0] = IMPASSABLE
+
+    assert find_path(costs, (0, 0), (1, 1)) is None
+
+
+def test_hex_steps_use_odd_q_neighbours():
+    costs = np.full((5, 5), FEET_PER_CELL, dtype=np.int16)
+
+    # (1, 0) -> (2, 1) is a single step in odd-q, (0, 0) -> (1, 1) is not
+    assert find_path(costs, (1, 0), (2, 1), grid_type='hex')[1] == FEET_PER_CELL
+    assert find_path(costs, (0, 0), (1, 1), grid_type='hex')[1] == 2 * FEET_PER_CELL
+
+
+def test_distance_field_respects_budget():
+    costs = np.full((20, 20), FEET_PER_CELL, dtype=np.int16)
+    field = distance_field(costs, np.ones(costs.shape, dtype=bool), [(10, 10)], 15)
+
+    cells = {(c, r): feet for c, r, feet in field.reachable()}
+    assert cells[(13, 13)] == 15
+    assert (14, 10) not in cells
+    assert max(cells.values()) == 15
+
+
+def test_large_footprint_must_fit():
+    terrain = np.full((4, 4), FEET_PER_CELL, dtype=np.int16)
+    terrain[1, 2] = IMPASSABLE
+    index = TokenIndex()
+    index.insert('ogre', 0, 0, 2)
+
+    costs, endable = movement_grid(terrain, index, 2, hostile=[], allied=[])
+
+    assert costs[0, 0] == FEET_PER_CELL
+    assert costs[0, 1] == IMPASSABLE
+    assert costs[0, 2] == IMPASSABLE
+    assert costs[3, 3] == IMPASSABLE  # footprint would leave the grid
+    assert endable[2, 2] and not endable[3, 0]
+
+
+def test_hex_walls_block_movement():
+    size = 50
+    x0, _ = offset_to_pixel(4.5, 0, size)
+    # A wall between hex columns 4 and 5, top to bottom of the map
+    map_data = {
+        'grid_type': 'hex', 'grid_size': size, 'cols': 10, 'rows': 8,
+        'walls': [{'id': 'w', 'x1': float(x0), 'y1': -size, 'x2': float(x0), 'y2': 20 * size}],
+    }
+    costs = hex_terrain_costs(map_data)
+
+    assert (costs[:, 4] == IMPASSABLE).all()
+    assert find_path(costs, (0, 3), (9, 3), grid_type='hex') is None
+    assert find_path(costs, (0, 3), (3, 3), grid_type='hex') is not None
+
+    map_data['walls'][0]['door'] = True
+    map_data['walls'][0]['open'] = True
+    assert find_path(hex_terrain_costs(map_data), (0, 3), (9, 3), grid_type='hex') is not None
+
+
+def test_hostile_tokens_block_and_allies_cannot_be_ended_on():
+    map_data = {
+        'id': 'm', 'version': 1, 'grid_size': 50, 'cols': 5, 'rows': 1,
+        'tokens': [
+            {'id': 'hero', 'grid_x': 0, 'grid_y': 0},
+            {'id': 'friend', 'grid_x': 1, 'grid_y': 0},
+            {'id': 'orc', 'grid_x': 3, 'grid_y': 0, 'owner_kind': 'monster'},
+        ],
+    }
+    cells = {(c, r) for c, r, _ in reachable_for_token(map_data, 'hero', 30).reachable()}
+
+    assert (1, 0) not in cells  # ally: pass through, do not stop
+    assert (2, 0) in cells
+    assert (3, 0) not in cells and (4, 0) not in cells
+    assert terrain_for_map(map_data) is terrain_for_map(map_data)
@@ -0,0 +1,112 @@
+"""
+Unit tests for the token spatial index, checked against a linear scan.
+"""
+import random
+
+import pytest
+
+from app.services import hex_grid
+from app.services.token_index import FEET_PER_CELL, TokenIndex, token_footprint
+
+MAP_CELLS = 30
+
+
+def _tokens(rnd, count=80):
+    sizes = ['medium'] * 4 + ['small', 'large', 'huge', 'gargantuan']
+    return [
+        {'id': str(i), 'grid_x': rnd.randrange(MAP_CELLS), 'grid_y': rnd.randrange(MAP_CELLS), 'size': rnd.choice(sizes)}
+        for i in range(count)
+    ]
+
+
+def _cells(col, row, size):
+    return [(col + dx, row + dy) for dy in range(size) for dx in range(size)]
+
+
+def _scan_within(tokens, col, row, feet, size, grid_type):
+    """Reference: distance between the closest cells of every token"""
+    reach = feet // FEET_PER_CELL
+    found = {}
+    for token in tokens:
+        cells = _cells(token['grid_x'], token['grid_y'], token_footprint(token))
+        if grid_type == 'hex':
+            steps = min(
+                hex_grid.offset_distance(c0, r0, c1, r1)
+                for c0, r0 in _cells(col, row, size) for c1, r1 in cells
+            )
+        else:
+            steps = min(
+                max(abs(c0 - c1), abs(r0 - r1))
+                for c0, r0 in _cells(col, row, size) for c1, r1 in cells
+            )
+        if steps <= reach:
+            found[token['id']] = int(steps) * FEET_PER_CELL
+    return found
+
+
+def test_footprint_sizes():
+    assert token_footprint({}) == 1
+    assert token_footprint({'size': 'Large'}) == 2
+    assert token_footprint({'size': 'gargantuan'}) == 4
+    assert token_footprint({'size': 3}) == 3
+
+
+@pytest.mark.parametrize('grid_type', ['square', 'hex'])
+def test_within_matches_linear_scan(grid_type):
+    rnd = random.Random(3)
+    tokens = _tokens(rnd)
+    index = TokenIndex.from_tokens(tokens)
+
+    for _ in range(50):
+        col, row = rnd.randrange(MAP_CELLS), rnd.randrange(MAP_CELLS)
+        size = rnd.choice([1, 1, 2, 3])
+        feet = rnd.choice([0, 5, 15, 30])
+        assert index.within(col, row, feet, size=size, grid_type=grid_type) == \
+            _scan_within(tokens, col, row, feet, size, grid_type)
+
+
+def test_hex_within_uses_hex_steps():
+    # Odd-q: (1, 0)'s neighbours are (0, 0), (0, 1), (2, 0), (2, 1), (1, 1)
+    index = TokenIndex.from_tokens([
+        {'id': 'a', 'grid_x': 2, 'grid_y': 1},
+        {'id': 'b', 'grid_x': 3, 'grid_y': 2},
+    ])
+
+    assert index.within(1, 0, 5, grid_type='hex') == {'a': 5}
+    # Chebyshev distance would put 'b' two squares away as well
+    assert index.within(1, 0, 10, grid_type='square') == {'a': 5, 'b': 10}
+    assert index.within(1, 0, 10, grid_type='hex') == {'a': 5}
+
+
+def test_moves_update_collisions_and_areas():
+    index = TokenIndex.from_tokens([{'id': 'ogre', 'grid_x': 0, 'grid_y': 0, 'size': 'large'}])
+
+    assert index.collisions(1, 1) == {'ogre'}
+    assert index.collisions(1, 1, ignore='ogre') == set()
+
+    index.move('ogre', 5, 5)
+    assert index.collisions(1, 1) == set()
+    assert index.in_area(6, 6, 9, 9) == {'ogre'}
+    assert index.at_cells([(5, 6)]) == {'ogre'}
+
+    index.move('ogre', 5, 5, size=1)
+    assert index.at_cells([(6, 6)]) == set()
+
+    index.remove('ogre')
+    assert len(index) == 0
+    assert index.in_area(0, 0, MAP_CELLS, MAP_CELLS) == set()
+
+
+def test_insert_twice_is_rejected():
+    index = TokenIndex()
+    index.insert('a', 0, 0)
+    with pytest.raises(ValueError):
+        index.insert('a', 1, 1)
+
+
+def test_hex_tokens_indexed_from_pixels():
+    x, y = hex_grid.offset_to_pixel(3, 4, 50)
+    index = TokenIndex.from_tokens([{'id': 'a', 'x': float(x), 'y': float(y)}], 50, 'hex')
+
+    assert index.position('a') == (3, 4, 1)
+    assert index.center('a', 50, 'hex') == pytest.approx((float(x), float(y)))
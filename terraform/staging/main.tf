@@ -199,6 +199,56 @@ module "orchestrator" {
   depends_on = [module.ecs, module.alb, module.rds, module.redis]
 }
 
+# Finished exports; the export workers write here instead of their own
+# container disk, which is neither shared nor kept across deployments
+resource "aws_s3_bucket" "exports" {
+  bucket = "staging-ai-dungeon-master-exports"
+}
+
+# Document exports (journals, encounter cards, VTT bundles) run on their
+# own workers so long exports never hold up rules and combat tasks
+module "export_workers" {
+  source = "../modules/ecs-service"
+  
+  environment = "staging"
+  service_name = "export-workers"
+  
+  cluster_id = module.ecs.cluster_id
+  vpc_id     = module.vpc.vpc_id
+  
+  subnet_ids = module.vpc.private_subnet_ids
+  
+  image = var.workers_image
+  port  = 8001
+  
+  cpu    = 512
+  memory = 1024
+  
+  desired_count = 1
+  
+  # Workers don't need load balancer
+  load_balancer_arn = null
+  target_group_arn  = null
+  
+  environment_variables = {
+    DATABASE_URL  = module.rds.connection_string
+    REDIS_URL     = module.redis.connection_string
+    CELERY_QUEUES = "exports"
+    ENVIRONMENT   = "staging"
+    # Exports without a destination go to the bucket (task role credentials)
+    EXPORT_BUCKET  = aws_s3_bucket.exports.bucket
+    MINIO_ENDPOINT = "s3.${var.aws_region}.amazonaws.com"
+    MINIO_USE_SSL  = "true"
+  }
+  
+  secrets = {
+    DATABASE_PASSWORD = module.rds.db_password_arn
+    RNG_MASTER_SEED   = var.rng_master_seed_arn
+  }
+  
+  depends_on = [module.ecs, module.rds, module.redis, aws_s3_bucket.exports]
+}
+
 module "workers" {
   source = "../modules/ecs-service"
   
@@ -223,17 +273,22 @@ module "workers" {
   target_group_arn  = null
   
   environment_variables = {
-    DATABASE_URL = module.rds.connection_string
-    REDIS_URL    = module.redis.connection_string
-    NATS_URL     = var.nats_url
+    DATABASE_URL  = module.rds.connection_string
+    REDIS_URL     = module.redis.connection_string
+    NATS_URL      = var.nats_url
+    # Exports are consumed by export_workers
+    CELERY_QUEUES = "celery"
+    ENVIRONMENT   = "staging"
   }
   
   secrets = {
     DATABASE_PASSWORD = module.rds.db_password_arn
-    OPENAI_API_KEY   = var.openai_api_key_arn
+    OPENAI_API_KEY    = var.openai_api_key_arn
+    RNG_MASTER_SEED   = var.rng_master_seed_arn
   }
   
-  depends_on = [module.ecs, module.rds, module.redis]
+  # Created after export_workers so the "exports" queue always has a consumer
+  depends_on = [module.ecs, module.rds, module.redis, module.export_workers]
 }
 
 # Route53 DNS
@@ -259,7 +314,8 @@ module "logs" {
     "/ecs/staging/frontend",
     "/ecs/staging/gateway", 
     "/ecs/staging/orchestrator",
-    "/ecs/staging/workers"
+    "/ecs/staging/workers",
+    "/ecs/staging/export-workers"
   ]
 }
 
@@ -48,6 +48,11 @@ variable "openai_api_key_arn" {
   type        = string
 }
 
+variable "rng_master_seed_arn" {
+  description = "ARN of the workers' RNG master seed in AWS Secrets Manager"
+  type        = string
+}
+
 variable "nats_url" {
   description = "NATS server URL"
   type        = string